@@ -0,0 +1,65 @@
+import argparse
+import json
+import sys
+from utils.logger import get_logger
+from utils.logfile_utils import make_log_filename
+
+"""
+Fusion2X Autotune command
+-------------------------
+Benchmarks a registered model over a sample frame set for a grid of
+tile_size / threads / gpu_id values and writes the fastest combination to this
+host's performance profile (profiles/<hostname>.json). Jobs that omit those
+params then use the tuned values automatically.
+
+Example:
+    python autotune.py --stage upscaling --model realesrgan-ncnn-vulkan \
+        --samples samples/ --tile_sizes 0,200,400 --threads 1:2:2,2:4:2 --gpu_ids 0,1
+"""
+
+
+def _csv(cast):
+    def parse(value):
+        return [cast(v) for v in value.split(",") if v.strip()]
+    return parse
+
+
+def parse_cli_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fusion2X: tune model parameters for this machine")
+    parser.add_argument('--stage', required=True, choices=['upscaling', 'interpolation'])
+    parser.add_argument('--model', required=True, help='Model name from the registry')
+    parser.add_argument('--samples', required=True, help='Directory of sample frames')
+    parser.add_argument('--tile_sizes', type=_csv(int), help='Comma-separated tile sizes (e.g. 0,200,400)')
+    parser.add_argument('--threads', type=_csv(str), help='Comma-separated threads values: ncnn -j specs (e.g. 1:2:2,2:2:2) or onnxruntime thread counts')
+    parser.add_argument('--gpu_ids', type=_csv(int), help='Comma-separated GPU ids (e.g. 0,1)')
+    parser.add_argument('--params', type=json.loads, default={}, help='Fixed model params as JSON')
+    parser.add_argument('--no_write', action='store_true', help='Measure only; do not update the profile')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_cli_args(argv)
+    log_path = make_log_filename()
+    logger = get_logger(log_path, module_name="Autotune")
+
+    from core.autotune import autotune
+
+    summary = autotune(
+        args.stage,
+        args.model,
+        args.samples,
+        tile_sizes=args.tile_sizes,
+        threads=args.threads,
+        gpu_ids=args.gpu_ids,
+        base_params=args.params,
+        logger=logger,
+        write=not args.no_write,
+    )
+    summary["log_path"] = log_path
+    print(json.dumps(summary))
+    if summary["status"] != "success":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Fusion2X Autotune
+-----------------
+Sweeps tile_size, threads and gpu_id for one registered
+model over a sample frame set, measures frames/sec and peak child memory for
+every combination, and stores the fastest combination in the host performance
+profile (utils.perf_profile) so jobs that omit those params use it.
+
+Each grid point runs in its own worker process so peak memory can be read from
+that process's child rusage. Points on different GPUs run in parallel; points
+on the same GPU run one after another so they do not skew each other.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from handlers import upscaling_handler, interpolation_handler
+from media.frame_format import list_frames
+from media.frame_verify import read_image_size
+from utils.perf_profile import load_profile, save_profile, TUNABLE_PARAMS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TILE_SIZES = [0, 100, 200, 400]
+# "threads" is the -j load:proc:save spec of the ncnn executables, an int for onnxruntime
+DEFAULT_THREADS = ["1:2:2", "2:2:2", "4:4:4"]
+DEFAULT_ONNXRUNTIME_THREADS = [1, 2, 4, 8]
+DEFAULT_GPU_IDS = [0]
+
+
+def _registry(stage):
+    if stage == "upscaling":
+        return upscaling_handler.MODEL_REGISTRY
+    if stage == "interpolation":
+        return interpolation_handler.MODEL_REGISTRY
+    raise ValueError(f"Unknown stage '{stage}'")
+
+
+def thread_grid(model_name, threads=None):
+    """The threads values to sweep for model_name, in the form its runner takes."""
+    if model_name == "onnxruntime-cpu":
+        if threads is not None:
+            return [int(t) for t in threads]
+        cores = os.cpu_count() or 1
+        return [t for t in DEFAULT_ONNXRUNTIME_THREADS if t <= cores] or [1]
+    return threads if threads is not None else DEFAULT_THREADS
+
+
+def build_grid(supported_params, tile_sizes=None, threads=None, gpu_ids=None, base_params=None, model_name=None):
+    """
+    Cartesian product of the tunable values the model supports.
+    Returns a list of param dicts (base_params merged with one combination each).
+    """
+    axes = []
+    for name, values, default in (
+        ("tile_size", tile_sizes, DEFAULT_TILE_SIZES),
+        ("threads", thread_grid(model_name, threads), DEFAULT_THREADS),
+        ("gpu_id", gpu_ids, DEFAULT_GPU_IDS),
+    ):
+        if name in supported_params:
+            axes.append([(name, v) for v in (values if values is not None else default)])
+    base_params = base_params or {}
+    return [dict(base_params, **dict(combo)) for combo in itertools.product(*axes)]
+
+
+def sample_megapixels(sample_dir):
+    """Megapixels of the first sample frame (fps in the profile is at this size), or None."""
+    frames = list_frames(sample_dir)
+    size = read_image_size(os.path.join(sample_dir, frames[0])) if frames else None
+    return round(size[0] * size[1] / 1e6, 4) if size else None
+
+
+def _peak_child_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return rss / (1024 * 1024)
+    return rss / 1024
+
+
+def measure_point(stage, model_name, params, sample_dir):
+    """
+    Run the model once over a private copy of sample_dir with params.
+    Returns dict: params, success, seconds, frames, fps, peak_rss_mb, message.
+    """
+    model_func, _ = _registry(stage)[model_name]
+    logger = logging.getLogger("fusion2x_autotune")
+    frames = list_frames(sample_dir)
+    work_dir = tempfile.mkdtemp(prefix="fusion2x_autotune_")
+    try:
+        for f in frames:
+            shutil.copy2(os.path.join(sample_dir, f), os.path.join(work_dir, f))
+        start = time.perf_counter()
+        model_func(frame_dir=work_dir, params=params, logger=logger)
+        seconds = time.perf_counter() - start
+        return {
+            "params": params,
+            "success": True,
+            "seconds": seconds,
+            "frames": len(frames),
+            "fps": len(frames) / seconds if seconds > 0 else 0.0,
+            "peak_rss_mb": _peak_child_rss_mb(),
+            "message": "",
+        }
+    except Exception as e:
+        return {
+            "params": params,
+            "success": False,
+            "seconds": None,
+            "frames": len(frames),
+            "fps": 0.0,
+            "peak_rss_mb": _peak_child_rss_mb(),
+            "message": str(e),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_sweep(stage, model_name, sample_dir, grid, logger=None, isolate=True):
+    """
+    Measure every point of grid. With isolate (default) each point runs in a
+    fresh worker process; points on different gpu_ids run in parallel.
+    Returns the list of measurement dicts in grid order.
+    """
+    results = [None] * len(grid)
+    groups = {}
+    for i, params in enumerate(grid):
+        groups.setdefault(params.get("gpu_id"), []).append(i)
+
+    def report(i):
+        if logger:
+            r = results[i]
+            status = f"{r['fps']:.2f} fps" if r["success"] else f"failed: {r['message']}"
+            logger.info(f"[autotune] {model_name} {r['params']}: {status}")
+
+    if not isolate:
+        for i, params in enumerate(grid):
+            results[i] = measure_point(stage, model_name, params, sample_dir)
+            report(i)
+        return results
+
+    # maxtasksperchild=1 gives every point a clean process, so RUSAGE_CHILDREN is per point
+    with multiprocessing.Pool(processes=len(groups), maxtasksperchild=1) as pool:
+        def run_group(indices):
+            for i in indices:
+                results[i] = pool.apply(measure_point, (stage, model_name, grid[i], sample_dir))
+                report(i)
+
+        threads = [threading.Thread(target=run_group, args=(indices,)) for indices in groups.values()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    return results
+
+
+def autotune(stage, model_name, sample_dir, tile_sizes=None, threads=None, gpu_ids=None,
+             base_params=None, logger=None, isolate=True, write=True):
+    """
+    Sweep the tunable parameters of a registered model and record the best
+    combination in the host profile.
+
+    Returns dict: status, best (measurement), results (all measurements),
+    profile_path (when written), message.
+    """
+    registry = _registry(stage)
+    if model_name not in registry:
+        return {"status": "error", "message": f"Unknown {stage} model '{model_name}'"}
+    if not os.path.isdir(sample_dir):
+        return {"status": "error", "message": f"Sample directory does not exist: {sample_dir}"}
+    _, supported_params = registry[model_name]
+    grid = build_grid(supported_params, tile_sizes, threads, gpu_ids, base_params, model_name)
+    if logger:
+        logger.info(f"[autotune] {model_name}: {len(grid)} parameter combinations on {sample_dir}")
+
+    results = run_sweep(stage, model_name, sample_dir, grid, logger=logger, isolate=isolate)
+    successful = [r for r in results if r["success"]]
+    if not successful:
+        return {"status": "error", "message": "Every parameter combination failed.", "results": results}
+    best = max(successful, key=lambda r: r["fps"])
+
+    summary = {"status": "success", "best": best, "results": results, "message": "Autotune complete."}
+    if write:
+        profile = load_profile()
+        profile.setdefault(stage, {})[model_name] = {
+            "params": {k: v for k, v in best["params"].items() if k in TUNABLE_PARAMS},
+            "fps": best["fps"],
+            "peak_rss_mb": best["peak_rss_mb"],
+            "sample_frames": best["frames"],
+            "sample_megapixels": sample_megapixels(sample_dir),
+        }
+        summary["profile_path"] = save_profile(profile)
+    return summary
@@ -0,0 +1,510 @@
+"""
+Coordinator/worker mode: one job's upscaling frames spread over several machines.
+
+The job's process is the coordinator. It splits the frames into batches and
+listens on a TCP port (pipeline "coordinator", e.g. "0.0.0.0:7800"). Workers,
+started on any host with `python receiver.py --worker HOST:PORT`, connect,
+take batches, run them through the normal upscaling handler (model registry,
+retries, output verification, the host's performance profile) and send the
+outputs back. Workers reconnect after each job, so one set of workers serves
+job after job.
+
+    worker -> coordinator   {"type": "hello", "worker": id, "nonce": ...}
+                            {"type": "auth", "proof": ...}
+                            {"type": "ready"}
+                            {"type": "heartbeat"}
+                            {"type": "result", "batch": n, "ok": bool, "message": ..., "frames": {...}}
+    coordinator -> worker   {"type": "welcome", "nonce": ..., "proof": ...}
+                            {"type": "batch", "batch": n, "block": {...}}
+                            {"type": "wait", "seconds": s}
+                            {"type": "done"}       job finished, reconnect for the next one
+                            {"type": "error", "message": ...}
+
+Every message is a 4-byte big-endian length, that many bytes of JSON, then
+the bytes of the files the header lists ("files": [[name, size], ...]).
+
+Workers pull batches, so fast workers simply take more of them. A worker
+that stops sending heartbeats (HEARTBEAT_TIMEOUT) or disconnects has its
+batches put back in the queue. Once the queue is empty, an idle worker is
+given a copy of the oldest batch still running elsewhere (work stealing,
+at most MAX_COPIES copies). The first result wins and later copies are
+dropped. If no worker is connected for worker_wait seconds, the remaining
+frames are upscaled locally.
+
+Set FUSION2X_CLUSTER_TOKEN on the coordinator and the workers to reject
+other clients. The token itself is never sent: each side proves it knows it
+with an HMAC of the other side's nonce, so workers also refuse coordinators
+without the token. The protocol is not encrypted; use it on a trusted network.
+
+Batches carry the upscaling block without host-local params (executable and
+model paths, HOST_LOCAL_PARAMS): those name files on the coordinator, so
+workers find the model the way a normal job on their host would.
+"""
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+from media.frame_format import list_frames
+from handlers.upscaling_handler import run_upscaling
+
+DEFAULT_PORT = 7800
+BATCH_FRAMES = 32
+HEARTBEAT_INTERVAL = 2.0
+HEARTBEAT_TIMEOUT = 10.0
+# Seconds without any connected worker before the coordinator upscales the rest itself
+WORKER_WAIT = 30.0
+RECONNECT_DELAY = 2.0
+# Failed runs of one batch (on any workers) before it is left to the local fallback
+MAX_BATCH_ATTEMPTS = 3
+# Copies of one batch running at once (the original plus stolen duplicates)
+MAX_COPIES = 2
+MAX_HEADER = 16 * 1024 * 1024
+RECV_CHUNK = 1024 * 1024
+_LENGTH = struct.Struct(">I")
+# Upscaling params naming files on one host; never sent to or accepted by workers
+HOST_LOCAL_PARAMS = ("model_path", "model_dir")
+HOST_LOCAL_SUFFIX = "_exe_path"
+
+
+class ProtocolError(Exception):
+    """The peer sent something that is not a valid message."""
+
+
+def parse_address(text, default_host="0.0.0.0"):
+    """ "host:port", "host" or "port" -> (host, port)."""
+    text = str(text).strip()
+    if ":" not in text:
+        return (default_host, int(text)) if text.isdigit() else (text, DEFAULT_PORT)
+    host, _, port = text.rpartition(":")
+    return host or default_host, int(port or DEFAULT_PORT)
+
+
+def cluster_token():
+    return os.environ.get("FUSION2X_CLUSTER_TOKEN") or None
+
+
+def _proof(token, role, nonce):
+    return hmac.new(token.encode("utf-8"), f"{role}:{nonce}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _proven(token, role, nonce, proof):
+    """True without a token, else whether proof is the HMAC of role and nonce with the token."""
+    return not token or hmac.compare_digest(str(proof or ""), _proof(token, role, nonce))
+
+
+def portable_block(block):
+    """(upscaling block without host-local params, names of the params removed)."""
+    params = block.get("params") or {}
+    removed = sorted(k for k in params if k in HOST_LOCAL_PARAMS or k.endswith(HOST_LOCAL_SUFFIX))
+    if not removed:
+        return block, []
+    return dict(block, params={k: v for k, v in params.items() if k not in removed}), removed
+
+
+def send_message(sock, header, paths=()):
+    """Send a JSON header followed by the contents of paths (listed as header["files"])."""
+    files = [open(p, "rb") for p in paths]
+    try:
+        header = dict(header)
+        if files:
+            header["files"] = [[os.path.basename(p), os.fstat(f.fileno()).st_size] for p, f in zip(paths, files)]
+        data = json.dumps(header).encode("utf-8")
+        sock.sendall(_LENGTH.pack(len(data)) + data)
+        for f in files:
+            sock.sendfile(f)
+    finally:
+        for f in files:
+            f.close()
+
+
+def _recv_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(RECV_CHUNK, n - len(buf)))
+        if not chunk:
+            raise ConnectionError("Connection closed by peer.")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock, dest_dir=None):
+    """
+    Receive one message; the files it carries are written to dest_dir under
+    their base names. Returns the header.
+    """
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    if length > MAX_HEADER:
+        raise ProtocolError(f"Header of {length} bytes is too large.")
+    try:
+        header = json.loads(_recv_exact(sock, length))
+    except ValueError as e:
+        raise ProtocolError(f"Invalid header: {e}")
+    for name, size in header.get("files", []):
+        base = os.path.basename(str(name))
+        if dest_dir is None or not base or base.startswith("."):
+            raise ProtocolError(f"Unexpected file '{name}'.")
+        with open(os.path.join(dest_dir, base), "wb") as f:
+            remaining = int(size)
+            while remaining:
+                chunk = sock.recv(min(RECV_CHUNK, remaining))
+                if not chunk:
+                    raise ConnectionError("Connection closed during a file transfer.")
+                f.write(chunk)
+                remaining -= len(chunk)
+    return header
+
+
+class Coordinator:
+    """
+    Hands out one job's frame batches to connected workers and collects the
+    outputs into frames_dir. Use run() (or start() / wait() / close()).
+
+    Args:
+        frames_dir (str): Directory of the frames; outputs replace them here.
+        block (dict): The job's upscaling block, sent to the workers.
+        logger: Logger instance.
+        address (tuple): (host, port) to listen on; port 0 picks a free one (see .address).
+        batch_frames (int): Frames per batch.
+        token (str): Shared secret workers must present (default: FUSION2X_CLUSTER_TOKEN).
+        heartbeat_timeout (float): Seconds of silence after which a worker is dropped.
+        worker_wait (float): Seconds without any worker before giving up on the cluster.
+    """
+
+    def __init__(self, frames_dir, block, logger, address=("0.0.0.0", DEFAULT_PORT), batch_frames=BATCH_FRAMES,
+                 token=None, heartbeat_timeout=HEARTBEAT_TIMEOUT, worker_wait=WORKER_WAIT):
+        self.frames_dir = frames_dir
+        self.block, removed = portable_block(block)
+        if removed:
+            logger.info(f"[cluster] Workers use their own {', '.join(removed)}.")
+        self.logger = logger
+        self.token = token if token is not None else cluster_token()
+        self.heartbeat_timeout = heartbeat_timeout
+        self.worker_wait = worker_wait
+        names = list_frames(frames_dir)
+        size = max(1, int(batch_frames))
+        self.batches = [names[i:i + size] for i in range(0, len(names), size)]
+        self.queue = deque(range(len(self.batches)))
+        self.assigned = {}   # batch -> worker ids running it
+        self.started = {}    # batch -> time of its first dispatch
+        self.attempts = {}   # batch -> failed runs
+        self.done = set()
+        self.abandoned = set()
+        self.frames = {"expected": 0, "verified": 0, "reprocessed": 0, "failed": 0}
+        self._cond = threading.Condition()
+        self._workers = {}
+        self._stop = threading.Event()
+        self._work_dir = tempfile.mkdtemp(prefix="_dist_", dir=os.path.dirname(os.path.abspath(frames_dir)))
+        self._server = socket.create_server(address)
+        self.address = self._server.getsockname()[:2]
+
+    # Batch bookkeeping (callers hold self._cond)
+
+    def _finished(self):
+        return len(self.done) + len(self.abandoned) == len(self.batches)
+
+    def _next_batch(self, worker):
+        while self.queue:
+            batch = self.queue.popleft()
+            if batch not in self.done and batch not in self.abandoned:
+                self.assigned.setdefault(batch, set()).add(worker)
+                self.started.setdefault(batch, time.monotonic())
+                return batch
+        # Queue empty: steal the oldest batch still running on another worker
+        running = [
+            b for b, workers in self.assigned.items()
+            if workers and worker not in workers and len(workers) < MAX_COPIES
+            and b not in self.done and b not in self.abandoned
+        ]
+        if not running:
+            return None
+        batch = min(running, key=lambda b: self.started[b])
+        self.assigned[batch].add(worker)
+        self.logger.info(f"[cluster] {worker} takes a copy of batch {batch} (running on "
+                         f"{', '.join(sorted(self.assigned[batch] - {worker}))}).")
+        return batch
+
+    def _release(self, worker, batch):
+        """worker no longer runs batch; requeue it if nobody else does."""
+        workers = self.assigned.get(batch, set())
+        workers.discard(worker)
+        if not workers and batch not in self.done and batch not in self.abandoned and batch not in self.queue:
+            self.queue.appendleft(batch)
+            self.logger.warning(f"[cluster] Batch {batch} re-dispatched (was on {worker}).")
+
+    def _accept_result(self, worker, header, recv_dir):
+        batch = header.get("batch")
+        with self._cond:
+            if batch not in self.assigned or worker not in self.assigned[batch]:
+                raise ProtocolError(f"Result for batch {batch} that was not given to {worker}.")
+            self.assigned[batch].discard(worker)
+            if batch in self.done or batch in self.abandoned:
+                return  # a faster copy already finished it
+            if not header.get("ok"):
+                self.attempts[batch] = self.attempts.get(batch, 0) + 1
+                self.logger.warning(f"[cluster] Batch {batch} failed on {worker}: {header.get('message')}")
+                if self.attempts[batch] >= MAX_BATCH_ATTEMPTS:
+                    self.abandoned.add(batch)
+                else:
+                    self._release(worker, batch)
+                self._cond.notify_all()
+                return
+            sources = {os.path.splitext(name)[0]: name for name in self.batches[batch]}
+            for name, _ in header.get("files", []):
+                name = os.path.basename(name)
+                source = sources.get(os.path.splitext(name)[0])
+                if source is None:
+                    continue
+                os.replace(os.path.join(recv_dir, name), os.path.join(self.frames_dir, name))
+                if name != source:
+                    # Output in another format replaces the source frame
+                    try:
+                        os.remove(os.path.join(self.frames_dir, source))
+                    except FileNotFoundError:
+                        pass
+            for key, value in (header.get("frames") or {}).items():
+                if key in self.frames:
+                    self.frames[key] += value
+            self.done.add(batch)
+            self._cond.notify_all()
+
+    # Connections
+
+    def start(self):
+        threading.Thread(target=self._accept_loop, name="cluster-accept", daemon=True).start()
+        self.logger.info(f"[cluster] Coordinator listening on {self.address[0]}:{self.address[1]} "
+                         f"with {len(self.batches)} batches.")
+
+    def _accept_loop(self):
+        self._server.settimeout(0.5)
+        while not self._stop.is_set():
+            try:
+                sock, peer = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            thread = threading.Thread(target=self._serve, args=(sock, peer), name=f"cluster-{peer[0]}", daemon=True)
+            thread.start()
+
+    def _serve(self, sock, peer):
+        sock.settimeout(self.heartbeat_timeout)
+        worker = None
+        recv_dir = tempfile.mkdtemp(dir=self._work_dir)
+        try:
+            hello = recv_message(sock)
+            nonce = secrets.token_hex(16)
+            if hello.get("type") == "hello":
+                welcome = {"type": "welcome", "nonce": nonce}
+                if self.token:
+                    welcome["proof"] = _proof(self.token, "coordinator", hello.get("nonce", ""))
+                send_message(sock, welcome)
+                auth = recv_message(sock)
+            if (hello.get("type") != "hello" or auth.get("type") != "auth"
+                    or not _proven(self.token, "worker", nonce, auth.get("proof"))):
+                send_message(sock, {"type": "error", "message": "Not authorized."})
+                self.logger.warning(f"[cluster] Rejected connection from {peer[0]}.")
+                return
+            with self._cond:
+                worker = str(hello.get("worker") or f"{peer[0]}:{peer[1]}")
+                while worker in self._workers:
+                    worker += "+"
+                self._workers[worker] = sock
+                self._cond.notify_all()
+            self.logger.info(f"[cluster] Worker {worker} connected from {peer[0]}.")
+            while not self._stop.is_set():
+                header = recv_message(sock, recv_dir)
+                kind = header.get("type")
+                if kind == "ready":
+                    with self._cond:
+                        batch = None if self._finished() else self._next_batch(worker)
+                        finished = self._finished()
+                    if batch is not None:
+                        paths = [os.path.join(self.frames_dir, name) for name in self.batches[batch]]
+                        send_message(sock, {"type": "batch", "batch": batch, "block": self.block}, paths)
+                    elif finished:
+                        send_message(sock, {"type": "done"})
+                        return
+                    else:
+                        send_message(sock, {"type": "wait", "seconds": 0.5})
+                elif kind == "result":
+                    self._accept_result(worker, header, recv_dir)
+                    for name in os.listdir(recv_dir):
+                        os.remove(os.path.join(recv_dir, name))
+                elif kind != "heartbeat":
+                    raise ProtocolError(f"Unknown message type '{kind}'.")
+        except (OSError, ProtocolError, ValueError) as e:
+            if not self._stop.is_set():
+                self.logger.warning(f"[cluster] Lost worker {worker or peer[0]}: {e}")
+        finally:
+            with self._cond:
+                if worker is not None:
+                    self._workers.pop(worker, None)
+                    for batch in [b for b, workers in self.assigned.items() if worker in workers]:
+                        self._release(worker, batch)
+                self._cond.notify_all()
+            sock.close()
+            shutil.rmtree(recv_dir, ignore_errors=True)
+
+    def wait(self):
+        """
+        Block until every batch is done or abandoned, or no worker was connected
+        for worker_wait seconds. Returns the frame names still without output.
+        """
+        idle_since = time.monotonic()
+        with self._cond:
+            while not self._finished():
+                if self._workers:
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since > self.worker_wait:
+                    self.logger.warning(f"[cluster] No workers for {self.worker_wait:g}s.")
+                    break
+                self._cond.wait(0.5)
+            return [name for b, batch in enumerate(self.batches) if b not in self.done for name in batch]
+
+    def close(self):
+        self._stop.set()
+        self._server.close()
+        with self._cond:
+            socks = list(self._workers.values())
+        for sock in socks:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        shutil.rmtree(self._work_dir, ignore_errors=True)
+
+    def run(self):
+        self.start()
+        try:
+            return self.wait()
+        finally:
+            self.close()
+
+
+def run_distributed_upscaling(frames_dir, upscaling_params, logger, address, batch_frames=BATCH_FRAMES,
+                              worker_wait=WORKER_WAIT):
+    """
+    Upscale frames_dir with the workers connecting to address; frames the
+    cluster could not finish are upscaled locally. Same result dict as
+    handlers.upscaling_handler.run_upscaling.
+    """
+    if isinstance(address, str):
+        address = parse_address(address)
+    coordinator = Coordinator(frames_dir, upscaling_params, logger, address=address, batch_frames=batch_frames,
+                              worker_wait=worker_wait)
+    remaining = coordinator.run()
+    frames = dict(coordinator.frames)
+    if not remaining:
+        logger.info(f"[cluster] {len(coordinator.batches)} batches upscaled by workers.")
+        if frames["failed"]:
+            return {"success": False, "frames": frames,
+                    "message": f"Upscaling left {frames['failed']} of {frames['expected']} frames without valid output."}
+        return {"success": True, "message": "Upscaling completed on cluster workers.", "frames": frames}
+
+    logger.info(f"[cluster] Upscaling {len(remaining)} remaining frames locally.")
+    local_dir = os.path.join(frames_dir, "_local")
+    shutil.rmtree(local_dir, ignore_errors=True)
+    os.makedirs(local_dir)
+    try:
+        for name in remaining:
+            os.replace(os.path.join(frames_dir, name), os.path.join(local_dir, name))
+        result = run_upscaling(local_dir, upscaling_params, logger)
+        for name in os.listdir(local_dir):
+            os.replace(os.path.join(local_dir, name), os.path.join(frames_dir, name))
+    finally:
+        shutil.rmtree(local_dir, ignore_errors=True)
+    for key, value in (result.get("frames") or {}).items():
+        frames[key] = frames.get(key, 0) + value
+    result["frames"] = frames
+    return result
+
+
+def _serve_coordinator(sock, worker_id, token, logger, stop, work_dir):
+    """Take batches from one connected coordinator until it says the job is done."""
+    lock = threading.Lock()
+
+    def send(header, paths=()):
+        with lock:
+            send_message(sock, header, paths)
+
+    def heartbeat():
+        while not beat_stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                send({"type": "heartbeat"})
+            except OSError:
+                return
+
+    nonce = secrets.token_hex(16)
+    send({"type": "hello", "worker": worker_id, "nonce": nonce})
+    welcome = recv_message(sock)
+    if welcome.get("type") != "welcome" or not _proven(token, "coordinator", nonce, welcome.get("proof")):
+        logger.error("[worker] The coordinator did not prove the cluster token; disconnecting.")
+        return "error"
+    send({"type": "auth", "proof": _proof(token, "worker", welcome.get("nonce", "")) if token else None})
+    beat_stop = threading.Event()
+    threading.Thread(target=heartbeat, name="cluster-heartbeat", daemon=True).start()
+    try:
+        while not stop.is_set():
+            send({"type": "ready"})
+            batch_dir = tempfile.mkdtemp(prefix="fusion2x_batch_", dir=work_dir)
+            try:
+                header = recv_message(sock, batch_dir)
+                kind = header.get("type")
+                if kind == "wait":
+                    stop.wait(header.get("seconds", 1.0))
+                    continue
+                if kind != "batch":
+                    if kind == "error":
+                        logger.error(f"[worker] Coordinator refused the connection: {header.get('message')}")
+                    return kind
+                names = [name for name, _ in header.get("files", [])]
+                logger.info(f"[worker] Batch {header['batch']}: {len(names)} frames.")
+                block, removed = portable_block(header["block"])
+                if removed:
+                    logger.warning(f"[worker] Ignoring the coordinator's {', '.join(removed)}; using this host's.")
+                result = run_upscaling(batch_dir, block, logger)
+                outputs = []
+                if result.get("success"):
+                    stems = {os.path.splitext(name)[0] for name in names}
+                    outputs = [os.path.join(batch_dir, f) for f in sorted(os.listdir(batch_dir))
+                               if os.path.splitext(f)[0] in stems and os.path.isfile(os.path.join(batch_dir, f))]
+                send({"type": "result", "batch": header["batch"], "ok": bool(result.get("success")),
+                      "message": result.get("message", ""), "frames": result.get("frames")}, outputs)
+            finally:
+                shutil.rmtree(batch_dir, ignore_errors=True)
+    finally:
+        beat_stop.set()
+
+
+def run_worker(address, logger, token=None, stop_event=None, work_dir=None, once=False,
+               reconnect_delay=RECONNECT_DELAY):
+    """
+    Serve upscaling batches for coordinators at address, reconnecting between
+    jobs, until stop_event is set (or after one job with once=True).
+    """
+    if isinstance(address, str):
+        address = parse_address(address, default_host="127.0.0.1")
+    token = token if token is not None else cluster_token()
+    stop = stop_event or threading.Event()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident() % 10000}"
+    logger.info(f"[worker] {worker_id} serving coordinator {address[0]}:{address[1]}.")
+    while not stop.is_set():
+        try:
+            with socket.create_connection(address, timeout=HEARTBEAT_TIMEOUT) as sock:
+                sock.settimeout(HEARTBEAT_TIMEOUT * 3)
+                outcome = _serve_coordinator(sock, worker_id, token, logger, stop, work_dir)
+            if outcome == "error" or once:
+                return outcome
+        except (OSError, ProtocolError) as e:
+            logger.debug(f"[worker] No coordinator at {address[0]}:{address[1]}: {e}")
+        stop.wait(reconnect_delay)
+    return None
@@ -0,0 +1,208 @@
+"""
+Shared process pool for CPU-bound Python work inside a job (frame
+verification, hashing, tiling, format conversion).
+
+Stage code submits chunks of work with run_chunks(); one pool per process is
+shared by every job (watch-folder mode runs several at once) and a global
+budget caps the chunks running at the same time, so Python workers leave
+cores for ffmpeg and the model executables. The budget defaults to half the
+cores and can be set with FUSION2X_CPU_WORKERS or configure(max_workers=...).
+The budget is a process setting: receiver.py applies the pipeline
+"cpu_workers" of the request it starts with (--cpu_workers), before any job
+runs; jobs never resize the pool other jobs are using.
+
+Small inputs (fewer than PARALLEL_MIN_ITEMS items) run inline: starting a
+worker costs more than checking a few hundred frames.
+
+Large buffers (decoded frames) should not be pickled into a task; put them in
+a SharedBuffer and pass its descriptor instead. The worker attaches with
+SharedBuffer.attach(descriptor) and reads the same memory.
+"""
+import atexit
+import os
+import threading
+
+PARALLEL_MIN_ITEMS = 2000
+DEFAULT_CHUNK_SIZE = 500
+
+_lock = threading.Lock()
+_pool = None
+_max_workers = None
+_budget = None
+_atexit_registered = False
+# run_chunks calls using the pool right now
+_in_use = 0
+
+
+def default_workers():
+    """FUSION2X_CPU_WORKERS, else half the cores (at least 1)."""
+    env = os.environ.get("FUSION2X_CPU_WORKERS")
+    if env:
+        return max(1, int(env))
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def configure(max_workers=None):
+    """
+    Set the global worker budget (None = default_workers()). An idle pool of
+    a different size is shut down; the next run_chunks starts a new one.
+    Raises RuntimeError while run_chunks calls are using the pool.
+    """
+    global _max_workers, _budget, _pool
+    workers = max(1, int(max_workers)) if max_workers else default_workers()
+    with _lock:
+        if workers == _max_workers:
+            return
+        if _in_use:
+            raise RuntimeError("The CPU worker pool is in use; set cpu_workers before jobs start.")
+        old_pool, _pool = _pool, None
+        _max_workers = workers
+        _budget = threading.BoundedSemaphore(workers)
+    if old_pool is not None:
+        old_pool.shutdown(wait=True)
+
+
+def max_workers():
+    if _max_workers is None:
+        configure()
+    return _max_workers
+
+
+def _get_pool():
+    global _pool, _atexit_registered
+    # Imported on first parallel run; most jobs never start the pool
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = max_workers()
+    with _lock:
+        if _pool is None:
+            # spawn: the parent has threads (log listener, fused-stage workers) that fork would copy mid-state
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            if not _atexit_registered:
+                atexit.register(shutdown)
+                _atexit_registered = True
+        return _pool, _budget
+
+
+def shutdown():
+    """Stop the worker processes (registered with atexit)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _chunks(items, chunk_size):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def run_chunks(func, items, chunk_size=None, min_items=PARALLEL_MIN_ITEMS):
+    """
+    Call func(chunk) for consecutive chunks of items and return the results in
+    order (one per chunk). func must be picklable (a module-level function or
+    functools.partial of one).
+
+    Runs inline when there are fewer than min_items items or the budget is a
+    single worker; otherwise on the shared pool, never more than the budget of
+    chunks at once across all callers.
+    """
+    items = list(items)
+    if not items:
+        return []
+    chunk_size = max(1, int(chunk_size or DEFAULT_CHUNK_SIZE))
+    chunks = _chunks(items, chunk_size)
+    if len(items) < min_items or len(chunks) == 1 or max_workers() <= 1:
+        return [func(chunk) for chunk in chunks]
+
+    global _in_use
+    with _lock:
+        _in_use += 1
+    try:
+        pool, budget = _get_pool()
+        return _run_on_pool(pool, budget, func, chunks)
+    finally:
+        with _lock:
+            _in_use -= 1
+
+
+def _run_on_pool(pool, budget, func, chunks):
+    futures = []
+    try:
+        for chunk in chunks:
+            budget.acquire()
+            try:
+                future = pool.submit(func, chunk)
+            except BaseException:
+                budget.release()
+                raise
+            future.add_done_callback(lambda _: budget.release())
+            futures.append(future)
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+class SharedBuffer:
+    """
+    Block of shared memory for passing frame data to workers without pickling.
+
+    The creating process owns the block and must close() it (or use it as a
+    context manager); workers attach(descriptor) and close their handle when done.
+    """
+
+    def __init__(self, nbytes=None, name=None):
+        from multiprocessing import shared_memory
+
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, int(nbytes)))
+            self.owner = True
+        else:
+            try:
+                # Python 3.13+: keep the resource tracker from unlinking the owner's block
+                self._shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self._shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.nbytes = int(nbytes) if nbytes is not None else self._shm.size
+
+    @classmethod
+    def from_bytes(cls, data):
+        buffer = cls(len(data))
+        buffer.buf[:len(data)] = data
+        return buffer
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Open a buffer created in another process from its descriptor()."""
+        name, nbytes = descriptor
+        return cls(nbytes=nbytes, name=name)
+
+    @property
+    def buf(self):
+        return self._shm.buf
+
+    def descriptor(self):
+        """(name, nbytes): the picklable handle to send to a worker."""
+        return self._shm.name, self.nbytes
+
+    def as_array(self, shape, dtype="uint8"):
+        """NumPy view of the buffer (requires numpy)."""
+        import numpy as np
+        return np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+
+    def close(self):
+        self._shm.close()
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
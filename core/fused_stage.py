@@ -0,0 +1,130 @@
+"""
+Fused interpolate -> upscale stage.
+
+Source frames are processed in chunks: each chunk is interpolated at source
+resolution and its output is upscaled straight away, while the next chunk is
+already being interpolated. Only one or two chunks of intermediate frames exist
+at any time, so the full interpolated (or full-resolution) frame set is never
+materialized.
+"""
+import contextvars
+import math
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from handlers.upscaling_handler import run_upscaling
+from handlers.interpolation_handler import run_interpolation
+from media.frame_format import list_frames
+from utils.file_utils import link_or_copy
+from utils.timing import output_frame_ratio
+
+
+def _interpolate_chunk(frames_dir, frames, start, end, chunk_dir, interpolation_params, source_fps, ratio, logger):
+    """
+    Interpolate frames[start:end] plus one frame of overlap with the next chunk,
+    then drop the output that belongs to the overlap frame.
+    Returns (success, message, interpolation result).
+    """
+    os.makedirs(chunk_dir, exist_ok=True)
+    last_chunk = end >= len(frames)
+    source = frames[start:end] if last_chunk else frames[start:end + 1]
+    for i, name in enumerate(source, start=1):
+        link_or_copy(os.path.join(frames_dir, name), os.path.join(chunk_dir, f"frame_{i:06d}{os.path.splitext(name)[1]}"))
+
+    result = run_interpolation(chunk_dir, interpolation_params, logger, source_fps=source_fps)
+    if not result.get("success"):
+        return False, result.get("message", "Interpolation failed."), result
+    if last_chunk:
+        return True, "", result
+
+    outputs = list_frames(chunk_dir)
+    if len(outputs) == math.ceil(len(source) * ratio):
+        keep = int((end - start) * ratio)
+    else:
+        keep = round(len(outputs) * (end - start) / len(source))
+    for name in outputs[keep:]:
+        os.remove(os.path.join(chunk_dir, name))
+    return True, "", result
+
+
+def run_fused_stage(frames_dir, interpolation_params, upscaling_params, logger, chunk_size=100, source_fps=None,
+                    workers=1):
+    """
+    Interpolate then upscale the frames in frames_dir chunk by chunk, pipelining
+    interpolation of the next chunks (workers at a time) with upscaling of chunk k.
+    Afterwards frames_dir holds the final sequence as frame_%06d.
+
+    With a target_fps, chunk boundaries are aligned so every chunk starts on
+    the output frame grid (e.g. multiples of 400 source frames for 23.976 -> 60).
+    Returns dict: {"success": bool, "message": str, "output_fps": str, "frames": dict}
+    ("frames" sums the verified upscaling counts of the chunks).
+    """
+    frames = list_frames(frames_dir)
+    if not frames:
+        return {"success": False, "message": "No frames to process."}
+    ratio = output_frame_ratio(interpolation_params, source_fps)
+    chunk_size = max(1, int(chunk_size))
+    chunk_size = math.ceil(chunk_size / ratio.denominator) * ratio.denominator
+    bounds = [(i, min(i + chunk_size, len(frames))) for i in range(0, len(frames), chunk_size)]
+    work_dir = frames_dir.rstrip(os.sep) + "_fused"
+    out_dir = os.path.join(work_dir, "output")
+    os.makedirs(out_dir, exist_ok=True)
+    logger.info(f"Fused stage: {len(frames)} frames in {len(bounds)} chunks of {chunk_size}.")
+
+    def interpolate(k):
+        start, end = bounds[k]
+        chunk_dir = os.path.join(work_dir, f"chunk_{k:05d}")
+        return (chunk_dir,) + _interpolate_chunk(
+            frames_dir, frames, start, end, chunk_dir, interpolation_params, source_fps, ratio, logger
+        )
+
+    produced = 0
+    output_fps = None
+    counts = {"expected": 0, "verified": 0, "reprocessed": 0, "failed": 0}
+    workers = max(1, int(workers))
+    # Workers run in a copy of the caller's context so the stage's process limits apply to their children
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque(
+            pool.submit(contextvars.copy_context().run, interpolate, k) for k in range(min(workers, len(bounds)))
+        )
+        for k in range(len(bounds)):
+            chunk_start = time.perf_counter()
+            chunk_dir, ok, msg, interp_result = pending.popleft().result()
+            if not ok:
+                return {"success": False, "message": msg}
+            output_fps = interp_result.get("output_fps", output_fps)
+            if k + workers < len(bounds):
+                pending.append(pool.submit(contextvars.copy_context().run, interpolate, k + workers))
+
+            result = run_upscaling(chunk_dir, upscaling_params, logger)
+            if not result.get("success"):
+                return {"success": False, "message": result.get("message", "Upscaling failed."),
+                        "frames": result.get("frames")}
+            for key, value in result.get("frames", {}).items():
+                counts[key] += value
+
+            for name in list_frames(chunk_dir):
+                produced += 1
+                os.replace(
+                    os.path.join(chunk_dir, name),
+                    os.path.join(out_dir, f"frame_{produced:06d}{os.path.splitext(name)[1]}"),
+                )
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+            logger.info(
+                f"Fused stage: chunk {k + 1}/{len(bounds)} done ({produced} frames).",
+                extra={"stage": "fused", "frame": produced, "duration": round(time.perf_counter() - chunk_start, 3)},
+            )
+
+    for name in frames:
+        os.remove(os.path.join(frames_dir, name))
+    for name in list_frames(out_dir):
+        os.replace(os.path.join(out_dir, name), os.path.join(frames_dir, name))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    result = {"success": True, "message": f"Fused interpolation and upscaling completed ({produced} frames).",
+              "frames": counts}
+    if output_fps:
+        result["output_fps"] = output_fps
+    return result
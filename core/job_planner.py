@@ -0,0 +1,222 @@
+"""
+Dry-run job planning.
+
+plan_job() predicts a job from its probed input alone. For each stage it
+gives the frames, resolution and wall time. For the job it gives the peak
+disk use of the temp folder and the size of the output. A scheduler can use
+this to pack jobs onto nodes, and to reject a job that will not fit before it
+runs for hours.
+
+Model times come from the host performance profile (autotune.py) when the
+model was tuned on this machine:
+
+    seconds = frames * (megapixels / profile sample megapixels) / profile fps
+
+Profile fps counts input frames per second. Interpolation is tuned at the
+default times=2, so an interpolation stage counts its output frames / 2.
+Untuned models use stage_planner.MODEL_COST against
+DEFAULT_MODEL_MPX_PER_SECOND. Decode and encode rates, intermediate frame
+sizes and the output bitrate are rough constants. Every stage reports its
+"source" ("profile" or "estimate") so callers know how far to trust it.
+"""
+from core.stage_planner import MODEL_COST, _megapixels
+from media.renditions import bitrate_bps, rendition_settings, rendition_size
+from utils.perf_profile import get_model_profile
+from utils.timing import output_frame_ratio, parse_fps
+
+# Megapixels per second a model of MODEL_COST 1.0 processes on a mid-range GPU
+DEFAULT_MODEL_MPX_PER_SECOND = 4.0
+# ffmpeg decode + intermediate frame write, megapixels per second
+DECODE_MPX_PER_SECOND = {"png": 60, "webp": 25, "jpg": 250, "bmp": 400, "ppm": 400}
+# Intermediate frame read + x264 encode by preset, megapixels per second
+ENCODE_MPX_PER_SECOND = {
+    "ultrafast": 600, "superfast": 450, "veryfast": 300, "faster": 180, "fast": 120,
+    "medium": 80, "slow": 45, "slower": 25, "veryslow": 12,
+}
+GIF_ENCODE_MPX_PER_SECOND = 30
+# Encode time of other rendition codecs relative to x264 at the same preset
+CODEC_ENCODE_COST = {"libx264": 1.0, "libx265": 4.0, "libvpx-vp9": 4.0, "libsvtav1": 3.0}
+# Average bytes per pixel of a frame file (png/webp depend on the content)
+FRAME_BYTES_PER_PIXEL = {"png": 1.6, "webp": 1.2, "jpg": 0.25, "jpeg": 0.25, "bmp": 3.0, "ppm": 3.0}
+# Video output, bits per pixel per frame (x264 at its default CRF 23; gif)
+VIDEO_BITS_PER_PIXEL = {"x264": 0.08, "gif": 1.0}
+
+
+class _Frames:
+    """A frame sequence: count and size."""
+
+    def __init__(self, count, width, height):
+        self.count, self.width, self.height = count, width, height
+
+    @property
+    def megapixels(self):
+        return self.width * self.height / 1e6
+
+    @property
+    def resolution(self):
+        return f"{round(self.width)}x{round(self.height)}"
+
+    def bytes(self, fmt):
+        return self.count * self.megapixels * 1e6 * FRAME_BYTES_PER_PIXEL.get(fmt, 1.6)
+
+    def scaled(self, scale):
+        return _Frames(self.count, self.width * scale, self.height * scale)
+
+    def retimed(self, ratio):
+        return _Frames(round(self.count * ratio), self.width, self.height)
+
+
+def model_seconds(stage, model_name, frames_in, frames_out):
+    """(seconds, "profile" or "estimate", peak_rss_mb) of one model stage; frames_in sets the size."""
+    profile = get_model_profile(stage, model_name)
+    count = frames_in.count if stage == "upscaling" else frames_out.count
+    if profile.get("fps"):
+        size_ratio = frames_in.megapixels / profile["sample_megapixels"] if profile.get("sample_megapixels") else 1.0
+        if stage == "interpolation":
+            count /= 2
+        return count * size_ratio / profile["fps"], "profile", profile.get("peak_rss_mb")
+    cost = MODEL_COST.get(model_name, 1.0)
+    return count * frames_in.megapixels * cost / DEFAULT_MODEL_MPX_PER_SECOND, "estimate", None
+
+
+def output_bytes(frames, output_format):
+    if output_format in FRAME_BYTES_PER_PIXEL:
+        return frames.bytes(output_format)
+    codec = "gif" if output_format == "gif" else "x264"
+    return frames.count * frames.megapixels * 1e6 * VIDEO_BITS_PER_PIXEL[codec] / 8
+
+
+def _encode_rate(json_request):
+    if str(json_request.get("output_format", "")).lower() == "gif":
+        return GIF_ENCODE_MPX_PER_SECOND
+    return ENCODE_MPX_PER_SECOND.get(json_request.get("pipeline", {}).get("encoder_preset") or "medium", 80)
+
+
+def _rendition_rate(json_request, rendition):
+    if rendition["container"] == "gif":
+        return GIF_ENCODE_MPX_PER_SECOND
+    preset = json_request.get("pipeline", {}).get("encoder_preset") or "medium"
+    return ENCODE_MPX_PER_SECOND.get(preset, 80) / CODEC_ENCODE_COST.get(rendition["codec"], 1.0)
+
+
+def plan_renditions(json_request, frames, fps):
+    """(encode seconds, [{name, resolution, container, size_bytes}]) of a job's renditions."""
+    seconds, planned = 0.0, []
+    for rendition in rendition_settings(json_request):
+        scaled = _Frames(frames.count, *rendition_size(rendition, frames.width, frames.height))
+        # One ffmpeg process reads the frames once; each rendition is scaled and encoded on its own
+        seconds += scaled.count * scaled.megapixels / _rendition_rate(json_request, rendition)
+        bps = bitrate_bps(rendition["bitrate"])
+        size = bps * scaled.count / fps / 8 if bps and fps else output_bytes(scaled, rendition["container"])
+        planned.append({"name": rendition["name"], "resolution": scaled.resolution,
+                        "container": rendition["container"], "size_bytes": round(size)})
+    return seconds, planned
+
+
+def plan_job(json_request, source, stages, filter_stages=(), intermediate_format="png"):
+    """
+    Predict a job from its probed input.
+
+    Args:
+        json_request (dict): The job request.
+        source (dict): resolution ("WxH"), frame_count and, for video, fps_fraction.
+        stages (list): Model stages in run order ("upscaling", "interpolation", "fused").
+        filter_stages (iterable): Stages run as ffmpeg filters inside decode/encode.
+        intermediate_format (str): Image format of the frames between stages.
+
+    Returns:
+        dict: stages (stage, frames, resolution, seconds, source [, model, peak_rss_mb]),
+        output (frames, resolution, fps, size_bytes [, renditions]), temp_disk_peak_bytes,
+        wall_seconds, estimated_from.
+    Raises:
+        ValueError: the input resolution is unknown.
+    """
+    if _megapixels(source.get("resolution")) is None:
+        raise ValueError(f"Input resolution is unknown ({source.get('resolution')}); cannot plan the job.")
+    width, height = [int(x) for x in source["resolution"].lower().split("x")]
+    fps = source.get("fps_fraction")
+    output_format = str(json_request.get("output_format", "mp4")).lower()
+    upscaling = json_request.get("upscaling", {})
+    interpolation = json_request.get("interpolation", {})
+    scale = float(upscaling.get("params", {}).get("scale", 2))
+    ratio = float(output_frame_ratio(interpolation, fps)) if fps else 1.0
+
+    planned = []
+
+    def add(stage, frames, seconds, kind="estimate", model=None, rss=None):
+        entry = {"stage": stage, "frames": frames.count, "resolution": frames.resolution,
+                 "seconds": round(seconds, 1), "source": kind}
+        if model:
+            entry["model"] = model
+        if rss:
+            entry["peak_rss_mb"] = rss
+        planned.append(entry)
+
+    # All stages are ffmpeg filters: one transcode, no frames on disk
+    transcode = bool(filter_stages) and not stages
+    frames = _Frames(int(source.get("frame_count") or 1), width, height)
+    if "upscaling" in filter_stages:
+        frames = frames.scaled(scale)
+    peak = held = 0.0
+    if not fps:
+        # Image: a copy of the input in the temp folder, upscaled in place
+        held = peak = frames.bytes(output_format)
+    elif not transcode:
+        decode_rate = DECODE_MPX_PER_SECOND.get(intermediate_format, 60)
+        add("decoding", frames, frames.count * frames.megapixels / decode_rate)
+        held = peak = frames.bytes(intermediate_format)
+    for stage in stages:
+        if stage == "upscaling":
+            result = frames.scaled(scale)
+            seconds, kind, rss = model_seconds(stage, upscaling.get("model_name"), frames, result)
+            model = upscaling.get("model_name")
+        elif stage == "interpolation":
+            result = frames.retimed(ratio)
+            seconds, kind, rss = model_seconds(stage, interpolation.get("model_name"), frames, result)
+            model = interpolation.get("model_name")
+        else:
+            # Fused: interpolation and upscaling overlap chunk by chunk, so the slower one sets the pace
+            interpolated = frames.retimed(ratio)
+            result = interpolated.scaled(scale)
+            interp = model_seconds("interpolation", interpolation.get("model_name"), frames, interpolated)
+            up = model_seconds("upscaling", upscaling.get("model_name"), interpolated, interpolated)
+            seconds = max(interp[0], up[0])
+            kind = "profile" if interp[1] == up[1] == "profile" else "estimate"
+            rss = (interp[2] or 0) + (up[2] or 0) or None
+            model = f"{interpolation.get('model_name')}+{upscaling.get('model_name')}"
+        add(stage, result, seconds, kind, model, rss)
+        # A stage's input frames stay on disk until its output is complete
+        written = result.bytes(output_format if not fps else intermediate_format)
+        peak = max(peak, held + written)
+        held = written
+        frames = result
+    if "interpolation" in filter_stages:
+        frames = frames.retimed(ratio)
+    output_fps = None
+    if fps:
+        interpolated = "interpolation" in stages or "fused" in stages or "interpolation" in filter_stages
+        output_fps = float(parse_fps(fps)) * (ratio if interpolated else 1)
+    renditions = []
+    if fps:
+        encode_seconds = frames.count * frames.megapixels / _encode_rate(json_request)
+        segments = int(json_request.get("pipeline", {}).get("encode_segments") or 1)
+        if json_request.get("renditions"):
+            encode_seconds, renditions = plan_renditions(json_request, frames, output_fps)
+        elif segments > 1 and not transcode and "interpolation" not in filter_stages and output_format != "gif":
+            # Segmented encoding scales about linearly while there are cores to spare
+            encode_seconds /= segments
+        add("transcoding" if transcode else "encoding", frames, encode_seconds)
+
+    size = sum(r["size_bytes"] for r in renditions) if renditions else output_bytes(frames, output_format)
+    output = {"frames": frames.count, "resolution": frames.resolution, "size_bytes": round(size)}
+    if output_fps:
+        output["fps"] = round(output_fps, 3)
+    if renditions:
+        output["renditions"] = renditions
+    return {
+        "stages": planned,
+        "output": output,
+        "temp_disk_peak_bytes": round(max(peak, held + size)),
+        "wall_seconds": round(sum(s["seconds"] for s in planned), 1),
+        "estimated_from": sorted({s["source"] for s in planned}),
+    }
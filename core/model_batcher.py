@@ -0,0 +1,230 @@
+"""
+Cross-job model batching.
+
+Jobs that run in the same process (batch and watch-folder mode) often use
+the same upscaling model with the same parameters. Every model run pays for
+loading the model and initializing the GPU, which dominates short clips. With
+batching on, a job that reaches a model run waits up to `window` seconds for
+the other jobs in the same stage with the same (model, params) key: jobs
+inside batch_stage() for that key that have not run it yet. Jobs that are
+decoding, encoding or using another model do not hold it up, and neither does
+a job's own rerun of frames once the others have run. Their frames then go
+through one model invocation:
+
+    staging/j000__frame_000001.png   <- job A's frame_dir/frame_000001.png
+    staging/j001__frame_000001.png   <- job B's frame_dir/frame_000001.png
+
+Inputs are hard-linked (copied across filesystems) into a staging directory
+next to the first job's frames, and every output the model writes there is
+moved back to its job by namespace prefix. Each job then sees the same result
+as a run of its own: outputs in its frame_dir, or the model's error, after
+which its own retry policy reruns the frames still missing output.
+
+Only models that process a whole directory per run fit (see
+handlers.upscaling_handler.BATCHABLE_MODELS): sequence models such as frame
+interpolation would mix frames of different jobs.
+"""
+import contextvars
+import copy
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from media.frame_format import list_frames
+from utils.file_utils import snapshot_dir, changed_files, link_or_copy
+
+NAMESPACE_SEP = "__"
+
+_window = contextvars.ContextVar("batch_window", default=0.0)
+# The job's stage registration: {"key": ..., "pending": bool} (see batch_stage)
+_stage = contextvars.ContextVar("batch_stage", default=None)
+
+
+@contextmanager
+def model_batching(window):
+    """
+    Run one job with batching: its model runs started inside the block are
+    combined with other jobs' runs arriving within window seconds. 0/None: off.
+    """
+    window = float(window or 0)
+    token = _window.set(window)
+    try:
+        yield
+    finally:
+        _window.reset(token)
+
+
+def batch_window():
+    return _window.get()
+
+
+def batch_key(model_name, params):
+    return model_name, json.dumps(params, sort_keys=True, default=str)
+
+
+@contextmanager
+def batch_stage(model_name, params):
+    """
+    The job is in a stage that will run model_name with params: batches for
+    that key wait for it (up to the window) until it joins one or leaves the
+    block. No-op without batching or model_name.
+    """
+    if not model_name or not batch_window():
+        yield
+        return
+    registration = {"key": batch_key(model_name, params), "pending": True}
+    BATCHER.expect(registration["key"])
+    token = _stage.set(registration)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+        if registration["pending"]:
+            BATCHER.unexpect(registration["key"])
+
+
+class _Member:
+    def __init__(self, frame_dir, logger):
+        self.frame_dir = frame_dir
+        self.logger = logger
+        self.error = None
+        self.done = threading.Event()
+
+
+class _Batch:
+    def __init__(self):
+        self.members = []
+
+
+class ModelBatcher:
+    """
+    Groups concurrent model runs by key. The first caller for a key becomes the
+    leader: it waits until every job expected for the key joined or the window
+    passed, closes the batch and runs the model for every member; the others
+    block until their outputs are in place.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._open = {}
+        # key -> jobs in a stage for the key that have not joined a batch of it yet
+        self._expected = {}
+
+    def expect(self, key):
+        with self._cond:
+            self._expected[key] = self._expected.get(key, 0) + 1
+
+    def unexpect(self, key):
+        with self._cond:
+            self._unexpect(key)
+
+    def _unexpect(self, key):
+        count = self._expected.get(key, 0) - 1
+        if count > 0:
+            self._expected[key] = count
+        else:
+            self._expected.pop(key, None)
+        self._cond.notify_all()
+
+    def run(self, key, model_func, frame_dir, params, logger, window, expected=False):
+        """
+        Same contract as model_func(frame_dir=..., params=..., logger=...), shared
+        with other callers. expected: the caller was counted with expect(key).
+        """
+        member = _Member(frame_dir, logger)
+        with self._cond:
+            if expected:
+                self._unexpect(key)
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            batch.members.append(member)
+            self._cond.notify_all()
+            if leader:
+                # Wait for the other jobs headed for this key, but never longer than the window
+                deadline = time.monotonic() + window
+                while self._expected.get(key):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                del self._open[key]
+        if leader:
+            self._execute(batch, model_func, params, logger)
+        member.done.wait()
+        if member.error is not None:
+            # Each job's retry policy annotates its error (pending_frames); do not share one object
+            raise copy.copy(member.error)
+
+    def _execute(self, batch, model_func, params, logger):
+        members = batch.members
+        try:
+            if len(members) == 1:
+                model_func(frame_dir=members[0].frame_dir, params=params, logger=logger)
+            else:
+                self._run_combined(members, model_func, params, logger)
+        except BaseException as e:
+            for member in members:
+                member.error = e
+            if len(members) == 1 or not isinstance(e, Exception):
+                raise
+        finally:
+            for member in members:
+                member.done.set()
+
+    def _run_combined(self, members, model_func, params, logger):
+        parent = os.path.dirname(os.path.abspath(members[0].frame_dir))
+        staging = tempfile.mkdtemp(prefix="_batch_", dir=parent)
+        try:
+            total = 0
+            for i, member in enumerate(members):
+                for name in list_frames(member.frame_dir):
+                    link_or_copy(os.path.join(member.frame_dir, name),
+                                 os.path.join(staging, f"j{i:03d}{NAMESPACE_SEP}{name}"))
+                    total += 1
+            logger.info(f"[batch] One model run for {total} frames of {len(members)} jobs.")
+            for member in members[1:]:
+                member.logger.info(f"[batch] Frames run together with {len(members) - 1} other job(s).")
+            before = snapshot_dir(staging)
+            try:
+                model_func(frame_dir=staging, params=params, logger=logger)
+            finally:
+                # Whatever the model finished goes back, also when it failed part way
+                for name in changed_files(staging, before):
+                    ns, _, original = name.partition(NAMESPACE_SEP)
+                    if not original or not ns.startswith("j"):
+                        continue
+                    member = members[int(ns[1:])]
+                    os.replace(os.path.join(staging, name), os.path.join(member.frame_dir, original))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+BATCHER = ModelBatcher()
+
+
+def batched(model_name, model_func, window=None):
+    """
+    model_func wrapped so each call goes through BATCHER, keyed by model name
+    and params. Returns model_func itself when batching is off (window 0).
+    """
+    window = batch_window() if window is None else window
+    if not window:
+        return model_func
+
+    def run(frame_dir, params, logger):
+        key = batch_key(model_name, params)
+        registration = _stage.get()
+        expected = bool(registration and registration["pending"] and registration["key"] == key)
+        if registration and registration["pending"]:
+            # The job's first run (or a run with backed-off params) ends its expected run of the stage key
+            registration["pending"] = False
+            if not expected:
+                BATCHER.unexpect(registration["key"])
+        BATCHER.run(key, model_func, frame_dir, params, logger, window, expected)
+    return run
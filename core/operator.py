@@ -1,15 +1,35 @@
 import os
 import shutil
+import time
 import traceback
+from contextlib import contextmanager
 from datetime import datetime
 
-from media.video_decoder import extract_frames
-from media.video_encoder import encode_video
+from media.video_decoder import extract_frames, probe_video, decode_to_store
+from media.video_encoder import encode_video, transcode_video, encode_renditions, transcode_renditions, \
+    encode_from_store
+from media.frame_store import FrameStore
+from media.renditions import rendition_settings
 from media.image_handler import process_image
-from handlers.upscaling_handler import run_upscaling
-from handlers.interpolation_handler import run_interpolation
+from media.frame_verify import read_image_size
+from media.frame_format import intermediate_settings, ffmpeg_image_args, with_intermediate_format, frame_extension
+from handlers import upscaling_handler, interpolation_handler
+from handlers.upscaling_handler import run_upscaling, build_upscaling_filter
+from handlers.interpolation_handler import run_interpolation, build_interpolation_filter
+from core.stage_planner import choose_stage_order
+from core.job_planner import plan_job
+from core.fused_stage import run_fused_stage
+from core.model_batcher import model_batching
+from core.distributed import run_distributed_upscaling, BATCH_FRAMES
+from media.frame_format import list_frames
+from utils.progress import ProgressReporter
+from utils.timing import output_frame_ratio
 from utils.logger import get_logger
-from utils.file_utils import create_temp_folder, safe_rename, move_file
+from utils.json_utils import VIDEO_FORMATS, IMAGE_FORMATS
+from utils.file_utils import create_temp_folder, safe_rename, move_file, link_or_copy
+from utils import job_store, metrics, profiling
+from utils.process_utils import process_limits
+from utils.signal_utils import JobCancelled, check_cancelled
 from utils.logfile_utils import make_log_filename
 
 """
@@ -34,8 +54,17 @@ def get_run_log_path():
     return make_log_filename()
 
 
-log_path = get_run_log_path()
-logger = get_logger(log_path, module_name="Operator")
+def apply_intermediate_format(json_request, settings):
+    """
+    Point the model blocks' "output_format" at the pipeline's intermediate
+    format (models that cannot write it keep png; explicit params win).
+    """
+    for block, registry in (("upscaling", upscaling_handler.MODEL_REGISTRY),
+                            ("interpolation", interpolation_handler.MODEL_REGISTRY)):
+        params = json_request.get(block)
+        if params and params.get("model_name") in registry:
+            _, supported_params = registry[params["model_name"]]
+            json_request[block] = with_intermediate_format(params, supported_params, settings)
 
 
 def find_model_executable(model_root, model_name, exe_name=None):
@@ -52,25 +81,208 @@ def find_model_executable(model_root, model_name, exe_name=None):
     return None
 
 
-def process_request(json_request):
+def model_stages(json_request, upscaling, interpolation, frame_count, resolution, source_fps, logger):
+    """
+    Model stages (not run as ffmpeg filters) in run order. For task "both" the
+    order comes from the job or the cost model; interpolating first may run as
+    one "fused" stage.
+    """
+    stages = [stage for stage, run in (("upscaling", upscaling), ("interpolation", interpolation)) if run]
+    if len(stages) == 2:
+        pipeline = json_request.get("pipeline", {})
+        order = choose_stage_order(
+            pipeline, frame_count, resolution, json_request["upscaling"], json_request["interpolation"], logger,
+            source_fps=source_fps,
+        )
+        if order == "interpolate_first":
+            stages.reverse()
+        if order == "interpolate_first" and pipeline.get("fused_stage", False):
+            stages = ["fused"]
+    return stages
+
+
+def stage_progress_target(stage, frames_dir, interpolation_params, source_fps):
+    """(expected output frames, directory they are written to) for a model stage's progress."""
+    count = len(list_frames(frames_dir))
+    if stage == "upscaling":
+        return count, frames_dir
+    total = round(count * output_frame_ratio(interpolation_params, source_fps))
+    if stage == "fused":
+        return total, os.path.join(frames_dir.rstrip(os.sep) + "_fused", "output")
+    return total, frames_dir
+
+
+def stage_limit(pipeline, key, stage):
+    """A pipeline time limit (stage_timeout / idle_timeout): one number for every stage or a dict per stage."""
+    value = pipeline.get(key)
+    if isinstance(value, dict):
+        value = value.get(stage)
+    return float(value) if value else None
+
+
+@contextmanager
+def job_stage(progress, pipeline, stage, total=None, watch_dir=None, output_path=None):
+    """
+    Run one stage: record it in the job database, metrics and profile, report
+    its progress and apply the pipeline's time limits to every child process it
+    starts. Activity in watch_dir/output_path keeps the no-progress timeout
+    from firing.
+    """
+    check_cancelled()
+    start = time.monotonic()
+    try:
+        with job_store.recorded_stage(stage, total), progress.stage(stage, total, watch_dir=watch_dir), \
+                profiling.profiled_stage(stage):
+            with process_limits(
+                timeout=stage_limit(pipeline, "stage_timeout", stage),
+                idle_timeout=stage_limit(pipeline, "idle_timeout", stage),
+                watch=[watch_dir, output_path],
+            ):
+                yield
+    finally:
+        metrics.STAGE_SECONDS.observe(time.monotonic() - start, stage=stage)
+
+
+def process_request(json_request, progress=None):
     """
     Main entry point for processing a Fusion2X job.
 
     Args:
         json_request (dict): The JSON job request from receiver/GUI.
+        progress (ProgressReporter): Optional; receives stage and frame progress.
 
     Returns:
         dict: Result dict with at least keys: status, message, log_path, output_path.
     """
+    metrics.JOBS_STARTED.inc()
+    metrics.JOBS_RUNNING.inc()
+    start = time.monotonic()
+    try:
+        # Jobs running side by side in this process (batch/watch mode) may share model runs
+        with model_batching(json_request.get("pipeline", {}).get("batch_window")):
+            profile = json_request.get("misc", {}).get("profile")
+            if profile and not json_request.get("log_path"):
+                # Profile files are written next to the job's log
+                json_request = dict(json_request, log_path=get_run_log_path())
+            with job_store.recording(job_store.JobRecord.open(json_request)) as record, \
+                    profiling.job_profiling(profile, json_request.get("log_path")) as profiler:
+                result = _process_request(json_request, progress)
+            if record:
+                record.finish(result)
+            if profiler:
+                result["profile"] = profiler.files
+    finally:
+        metrics.JOBS_RUNNING.dec()
+    metrics.JOBS_FINISHED.inc(status="reused" if result.get("reused_job") else result["status"])
+    metrics.JOB_SECONDS.observe(time.monotonic() - start)
+    return result
+
+
+def reuse_output(previous, export_dir, log_path, logger):
+    """Result for a job identical to a finished one: its outputs, linked into export_dir if elsewhere."""
+    os.makedirs(export_dir, exist_ok=True)
+
+    def exported(path):
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(export_dir):
+            return path
+        target = os.path.join(export_dir, os.path.basename(path))
+        if not os.path.exists(target):
+            link_or_copy(path, target)
+        return target
+
+    output_path = exported(previous["output_path"])
+    outputs = {name: exported(path) for name, path in job_store.stored_outputs(previous).items()}
+    logger.info(f"Identical to job {previous['id']} (log: {previous['log_path']}). Returning {output_path}.")
+    return job_store.reused_result(previous, output_path, log_path, outputs)
+
+
+def plan_request(json_request, logger=None):
+    """
+    Predict a job without processing it: probe the input, resolve the models
+    and the stage order as process_request would, and estimate every stage's
+    frames and time, the peak temp disk use and the output size
+    (see core.job_planner; model times come from the host profile).
+
+    Returns:
+        dict: status, message, input (resolution, fps, frame_count, ...) and the
+        plan (stages, output, temp_disk_peak_bytes, wall_seconds, estimated_from).
+    """
+    logger = logger or get_logger(json_request.get("log_path") or get_run_log_path(), module_name="Planner")
+    try:
+        input_path = os.path.abspath(json_request["input_path"])
+        in_fmt = json_request["input_format"].lower()
+        up_enabled = json_request["task"] in ("upscaling", "both") and json_request.get("upscaling", {}).get("enabled", False)
+        interp_enabled = json_request["task"] in ("interpolation", "both") and json_request.get("interpolation", {}).get("enabled", False)
+        for block, registry, enabled in (("upscaling", upscaling_handler.MODEL_REGISTRY, up_enabled),
+                                         ("interpolation", interpolation_handler.MODEL_REGISTRY, interp_enabled)):
+            model_name = json_request.get(block, {}).get("model_name")
+            if enabled and model_name not in registry:
+                return {"status": "error", "message": f"Unknown {block} model '{model_name}'"}
+        pipeline = json_request.get("pipeline", {})
+        intermediate = intermediate_settings(pipeline)
+
+        if in_fmt in VIDEO_FORMATS:
+            source = probe_video(input_path, logger=logger)
+            if not source.get("frame_count"):
+                return {"status": "error", "message": f"Could not read the frame count of {input_path}."}
+            fps = source["fps_fraction"]
+            up_filter = build_upscaling_filter(json_request["upscaling"], fps, logger) if up_enabled else None
+            interp_filter = build_interpolation_filter(json_request["interpolation"], fps, logger) if interp_enabled else None
+            stages = model_stages(
+                json_request, (up_enabled and not up_filter), (interp_enabled and not interp_filter),
+                source["frame_count"], source["resolution"], fps, logger,
+            )
+            filter_stages = [stage for stage, f in (("upscaling", up_filter), ("interpolation", interp_filter)) if f]
+        elif in_fmt in IMAGE_FORMATS:
+            size = read_image_size(input_path)
+            if size is None:
+                return {"status": "error", "message": f"Could not read the image size of {input_path}."}
+            source = {"resolution": f"{size[0]}x{size[1]}", "frame_count": 1}
+            stages, filter_stages = (["upscaling"] if up_enabled else []), []
+        else:
+            return {"status": "error", "message": f"Unsupported input format: {json_request['input_format']}"}
+
+        plan = plan_job(json_request, source, stages, filter_stages, intermediate["format"])
+        logger.info(f"Planned {input_path}: {plan['wall_seconds']}s, "
+                    f"temp disk peak {plan['temp_disk_peak_bytes'] / 1e9:.2f} GB")
+        return {"status": "success", "message": "Plan only; nothing was processed.", "input": source, **plan}
+    except Exception as e:
+        logger.error(f"Planning failed: {e}")
+        return {"status": "error", "message": f"Planning failed: {e}"}
+
+
+def encode_through_store(video_path, source, temp_folder, output_path, pipeline, progress, logger, format="mp4"):
+    """
+    Re-encode a video whose frames no stage touches through one raw frame
+    store (media.frame_store) in temp_folder instead of one image file per frame.
+    source: probe_video() of video_path (resolution and frame_count known).
+    """
+    width, height = (int(x) for x in source["resolution"].split("x"))
+    # frame_count may be estimated from the duration; unwritten slots take no disk space
+    capacity = source["frame_count"] + int(source["fps"]) + 1
+    store_path = os.path.join(temp_folder, "frames.f2x")
+    with FrameStore.create(store_path, width, height, capacity) as store:
+        with job_stage(progress, pipeline, "decoding", source["frame_count"], output_path=store_path):
+            decoded = decode_to_store(video_path, store, logger=logger)
+        logger.info(f"Decoded {decoded} frames into {store_path}.")
+        with job_stage(progress, pipeline, "encoding", decoded, output_path=output_path):
+            encode_from_store(store, output_path, fps=source["fps_fraction"], format=format,
+                              preset=pipeline.get("encoder_preset"), logger=logger)
+
+
+def _process_request(json_request, progress):
+    # Use unified log_path if provided, else create a new one (should always be present)
+    log_path = json_request.get("log_path") or get_run_log_path()
+    logger = get_logger(log_path, module_name="Operator", level=json_request.get("misc", {}).get("log_level"))
+    progress = progress or ProgressReporter()
+    temp_folder = None
     try:
         original_file = os.path.abspath(json_request["input_path"])
         file_dir, file_name = os.path.split(original_file)
         file_base, file_ext = os.path.splitext(file_name)
         in_fmt = json_request["input_format"].lower()
         out_fmt = json_request.get("output_format", "").lower()
-        video_fmts = {"mp4", "avi", "mov", "mkv", "webm", "gif"}
-        image_fmts = {"png", "jpg", "jpeg", "webp"}
-        if in_fmt in video_fmts and out_fmt not in video_fmts:
+        if in_fmt in VIDEO_FORMATS and out_fmt not in VIDEO_FORMATS:
             msg = f"Output format '{out_fmt}' is not valid for video input"
             logger.error(msg)
             return {
@@ -79,7 +291,7 @@ def process_request(json_request):
                 "message": msg,
                 "output_path": None,
             }
-        if in_fmt in image_fmts and out_fmt not in image_fmts:
+        if in_fmt in IMAGE_FORMATS and out_fmt not in IMAGE_FORMATS:
             msg = f"Output format '{out_fmt}' is not valid for image input"
             logger.error(msg)
             return {
@@ -88,13 +300,20 @@ def process_request(json_request):
                 "message": msg,
                 "output_path": None,
             }
-        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_folder = create_temp_folder(base_dir=file_dir, base_name=file_base, timestamp=now_str)
-        os.makedirs("logs", exist_ok=True)
+        # Same request and input as a finished job: hand out its output instead of processing again
+        record = job_store.current_job()
+        if record:
+            previous = record.previous() if json_request.get("misc", {}).get("reuse_output", True) else None
+            if previous:
+                return reuse_output(previous, json_request.get("output_path") or file_dir, log_path, logger)
+            record.start(log_path, logger)
 
-        # Use unified log_path if provided, else create a new one (should always be present)
-        log_path = json_request.get("log_path", f"logs/process_{now_str}.log")
-        logger = get_logger(log_path, module_name="Operator")
+        now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        pipeline = json_request.get("pipeline", {})
+        scratch_dir = pipeline.get("scratch_dir") or file_dir
+        os.makedirs(scratch_dir, exist_ok=True)
+        temp_folder = create_temp_folder(base_dir=scratch_dir, base_name=file_base, timestamp=now_str)
+        metrics.track_temp_dir(temp_folder)
 
         result = {
             "status": "error",
@@ -104,62 +323,169 @@ def process_request(json_request):
         }
 
         logger.info(f"Started Fusion2X operator for file: {original_file}")
-        logger.info(f"Job config: {json_request}")
+        logger.debug(f"Job config: {json_request}")
 
-        # Video processing
-        if json_request["input_format"].lower() in ("mp4", "avi", "mov", "mkv", "gif"):
-            logger.info("Detected video or gif input. Beginning frame extraction.")
-            frames_dir = os.path.join(temp_folder, "frames")
-            metadata = extract_frames(original_file, frames_dir, output_format="png", logger=logger)
-            logger.info(f"Extracted frames. Metadata: {metadata}")
-
-            # Perform upscaling first if needed
-            if json_request["task"] in ("upscaling", "both") and json_request.get("upscaling", {}).get("enabled", False):
-                logger.info("Starting upscaling process.")
-                upscaling_result = run_upscaling(frames_dir, json_request["upscaling"], logger)
-                if not upscaling_result.get("success"):
-                    msg = upscaling_result.get("message", "Upscaling failed.")
-                    logger.error(msg)
-                    result["message"] = msg
-                    return result
-                logger.info("Upscaling complete.")
+        up_enabled = json_request["task"] in ("upscaling", "both") and json_request.get("upscaling", {}).get("enabled", False)
+        interp_enabled = json_request["task"] in ("interpolation", "both") and json_request.get("interpolation", {}).get("enabled", False)
 
-            # Interpolation if requested
-            if json_request["task"] in ("interpolation", "both") and json_request.get("interpolation", {}).get("enabled", False):
-                logger.info("Starting interpolation process.")
-                interpolation_result = run_interpolation(frames_dir, json_request["interpolation"], logger)
-                if not interpolation_result.get("success"):
-                    msg = interpolation_result.get("message", "Interpolation failed.")
-                    logger.error(msg)
-                    result["message"] = msg
-                    return result
-                logger.info("Interpolation complete.")
-
-            # Encode frames back to video
-            logger.info("Starting video encoding.")
-            target_fps = metadata.get("fps", 30)
-            target_res = metadata.get("resolution", None)
+        # Video processing
+        if in_fmt in VIDEO_FORMATS:
             output_ext = "." + json_request.get("output_format", "mp4").lstrip(".")
             out_video_path = os.path.join(temp_folder, f"{file_base}_fusion2x_{now_str}{output_ext}")
-            encode_video(
-                frames_dir,
-                out_video_path,
-                fps=target_fps,
-                resolution=target_res,
-                format=json_request.get("output_format", "mp4"),
-                logger=logger,
-            )
+            # Renditions: every output comes from the same ffmpeg process (split), named by rendition
+            rendition_outputs = [
+                (r, os.path.join(temp_folder, f"{file_base}_fusion2x_{now_str}_{r['name']}.{r['container']}"))
+                for r in rendition_settings(json_request)
+            ]
+            if rendition_outputs:
+                logger.info(f"Renditions: {', '.join(r['name'] for r, _ in rendition_outputs)}.")
+                out_video_path = rendition_outputs[0][1]
+
+            # ffmpeg-filter backends are fused into the decode/encode process instead of running as a stage
+            source = probe_video(original_file, logger=logger)
+            source_fps = source["fps_fraction"]
+            up_filter = build_upscaling_filter(json_request["upscaling"], source_fps, logger) if up_enabled else None
+            interp_filter = build_interpolation_filter(json_request["interpolation"], source_fps, logger) if interp_enabled else None
+
+            if (up_filter or interp_filter) and (up_filter or not up_enabled) and (interp_filter or not interp_enabled):
+                logger.info("All requested stages are ffmpeg filters. Transcoding without extracting frames.")
+                with job_stage(progress, pipeline, "transcoding", output_path=out_video_path):
+                    if rendition_outputs:
+                        transcode_renditions(
+                            original_file,
+                            rendition_outputs,
+                            [f for f in (up_filter, interp_filter) if f],
+                            preset=pipeline.get("encoder_preset"),
+                            logger=logger,
+                        )
+                    else:
+                        transcode_video(
+                            original_file,
+                            out_video_path,
+                            [f for f in (up_filter, interp_filter) if f],
+                            format=json_request.get("output_format", "mp4"),
+                            preset=pipeline.get("encoder_preset"),
+                            logger=logger,
+                        )
+            elif (pipeline.get("frame_store") and not (up_enabled or interp_enabled) and not rendition_outputs
+                  and source["frame_count"] and source["resolution"] != "unknown"):
+                logger.info("No stage processes the frames. Re-encoding through a frame store.")
+                encode_through_store(original_file, source, temp_folder, out_video_path, pipeline, progress, logger,
+                                     format=json_request.get("output_format", "mp4"))
+            else:
+                logger.info("Detected video or gif input. Beginning frame extraction.")
+                frames_dir = os.path.join(temp_folder, "frames")
+                intermediate = intermediate_settings(pipeline)
+                json_request = dict(json_request)
+                apply_intermediate_format(json_request, intermediate)
+                logger.info(f"Intermediate frames: {intermediate['format']}.")
+                with job_stage(progress, pipeline, "decoding", watch_dir=frames_dir):
+                    metadata = extract_frames(
+                        original_file, frames_dir, output_format=intermediate["format"],
+                        filters=[up_filter] if up_filter else None,
+                        output_args=ffmpeg_image_args(intermediate), probe=source, logger=logger,
+                    )
+                logger.info(f"Extracted frames. Metadata: {metadata}")
+
+                stages = model_stages(
+                    json_request, (up_enabled and not up_filter), (interp_enabled and not interp_filter),
+                    metadata["frame_count"], metadata["resolution"], metadata.get("fps_fraction"), logger,
+                )
+
+                # Interpolation changes the frame rate; timestamps are set for non-uniform output
+                target_fps = metadata.get("fps_fraction", metadata.get("fps", 30))
+                timestamps = None
+                frame_counts = {}
+                for stage in stages:
+                    logger.info(f"Starting {stage} process.")
+                    total, watch_dir = stage_progress_target(
+                        stage, frames_dir, json_request.get("interpolation", {}), target_fps
+                    )
+                    with job_stage(progress, pipeline, stage, total, watch_dir=watch_dir):
+                        if stage == "fused":
+                            stage_result = run_fused_stage(
+                                frames_dir, json_request["interpolation"], json_request["upscaling"], logger,
+                                chunk_size=pipeline.get("chunk_size", 100),
+                                workers=pipeline.get("workers", 1),
+                                source_fps=target_fps,
+                            )
+                        elif stage == "upscaling" and pipeline.get("coordinator"):
+                            # Frames are upscaled by cluster workers (receiver.py --worker)
+                            stage_result = run_distributed_upscaling(
+                                frames_dir, json_request["upscaling"], logger, pipeline["coordinator"],
+                                batch_frames=pipeline.get("batch_frames", BATCH_FRAMES),
+                            )
+                        elif stage == "upscaling":
+                            stage_result = run_upscaling(frames_dir, json_request["upscaling"], logger)
+                        else:
+                            stage_result = run_interpolation(
+                                frames_dir, json_request["interpolation"], logger, source_fps=target_fps
+                            )
+                    if stage_result.get("frames"):
+                        frame_counts[stage] = stage_result["frames"]
+                        result["frames"] = frame_counts
+                    if not stage_result.get("success"):
+                        job_store.mark_stage(stage, "error")
+                        msg = stage_result.get("message", f"{stage.capitalize()} failed.")
+                        logger.error(msg)
+                        result["message"] = msg
+                        return result
+                    target_fps = stage_result.get("output_fps", target_fps)
+                    timestamps = stage_result.get("timestamps", timestamps)
+                    logger.info(f"{stage.capitalize()} complete.")
+
+                # Encode frames back to video
+                logger.info(f"Starting video encoding at {target_fps} fps.")
+                # Upscaled frames keep their new size; only pin the source resolution otherwise
+                target_res = None if up_enabled else metadata.get("resolution", None)
+                with job_stage(progress, pipeline, "encoding", len(list_frames(frames_dir)), output_path=out_video_path):
+                    if rendition_outputs:
+                        if pipeline.get("encode_segments"):
+                            logger.info("Renditions are encoded by one ffmpeg process; encode_segments is not used.")
+                        encode_renditions(
+                            frames_dir,
+                            rendition_outputs,
+                            fps=target_fps,
+                            filters=[interp_filter] if interp_filter else None,
+                            timestamps=timestamps,
+                            preset=pipeline.get("encoder_preset"),
+                            frame_format=frame_extension(frames_dir, intermediate["format"]),
+                            logger=logger,
+                        )
+                    else:
+                        encode_video(
+                            frames_dir,
+                            out_video_path,
+                            fps=target_fps,
+                            resolution=target_res,
+                            format=json_request.get("output_format", "mp4"),
+                            filters=[interp_filter] if interp_filter else None,
+                            timestamps=timestamps,
+                            preset=pipeline.get("encoder_preset"),
+                            frame_format=frame_extension(frames_dir, intermediate["format"]),
+                            segments=pipeline.get("encode_segments"),
+                            gop_size=pipeline.get("gop_size"),
+                            logger=logger,
+                        )
             logger.info(f"Video encoding complete: {out_video_path}")
 
             # Move result to output directory
             export_dir = json_request.get("output_path") or file_dir
             os.makedirs(export_dir, exist_ok=True)
-            final_name = f"{file_base}_fusion2x_{now_str}{output_ext}"
-            # Move the encoded video to the export directory and capture its new location
-            moved_path = move_file(out_video_path, export_dir)
-            # Rename to the final desired name
-            final_path = safe_rename(moved_path, final_name)
-            logger.info(f"Moved processed video to: {final_path}")
+            if rendition_outputs:
+                outputs = {}
+                for rendition, path in rendition_outputs:
+                    outputs[rendition["name"]] = move_file(path, export_dir)
+                    logger.info(f"Moved {rendition['name']} rendition to: {outputs[rendition['name']]}")
+                result["outputs"] = outputs
+                final_path = outputs[rendition_outputs[0][0]["name"]]
+            else:
+                final_name = f"{file_base}_fusion2x_{now_str}{output_ext}"
+                # Move the encoded video to the export directory and capture its new location
+                moved_path = move_file(out_video_path, export_dir)
+                # Rename to the final desired name
+                final_path = safe_rename(moved_path, final_name)
+                logger.info(f"Moved processed video to: {final_path}")
 
             # Cleanup
             try:
@@ -174,7 +500,7 @@ def process_request(json_request):
             return result
 
         # Image processing
-        elif json_request["input_format"].lower() in ("png", "jpg", "jpeg", "webp"):
+        elif in_fmt in IMAGE_FORMATS:
             logger.info("Detected image input. Beginning processing.")
             # Copy input image to temp folder
             img_temp = os.path.join(temp_folder, file_name)
@@ -182,10 +508,14 @@ def process_request(json_request):
             frames_dir = temp_folder
 
             # Upscaling
-            if json_request["task"] in ("upscaling", "both") and json_request.get("upscaling", {}).get("enabled", False):
+            if up_enabled:
                 logger.info("Starting upscaling process.")
-                upscaling_result = run_upscaling(frames_dir, json_request["upscaling"], logger)
+                with job_stage(progress, pipeline, "upscaling", 1, watch_dir=frames_dir):
+                    upscaling_result = run_upscaling(frames_dir, json_request["upscaling"], logger)
+                if upscaling_result.get("frames"):
+                    result["frames"] = {"upscaling": upscaling_result["frames"]}
                 if not upscaling_result.get("success"):
+                    job_store.mark_stage("upscaling", "error")
                     msg = upscaling_result.get("message", "Upscaling failed.")
                     logger.error(msg)
                     result["message"] = msg
@@ -221,6 +551,14 @@ def process_request(json_request):
             result["message"] = msg
             return result
 
+    except JobCancelled as e:
+        logger.warning(f"{e} Stopped child processes.")
+        return {
+            "status": "cancelled",
+            "log_path": log_path,
+            "message": str(e),
+            "output_path": None
+        }
     except Exception as e:
         msg = f"Exception occurred: {e}\n{traceback.format_exc()}"
         logger.error(msg)
@@ -230,3 +568,10 @@ def process_request(json_request):
             "message": msg,
             "output_path": None
         }
+    finally:
+        if temp_folder:
+            metrics.untrack_temp_dir(temp_folder)
+        # Failed, cancelled and timed-out jobs give their scratch space back too
+        if temp_folder and os.path.isdir(temp_folder) and not json_request.get("misc", {}).get("keep_temp"):
+            shutil.rmtree(temp_folder, ignore_errors=True)
+            logger.info(f"Deleted temp folder: {temp_folder}")
@@ -0,0 +1,171 @@
+"""
+Bounded ring of fixed-size frame slots in shared memory.
+
+A producer (decoder) and a consumer (Python stage or encoder), in the same or
+different processes, exchange frames by slot index instead of copying them
+through a queue:
+
+    producer                              consumer
+    i = ring.acquire_write()              slot = ring.acquire_read()
+    ring.slot(i)[:n] = frame_bytes        if slot is None: end of stream
+    ring.commit_write(i, n)               i, n = slot; use ring.slot(i)[:n]
+    ...                                   ring.release_read(i)
+    ring.close_writer()
+
+Memory is fixed at slots * slot_size bytes. When every slot is full the
+producer blocks until the consumer releases one, so a slow stage throttles
+the decoder instead of growing a queue. One producer and one consumer per
+ring; chain rings for more stages.
+
+The ring can be passed to a multiprocessing.Process as an argument (not
+through a pool queue: its semaphores are only inherited at process start).
+"""
+import multiprocessing
+import struct
+import time
+
+# Header: write count, read count, end-of-stream flag; then the byte length of every slot.
+# Each field has a single writer (producer: write count and flag, consumer: read count).
+_HEADER = struct.Struct("<QQQ")
+_WRITTEN, _READ, _EOF = 0, 8, 16
+
+
+class RingClosed(Exception):
+    """Raised by acquire_* after a timeout when the other side stopped (or never came)."""
+
+
+class FrameRing:
+    """
+    Args:
+        slots (int): Number of frame slots (bounded memory: slots * slot_size).
+        slot_size (int): Bytes per slot, e.g. width * height * 3 for rgb24.
+        ctx: multiprocessing context providing the semaphores (default: the
+            process default).
+    """
+
+    def __init__(self, slots, slot_size, ctx=None):
+        from multiprocessing import shared_memory
+
+        ctx = ctx or multiprocessing.get_context()
+        self.slots = int(slots)
+        self.slot_size = int(slot_size)
+        self._data_offset = _HEADER.size + 8 * self.slots
+        self._shm = shared_memory.SharedMemory(create=True, size=self._data_offset + self.slots * self.slot_size)
+        self._shm.buf[:self._data_offset] = bytes(self._data_offset)
+        self._free = ctx.Semaphore(self.slots)
+        self._filled = ctx.Semaphore(0)
+        self.owner = True
+
+    # Pickled into child processes by shared-memory name
+    def __getstate__(self):
+        return {
+            "slots": self.slots, "slot_size": self.slot_size, "name": self._shm.name,
+            "free": self._free, "filled": self._filled,
+        }
+
+    def __setstate__(self, state):
+        from multiprocessing import shared_memory
+
+        self.slots = state["slots"]
+        self.slot_size = state["slot_size"]
+        self._data_offset = _HEADER.size + 8 * self.slots
+        try:
+            self._shm = shared_memory.SharedMemory(name=state["name"], track=False)
+        except TypeError:
+            self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._free = state["free"]
+        self._filled = state["filled"]
+        self.owner = False
+
+    def _counters(self):
+        return _HEADER.unpack_from(self._shm.buf, 0)
+
+    def _set(self, offset, value):
+        struct.pack_into("<Q", self._shm.buf, offset, value)
+
+    def slot(self, index):
+        """Writable memoryview of slot index (slot_size bytes)."""
+        start = self._data_offset + index * self.slot_size
+        return self._shm.buf[start:start + self.slot_size]
+
+    def acquire_write(self, timeout=None):
+        """Block until a slot is free; returns its index. Single producer only."""
+        if not self._free.acquire(timeout=timeout):
+            raise RingClosed("No free frame slot (consumer stalled).")
+        written, _, _ = self._counters()
+        return written % self.slots
+
+    def commit_write(self, index, nbytes):
+        """Publish the frame written to slot index (nbytes long) to the consumer."""
+        if nbytes > self.slot_size:
+            raise ValueError(f"Frame of {nbytes} bytes does not fit a {self.slot_size}-byte slot")
+        struct.pack_into("<Q", self._shm.buf, _HEADER.size + 8 * index, nbytes)
+        self._set(_WRITTEN, self._counters()[0] + 1)
+        self._filled.release()
+
+    def release_write(self, index):
+        """Give back a slot from acquire_write without publishing it (e.g. short read at the end)."""
+        self._free.release()
+
+    def close_writer(self):
+        """Mark the end of the stream; the consumer's acquire_read returns None once drained."""
+        self._set(_EOF, 1)
+        self._filled.release()
+
+    def acquire_read(self, timeout=None):
+        """
+        Block until a frame is available. Returns (index, nbytes), or None at the
+        end of the stream. Single consumer only.
+        """
+        if not self._filled.acquire(timeout=timeout):
+            raise RingClosed("No frame available (producer stalled).")
+        written, read, eof = self._counters()
+        if read == written and eof:
+            self._filled.release()  # later calls also see the end
+            return None
+        index = read % self.slots
+        nbytes = struct.unpack_from("<Q", self._shm.buf, _HEADER.size + 8 * index)[0]
+        return index, nbytes
+
+    def release_read(self, index):
+        """Give slot index back to the producer."""
+        self._set(_READ, self._counters()[1] + 1)
+        self._free.release()
+
+    def frames(self, timeout=None):
+        """
+        Iterate over the frames (memoryviews of their slots) until the end of
+        the stream; each slot is released when the next frame is requested.
+        """
+        while True:
+            item = self.acquire_read(timeout=timeout)
+            if item is None:
+                return
+            index, nbytes = item
+            try:
+                yield self.slot(index)[:nbytes]
+            finally:
+                self.release_read(index)
+
+    def wait_drained(self, timeout=None, poll=0.01):
+        """Wait until the consumer has released every committed frame."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            written, read, _ = self._counters()
+            if read >= written:
+                return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(poll)
+
+    def close(self):
+        """
+        Detach; the creating process also frees the shared memory. Views from
+        slot() or frames() must be released first.
+        """
+        self._shm.close()
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,85 @@
+"""
+Stage ordering for task "both".
+
+Upscaling then interpolating runs the interpolation model on full-resolution
+frames; interpolating first runs the upscaler on times-as-many frames. Which is
+cheaper depends on the models, the scale and the multiplier, so the order is
+picked from a simple cost model unless the job pins it.
+"""
+from utils.timing import output_frame_ratio
+
+# Relative cost of one model pass over one megapixel of input.
+# Only the ratios matter; unknown models default to 1.0.
+MODEL_COST = {
+    "waifu2x-ncnn-vulkan": 1.0,
+    "realesrgan-ncnn-vulkan": 1.5,
+    "realcugan-ncnn-vulkan": 1.5,
+    "realsr-ncnn-vulkan": 1.5,
+    "srmd-ncnn-vulkan": 0.6,
+    "onnxruntime-cpu": 4.0,
+    "ffmpeg-scale": 0.01,
+    "rife-ncnn-vulkan": 0.4,
+    "ffmpeg-minterpolate": 0.2,
+    "ffmpeg-framerate": 0.01,
+}
+
+STAGE_ORDERS = ("auto", "upscale_first", "interpolate_first")
+
+
+def _megapixels(resolution):
+    try:
+        width, height = [int(x) for x in str(resolution).lower().split("x")]
+    except ValueError:
+        return None
+    return width * height / 1e6
+
+
+def estimate_stage_costs(frame_count, resolution, upscaling, interpolation, source_fps=None):
+    """
+    Estimate the relative model cost of both orders.
+
+    Args:
+        frame_count (int): Source frame count.
+        resolution (str): Source resolution, e.g. "1920x1080".
+        upscaling (dict): The job's upscaling block.
+        interpolation (dict): The job's interpolation block.
+        source_fps: Source frame rate, needed when the block sets target_fps.
+
+    Returns:
+        dict: {"upscale_first": float, "interpolate_first": float}, or None if
+              the resolution is unknown.
+    """
+    mp = _megapixels(resolution)
+    if mp is None:
+        return None
+    scale = float(upscaling.get("params", {}).get("scale", 2))
+    times = float(output_frame_ratio(interpolation, source_fps))
+    up_cost = MODEL_COST.get(upscaling.get("model_name"), 1.0)
+    interp_cost = MODEL_COST.get(interpolation.get("model_name"), 1.0)
+
+    out_frames = frame_count * times
+    return {
+        # upscale N source frames, then interpolate at the upscaled size
+        "upscale_first": frame_count * mp * up_cost + out_frames * mp * scale * scale * interp_cost,
+        # interpolate at source size, then upscale every output frame
+        "interpolate_first": out_frames * mp * interp_cost + out_frames * mp * up_cost,
+    }
+
+
+def choose_stage_order(pipeline, frame_count, resolution, upscaling, interpolation, logger=None, source_fps=None):
+    """
+    Resolve the job's "stage_order" ("auto", "upscale_first", "interpolate_first").
+    Returns "upscale_first" or "interpolate_first".
+    """
+    order = (pipeline or {}).get("stage_order", "auto")
+    if order not in STAGE_ORDERS:
+        raise ValueError(f"Unknown stage_order '{order}'")
+    if order != "auto":
+        return order
+    costs = estimate_stage_costs(frame_count, resolution, upscaling, interpolation, source_fps)
+    if costs is None:
+        return "upscale_first"
+    order = min(costs, key=costs.get)
+    if logger:
+        logger.info(f"Stage order cost estimate: {costs} -> {order}")
+    return order
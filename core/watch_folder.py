@@ -0,0 +1,307 @@
+"""
+Fusion2X Folder Ingestion
+-------------------------
+Runs one job per media file in a directory, using a template job request for
+everything except the input. Two modes:
+
+    - process_directory: process the files already in a directory, then return.
+    - watch_directory: keep watching a drop folder and process files as they
+      finish being written, until stopped.
+
+Jobs run concurrently (up to max_jobs) in this process, so a batch does not
+pay one interpreter start per file. Each file gets its own log and a result
+manifest <output_dir>/<file name>.result.json; a file whose manifest already
+reports success for the same file (size and modification time) is skipped, so
+a restarted batch resumes where it stopped while a new file under an old name
+is processed.
+"""
+import copy
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from core.operator import process_request
+from utils.dir_watcher import DirectoryWatcher
+from utils.json_utils import validate_json_request, VIDEO_FORMATS, IMAGE_FORMATS
+from utils.logfile_utils import make_log_filename
+from utils.logger import close_logger
+from utils import metrics
+from utils.signal_utils import JobCancelled
+
+MANIFEST_SUFFIX = ".result.json"
+
+
+def build_job_request(template, input_file, output_dir):
+    """
+    Job request for one file: the template with input_path, input_format and
+    output_path filled in. The template's output_format is kept when it suits
+    the file type; otherwise video defaults to mp4 and images keep their format.
+    Returns None if the file extension is not a supported input format.
+    """
+    in_fmt = os.path.splitext(input_file)[1].lstrip(".").lower()
+    if in_fmt in VIDEO_FORMATS:
+        allowed, default_fmt = VIDEO_FORMATS, "mp4"
+    elif in_fmt in IMAGE_FORMATS:
+        allowed, default_fmt = IMAGE_FORMATS, in_fmt
+    else:
+        return None
+    request = copy.deepcopy(template)
+    request.pop("log_path", None)
+    out_fmt = str(request.get("output_format", "")).lower()
+    request["input_path"] = os.path.abspath(input_file)
+    request["input_format"] = in_fmt
+    request["output_format"] = out_fmt if out_fmt in allowed else default_fmt
+    request["output_path"] = output_dir
+    return request
+
+
+def manifest_path(input_file, output_dir):
+    return os.path.join(output_dir, os.path.basename(input_file) + MANIFEST_SUFFIX)
+
+
+def write_manifest(path, manifest):
+    """Write a result manifest atomically."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def input_identity(input_file):
+    """Size and modification time of an input, stored in its manifest (empty if unreadable)."""
+    try:
+        st = os.stat(input_file)
+    except OSError:
+        return {}
+    return {"input_size": st.st_size, "input_mtime_ns": st.st_mtime_ns}
+
+
+def already_processed(input_file, output_dir):
+    """
+    True if the file's manifest exists, reports success and was written for
+    this file: same size and modification time (manifests without them match by name).
+    """
+    path = manifest_path(input_file, output_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get("status") != "success":
+        return False
+    recorded = {k: manifest[k] for k in ("input_size", "input_mtime_ns") if k in manifest}
+    return not recorded or recorded == {k: v for k, v in input_identity(input_file).items() if k in recorded}
+
+
+def run_file_job(input_file, template, output_dir, logger):
+    """
+    Process one file with the template and write its manifest.
+    Returns the manifest dict (the operator result plus input_path, started, finished,
+    input_size, input_mtime_ns).
+    """
+    started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    identity = input_identity(input_file)
+    request = build_job_request(template, input_file, output_dir)
+    if request is None:
+        result = {"status": "error", "message": f"Unsupported input format: {input_file}", "output_path": None}
+    else:
+        # One log per job; concurrent jobs writing one file would interleave
+        request["log_path"] = make_log_filename()
+        valid, reason = validate_json_request(request)
+        if valid:
+            logger.info(f"[Batch] Processing {input_file}")
+            try:
+                result = process_request(request)
+            finally:
+                close_logger(request["log_path"])
+        else:
+            result = {"status": "error", "message": reason, "output_path": None, "log_path": request["log_path"]}
+    manifest = dict(result, input_path=os.path.abspath(input_file), started=started,
+                    finished=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **identity)
+    write_manifest(manifest_path(input_file, output_dir), manifest)
+    if manifest["status"] == "success":
+        logger.info(f"[Batch] Finished {input_file} -> {manifest.get('output_path')}")
+    else:
+        logger.error(f"[Batch] Failed {input_file}: {manifest.get('message')}")
+    return manifest
+
+
+def guarded_file_job(input_file, template, output_dir, logger):
+    """
+    run_file_job() that always returns a manifest: an exception outside the
+    operator (log or manifest I/O, a cancel in the job's thread) becomes the
+    file's error or cancelled manifest, written if the output directory allows.
+    """
+    try:
+        return run_file_job(input_file, template, output_dir, logger)
+    except JobCancelled as e:
+        status, message = "cancelled", str(e) or "Job cancelled."
+    except Exception as e:
+        status, message = "error", f"{type(e).__name__}: {e}"
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    manifest = {"status": status, "message": message, "output_path": None,
+                "input_path": os.path.abspath(input_file), "started": now, "finished": now}
+    logger.error(f"[Batch] Failed {input_file}: {message}")
+    try:
+        write_manifest(manifest_path(input_file, output_dir), manifest)
+    except OSError as e:
+        logger.error(f"[Batch] Could not write the manifest of {input_file}: {e}")
+    return manifest
+
+
+def _log_job_error(future, input_file, logger):
+    """Done callback: a job that still raised (e.g. in on_result) is logged, not dropped."""
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"[Batch] Job for {input_file} raised: {future.exception()!r}")
+
+
+def _media_files(directory):
+    formats = VIDEO_FORMATS | IMAGE_FORMATS
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if os.path.isfile(os.path.join(directory, f))
+        and os.path.splitext(f)[1].lstrip(".").lower() in formats
+    )
+
+
+def _summary(manifests, skipped):
+    failed = sum(1 for m in manifests if m["status"] != "success")
+    return {
+        "status": "success" if failed == 0 else "error",
+        "message": f"Processed {len(manifests)} file(s): {len(manifests) - failed} succeeded, "
+                   f"{failed} failed, {skipped} skipped (already done).",
+        "results": manifests,
+    }
+
+
+def process_directory(input_dir, template, output_dir, logger, max_jobs=2, on_result=None):
+    """
+    Process every media file currently in input_dir (not recursive).
+
+    Args:
+        input_dir (str): Directory of input files.
+        template (dict): Job request without input_path (task, model blocks, output_format, ...).
+        output_dir (str): Where outputs and manifests are written.
+        logger: Logger for batch progress.
+        max_jobs (int): Files processed at the same time.
+        on_result (callable): Called with each manifest as it completes.
+
+    Returns:
+        dict: status, message, results (list of manifests).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    files = _media_files(input_dir)
+    todo = [f for f in files if not already_processed(f, output_dir)]
+    logger.info(f"[Batch] {len(todo)} of {len(files)} file(s) in {input_dir} to process with {max_jobs} job(s).")
+
+    manifests = []
+    lock = threading.Lock()
+
+    def job(input_file):
+        metrics.QUEUE_DEPTH.dec()
+        manifest = guarded_file_job(input_file, template, output_dir, logger)
+        with lock:
+            manifests.append(manifest)
+            if on_result:
+                on_result(manifest)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as pool:
+        for f in todo:
+            metrics.QUEUE_DEPTH.inc()
+            pool.submit(job, f).add_done_callback(partial(_log_job_error, input_file=f, logger=logger))
+    return _summary(manifests, len(files) - len(todo))
+
+
+def _archive(input_file, manifest, watch_dir):
+    """Move a finished input into processed/ or failed/ so the drop folder only holds new work."""
+    sub = "processed" if manifest["status"] == "success" else "failed"
+    dest_dir = os.path.join(watch_dir, sub)
+    try:
+        os.makedirs(dest_dir, exist_ok=True)
+        shutil.move(input_file, os.path.join(dest_dir, os.path.basename(input_file)))
+    except OSError:
+        pass
+
+
+def output_dir_problem(watch_dir, output_dir):
+    """
+    Why output_dir cannot serve watch_dir, or None. Outputs written into the
+    drop folder (or into processed/, failed/ or any folder inside it) would be
+    picked up as new inputs or mixed with the archived ones.
+    """
+    watch_real = os.path.realpath(watch_dir)
+    output_real = os.path.realpath(output_dir)
+    if output_real == watch_real or output_real.startswith(os.path.join(watch_real, "")):
+        return (f"Output directory {output_dir} is the watched folder {watch_dir} or inside it "
+                f"(processed/ and failed/ included); choose a directory outside it.")
+    return None
+
+
+def watch_directory(watch_dir, template, output_dir, logger, max_jobs=2, poll_interval=2.0,
+                    settle_time=2.0, stop_event=None, on_result=None, archive=True):
+    """
+    Watch watch_dir and process each media file once it has finished writing.
+    Runs until stop_event is set (or KeyboardInterrupt), then waits for
+    running jobs. Files already present are picked up on start.
+
+    With archive (default), finished inputs are moved to watch_dir/processed
+    or watch_dir/failed.
+
+    Returns:
+        dict: status, message, results (list of manifests). An output_dir in
+        watch_dir is an error (see output_dir_problem).
+    """
+    problem = output_dir_problem(watch_dir, output_dir)
+    if problem:
+        logger.error(f"[Watch] {problem}")
+        return {"status": "error", "message": problem, "results": []}
+    os.makedirs(output_dir, exist_ok=True)
+    stop_event = stop_event or threading.Event()
+    formats = VIDEO_FORMATS | IMAGE_FORMATS
+    watcher = DirectoryWatcher(watch_dir, poll_interval=poll_interval, settle_time=settle_time, logger=logger)
+    watcher.scan_existing()
+    manifests = []
+    skipped = 0
+    lock = threading.Lock()
+
+    def job(input_file):
+        metrics.QUEUE_DEPTH.dec()
+        manifest = guarded_file_job(input_file, template, output_dir, logger)
+        # Cancelled files stay in the drop folder and are picked up again on restart
+        if archive and manifest["status"] != "cancelled":
+            _archive(input_file, manifest, watch_dir)
+            watcher.forget(input_file)
+        with lock:
+            manifests.append(manifest)
+            if on_result:
+                on_result(manifest)
+
+    logger.info(f"[Watch] Watching {watch_dir} -> {output_dir} with {max_jobs} job(s).")
+    pool = ThreadPoolExecutor(max_workers=max(1, max_jobs))
+    try:
+        while not stop_event.is_set():
+            for input_file in watcher.wait_for_files(timeout=min(1.0, poll_interval)):
+                if os.path.splitext(input_file)[1].lstrip(".").lower() not in formats:
+                    continue
+                if already_processed(input_file, output_dir):
+                    # The same file again: clear it out of the drop folder so it does not sit there
+                    logger.warning(f"[Watch] {input_file} was already processed; skipping it.")
+                    skipped += 1
+                    if archive:
+                        _archive(input_file, {"status": "success"}, watch_dir)
+                        watcher.forget(input_file)
+                    continue
+                metrics.QUEUE_DEPTH.inc()
+                pool.submit(job, input_file).add_done_callback(
+                    partial(_log_job_error, input_file=input_file, logger=logger))
+    except (KeyboardInterrupt, JobCancelled):
+        # After a cancel signal the running jobs stop their processes and finish as "cancelled"
+        logger.info("[Watch] Interrupted; waiting for running jobs.")
+    finally:
+        pool.shutdown(wait=True)
+        watcher.close()
+    return _summary(manifests, skipped)
@@ -1,7 +1,8 @@
 import os
 import sys
 import json
-import subprocess
+import time
+from collections import deque
 from utils import env_setup
 
 sys.path.insert(
@@ -20,12 +21,19 @@ from PyQt5.QtWidgets import (  # noqa: E402
     QLineEdit,
     QTextEdit,
     QSpinBox,
+    QDoubleSpinBox,
     QCheckBox,
     QGroupBox,
+    QListWidget,
+    QListWidgetItem,
+    QProgressBar,
+    QMessageBox,
 )
+from PyQt5.QtCore import QObject, QProcess, QProcessEnvironment, QTimer, Qt, pyqtSignal  # noqa: E402
 
 from utils.logger import get_logger  # noqa: E402
 from utils.logfile_utils import make_log_filename
+from utils.progress import parse_progress_line
 gui_log_path = os.path.join("logs", "gui.log")
 os.makedirs("logs", exist_ok=True)
 logger = get_logger(gui_log_path, module_name="GUI")
@@ -40,13 +48,116 @@ UPSCALE_MODELS = [
     "realesrgan-ncnn-vulkan",
     "realcugan-ncnn-vulkan",
     "realsr-ncnn-vulkan",
-    "srmd-ncnn-vulkan"
+    "srmd-ncnn-vulkan",
+    "onnxruntime-cpu",
+    "ffmpeg-scale"
 ]
 INTERP_MODELS = [
-    "rife-ncnn-vulkan"
+    "rife-ncnn-vulkan",
+    "onnxruntime-cpu",
+    "ffmpeg-minterpolate",
+    "ffmpeg-framerate"
 ]
 VIDEO_OUTPUT_FORMATS = ["mp4", "gif", "webm", "avi", "mov", "mkv"]
 IMAGE_OUTPUT_FORMATS = ["png", "jpg"]
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60:02d}:{rest % 60:02d}"
+
+
+class JobRunner(QObject):
+    """
+    Runs one job as a receiver.py child process through QProcess, so the GUI
+    thread never waits on it. Progress lines on the child's stderr become
+    progress signals; the JSON result on stdout becomes the finished signal.
+    stdin stays open after the request: a "cancel" line (or closing it) makes
+    the receiver stop its children and remove its temp folder, on Windows too.
+    """
+    progress = pyqtSignal(dict)
+    message = pyqtSignal(str)
+    finished = pyqtSignal(dict)
+
+    # Grace period between the cancel request and kill
+    KILL_TIMEOUT_MS = 5000
+
+    def __init__(self, config, log_path, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.log_path = log_path
+        self.cancelled = False
+        self._done = False
+        self._stderr = b""
+        self.proc = QProcess(self)
+        self.proc.setWorkingDirectory(APP_DIR)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("FUSION2X_LOG_PATH", log_path)
+        env.insert("FUSION2X_PROGRESS", "1")
+        env.insert("FUSION2X_CONTROL_STDIN", "1")
+        self.proc.setProcessEnvironment(env)
+        self.proc.readyReadStandardError.connect(self._read_stderr)
+        self.proc.finished.connect(self._on_finished)
+        self.proc.errorOccurred.connect(self._on_error)
+
+    def start(self):
+        self.proc.start(sys.executable, ["receiver.py"])
+        # One line: the receiver reads the request, then listens for "cancel"
+        self.proc.write(json.dumps(self.config).encode("utf-8") + b"\n")
+
+    def is_running(self):
+        return self.proc.state() != QProcess.NotRunning
+
+    def cancel(self):
+        """Ask the receiver to stop (it cleans up its children), then kill it after a grace period."""
+        if not self.is_running():
+            return
+        self.cancelled = True
+        self.proc.write(b"cancel\n")
+        self.proc.closeWriteChannel()
+        QTimer.singleShot(self.KILL_TIMEOUT_MS, self._kill_if_running)
+
+    def _kill_if_running(self):
+        if self.is_running():
+            self.proc.kill()
+
+    def _read_stderr(self):
+        self._stderr += bytes(self.proc.readAllStandardError())
+        *lines, self._stderr = self._stderr.split(b"\n")
+        for raw in lines:
+            line = raw.decode("utf-8", "replace").rstrip()
+            event = parse_progress_line(line)
+            if event is not None:
+                self.progress.emit(event)
+            elif line:
+                self.message.emit(line)
+
+    def _finish(self, result):
+        if not self._done:
+            self._done = True
+            self.finished.emit(result)
+
+    def _on_finished(self, exit_code, exit_status):
+        self._read_stderr()
+        stdout = bytes(self.proc.readAllStandardOutput()).decode("utf-8", "replace").strip()
+        if self.cancelled:
+            self._finish({"status": "cancelled", "message": "Cancelled.", "log_path": self.log_path})
+            return
+        try:
+            result = json.loads(stdout.splitlines()[-1])
+        except (ValueError, IndexError):
+            result = {"status": "error", "log_path": self.log_path,
+                      "message": f"receiver.py exited with code {exit_code}: {stdout[-500:]}"}
+        self._finish(result)
+
+    def _on_error(self, error):
+        if error == QProcess.FailedToStart:
+            self._finish({"status": "error", "log_path": self.log_path,
+                          "message": f"Could not start receiver.py: {self.proc.errorString()}"})
 
 
 class Fusion2XGUI(QWidget):
@@ -56,7 +167,11 @@ class Fusion2XGUI(QWidget):
         self.log_path = make_log_filename()
         self.logger = get_logger(self.log_path, module_name="GUI")
         self.setWindowTitle("Fusion2X - Video AI Processing")
-        self.resize(750, 520)
+        self.resize(750, 680)
+
+        # Job queue: pending (item, config) entries and running JobRunner -> item
+        self.pending = deque()
+        self.running = {}
 
         self.init_ui()
 
@@ -94,9 +209,29 @@ class Fusion2XGUI(QWidget):
         self.upscale_group = self.make_upscale_group()
         self.interp_group = self.make_interp_group()
 
-        # Run button and log
-        self.run_btn = QPushButton("Run")
+        # Run/queue controls, queue list, progress and log
+        run_layout = QHBoxLayout()
+        self.run_btn = QPushButton("Add to Queue && Run")
         self.run_btn.clicked.connect(self.run_fusion2x)
+        self.cancel_btn = QPushButton("Cancel Selected")
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        self.cancel_all_btn = QPushButton("Cancel All")
+        self.cancel_all_btn.clicked.connect(self.cancel_all)
+        self.parallel_jobs = QSpinBox()
+        self.parallel_jobs.setRange(1, 8)
+        self.parallel_jobs.setValue(1)
+        self.parallel_jobs.valueChanged.connect(self.start_next_jobs)
+        run_layout.addWidget(self.run_btn)
+        run_layout.addWidget(self.cancel_btn)
+        run_layout.addWidget(self.cancel_all_btn)
+        run_layout.addWidget(QLabel("Parallel jobs:"))
+        run_layout.addWidget(self.parallel_jobs)
+
+        self.queue_list = QListWidget()
+        self.queue_list.setMaximumHeight(110)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_label = QLabel("Idle")
         self.log_box = QTextEdit()
         self.log_box.setReadOnly(True)
 
@@ -106,7 +241,11 @@ class Fusion2XGUI(QWidget):
         layout.addLayout(format_layout)
         layout.addWidget(self.upscale_group)
         layout.addWidget(self.interp_group)
-        layout.addWidget(self.run_btn)
+        layout.addLayout(run_layout)
+        layout.addWidget(QLabel("Queue:"))
+        layout.addWidget(self.queue_list)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_label)
         layout.addWidget(QLabel("Status Log:"))
         layout.addWidget(self.log_box)
         self.setLayout(layout)
@@ -185,6 +324,15 @@ class Fusion2XGUI(QWidget):
 
         layout.addLayout(hl)
 
+        fps_layout = QHBoxLayout()
+        fps_layout.addWidget(QLabel("Target FPS (0 = use Times):"))
+        self.interp_target_fps = QDoubleSpinBox()
+        self.interp_target_fps.setRange(0, 240)
+        self.interp_target_fps.setDecimals(3)
+        self.interp_target_fps.setValue(0)
+        fps_layout.addWidget(self.interp_target_fps)
+        layout.addLayout(fps_layout)
+
         self.tta_checkbox = QCheckBox("Enable TTA Mode")
         self.uhd_checkbox = QCheckBox("Enable UHD Mode")
         layout.addWidget(self.tta_checkbox)
@@ -194,9 +342,11 @@ class Fusion2XGUI(QWidget):
         return group
 
     def browse_input(self):
-        path, _ = QFileDialog.getOpenFileName(self, "Select input file")
-        if path:
-            self.input_line.setText(path)
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select input file(s)")
+        if paths:
+            path = paths[0]
+            # Several files are queued together with the same settings
+            self.input_line.setText(";".join(paths))
             # Set output dir to input file's folder (only if output is blank)
             if not self.output_line.text().strip():
                 self.output_line.setText(os.path.dirname(path))
@@ -213,53 +363,113 @@ class Fusion2XGUI(QWidget):
 
 
     def run_fusion2x(self):
-        input_path = self.input_line.text().strip()
+        """Queue every selected input with the current settings and start jobs up to the parallel limit."""
+        inputs = [p.strip() for p in self.input_line.text().split(";") if p.strip()]
         output_path = self.output_line.text().strip()
-        if not input_path or not output_path:
+        if not inputs or not output_path:
             self.log_box.append("[ERROR] Please select both an input file and an output directory before running.")
-            from PyQt5.QtWidgets import QMessageBox
             QMessageBox.critical(self, "Input/Output Missing", "Please select both an input file and an output directory before running.")
             return
 
-        config = self.collect_config()
-        config["log_path"] = self.log_path  # Pass log path to receiver
-        self.logger.info("User clicked Run. Collected config:")
-        self.logger.info(json.dumps(config, indent=2))
-        self.log_box.clear()
-        self.log_box.append("Starting Fusion2X...")
-
-        try:
-            env = os.environ.copy()
-            env["FUSION2X_LOG_PATH"] = self.log_path
-            proc = subprocess.Popen(
-                [sys.executable, "receiver.py"],
-                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                cwd=os.path.dirname(os.path.abspath(__file__)),
-                env=env
-            )
-            stdout, stderr = proc.communicate(json.dumps(config).encode('utf-8'))
-            if stderr:
-                self.log_box.append("[stderr]\n" + stderr.decode())
-                self.logger.error(f"Receiver.py stderr: {stderr.decode()}")
-            try:
-                result = json.loads(stdout.decode())
-                self.logger.info(f"Receiver.py output: {result}")
-                if result.get("status") == "success":
-                    self.log_box.append("Done!\nOutput: " + str(result.get("output_path")))
-                    self.log_box.append("Log: " + str(result.get("log_path", self.log_path)))
-                else:
-                    self.log_box.append("[ERROR] " + result.get("message", "Unknown error"))
-                    self.log_box.append("Log: " + str(result.get("log_path", self.log_path)))
-            except Exception as e:
-                self.log_box.append("Raw output:\n" + stdout.decode())
-                self.logger.error(f"Failed to parse receiver output: {e}")
-        except Exception as e:
-            self.logger.error(f"Exception in GUI: {e}")
-            self.log_box.append("[Exception] " + str(e))
-
-
-
-    def collect_config(self):
+        for input_path in inputs:
+            config = self.collect_config(input_path)
+            self.logger.info(f"Queued job for {input_path}.")
+            self.logger.debug(json.dumps(config))
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, input_path)
+            self.queue_list.addItem(item)
+            self.pending.append((item, config))
+            self.set_item_status(item, "queued")
+        self.start_next_jobs()
+
+    def set_item_status(self, item, status):
+        item.setText(f"{os.path.basename(item.data(Qt.UserRole))} - {status}")
+
+    def start_next_jobs(self):
+        while self.pending and len(self.running) < self.parallel_jobs.value():
+            item, config = self.pending.popleft()
+            log_path = make_log_filename()
+            config["log_path"] = log_path
+            runner = JobRunner(config, log_path, parent=self)
+            runner.progress.connect(lambda event, r=runner: self.on_job_progress(r, event))
+            runner.message.connect(lambda line: self.log_box.append(line))
+            runner.finished.connect(lambda result, r=runner: self.on_job_finished(r, result))
+            self.running[runner] = item
+            self.set_item_status(item, "starting")
+            self.log_box.append(f"Starting {item.data(Qt.UserRole)} (log: {log_path})")
+            runner.start()
+
+    def on_job_progress(self, runner, event):
+        item = self.running.get(runner)
+        if item is None:
+            return
+        stage = event.get("stage")
+        if event.get("event") == "progress":
+            done, total = event.get("done", 0), event.get("total")
+            text = f"{stage} {done}/{total or '?'} frames, {event.get('fps', 0):.1f} fps, ETA {format_eta(event.get('eta'))}"
+            if total:
+                self.progress_bar.setValue(min(100, int(100 * done / total)))
+        elif event.get("event") == "stage":
+            text = f"{stage}..."
+            self.progress_bar.setValue(0)
+        else:
+            text = f"{stage} done in {event.get('duration', 0):.1f}s"
+        self.set_item_status(item, text)
+        self.progress_label.setText(f"{os.path.basename(item.data(Qt.UserRole))}: {text}")
+
+    def on_job_finished(self, runner, result):
+        item = self.running.pop(runner, None)
+        runner.deleteLater()
+        status = result.get("status")
+        self.logger.info(f"Job finished: {result}")
+        if item is not None:
+            self.set_item_status(item, status)
+            name = item.data(Qt.UserRole)
+            if status == "success":
+                self.log_box.append(f"Done: {name}\nOutput: {result.get('output_path')}")
+            else:
+                self.log_box.append(f"[{str(status).upper()}] {name}: {result.get('message', 'Unknown error')}")
+            self.log_box.append("Log: " + str(result.get("log_path", runner.log_path)))
+        if not self.running and not self.pending:
+            self.progress_label.setText("Idle")
+            self.progress_bar.setValue(100 if status == "success" else 0)
+        self.start_next_jobs()
+
+    def cancel_selected(self):
+        for item in self.queue_list.selectedItems():
+            self.cancel_item(item)
+
+    def cancel_all(self):
+        for item in [item for item, _ in self.pending] + list(self.running.values()):
+            self.cancel_item(item)
+
+    def cancel_item(self, item):
+        for entry in list(self.pending):
+            if entry[0] is item:
+                self.pending.remove(entry)
+                self.set_item_status(item, "cancelled")
+                return
+        for runner, running_item in self.running.items():
+            if running_item is item:
+                self.set_item_status(item, "cancelling")
+                runner.cancel()
+                return
+
+    def closeEvent(self, event):
+        # Do not leave receiver processes behind when the window closes
+        self.pending.clear()
+        runners = list(self.running)
+        for runner in runners:
+            runner.cancel()
+        # All jobs stop in parallel: one grace period in total, not one per job
+        deadline = time.monotonic() + JobRunner.KILL_TIMEOUT_MS / 1000
+        for runner in runners:
+            runner.proc.waitForFinished(max(0, int((deadline - time.monotonic()) * 1000)))
+            if runner.is_running():
+                runner.proc.kill()
+        super().closeEvent(event)
+
+    def collect_config(self, input_path=None):
         # Core config (input/output/task)
         up_enabled = self.upscale_group.isChecked()
         interp_enabled = self.interp_group.isChecked()
@@ -271,7 +481,7 @@ class Fusion2XGUI(QWidget):
             task = "interpolation"
         else:
             task = "upscaling"
-        input_path = self.input_line.text()
+        input_path = input_path or self.input_line.text()
         output_path = self.output_line.text()
         input_format = os.path.splitext(input_path)[1][1:] if "." in input_path else "mp4"
         video_formats = ["mp4", "avi", "mkv", "mov", "webm", "gif"]
@@ -314,6 +524,9 @@ class Fusion2XGUI(QWidget):
                     "uhd_mode": self.uhd_checkbox.isChecked()
                 }
             }
+            if self.interp_target_fps.value() > 0:
+                config["interpolation"]["target_fps"] = self.interp_target_fps.value()
+                del config["interpolation"]["params"]["times"]
         # Add misc options as needed
         config["misc"] = {
             "keep_temp": False,
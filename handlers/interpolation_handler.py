@@ -1,16 +1,205 @@
-from handlers.models.rife_ncnn_vulkan import run_rife_ncnn_vulkan, supported_rife_ncnn_vulkan_params
+from core.executor import run_chunks
+from handlers.registry import ModelRegistry, lazy, validate_params
+from handlers.retry_policy import RETRYABLE_ERRORS, retry_settings, run_with_retries
+from media.frame_format import list_frames
+from media.frame_verify import read_image_size, invalid_frames
+from utils.file_utils import snapshot_dir, changed_files, renumber_frames, link_or_copy
+from utils.timing import parse_fps, format_rate, plan_interpolation
+from utils.perf_profile import apply_profile_defaults
+from utils import metrics
+from utils.process_utils import ModelProcessError
+from fractions import Fraction
+from functools import partial
+from itertools import chain
+import math
+import os
 import subprocess
+import time
 
 # Central registry: key = model name, value = (runner function, supported_params)
-MODEL_REGISTRY = {
-    "rife-ncnn-vulkan": (run_rife_ncnn_vulkan, supported_rife_ncnn_vulkan_params),
+# Model modules are imported on first lookup.
+MODEL_REGISTRY = ModelRegistry({
+    "rife-ncnn-vulkan": lazy("handlers.models.rife_ncnn_vulkan",
+                             "run_rife_ncnn_vulkan", "supported_rife_ncnn_vulkan_params"),
+    "onnxruntime-cpu": lazy("handlers.models.onnxruntime_cpu",
+                            "run_onnxruntime_interpolator", "supported_onnxruntime_interpolator_params"),
+    "ffmpeg-minterpolate": lazy("handlers.models.ffmpeg_filters",
+                                "run_ffmpeg_minterpolate", "supported_ffmpeg_minterpolate_params"),
+    "ffmpeg-framerate": lazy("handlers.models.ffmpeg_filters",
+                             "run_ffmpeg_framerate", "supported_ffmpeg_framerate_params"),
     # Add more interpolation models here as needed.
-}
+})
 
-def run_interpolation(frame_dir, interpolation_params, logger):
+# Models that can be fused into the decode/encode ffmpeg process.
+# key = model name, value = filter builder (params, fps) -> ffmpeg filter string
+FILTER_REGISTRY = ModelRegistry({
+    "ffmpeg-minterpolate": lazy("handlers.models.ffmpeg_filters", "build_ffmpeg_minterpolate_filter"),
+    "ffmpeg-framerate": lazy("handlers.models.ffmpeg_filters", "build_ffmpeg_framerate_filter"),
+})
+
+
+def build_interpolation_filter(interpolation_params, fps, logger):
+    """
+    Returns the ffmpeg filter string for a fusable interpolation model, or None
+    if the model must run as a separate stage.
+    """
+    model_name = interpolation_params.get("model_name")
+    if model_name not in FILTER_REGISTRY:
+        return None
+    params = interpolation_params.get("params", {})
+    _, supported_params = MODEL_REGISTRY[model_name]
+    msg = validate_params(model_name, params, supported_params, logger)
+    if msg:
+        raise ValueError(msg)
+    target_fps = interpolation_params.get("target_fps")
+    if target_fps:
+        params = dict(params, times=format_rate(parse_fps(target_fps) / parse_fps(fps)))
+    return FILTER_REGISTRY[model_name](params, fps)
+
+
+def _retime_params(model_name, params, supported_params, frame_count, source_fps, target_fps, logger):
+    """
+    Adapt params so the model produces the target_fps plan directly.
+    Returns (params, plan, select_times); select_times is set when the model can
+    only multiply by an integer and the plan has to be picked from its output.
+    """
+    plan = plan_interpolation(frame_count, source_fps, target_fps)
+    params = dict(params)
+    params.pop("times", None)
+    if "timesteps" in supported_params:
+        params["timesteps"] = [[i, float(t)] for i, t in plan["frames"]]
+        logger.info(f"Retiming to {format_rate(plan['output_fps'])} fps: {len(plan['frames'])} frames, {len(plan['timesteps'])} distinct timesteps.")
+        return params, plan, None
+    if "num_frame" in supported_params:
+        params["num_frame"] = len(plan["frames"])
+        logger.info(f"Retiming to {format_rate(plan['output_fps'])} fps: {len(plan['frames'])} frames.")
+        return params, plan, None
+    if model_name in FILTER_REGISTRY:
+        params["times"] = format_rate(plan["ratio"])
+        return params, plan, None
+    select_times = math.ceil(plan["ratio"])
+    params["times"] = select_times
+    logger.warning(
+        f"Model '{model_name}' cannot generate arbitrary timesteps; interpolating x{select_times} "
+        f"and keeping the {len(plan['frames'])} frames nearest to the {format_rate(plan['output_fps'])} fps grid."
+    )
+    return params, plan, select_times
+
+
+def _select_frames(frame_dir, plan, select_times, source_fps):
+    """
+    Keep the frames of an x select_times sequence nearest to the plan's output grid.
+    Returns the exact presentation time (seconds) of every kept frame.
+    """
+    frames = list_frames(frame_dir)
+    picked = []
+    for j in range(len(plan["frames"])):
+        position = Fraction(j) / plan["ratio"]
+        picked.append(min(round(position * select_times), len(frames) - 1))
+    staging = os.path.join(frame_dir, "_retime")
+    os.makedirs(staging, exist_ok=True)
+    names = []
+    for j, idx in enumerate(picked):
+        name = f"retimed_{j:06d}{os.path.splitext(frames[idx])[1]}"
+        link_or_copy(os.path.join(frame_dir, frames[idx]), os.path.join(staging, name))
+        names.append(name)
+    for f in frames:
+        os.remove(os.path.join(frame_dir, f))
+    for name in names:
+        os.replace(os.path.join(staging, name), os.path.join(frame_dir, name))
+    os.rmdir(staging)
+    renumber_frames(frame_dir, names)
+    rate = parse_fps(source_fps) * select_times
+    return [float(idx / rate) for idx in picked]
+
+
+def _run_model(frame_dir, model_name, params, interpolation_params, source_fps, logger):
+    """
+    Run one interpolation model and normalize its output.
+    Outputs that are unreadable, truncated or not of the input size raise
+    ModelProcessError (before the sources are dropped) so the stage is retried.
+    Returns extra result keys: output_fps, frames (counts) and timestamps for
+    non-uniform output.
+    """
+    model_func, supported_params = MODEL_REGISTRY[model_name]
+    target_fps = interpolation_params.get("target_fps")
+    plan = select_times = None
+    inputs = list_frames(frame_dir)
+    if target_fps and source_fps:
+        params, plan, select_times = _retime_params(
+            model_name, params, supported_params, len(inputs), source_fps, target_fps, logger
+        )
+
+    input_size = read_image_size(os.path.join(frame_dir, inputs[0])) if inputs else None
+    before = snapshot_dir(frame_dir)
+    model_func(frame_dir=frame_dir, params=params, logger=logger)
+    check = partial(invalid_frames, frame_dir, size=input_size)
+    bad = list(chain.from_iterable(run_chunks(check, changed_files(frame_dir, before))))
+    if bad:
+        raise ModelProcessError(
+            f"{model_name} wrote {len(bad)} unreadable or wrongly sized frames ({', '.join(bad[:5])})", 0
+        )
+    _normalize_outputs(frame_dir, before, logger)
+
+    extra = {}
+    if plan:
+        extra["output_fps"] = format_rate(plan["output_fps"])
+        if select_times:
+            extra["timestamps"] = _select_frames(frame_dir, plan, select_times, source_fps)
+    elif source_fps and params.get("num_frame") and inputs:
+        # An explicit frame count overrides times for the model, so it sets the rate too
+        extra["output_fps"] = format_rate(parse_fps(source_fps) * Fraction(int(params["num_frame"]), len(inputs)))
+    elif source_fps:
+        extra["output_fps"] = format_rate(parse_fps(source_fps) * Fraction(str(params.get("times", 2))))
+
+    count = len(list_frames(frame_dir))
+    expected = len(plan["frames"]) if plan else params.get("num_frame")
+    if expected and count != expected:
+        logger.warning(f"[verify] {model_name} produced {count} frames, expected {expected}.")
+    extra["frames"] = {"expected": expected or count, "verified": count, "reprocessed": 0, "failed": 0}
+    return extra
+
+
+def _normalize_outputs(frame_dir, before, logger):
+    """
+    Keep only the frames written by the model, renamed to frame_%06d.
+    Runners such as rife-ncnn-vulkan write their sequence next to the source
+    frames under different names, so the sources must be dropped.
+    """
+    outputs = changed_files(frame_dir, before)
+    if outputs:
+        renumber_frames(frame_dir, outputs)
+        logger.info(f"Interpolation produced {len(outputs)} frames.")
+
+
+def _discard_new_files(frame_dir, before):
+    """Remove files a failed model run added to frame_dir so a retry starts clean."""
+    for name in changed_files(frame_dir, before):
+        if name not in before:
+            os.remove(os.path.join(frame_dir, name))
+
+
+def run_interpolation(frame_dir, interpolation_params, logger, source_fps=None):
     """
     Runs the requested interpolation model on frames in frame_dir.
-    Returns dict: {"success": bool, "message": str}
+    Afterwards frame_dir holds only the interpolated sequence as frame_%06d.
+    Tunable parameters the job omits (threads, gpu_id) come from the host
+    performance profile written by autotune.py, if there is one.
+
+    With source_fps the result also reports the output frame rate (from
+    "num_frame" when the job sets it, otherwise "times"). If the block
+    sets "target_fps" the sequence is retimed to exactly that rate: models that
+    accept timesteps or a frame count generate only the needed frames; others
+    interpolate by the next integer multiple and the nearest frames are kept,
+    with their exact presentation times returned as "timestamps".
+
+    A failed model command is rerun with lighter settings (see
+    handlers.retry_policy; the block's "retry" settings apply). If the model
+    executable is missing, or retries are exhausted, and "fallback_model" is
+    set, the fallback model runs instead (e.g. "ffmpeg-minterpolate"). Output
+    frames are checked from their image headers; bad output counts as a failed
+    run. Frame counts are reported as "frames".
+    Returns dict: {"success": bool, "message": str, "output_fps": str, "frames": dict, "timestamps": list}
     """
     model_name = interpolation_params.get("model_name")
     params = interpolation_params.get("params", {})
@@ -20,21 +209,64 @@ def run_interpolation(frame_dir, interpolation_params, logger):
         logger.error(msg)
         return {"success": False, "message": msg}
 
-    model_func, supported_params = MODEL_REGISTRY[model_name]
+    _, supported_params = MODEL_REGISTRY[model_name]
     # Parameter validation
-    for k in params:
-        if k not in supported_params:
-            msg = f"Parameter '{k}' is not supported by model '{model_name}'"
-            logger.error(msg)
-            return {"success": False, "message": msg}
+    msg = validate_params(model_name, params, supported_params, logger)
+    if msg:
+        return {"success": False, "message": msg}
+    tuned_params = apply_profile_defaults("interpolation", model_name, params, supported_params, logger)
+
+    runs = []
+
+    def attempt(attempt_params):
+        before = snapshot_dir(frame_dir)
+        runs.append(attempt_params)
+        try:
+            extra = _run_model(frame_dir, model_name, attempt_params, interpolation_params, source_fps, logger)
+            if len(runs) > 1:
+                extra["frames"]["reprocessed"] = extra["frames"]["verified"]
+            return extra
+        except RETRYABLE_ERRORS:
+            _discard_new_files(frame_dir, before)
+            raise
+
+    def run_fallback(reason):
+        fallback = interpolation_params.get("fallback_model")
+        if not fallback or fallback == model_name or fallback not in MODEL_REGISTRY:
+            logger.error(f"Interpolation model '{model_name}' failed: {reason}")
+            return None
+        logger.warning(f"Interpolation model '{model_name}' failed ({reason}); falling back to '{fallback}'.")
+        _, fallback_supported = MODEL_REGISTRY[fallback]
+        fallback_params = {k: v for k, v in params.items() if k in fallback_supported}
+        try:
+            extra = _run_model(frame_dir, fallback, fallback_params, interpolation_params, source_fps, logger)
+            metrics.record_model_run("interpolation", fallback, extra["frames"]["verified"])
+            return {"success": True, "message": f"Interpolation completed with fallback model '{fallback}'.", **extra}
+        except Exception as e2:
+            logger.error(f"Fallback interpolation model '{fallback}' failed: {e2}")
+            return {"success": False, "message": str(e2)}
 
     try:
         logger.info(f"Running interpolation model: {model_name}")
-        model_func(frame_dir=frame_dir, params=params, logger=logger)
-        return {"success": True, "message": "Interpolation completed."}
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Interpolation model '{model_name}' failed: {e}")
-        return {"success": False, "message": e.stderr}
+        start = time.perf_counter()
+        # Interpolation output depends on neighbouring frames, so a failed run is retried as a whole
+        extra = run_with_retries(
+            attempt, tuned_params, supported_params, retry_settings(interpolation_params), logger, model_name
+        )
+        duration = time.perf_counter() - start
+        logger.info(f"Interpolation with {model_name} took {duration:.2f}s",
+                    extra={"stage": "interpolation", "duration": round(duration, 3)})
+        metrics.record_model_run("interpolation", model_name, extra["frames"]["verified"], duration)
+        return {"success": True, "message": "Interpolation completed.", **extra}
+    except FileNotFoundError as e:
+        return run_fallback(e) or {"success": False, "message": str(e)}
+    except RETRYABLE_ERRORS as e:
+        result = run_fallback(e)
+        if result:
+            return result
+        if isinstance(e, subprocess.CalledProcessError):
+            return {"success": False, "message": e.stderr}
+        return {"success": False, "message": str(e)}
     except Exception as e:
         logger.error(f"Interpolation model '{model_name}' failed: {e}")
         return {"success": False, "message": str(e)}
@@ -0,0 +1,140 @@
+"""
+Classical (non-AI) backends built on ffmpeg video filters.
+
+Each backend has two forms:
+    - a runner (frame_dir, params, logger) that processes an extracted frame
+      directory in place, like the ncnn runners;
+    - a filter builder (params, fps) returning the ffmpeg filter string, so the
+      operator can fuse the stage into the decode/encode ffmpeg process and
+      frames never touch disk.
+"""
+import os
+import re
+import shutil
+from fractions import Fraction
+from media.frame_format import list_frames
+from utils.process_utils import require_binaries, run_model_command
+from utils.timing import parse_fps, format_rate
+
+supported_ffmpeg_scale_params = [
+    "scale",            # Scale factor (e.g., 2, 4)
+    "algorithm",        # Scaler: lanczos, bicubic, bilinear, spline, neighbor
+    "output_format",    # Output format: png, jpg, etc.
+]
+
+supported_ffmpeg_minterpolate_params = [
+    "times",            # Interpolation multiplier (2=double, may be fractional e.g. "1001/400")
+    "mi_mode",          # Interpolation mode: mci (motion compensated), blend, dup
+    "mc_mode",          # Motion compensation mode: obmc, aobmc
+    "me_mode",          # Motion estimation mode: bidir, bilat
+    "output_format",    # Output format: png, jpg, etc.
+]
+
+supported_ffmpeg_framerate_params = [
+    "times",            # Interpolation multiplier (2=double, may be fractional e.g. "1001/400")
+    "output_format",    # Output format: png, jpg, etc.
+]
+
+SCALE_ALGORITHMS = ("lanczos", "bicubic", "bilinear", "spline", "neighbor")
+# Nominal rate for frame directories; only the ratio to the output rate matters.
+SEQUENCE_FPS = 25
+FRAME_NAME_RE = re.compile(r"^frame_(\d{6})\.(\w+)$")
+
+
+def build_ffmpeg_scale_filter(params, fps=None):
+    """ffmpeg scale filter string for the given params."""
+    scale = params.get("scale", 2)
+    algorithm = params.get("algorithm", "lanczos")
+    if algorithm not in SCALE_ALGORITHMS:
+        raise ValueError(f"Unknown scale algorithm '{algorithm}'")
+    return f"scale=iw*{scale}:ih*{scale}:flags={algorithm}"
+
+
+def _output_rate(params, fps):
+    return format_rate(parse_fps(fps) * Fraction(str(params.get("times", 2))))
+
+
+def build_ffmpeg_minterpolate_filter(params, fps):
+    """ffmpeg minterpolate filter string producing fps * times."""
+    mi_mode = params.get("mi_mode", "mci")
+    flt = f"minterpolate=fps={_output_rate(params, fps)}:mi_mode={mi_mode}"
+    if mi_mode == "mci":
+        flt += f":mc_mode={params.get('mc_mode', 'obmc')}:me_mode={params.get('me_mode', 'bidir')}"
+    return flt
+
+
+def build_ffmpeg_framerate_filter(params, fps):
+    """ffmpeg framerate (frame blending) filter string producing fps * times."""
+    return f"framerate=fps={_output_rate(params, fps)}"
+
+
+def _sequence_pattern(frames):
+    """
+    Returns (pattern, start_number) if frames form a frame_%06d sequence
+    with a single extension, else (None, None).
+    """
+    matches = [FRAME_NAME_RE.match(f) for f in frames]
+    if not frames or not all(matches) or len({m.group(2) for m in matches}) != 1:
+        return None, None
+    return f"frame_%06d.{matches[0].group(2)}", int(matches[0].group(1))
+
+
+def _replace_frames(frame_dir, old_frames, out_dir):
+    for f in old_frames:
+        os.remove(os.path.join(frame_dir, f))
+    for f in sorted(os.listdir(out_dir)):
+        os.replace(os.path.join(out_dir, f), os.path.join(frame_dir, f))
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def _run_sequence_filter(frame_dir, vf, output_format, logger, per_file_ok):
+    """Run vf over the frames in frame_dir, replacing them with the filtered output."""
+    require_binaries(["ffmpeg"])
+    frames = list_frames(frame_dir)
+    if not frames:
+        raise RuntimeError(f"No frames found in {frame_dir}")
+    out_dir = os.path.join(frame_dir, "_ffmpeg_out")
+    os.makedirs(out_dir, exist_ok=True)
+    pattern, start = _sequence_pattern(frames)
+    if pattern:
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-framerate", str(SEQUENCE_FPS), "-start_number", str(start),
+            "-i", os.path.join(frame_dir, pattern),
+            "-vf", vf,
+            "-start_number", str(start),
+            os.path.join(out_dir, f"frame_%06d.{output_format}"),
+        ]
+        run_model_command(cmd, logger)
+    elif per_file_ok:
+        for f in frames:
+            base = os.path.splitext(f)[0]
+            cmd = [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-i", os.path.join(frame_dir, f),
+                "-vf", vf,
+                os.path.join(out_dir, f"{base}.{output_format}"),
+            ]
+            run_model_command(cmd, logger)
+    else:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise RuntimeError("Frames must be named frame_%06d for ffmpeg interpolation.")
+    _replace_frames(frame_dir, frames, out_dir)
+
+
+def run_ffmpeg_scale(frame_dir, params, logger):
+    vf = build_ffmpeg_scale_filter(params)
+    _run_sequence_filter(frame_dir, vf, params.get("output_format", "png"), logger, per_file_ok=True)
+    logger.info(f"[ffmpeg-scale] Finished upscaling.")
+
+
+def run_ffmpeg_minterpolate(frame_dir, params, logger):
+    vf = build_ffmpeg_minterpolate_filter(params, SEQUENCE_FPS)
+    _run_sequence_filter(frame_dir, vf, params.get("output_format", "png"), logger, per_file_ok=False)
+    logger.info(f"[ffmpeg-minterpolate] Finished interpolation.")
+
+
+def run_ffmpeg_framerate(frame_dir, params, logger):
+    vf = build_ffmpeg_framerate_filter(params, SEQUENCE_FPS)
+    _run_sequence_filter(frame_dir, vf, params.get("output_format", "png"), logger, per_file_ok=False)
+    logger.info(f"[ffmpeg-framerate] Finished interpolation.")
@@ -0,0 +1,240 @@
+"""
+In-process model runners using onnxruntime on the CPU execution provider.
+
+Unlike the ncnn runners these do not spawn an executable: frames are loaded
+into batched NCHW float32 tensors and fed to an InferenceSession that is kept
+warm in a module-level cache, so repeated stages and jobs in the same process
+skip the model load.
+
+Optional dependencies: onnxruntime, numpy, Pillow.
+"""
+import os
+import threading
+
+from media.frame_format import list_frames
+
+supported_onnxruntime_upscaler_params = [
+    "model_path",       # Path to the .onnx model (optional if "model" is given)
+    "model",            # Model file name under models/upscaling/onnx/
+    "scale",            # Expected scale factor (informational, model decides)
+    "output_format",    # Output format: png, jpg, webp, etc.
+    "threads",          # Intra-op thread count (0 = onnxruntime default)
+    "inter_threads",    # Inter-op thread count (optional)
+    "batch_size",       # Frames per inference call
+]
+
+supported_onnxruntime_interpolator_params = [
+    "model_path",       # Path to the .onnx model (optional if "model" is given)
+    "model",            # Model file name under models/interpolation/onnx/
+    "times",            # Interpolation multiplier (2=double, 4=quadruple)
+    "output_format",    # Output format: png, jpg, webp, etc.
+    "threads",          # Intra-op thread count (0 = onnxruntime default)
+    "inter_threads",    # Inter-op thread count (optional)
+    "batch_size",       # Output frames per inference call
+    "timesteps",        # Explicit [source_index, t] per output frame (optional)
+]
+
+# key = (model_path, intra_threads, inter_threads), value = InferenceSession
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _require_runtime():
+    """Import and return (onnxruntime, numpy, PIL.Image) or raise a helpful error."""
+    try:
+        import numpy as np
+        import onnxruntime as ort
+        from PIL import Image
+    except ImportError as e:
+        raise RuntimeError(
+            "The onnxruntime-cpu backend requires onnxruntime, numpy and Pillow. "
+            "Install them with 'pip install onnxruntime numpy Pillow'. "
+            f"({e})"
+        )
+    return ort, np, Image
+
+
+def resolve_model_path(params, kind):
+    """
+    Resolve the .onnx file for a job from "model_path" or "model".
+    kind is "upscaling" or "interpolation".
+    """
+    model_path = params.get("model_path")
+    if not model_path and params.get("model"):
+        model_name = params["model"]
+        if not model_name.endswith(".onnx"):
+            model_name += ".onnx"
+        model_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "..", "..", "models", kind, "onnx", model_name)
+        )
+    if not model_path or not os.path.isfile(model_path):
+        raise FileNotFoundError(f"ONNX model not found: {model_path}")
+    return os.path.abspath(model_path)
+
+
+def get_session(model_path, threads=0, inter_threads=0, logger=None):
+    """
+    Return a cached CPU InferenceSession for model_path, creating it on first use.
+    Sessions are shared across frames and jobs within the process.
+    """
+    key = (model_path, int(threads or 0), int(inter_threads or 0))
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(key)
+        if session is not None:
+            return session
+        ort, _, _ = _require_runtime()
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        if inter_threads:
+            options.inter_op_num_threads = int(inter_threads)
+        if logger:
+            logger.info(f"[onnxruntime-cpu] Loading model {model_path} (threads={threads or 'auto'})")
+        session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        _SESSIONS[key] = session
+        return session
+
+
+def clear_session_cache():
+    """Drop all cached sessions (frees model memory)."""
+    with _SESSIONS_LOCK:
+        _SESSIONS.clear()
+
+
+def _load_rgb(path, np, Image):
+    with Image.open(path) as img:
+        arr = np.asarray(img.convert("RGB"), dtype=np.float32)
+    return arr.transpose(2, 0, 1) / 255.0
+
+
+def _save_rgb(chw, path, np, Image):
+    hwc = (np.clip(chw, 0.0, 1.0).transpose(1, 2, 0) * 255.0 + 0.5).astype(np.uint8)
+    # Intermediate WebP frames must stay lossless (Pillow defaults to lossy)
+    options = {"lossless": True} if path.lower().endswith(".webp") else {}
+    Image.fromarray(hwc).save(path, **options)
+
+
+def _batches(items, size):
+    size = max(1, int(size))
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def run_onnxruntime_upscaler(frame_dir, params, logger):
+    """Upscale every image in frame_dir in place with an ONNX super-resolution model."""
+    _, np, Image = _require_runtime()
+    model_path = resolve_model_path(params, "upscaling")
+    session = get_session(model_path, params.get("threads", 0), params.get("inter_threads", 0), logger)
+    input_name = session.get_inputs()[0].name
+    output_format = params.get("output_format", "png").lower()
+    batch_size = params.get("batch_size", 4)
+
+    frames = list_frames(frame_dir)
+    logger.info(f"[onnxruntime-cpu] Upscaling {len(frames)} frames (batch_size={batch_size})")
+    for batch in _batches(frames, batch_size):
+        tensors = [_load_rgb(os.path.join(frame_dir, f), np, Image) for f in batch]
+        # Frames of different sizes cannot share a tensor; run those one by one.
+        if len({t.shape for t in tensors}) == 1:
+            groups = [(batch, np.stack(tensors))]
+        else:
+            groups = [([f], t[None]) for f, t in zip(batch, tensors)]
+        for names, tensor in groups:
+            outputs = session.run(None, {input_name: tensor})[0]
+            for name, out in zip(names, outputs):
+                src = os.path.join(frame_dir, name)
+                dst = os.path.splitext(src)[0] + "." + output_format
+                _save_rgb(out, dst, np, Image)
+                if dst != src:
+                    os.remove(src)
+    logger.info("[onnxruntime-cpu] Finished upscaling.")
+
+
+def _timestep_tensor(session_input, timesteps, height, width, np):
+    """Build the per-sample timestep input in whatever layout the model declares."""
+    shape = session_input.shape
+    t = np.asarray(timesteps, dtype=np.float32)
+    if len(shape) != 4:
+        return t.reshape(-1, 1)
+    t = t.reshape(-1, 1, 1, 1)
+    if shape[2] == 1 and shape[3] == 1:
+        return t
+    return np.ascontiguousarray(np.broadcast_to(t, (len(timesteps), 1, height, width)))
+
+
+def run_onnxruntime_interpolator(frame_dir, params, logger):
+    """
+    Interpolate frames in frame_dir with an ONNX RIFE-style model.
+
+    The model takes (img0, img1) or (img0, img1, timestep). The source frames are
+    replaced by a frame_%06d sequence. By default it holds times-1 generated
+    frames between each source pair, len(frames) * times frames in total. If
+    "timesteps" is given (a list of [source_index, t] per output frame, see
+    utils.timing.plan_interpolation) exactly those frames are produced, so
+    retiming to an arbitrary rate generates only the frames that are shown.
+    """
+    _, np, Image = _require_runtime()
+    model_path = resolve_model_path(params, "interpolation")
+    session = get_session(model_path, params.get("threads", 0), params.get("inter_threads", 0), logger)
+    inputs = session.get_inputs()
+    output_format = params.get("output_format", "png").lower()
+    batch_size = params.get("batch_size", 4)
+    times = int(params.get("times", 2))
+
+    frames = list_frames(frame_dir)
+    if len(frames) < 2:
+        logger.warning("[onnxruntime-cpu] Fewer than two frames; nothing to interpolate.")
+        return
+    plan = params.get("timesteps")
+    if plan is None:
+        # The last frame is repeated so the count matches rife-ncnn-vulkan
+        plan = [(i, k / times) for i in range(len(frames) - 1) for k in range(times)]
+        plan += [(len(frames) - 1, 0.0)] * times
+    plan = [(int(i), float(t)) for i, t in plan]
+    if len(inputs) < 3 and any(t not in (0.0, 0.5) for _, t in plan):
+        raise ValueError("This ONNX interpolation model has no timestep input; only times=2 is supported.")
+    generated_count = sum(1 for _, t in plan if t)
+    logger.info(
+        f"[onnxruntime-cpu] Interpolating {len(frames)} frames into {len(plan)} "
+        f"({generated_count} generated, batch_size={batch_size})"
+    )
+
+    out_dir = os.path.join(frame_dir, "_onnx_interp")
+    os.makedirs(out_dir, exist_ok=True)
+    cache = {}
+
+    def load(i):
+        if i not in cache:
+            cache[i] = _load_rgb(os.path.join(frame_dir, frames[i]), np, Image)
+        return cache[i]
+
+    out_index = 1
+    for batch in _batches(plan, batch_size):
+        todo = [(i, t) for i, t in batch if t]
+        results = {}
+        if todo:
+            img0 = np.stack([load(i) for i, _ in todo])
+            img1 = np.stack([load(i + 1) for i, _ in todo])
+            feed = {inputs[0].name: img0, inputs[1].name: img1}
+            if len(inputs) >= 3:
+                feed[inputs[2].name] = _timestep_tensor(
+                    inputs[2], [t for _, t in todo], img0.shape[2], img0.shape[3], np
+                )
+            for key, out in zip(todo, session.run(None, feed)[0]):
+                results[key] = out
+        for i, t in batch:
+            chw = results[(i, t)] if t else load(i)
+            _save_rgb(chw, os.path.join(out_dir, f"frame_{out_index:06d}.{output_format}"), np, Image)
+            out_index += 1
+        # Plans move forward through the source, so older frames can be dropped
+        lowest = min(i for i, _ in batch)
+        for i in [k for k in cache if k < lowest]:
+            del cache[i]
+
+    for f in frames:
+        os.remove(os.path.join(frame_dir, f))
+    for f in sorted(os.listdir(out_dir)):
+        os.replace(os.path.join(out_dir, f), os.path.join(frame_dir, f))
+    os.rmdir(out_dir)
+    logger.info("[onnxruntime-cpu] Finished interpolation.")
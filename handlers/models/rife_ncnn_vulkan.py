@@ -1,5 +1,6 @@
 import os
 import subprocess
+from media.frame_format import list_frames
 from utils.model_finder import find_model_executable
 from utils.process_utils import run_model_command
 
@@ -7,6 +8,7 @@ supported_rife_ncnn_vulkan_params = [
     "rife_exe_path",     # Path to rife-ncnn-vulkan.exe (optional if using default)
     "model",             # Model version/folder, e.g. rife-v4.6
     "times",             # Interpolation multiplier (2=double, 4=quadruple)
+    "num_frame",         # Exact output frame count (overrides times; v4 models retime to any count)
     "output_format",     # Output image format: png, jpg, etc.
     "gpu_id",            # GPU selection (integer)
     "threads",           # Number of threads
@@ -46,6 +48,7 @@ def run_rife_ncnn_vulkan(frame_dir, params, logger):
     
     model = params.get("model", "rife-v4.6")
     times = params.get("times", 2)
+    num_frame = params.get("num_frame")
     fmt = params.get("output_format", "png")
     gpu_id = params.get("gpu_id", 0)
     threads = params.get("threads", 4)
@@ -55,6 +58,11 @@ def run_rife_ncnn_vulkan(frame_dir, params, logger):
 
     output_dir = frame_dir
 
+    # rife-ncnn-vulkan's -n is the target frame count, not a multiplier
+    if not num_frame:
+        input_count = len(list_frames(frame_dir))
+        num_frame = input_count * int(times)
+
     cmd = [
         exe_path,
         "-i",
@@ -62,7 +70,7 @@ def run_rife_ncnn_vulkan(frame_dir, params, logger):
         "-o",
         output_dir,
         "-n",
-        str(times),
+        str(num_frame),
         "-m",
         model,
         "-f",
@@ -0,0 +1,109 @@
+"""
+Lazily loaded model registries.
+
+Registry entries name the module and attributes that implement a model; the
+module is imported the first time the entry is looked up, so importing a
+handler (and therefore the operator) does not import every model backend.
+Listing model names or checking "name in registry" never imports anything,
+and neither does supported_params(): the params list is read from the
+module's source.
+"""
+import ast
+import importlib
+import importlib.util
+from collections.abc import MutableMapping
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _module_literals(module):
+    """Module-level NAME = <literal> assignments in the source of module, without importing it."""
+    spec = importlib.util.find_spec(module)
+    with open(spec.origin, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), spec.origin)
+    literals = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            try:
+                literals[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass  # computed at import time
+    return literals
+
+
+class lazy:
+    """Registry entry resolved to getattr(module, attr) (or a tuple of attrs) on first use."""
+
+    __slots__ = ("module", "attrs")
+
+    def __init__(self, module, *attrs):
+        self.module = module
+        self.attrs = attrs
+
+    def resolve(self):
+        mod = importlib.import_module(self.module)
+        values = tuple(getattr(mod, attr) for attr in self.attrs)
+        return values[0] if len(values) == 1 else values
+
+    def literal(self, attr):
+        """Value of attr if the module assigns it a literal (e.g. a params list), read without importing."""
+        literals = _module_literals(self.module)
+        if attr not in literals:
+            raise AttributeError(f"{self.module}.{attr} is not a module-level literal")
+        return literals[attr]
+
+
+class ModelRegistry(MutableMapping):
+    """
+    Dict-like registry: key = model name, value = whatever the entry resolves
+    to, e.g. (runner function, supported_params). Plain values can be
+    assigned as well (tests register fake models this way).
+    """
+
+    def __init__(self, entries=None):
+        self._entries = dict(entries or {})
+
+    def __getitem__(self, name):
+        value = self._entries[name]
+        if isinstance(value, lazy):
+            value = value.resolve()
+            self._entries[name] = value
+        return value
+
+    def supported_params(self, name):
+        """
+        supported_params of a (runner, supported_params) entry. An entry not
+        loaded yet is read from its module's source, so the runner is not imported.
+        """
+        value = self._entries[name]
+        if isinstance(value, lazy):
+            return list(value.literal(value.attrs[1]))
+        return value[1]
+
+    def __setitem__(self, name, value):
+        self._entries[name] = value
+
+    def __delitem__(self, name):
+        del self._entries[name]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __repr__(self):
+        return f"ModelRegistry({list(self._entries)})"
+
+
+def validate_params(model_name, params, supported_params, logger):
+    """Error message (also logged) for the first param model_name does not support, else None."""
+    for k in params:
+        if k not in supported_params:
+            msg = f"Parameter '{k}' is not supported by model '{model_name}'"
+            logger.error(msg)
+            return msg
+    return None
@@ -0,0 +1,203 @@
+"""
+Retry policy for failed model commands.
+
+When a model command fails, the frames that already have output are kept and
+only the remaining frames are run again, with lighter settings for
+memory-style failures (out of memory, Vulkan device lost, 0xC0000005 crash):
+
+    1. halve tile_size (auto/0 starts at START_TILE_SIZE) down to min_tile_size
+    2. reduce threads ("4:4:4" -> "2:2:2" -> "1:1:1", 8 -> 4 -> ... -> 1)
+    3. run on the CPU (gpu_id -1) if the job allows it ("cpu_fallback")
+
+Other failures are retried once with the same settings, then on the CPU if
+allowed. The job's "retry" block (inside "upscaling"/"interpolation") can
+override DEFAULT_RETRY:
+
+    "retry": {"max_attempts": 6, "min_tile_size": 32, "cpu_fallback": true}
+"""
+import os
+import shutil
+import subprocess
+
+from media.frame_format import list_frames
+from utils.file_utils import snapshot_dir, changed_files
+from utils.process_utils import ModelProcessError
+
+DEFAULT_RETRY = {
+    "max_attempts": 4,      # total runs including the first
+    "min_tile_size": 32,
+    "cpu_fallback": False,
+}
+START_TILE_SIZE = 256
+
+# Exit codes of a crashed model process (0xC0000005 on Windows, SIGKILL/SIGSEGV elsewhere)
+CRASH_CODES = (3221225477, -1073741819, -9, -11, 137, 139)
+MEMORY_MARKERS = (
+    "out of memory",
+    "out_of_memory",
+    "vkallocatememory",
+    "vk_error_out_of_device_memory",
+    "vk_error_device_lost",
+    "device lost",
+    "bad_alloc",
+    "0xc0000005",
+)
+# Errors a retry can help with; anything else (bad params, missing files) fails at once
+RETRYABLE_ERRORS = (ModelProcessError, subprocess.CalledProcessError)
+
+
+def retry_settings(block):
+    """DEFAULT_RETRY updated with the block's "retry" settings."""
+    return dict(DEFAULT_RETRY, **(block.get("retry") or {}))
+
+
+def classify_failure(error):
+    """Returns "memory" for out-of-memory / device-lost / crash failures, else "other"."""
+    text = " ".join(
+        str(x) for x in (error, getattr(error, "stderr", ""), getattr(error, "stdout", "")) if x
+    ).lower()
+    if any(marker in text for marker in MEMORY_MARKERS):
+        return "memory"
+    if getattr(error, "returncode", None) in CRASH_CODES:
+        return "memory"
+    return "other"
+
+
+def _reduce_threads(threads):
+    """Halve a thread setting (int or "load:proc:save"); None if it is already minimal."""
+    if isinstance(threads, int):
+        return threads // 2 if threads > 1 else None
+    parts = [int(x) for x in str(threads).split(":")]
+    reduced = [max(1, x // 2) for x in parts]
+    if reduced == parts:
+        return None
+    return ":".join(str(x) for x in reduced)
+
+
+def backoff_params(params, supported_params, failure, retry, history):
+    """
+    Params for the next attempt after a failure, or None if nothing is left to try.
+
+    Args:
+        params (dict): Params of the failed attempt.
+        supported_params (list): Params the model accepts.
+        failure (str): "memory" or "other" (see classify_failure).
+        retry (dict): Retry settings.
+        history (list): Changes already tried (this function appends to it).
+
+    Returns:
+        (dict, str) | None: new params and a description of the change.
+    """
+    params = dict(params)
+    if failure == "memory":
+        tile = int(params.get("tile_size", 0) or 0)
+        if "tile_size" in supported_params:
+            new_tile = START_TILE_SIZE if tile == 0 else tile // 2
+            if new_tile >= retry["min_tile_size"] and (tile == 0 or new_tile < tile):
+                params["tile_size"] = new_tile
+                history.append("tile_size")
+                return params, f"tile_size={new_tile}"
+        if "threads" in supported_params and "threads" in params:
+            threads = _reduce_threads(params["threads"])
+            if threads is not None:
+                params["threads"] = threads
+                history.append("threads")
+                return params, f"threads={threads}"
+    elif "same" not in history:
+        history.append("same")
+        return params, "the same parameters"
+    if retry["cpu_fallback"] and "gpu_id" in supported_params and params.get("gpu_id") != -1:
+        params["gpu_id"] = -1
+        history.append("cpu")
+        return params, "gpu_id=-1 (CPU)"
+    return None
+
+
+def pending_frames(frame_dir, frames, before):
+    """Frames of frames with no output written since the snapshot (matched by file stem)."""
+    done = {os.path.splitext(name)[0] for name in changed_files(frame_dir, before)}
+    return [f for f in frames if os.path.splitext(f)[0] not in done]
+
+
+def run_on_frames(model_func, frame_dir, frames, params, logger):
+    """
+    Run an in-place model on a subset of frame_dir by copying them to a staging
+    directory; outputs are moved back into frame_dir.
+    Returns the frames still without output and the error (None on success).
+    """
+    staging = os.path.join(frame_dir, "_retry")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in frames:
+        shutil.copy2(os.path.join(frame_dir, name), os.path.join(staging, name))
+    before = snapshot_dir(staging)
+    error = None
+    try:
+        try:
+            model_func(frame_dir=staging, params=params, logger=logger)
+        except RETRYABLE_ERRORS as e:
+            error = e
+        remaining = pending_frames(staging, frames, before) if error else []
+        for name in changed_files(staging, before):
+            os.replace(os.path.join(staging, name), os.path.join(frame_dir, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return remaining, error
+
+
+def run_with_frame_retries(model_func, frame_dir, params, supported_params, retry, logger, label):
+    """
+    Run an in-place per-frame model (upscalers) over frame_dir. On a retryable
+    failure, rerun only the frames without output using backoff_params.
+
+    Returns the params of the attempt that finished the job. On final failure
+    re-raises the last error with its .pending_frames set.
+    """
+    frames = list_frames(frame_dir)
+    before = snapshot_dir(frame_dir)
+    try:
+        model_func(frame_dir=frame_dir, params=params, logger=logger)
+        return params
+    except RETRYABLE_ERRORS as e:
+        error = e
+    pending = pending_frames(frame_dir, frames, before)
+    history = []
+    for attempt in range(2, retry["max_attempts"] + 1):
+        if not pending:
+            break
+        step = backoff_params(params, supported_params, classify_failure(error), retry, history)
+        if step is None:
+            break
+        params, change = step
+        logger.warning(
+            f"[retry] {label} failed ({error}); retrying {len(pending)} of {len(frames)} frames "
+            f"with {change} (attempt {attempt}/{retry['max_attempts']})."
+        )
+        pending, new_error = run_on_frames(model_func, frame_dir, pending, params, logger)
+        if new_error is None:
+            return params
+        error = new_error
+    error.pending_frames = pending
+    raise error
+
+
+def run_with_retries(attempt, params, supported_params, retry, logger, label):
+    """
+    Call attempt(params) until it succeeds, backing params off after each
+    retryable failure. For stages that must rerun as a whole (interpolation);
+    attempt is responsible for cleaning up partial output before raising.
+    Returns the result of the successful attempt.
+    """
+    history = []
+    for n in range(1, retry["max_attempts"] + 1):
+        try:
+            return attempt(params)
+        except RETRYABLE_ERRORS as error:
+            step = None
+            if n < retry["max_attempts"]:
+                step = backoff_params(params, supported_params, classify_failure(error), retry, history)
+            if step is None:
+                raise
+            params, change = step
+            logger.warning(f"[retry] {label} failed ({error}); retrying with {change} "
+                           f"(attempt {n + 1}/{retry['max_attempts']}).")
@@ -1,23 +1,152 @@
-from handlers.models.waifu2x_ncnn_vulkan import run_waifu2x_ncnn_vulkan, supported_waifu2x_ncnn_vulkan_params
-from handlers.models.realesrgan_ncnn_vulkan import run_realesrgan_ncnn_vulkan, supported_realesrgan_ncnn_vulkan_params
-from handlers.models.realcugan_ncnn_vulkan import run_realcugan_ncnn_vulkan, supported_realcugan_ncnn_vulkan_params
-from handlers.models.realsr_ncnn_vulkan import run_realsr_ncnn_vulkan, supported_realsr_ncnn_vulkan_params
-from handlers.models.srmd_ncnn_vulkan import run_srmd_ncnn_vulkan, supported_srmd_ncnn_vulkan_params
+from core.executor import run_chunks
+from core.model_batcher import batch_stage, batched
+from handlers.registry import ModelRegistry, lazy, validate_params
+from handlers.retry_policy import (
+    RETRYABLE_ERRORS, retry_settings, run_with_frame_retries, run_on_frames, pending_frames,
+)
+from media.frame_format import list_frames
+from media.frame_verify import probe_frames, verify_upscaled
+from utils.file_utils import snapshot_dir, changed_files
+from utils.perf_profile import apply_profile_defaults
+from utils import metrics
+from functools import partial
+from itertools import chain
+import os
 import subprocess
+import time
 
 # Central registry: key = model name, value = (runner function, supported_params)
-MODEL_REGISTRY = {
-    "waifu2x-ncnn-vulkan": (run_waifu2x_ncnn_vulkan, supported_waifu2x_ncnn_vulkan_params),
-    "realesrgan-ncnn-vulkan": (run_realesrgan_ncnn_vulkan, supported_realesrgan_ncnn_vulkan_params),
-    "realcugan-ncnn-vulkan": (run_realcugan_ncnn_vulkan, supported_realcugan_ncnn_vulkan_params),
-    "realsr-ncnn-vulkan": (run_realsr_ncnn_vulkan, supported_realsr_ncnn_vulkan_params),
-    "srmd-ncnn-vulkan": (run_srmd_ncnn_vulkan, supported_srmd_ncnn_vulkan_params),
+# Model modules are imported on first lookup.
+MODEL_REGISTRY = ModelRegistry({
+    "waifu2x-ncnn-vulkan": lazy("handlers.models.waifu2x_ncnn_vulkan",
+                                "run_waifu2x_ncnn_vulkan", "supported_waifu2x_ncnn_vulkan_params"),
+    "realesrgan-ncnn-vulkan": lazy("handlers.models.realesrgan_ncnn_vulkan",
+                                   "run_realesrgan_ncnn_vulkan", "supported_realesrgan_ncnn_vulkan_params"),
+    "realcugan-ncnn-vulkan": lazy("handlers.models.realcugan_ncnn_vulkan",
+                                  "run_realcugan_ncnn_vulkan", "supported_realcugan_ncnn_vulkan_params"),
+    "realsr-ncnn-vulkan": lazy("handlers.models.realsr_ncnn_vulkan",
+                               "run_realsr_ncnn_vulkan", "supported_realsr_ncnn_vulkan_params"),
+    "srmd-ncnn-vulkan": lazy("handlers.models.srmd_ncnn_vulkan",
+                             "run_srmd_ncnn_vulkan", "supported_srmd_ncnn_vulkan_params"),
+    "onnxruntime-cpu": lazy("handlers.models.onnxruntime_cpu",
+                            "run_onnxruntime_upscaler", "supported_onnxruntime_upscaler_params"),
+    "ffmpeg-scale": lazy("handlers.models.ffmpeg_filters",
+                         "run_ffmpeg_scale", "supported_ffmpeg_scale_params"),
+})
+
+# Models that read a whole directory per run and pay a model load / GPU init each
+# time, so concurrent jobs can share one run (core.model_batcher).
+BATCHABLE_MODELS = {
+    "waifu2x-ncnn-vulkan", "realesrgan-ncnn-vulkan", "realcugan-ncnn-vulkan",
+    "realsr-ncnn-vulkan", "srmd-ncnn-vulkan", "onnxruntime-cpu",
 }
 
+# Models that can be fused into the decode/encode ffmpeg process.
+# key = model name, value = filter builder (params, fps) -> ffmpeg filter string
+FILTER_REGISTRY = ModelRegistry({
+    "ffmpeg-scale": lazy("handlers.models.ffmpeg_filters", "build_ffmpeg_scale_filter"),
+})
+
+
+def build_upscaling_filter(upscaling_params, fps, logger):
+    """
+    Returns the ffmpeg filter string for a fusable upscaling model, or None
+    if the model must run as a separate stage.
+    """
+    model_name = upscaling_params.get("model_name")
+    if model_name not in FILTER_REGISTRY:
+        return None
+    params = upscaling_params.get("params", {})
+    _, supported_params = MODEL_REGISTRY[model_name]
+    msg = validate_params(model_name, params, supported_params, logger)
+    if msg:
+        raise ValueError(msg)
+    return FILTER_REGISTRY[model_name](params, fps)
+
+
+def _fallback_model(upscaling_params, model_name, params):
+    """(name, runner, params) of the block's usable fallback_model, or None."""
+    fallback = upscaling_params.get("fallback_model")
+    if not fallback or fallback == model_name or fallback not in MODEL_REGISTRY:
+        return None
+    fallback_func, fallback_supported = MODEL_REGISTRY[fallback]
+    return fallback, fallback_func, {k: v for k, v in params.items() if k in fallback_supported}
+
+
+def _verify_outputs(frame_dir, frames, source_sizes, before, model_func, params, logger, label):
+    """
+    Check every frame's output (present, complete, upscaled size read from the
+    image header) and rerun the model once on the frames that failed the check
+    while their source file is still untouched (e.g. skipped by the model).
+    Returns {"expected", "verified", "reprocessed", "failed"} frame counts.
+    """
+    scale = params.get("scale")
+    output_format = params.get("output_format", "png")
+
+    def check():
+        # Header reads are spread over the shared worker pool for long sequences
+        verify = partial(verify_upscaled, frame_dir, scale=scale, output_format=output_format)
+        bad = set(chain.from_iterable(run_chunks(verify, list(source_sizes.items()))))
+        bad.update(pending_frames(frame_dir, frames, before))
+        return sorted(bad)
+
+    bad = check()
+    reprocess = []
+    if bad:
+        rewritten = set(changed_files(frame_dir, before))
+        reprocess = [name for name in bad if name in before and name not in rewritten]
+        logger.warning(f"[verify] {label}: {len(bad)} of {len(frames)} frames have no valid output; "
+                       f"reprocessing {len(reprocess)}.")
+        if reprocess:
+            run_on_frames(model_func, frame_dir, reprocess, params, logger)
+            bad = check()
+        if bad:
+            logger.error(f"[verify] {label}: {len(bad)} frames still invalid: {', '.join(bad[:10])}")
+    _drop_replaced_sources(frame_dir, frames, bad, output_format)
+    return {
+        "expected": len(frames),
+        "verified": len(frames) - len(bad),
+        "reprocessed": len(reprocess),
+        "failed": len(bad),
+    }
+
+
+def _drop_replaced_sources(frame_dir, frames, bad, output_format):
+    """
+    Remove source frames that an output in another format (e.g. frame_000001.png
+    written for frame_000001.bmp) replaces, so later stages see one file per frame.
+    """
+    for name in frames:
+        stem, ext = os.path.splitext(name)
+        output = stem + "." + output_format.lstrip(".")
+        source = os.path.join(frame_dir, name)
+        if name not in bad and output != name and os.path.isfile(os.path.join(frame_dir, output)) \
+                and os.path.isfile(source):
+            os.remove(source)
+
+
+def _verified_result(counts, message):
+    if counts["failed"]:
+        return {"success": False, "frames": counts,
+                "message": f"Upscaling left {counts['failed']} of {counts['expected']} frames without valid output."}
+    return {"success": True, "message": message, "frames": counts}
+
+
 def run_upscaling(frame_dir, upscaling_params, logger):
     """
     Runs the requested upscaling model on frames in frame_dir.
-    Returns dict: {"success": bool, "message": str}
+    Tunable parameters the job omits (tile_size, threads, gpu_id) come from
+    the host performance profile written by autotune.py, if there is one.
+    If the model command fails, only the frames without output are retried,
+    with a smaller tile_size / fewer threads for memory-style failures (see
+    handlers.retry_policy; the block's "retry" settings apply).
+    If the model executable is missing, or retries are exhausted, and
+    "fallback_model" is set, the fallback model runs instead (e.g. "ffmpeg-scale").
+
+    A model that exits 0 may still skip frames, so the outputs are then
+    verified from their image headers; bad frames are reprocessed once and the
+    counts are reported as "frames".
+    Returns dict: {"success": bool, "message": str, "frames": dict}
     """
     model_name = upscaling_params.get("model_name")
     params = upscaling_params.get("params", {})
@@ -29,19 +158,70 @@ def run_upscaling(frame_dir, upscaling_params, logger):
 
     model_func, supported_params = MODEL_REGISTRY[model_name]
     # Parameter validation
-    for k in params:
-        if k not in supported_params:
-            msg = f"Parameter '{k}' is not supported by model '{model_name}'"
-            logger.error(msg)
-            return {"success": False, "message": msg}
-
-    try:
-        logger.info(f"Running upscaling model: {model_name}")
-        model_func(frame_dir=frame_dir, params=params, logger=logger)
-        return {"success": True, "message": "Upscaling completed."}
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Upscaling model '{model_name}' failed: {e}")
-        return {"success": False, "message": e.stderr}
-    except Exception as e:
-        logger.error(f"Upscaling model '{model_name}' failed: {e}")
-        return {"success": False, "message": str(e)}
+    msg = validate_params(model_name, params, supported_params, logger)
+    if msg:
+        return {"success": False, "message": msg}
+    tuned_params = apply_profile_defaults("upscaling", model_name, params, supported_params, logger)
+    if model_name in BATCHABLE_MODELS:
+        # Shares model runs with other jobs when the operator enabled batching
+        model_func = batched(model_name, model_func)
+
+    # Batches of other jobs with the same model and params wait for this job until it runs them
+    with batch_stage(model_name if model_name in BATCHABLE_MODELS else None, tuned_params):
+        frames = list_frames(frame_dir)
+        source_sizes = {}
+        for sizes in run_chunks(partial(probe_frames, frame_dir), frames):
+            source_sizes.update(sizes)
+        before = snapshot_dir(frame_dir)
+        try:
+            logger.info(f"Running upscaling model: {model_name}")
+            start = time.perf_counter()
+            final_params = run_with_frame_retries(
+                model_func, frame_dir, tuned_params, supported_params,
+                retry_settings(upscaling_params), logger, model_name,
+            )
+            counts = _verify_outputs(frame_dir, frames, source_sizes, before, model_func, final_params, logger, model_name)
+            duration = time.perf_counter() - start
+            logger.info(f"Upscaling with {model_name} took {duration:.2f}s",
+                        extra={"stage": "upscaling", "duration": round(duration, 3)})
+            metrics.record_model_run("upscaling", model_name, counts["verified"], duration)
+            return _verified_result(counts, "Upscaling completed.")
+        except FileNotFoundError as e:
+            fallback = _fallback_model(upscaling_params, model_name, params)
+            if not fallback:
+                logger.error(f"Upscaling model '{model_name}' failed: {e}")
+                return {"success": False, "message": str(e)}
+            fallback_name, fallback_func, fallback_params = fallback
+            logger.warning(f"Upscaling model '{model_name}' unavailable ({e}); falling back to '{fallback_name}'.")
+            try:
+                fallback_func(frame_dir=frame_dir, params=fallback_params, logger=logger)
+                counts = _verify_outputs(frame_dir, frames, source_sizes, before, fallback_func, fallback_params,
+                                         logger, fallback_name)
+                metrics.record_model_run("upscaling", fallback_name, counts["verified"])
+                return _verified_result(counts, f"Upscaling completed with fallback model '{fallback_name}'.")
+            except Exception as e2:
+                logger.error(f"Fallback upscaling model '{fallback_name}' failed: {e2}")
+                return {"success": False, "message": str(e2)}
+        except RETRYABLE_ERRORS as e:
+            fallback = _fallback_model(upscaling_params, model_name, params)
+            pending = getattr(e, "pending_frames", None)
+            if fallback and pending:
+                fallback_name, fallback_func, fallback_params = fallback
+                logger.warning(f"Upscaling model '{model_name}' failed on {len(pending)} frames after retries; "
+                               f"running them with fallback model '{fallback_name}'.")
+                _, e2 = run_on_frames(fallback_func, frame_dir, pending, fallback_params, logger)
+                if e2 is None:
+                    counts = _verify_outputs(frame_dir, frames, source_sizes, before, fallback_func, fallback_params,
+                                             logger, fallback_name)
+                    metrics.record_model_run("upscaling", fallback_name, len(pending))
+                    metrics.record_model_run("upscaling", model_name, max(0, counts["verified"] - len(pending)))
+                    return _verified_result(counts, f"Upscaling completed; {len(pending)} frames "
+                                                    f"used fallback model '{fallback_name}'.")
+                logger.error(f"Fallback upscaling model '{fallback_name}' failed: {e2}")
+            logger.error(f"Upscaling model '{model_name}' failed: {e}")
+            if isinstance(e, subprocess.CalledProcessError):
+                return {"success": False, "message": e.stderr}
+            return {"success": False, "message": str(e)}
+        except Exception as e:
+            logger.error(f"Upscaling model '{model_name}' failed: {e}")
+            return {"success": False, "message": str(e)}
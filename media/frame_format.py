@@ -0,0 +1,96 @@
+"""
+Image format of the intermediate frames written between stages.
+
+The job's "pipeline" block selects it once and the decoder, the model
+runners ("output_format" / -f) and the encoder input pattern all follow:
+
+    "intermediate_format": "png"    lossless (default); "intermediate_compression"
+                                    0-9 trades file size for CPU time
+    "intermediate_format": "webp"   lossless WebP; compression 0-6
+    "intermediate_format": "jpg"    lossy, "intermediate_quality" 1-100 (proxy jobs)
+    "intermediate_format": "bmp"    uncompressed; fastest on fast local disks
+    "intermediate_format": "ppm"    uncompressed
+"""
+import os
+
+INTERMEDIATE_FORMATS = ("png", "webp", "jpg", "bmp", "ppm")
+DEFAULT_FORMAT = "png"
+DEFAULT_JPEG_QUALITY = 95
+# The ncnn-vulkan executables read every intermediate format but write only these
+NCNN_OUTPUT_FORMATS = ("png", "jpg", "webp")
+# Frame file extensions the stages read (every intermediate format, jpeg spelled out too)
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".ppm")
+
+
+def list_frames(frame_dir):
+    """Sorted names of the frame images in frame_dir ([] if it does not exist)."""
+    if not os.path.isdir(frame_dir):
+        return []
+    return sorted(f for f in os.listdir(frame_dir) if f.lower().endswith(IMAGE_EXTS))
+
+
+def intermediate_settings(pipeline):
+    """
+    Normalized intermediate-format settings of a pipeline block.
+    Returns dict: format, compression (int or None), quality (int or None).
+    Raises ValueError for an unknown format.
+    """
+    fmt = str(pipeline.get("intermediate_format") or DEFAULT_FORMAT).lower().lstrip(".")
+    if fmt == "jpeg":
+        fmt = "jpg"
+    if fmt not in INTERMEDIATE_FORMATS:
+        raise ValueError(
+            f"Unknown intermediate_format '{fmt}' (expected one of: {', '.join(INTERMEDIATE_FORMATS)})"
+        )
+    compression = pipeline.get("intermediate_compression")
+    quality = pipeline.get("intermediate_quality")
+    return {
+        "format": fmt,
+        "compression": int(compression) if compression is not None else None,
+        "quality": int(quality) if quality is not None else None,
+    }
+
+
+def ffmpeg_image_args(settings):
+    """ffmpeg output arguments writing frames in the intermediate format."""
+    fmt, compression = settings["format"], settings["compression"]
+    if fmt == "png":
+        return ["-compression_level", str(min(9, max(0, compression)))] if compression is not None else []
+    if fmt == "webp":
+        args = ["-c:v", "libwebp", "-lossless", "1"]
+        if compression is not None:
+            args += ["-compression_level", str(min(6, max(0, compression)))]
+        return args
+    if fmt == "jpg":
+        quality = min(100, max(1, settings["quality"] or DEFAULT_JPEG_QUALITY))
+        # ffmpeg's mjpeg qscale runs from 2 (best) to 31 (worst)
+        return ["-q:v", str(2 + round((100 - quality) * 29 / 99))]
+    return []
+
+
+def model_output_format(model_name, fmt):
+    """Format a model should write: the intermediate format, or png if the model cannot write it."""
+    if model_name and model_name.endswith("-ncnn-vulkan") and fmt not in NCNN_OUTPUT_FORMATS:
+        return "png"
+    return fmt
+
+
+def with_intermediate_format(block, supported_params, settings):
+    """
+    Copy of a model block whose params write the intermediate format.
+    An "output_format" the job sets explicitly is kept.
+    """
+    if "output_format" not in supported_params:
+        return block
+    params = dict(block.get("params", {}))
+    params.setdefault("output_format", model_output_format(block.get("model_name"), settings["format"]))
+    return dict(block, params=params)
+
+
+def frame_extension(frame_dir, default=DEFAULT_FORMAT):
+    """Extension (without dot) of the frame_%06d files in frame_dir, or default if there are none."""
+    if os.path.isdir(frame_dir):
+        for name in sorted(os.listdir(frame_dir)):
+            if name.startswith("frame_"):
+                return os.path.splitext(name)[1].lstrip(".")
+    return default
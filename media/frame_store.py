@@ -0,0 +1,164 @@
+"""
+Memory-mapped store for a sequence of raw frames in one preallocated file.
+
+Large intermediate sequences kept on one machine can live in a single file
+instead of one image file per frame, which avoids filesystem metadata work on
+huge directories and gives O(1) access to any frame (resume, sharding):
+
+    +-------------------------------------------------------------+
+    | header: magic, version, width, height, pix_fmt, capacity,   |
+    |         stride; then one "written" flag byte per frame      |
+    | (padded to PAGE_SIZE)                                       |
+    +-------------------------------------------------------------+
+    | frame 0 | frame 1 | ...       each `stride` bytes (page-aligned)
+    +-------------------------------------------------------------+
+
+The file is created at its full size (sparse where the filesystem supports
+it, so unwritten frames take no disk space). Frames are raw pixels, no
+compression; see PIX_FMTS for the layouts.
+"""
+import mmap
+import struct
+
+MAGIC = b"F2XFRAME"
+VERSION = 1
+PAGE_SIZE = 4096
+# magic, version, width, height, pix_fmt (16 bytes, NUL padded), capacity, stride
+_HEADER = struct.Struct("<8sIII16sQQ")
+# Bytes per pixel of the supported raw layouts (ffmpeg pix_fmt names)
+PIX_FMTS = {"gray": 1, "rgb24": 3, "bgr24": 3, "rgba": 4, "bgra": 4, "rgb48le": 6}
+
+
+def _align(n, page=PAGE_SIZE):
+    return (n + page - 1) // page * page
+
+
+class FrameStore:
+    """
+    Fixed-stride frame sequence in a memory-mapped file.
+    Use FrameStore.create() for a new store and FrameStore.open() for an existing one.
+    """
+
+    def __init__(self, path, writable):
+        self.path = path
+        self._file = open(path, "r+b" if writable else "rb")
+        try:
+            header = self._file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError(f"{path} is not a frame store (file too short)")
+            magic, version, width, height, pix_fmt, capacity, stride = _HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a frame store (version {VERSION})")
+            self.width, self.height, self.capacity, self.stride = width, height, capacity, stride
+            self.pix_fmt = pix_fmt.rstrip(b"\0").decode("ascii")
+            self.frame_size = width * height * PIX_FMTS[self.pix_fmt]
+            self._flags_offset = _HEADER.size
+            self._data_offset = _align(_HEADER.size + capacity)
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+            self._view = memoryview(self._map)
+        except Exception:
+            self._file.close()
+            raise
+        self.writable = writable
+
+    @classmethod
+    def create(cls, path, width, height, capacity, pix_fmt="rgb24"):
+        """Create (or overwrite) a store for capacity frames of width x height."""
+        if pix_fmt not in PIX_FMTS:
+            raise ValueError(f"Unsupported pixel format '{pix_fmt}' (expected one of: {', '.join(PIX_FMTS)})")
+        stride = _align(width * height * PIX_FMTS[pix_fmt])
+        data_offset = _align(_HEADER.size + capacity)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, width, height, pix_fmt.encode("ascii"), capacity, stride))
+            # Extending by truncate leaves a hole; blocks are allocated as frames are written
+            f.truncate(data_offset + capacity * stride)
+        return cls(path, writable=True)
+
+    @classmethod
+    def open(cls, path, writable=False):
+        return cls(path, writable)
+
+    def __len__(self):
+        return self.capacity
+
+    def _check(self, index):
+        if not 0 <= index < self.capacity:
+            raise IndexError(f"Frame {index} outside store of {self.capacity} frames")
+
+    def frame(self, index):
+        """Zero-copy memoryview of frame index (frame_size bytes, writable if the store is)."""
+        self._check(index)
+        start = self._data_offset + index * self.stride
+        return self._view[start:start + self.frame_size]
+
+    def write(self, index, data):
+        """Copy one frame's raw pixels into slot index and mark it written."""
+        if len(data) != self.frame_size:
+            raise ValueError(f"Frame has {len(data)} bytes, expected {self.frame_size}")
+        view = self.frame(index)
+        try:
+            view[:] = data
+        finally:
+            view.release()
+        self.mark_written(index)
+
+    def read(self, index):
+        """Copy of frame index as bytes."""
+        view = self.frame(index)
+        try:
+            return bytes(view)
+        finally:
+            view.release()
+
+    def as_array(self, index):
+        """NumPy (height, width, channels) view of frame index (requires numpy)."""
+        import numpy as np
+        dtype = np.uint16 if self.pix_fmt == "rgb48le" else np.uint8
+        channels = PIX_FMTS[self.pix_fmt] // dtype().itemsize
+        return np.frombuffer(self.frame(index), dtype=dtype).reshape(self.height, self.width, channels)
+
+    def mark_written(self, index):
+        """Flag frame index as complete (after filling frame(index) in place)."""
+        self._check(index)
+        self._view[self._flags_offset + index] = 1
+
+    def is_written(self, index):
+        self._check(index)
+        return self._view[self._flags_offset + index] == 1
+
+    def written_count(self):
+        return bytes(self._view[self._flags_offset:self._flags_offset + self.capacity]).count(1)
+
+    def missing(self, start=0, end=None):
+        """Indices in [start, end) not written yet, e.g. to resume an interrupted stage."""
+        end = self.capacity if end is None else min(end, self.capacity)
+        flags = bytes(self._view[self._flags_offset + start:self._flags_offset + end])
+        return [start + i for i, flag in enumerate(flags) if flag != 1]
+
+    def shard(self, k, n):
+        """range of frame indices for shard k of n (contiguous, sizes differ by at most one)."""
+        size, extra = divmod(self.capacity, n)
+        start = k * size + min(k, extra)
+        return range(start, start + size + (1 if k < extra else 0))
+
+    def flush(self):
+        if self.writable:
+            self._map.flush()
+
+    def close(self):
+        """Flush and unmap. Views from frame() must be released first."""
+        if self._map is None:
+            return
+        self.flush()
+        self._view.release()
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
@@ -0,0 +1,166 @@
+"""
+Fast checks of frame files without decoding them.
+
+Image dimensions come from the file header (PNG IHDR, JPEG SOF, WebP VP8/VP8L/VP8X,
+BMP info header, PPM) and completeness from the file trailer (PNG IEND, JPEG EOI),
+so checking thousands of frames costs two small reads per file.
+"""
+import os
+import struct
+
+from media.frame_format import IMAGE_EXTS, list_frames
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_TRAILER = b"IEND\xaeB`\x82"
+# Pixels an upscaled frame may differ from round(source * scale) (odd sizes, model padding)
+SIZE_TOLERANCE = 2
+# JPEG start-of-frame markers (C4, C8 and CC are other segment types)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _webp_size(header):
+    chunk = header[12:16]
+    if chunk == b"VP8 " and len(header) >= 30:
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(header) >= 25:
+        bits = struct.unpack("<I", header[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(header) >= 30:
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _pnm_size(header):
+    # "P6 <width> <height> <maxval>" separated by whitespace; comments are not supported
+    fields = header[2:].split()
+    if len(fields) < 2 or not (fields[0].isdigit() and fields[1].isdigit()):
+        return None
+    return int(fields[0]), int(fields[1])
+
+
+def read_image_size(path):
+    """(width, height) read from the image header, or None if unreadable/unknown."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(32)
+            if header.startswith(PNG_SIGNATURE) and header[12:16] == b"IHDR":
+                return struct.unpack(">II", header[16:24])
+            if header[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+            if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+                return _webp_size(header)
+            if header[:2] in (b"P6", b"P5"):
+                return _pnm_size(header)
+            if header[:2] == b"BM" and len(header) >= 26:
+                width, height = struct.unpack("<ii", header[18:26])
+                return width, abs(height)
+    except OSError:
+        return None
+    return None
+
+
+def is_complete(path):
+    """False if a PNG/JPEG file is missing its end marker (truncated write)."""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if ext == ".png":
+                f.seek(max(0, size - 8))
+                return f.read(8) == PNG_TRAILER
+            if ext in (".jpg", ".jpeg"):
+                # Some encoders pad after EOI; look at the last few bytes
+                f.seek(max(0, size - 16))
+                return b"\xff\xd9" in f.read(16)
+    except OSError:
+        return False
+    return True
+
+
+def probe_frames(frame_dir, names=None):
+    """{name: (width, height) or None} for the image files in frame_dir (or the given names)."""
+    if names is None:
+        names = list_frames(frame_dir)
+    return {name: read_image_size(os.path.join(frame_dir, name)) for name in names}
+
+
+def verify_upscaled(frame_dir, source_sizes, scale=None, output_format=None):
+    """
+    Check that every source frame has a complete output of the upscaled size.
+
+    Args:
+        frame_dir (str): Directory holding the outputs (in-place upscaling).
+        source_sizes (dict): {source name: (width, height) or None} recorded before
+            the run (or a list of such pairs, e.g. one chunk of them).
+        scale (float): Expected scale. None checks only that outputs are larger;
+            1 skips the size check. Sources whose header could not be read are
+            only checked for an output file.
+        output_format (str): Extension of the outputs (default: same as source).
+
+    Returns:
+        list: Source names without a good output.
+    """
+    bad = []
+    for name, size in dict(source_sizes).items():
+        stem, ext = os.path.splitext(name)
+        out_path = os.path.join(frame_dir, stem + ("." + output_format.lstrip(".") if output_format else ext))
+        if not os.path.isfile(out_path):
+            bad.append(name)
+            continue
+        if size is None:
+            continue
+        out_size = read_image_size(out_path)
+        if out_size is None or not is_complete(out_path):
+            bad.append(name)
+        elif scale is None:
+            if not (out_size[0] > size[0] and out_size[1] > size[1]):
+                bad.append(name)
+        elif float(scale) != 1:
+            want = (round(size[0] * float(scale)), round(size[1] * float(scale)))
+            if abs(out_size[0] - want[0]) > SIZE_TOLERANCE or abs(out_size[1] - want[1]) > SIZE_TOLERANCE:
+                bad.append(name)
+    return bad
+
+
+def invalid_frames(frame_dir, names, size):
+    """
+    Names of frames that are unreadable, truncated or not of the given size.
+    With size None (the source header could not be read) nothing is checked.
+    """
+    if size is None:
+        return []
+    sizes = probe_frames(frame_dir, [n for n in names if n.lower().endswith(IMAGE_EXTS)])
+    return [
+        name for name, s in sizes.items()
+        if s is None or tuple(s) != tuple(size) or not is_complete(os.path.join(frame_dir, name))
+    ]
@@ -0,0 +1,129 @@
+"""
+Several outputs (renditions) of one processed frame set.
+
+A video job may list its outputs instead of relying on "output_format" alone:
+
+    "renditions": [
+        {"name": "master", "codec": "hevc", "bitrate": "40M", "container": "mkv"},
+        {"name": "hd", "resolution": "1080p", "bitrate": "8M"},
+        {"name": "proxy", "resolution": "854x480", "bitrate": "1M"}
+    ]
+
+    name        suffix of the output file name (default: the resolution, or
+                "r<index>")
+    resolution  "WxH", or a height such as "1080p" (the width follows the
+                aspect ratio); omitted: the processed frame size
+    codec       h264 (default; vp9 for webm), hevc, vp9, av1 or an ffmpeg
+                encoder name; not used for gif. The named codecs must fit the
+                container (see CONTAINER_CODECS); other encoder names are
+                passed to ffmpeg as they are
+    bitrate     target video bitrate, e.g. "8M" or "800k"; omitted: the
+                encoder's default quality
+    container   mp4, mkv, mov, avi, webm or gif (default: output_format)
+
+The models run once and the encoder reads the processed frames once: one
+ffmpeg process splits them into every rendition
+(media.video_encoder.encode_renditions).
+"""
+import re
+
+CONTAINERS = ("mp4", "mkv", "mov", "avi", "webm", "gif")
+CODECS = {
+    "h264": "libx264", "x264": "libx264", "avc": "libx264",
+    "hevc": "libx265", "h265": "libx265", "x265": "libx265",
+    "vp9": "libvpx-vp9", "av1": "libsvtav1",
+}
+DEFAULT_CODEC = "libx264"
+# Container -> the encoders of CODECS it can hold, its default first (gif has its own codec)
+CONTAINER_CODECS = {
+    "mp4": ("libx264", "libx265", "libvpx-vp9", "libsvtav1"),
+    "mkv": ("libx264", "libx265", "libvpx-vp9", "libsvtav1"),
+    "mov": ("libx264", "libx265"),
+    "avi": ("libx264",),
+    "webm": ("libvpx-vp9", "libsvtav1"),
+}
+_SIZE = re.compile(r"^(\d+)x(\d+)$")
+_HEIGHT = re.compile(r"^(\d+)p?$")
+_BITRATE = re.compile(r"^(\d+(?:\.\d+)?)([kmg]?)$", re.IGNORECASE)
+_BITRATE_UNITS = {"": 1, "k": 1e3, "m": 1e6, "g": 1e9}
+
+
+def container_codec(container):
+    """Default encoder for a container (libx264, libvpx-vp9 for webm)."""
+    return CONTAINER_CODECS.get(container, (DEFAULT_CODEC,))[0]
+
+
+def _scale(resolution):
+    """ffmpeg scale size ("W:H", or "-2:H" to keep the aspect ratio) of a rendition resolution."""
+    size = _SIZE.match(resolution)
+    if size:
+        return f"{size.group(1)}:{size.group(2)}"
+    height = _HEIGHT.match(resolution)
+    if height:
+        return f"-2:{height.group(1)}"
+    raise ValueError(f"Rendition resolution '{resolution}' is not WxH or a height such as 1080p")
+
+
+def bitrate_bps(bitrate):
+    """Bits per second of a bitrate such as "8M", or None if not set."""
+    if not bitrate:
+        return None
+    value, unit = _BITRATE.match(str(bitrate)).groups()
+    return float(value) * _BITRATE_UNITS[unit.lower()]
+
+
+def rendition_settings(json_request):
+    """
+    Normalized renditions of a job request ([] when it lists none).
+    Each is a dict: name, resolution (str or None), scale (ffmpeg size or
+    None), codec (ffmpeg encoder), bitrate (str or None), container.
+    Raises ValueError for a malformed list.
+    """
+    renditions = json_request.get("renditions")
+    if not renditions:
+        return []
+    if not isinstance(renditions, list) or not all(isinstance(r, dict) for r in renditions):
+        raise ValueError("'renditions' must be a list of objects")
+    default_container = str(json_request.get("output_format") or "mp4").lower().lstrip(".")
+    settings = []
+    for index, rendition in enumerate(renditions):
+        container = str(rendition.get("container") or default_container).lower().lstrip(".")
+        if container not in CONTAINERS:
+            raise ValueError(f"Unknown rendition container '{container}' (expected one of: {', '.join(CONTAINERS)})")
+        resolution = str(rendition["resolution"]).lower() if rendition.get("resolution") else None
+        bitrate = str(rendition["bitrate"]) if rendition.get("bitrate") else None
+        if bitrate and not _BITRATE.match(bitrate):
+            raise ValueError(f"Rendition bitrate '{bitrate}' is not a number with an optional k, M or G")
+        codec = str(rendition.get("codec") or "").lower()
+        codec = CODECS.get(codec, codec) or container_codec(container)
+        if container in CONTAINER_CODECS and codec in CODECS.values() and codec not in CONTAINER_CODECS[container]:
+            raise ValueError(f"Rendition codec '{codec}' cannot be stored in {container} "
+                             f"(use one of: {', '.join(CONTAINER_CODECS[container])})")
+        name = str(rendition.get("name") or resolution or f"r{index}")
+        if not re.match(r"^[\w.-]+$", name):
+            raise ValueError(f"Rendition name '{name}' may only use letters, digits, '.', '_' and '-'")
+        settings.append({
+            "name": name,
+            "resolution": resolution,
+            "scale": _scale(resolution) if resolution else None,
+            "codec": codec,
+            "bitrate": bitrate,
+            "container": container,
+        })
+    names = [r["name"] for r in settings]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Rendition names must be unique: {', '.join(duplicates)}")
+    return settings
+
+
+def rendition_size(rendition, width, height):
+    """(width, height) of a rendition of width x height frames."""
+    scale = rendition["scale"]
+    if not scale:
+        return width, height
+    w, h = (int(x) for x in scale.split(":"))
+    if w < 0:
+        # ffmpeg's -2: the aspect-ratio width rounded to an even number
+        w = round(width * h / height / 2) * 2
+    return w, h
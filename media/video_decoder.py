@@ -1,8 +1,60 @@
 import os
 import subprocess
-from utils.process_utils import require_binaries
+from utils.process_utils import require_binaries, run_process, supervised
 
-def extract_frames(video_path, output_dir, output_format="png", logger=None):
+# ffprobe reads only the container header; a hang means a broken input or mount
+PROBE_TIMEOUT = 60
+
+
+def probe_video(video_path, logger=None):
+    """
+    Reads width, height, frame rate and length of the first video stream with ffprobe.
+    Returns dict: resolution ("WxH" or "unknown"), fps (float),
+    fps_fraction (exact rate as "num/den"), duration (seconds or None),
+    frame_count (from the stream header or duration * fps; None if unknown).
+    """
+    try:
+        import json as js
+        probe_cmd = [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,r_frame_rate,nb_frames,duration:format=duration",
+            "-of", "json", video_path
+        ]
+        result = run_process(probe_cmd, timeout=PROBE_TIMEOUT, capture_output=True, check=True)
+        probe = js.loads(result.stdout)
+        stream = probe['streams'][0]
+        width = stream['width']
+        height = stream['height']
+        res = f"{width}x{height}"
+        # FPS calculation
+        fps_str = stream['r_frame_rate']
+        num, denom = [int(x) for x in fps_str.split('/')]
+        fps = num / denom if denom != 0 else 30
+        if denom == 0:
+            fps_str = "30/1"
+        # Some containers (mkv, webm) only have the duration in the format section
+        duration = _float_or_none(stream.get('duration')) or _float_or_none(probe.get('format', {}).get('duration'))
+        nb_frames = stream.get('nb_frames')
+        frame_count = int(nb_frames) if str(nb_frames).isdigit() else (round(duration * fps) if duration else None)
+    except Exception as e:
+        res = "unknown"
+        fps = 30
+        fps_str = "30/1"
+        duration = frame_count = None
+        if logger:
+            logger.warning(f"[VideoDecoder] ffprobe failed: {e}")
+    return {"resolution": res, "fps": fps, "fps_fraction": fps_str, "duration": duration, "frame_count": frame_count}
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_frames(video_path, output_dir, output_format="png", filters=None, output_args=None, probe=None,
+                   logger=None):
     """
     Extracts frames from a video file into output_dir using ffmpeg.
     Returns metadata dict: frame_count, resolution, fps (if available).
@@ -11,52 +63,128 @@ def extract_frames(video_path, output_dir, output_format="png", logger=None):
         video_path (str): Path to the input video or gif.
         output_dir (str): Directory to save the extracted frames.
         output_format (str): Output image format (default: png).
+        filters (list): Optional ffmpeg video filters applied while decoding.
+        output_args (list): Optional ffmpeg encoder arguments for the frames
+            (e.g. ["-compression_level", "1"], see media.frame_format).
+        probe (dict): probe_video() result for video_path if the caller has
+            one already (it is not probed again).
         logger: Logger instance.
     
     Returns:
-        dict: Metadata with keys frame_count, resolution, fps.
+        dict: Metadata with keys frame_count, resolution, fps, fps_fraction.
+              resolution and fps describe the source video.
     """
     require_binaries(["ffmpeg", "ffprobe"])
     if not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
     # ffmpeg command
     out_pattern = os.path.join(output_dir, f"frame_%06d.{output_format}")
-    cmd = [
-        "ffmpeg", "-i", video_path, "-vsync", "0", out_pattern, "-hide_banner", "-loglevel", "error"
-    ]
+    cmd = ["ffmpeg", "-i", video_path, "-vsync", "0"]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    if output_args:
+        cmd += list(output_args)
+    cmd += [out_pattern, "-hide_banner", "-loglevel", "error"]
     if logger:
         logger.info(f"[VideoDecoder] Running: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    run_process(cmd, check=True, watch=[output_dir])
 
     # Count extracted frames and get metadata (simplified)
     frames = sorted([f for f in os.listdir(output_dir) if f.endswith(f".{output_format}")])
     frame_count = len(frames)
-    # Optional: get FPS/resolution using ffprobe
-    try:
-        import json as js
-        probe_cmd = [
-            "ffprobe", "-v", "error", "-select_streams", "v:0",
-            "-show_entries", "stream=width,height,r_frame_rate",
-            "-of", "json", video_path
-        ]
-        result = subprocess.run(probe_cmd, stdout=subprocess.PIPE, check=True)
-        probe = js.loads(result.stdout)
-        stream = probe['streams'][0]
-        width = stream['width']
-        height = stream['height']
-        res = f"{width}x{height}"
-        # FPS calculation
-        fps_str = stream['r_frame_rate']
-        num, denom = [int(x) for x in fps_str.split('/')]
-        fps = num / denom if denom != 0 else 30
-    except Exception as e:
-        res = "unknown"
-        fps = 30
-        if logger:
-            logger.warning(f"[VideoDecoder] ffprobe failed: {e}")
+    probe = probe or probe_video(video_path, logger=logger)
 
     return {
         "frame_count": frame_count,
-        "resolution": res,
-        "fps": fps
+        "resolution": probe["resolution"],
+        "fps": probe["fps"],
+        "fps_fraction": probe["fps_fraction"]
     }
+
+
+def _read_frame(stream, view):
+    """Fill view from stream; returns the bytes read (short only at end of stream)."""
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def decode_to_ring(video_path, ring, width, height, pix_fmt="rgb24", filters=None, logger=None):
+    """
+    Decode a video as raw frames straight into the slots of a
+    core.ring_buffer.FrameRing (no frame files). Blocks while the ring is
+    full, so memory stays bounded by the ring size. Closes the writer side
+    at the end. Returns the number of frames decoded.
+    """
+    require_binaries(["ffmpeg"])
+    frame_size = width * height * 3 if pix_fmt in ("rgb24", "bgr24") else None
+    if frame_size is None:
+        raise ValueError(f"Unsupported raw pixel format '{pix_fmt}'")
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", video_path, "-vsync", "0"]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    cmd += ["-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}", "pipe:1"]
+    if logger:
+        logger.info(f"[VideoDecoder] Streaming: {' '.join(cmd)}")
+    count = 0
+    with supervised(cmd, stdout=subprocess.PIPE) as proc:
+        try:
+            while True:
+                index = ring.acquire_write()
+                view = ring.slot(index)
+                try:
+                    n = _read_frame(proc.stdout, view[:frame_size])
+                finally:
+                    view.release()
+                if n < frame_size:
+                    ring.release_write(index)
+                    break
+                ring.commit_write(index, frame_size)
+                count += 1
+        finally:
+            ring.close_writer()
+            proc.stdout.close()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return count
+
+
+def decode_to_store(video_path, store, filters=None, logger=None):
+    """
+    Decode a video as raw frames into a media.frame_store.FrameStore (created
+    with the output size and pix_fmt), writing straight into the mapped file.
+    Decodes at most len(store) frames. Returns the number of frames decoded.
+    """
+    require_binaries(["ffmpeg"])
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", video_path, "-vsync", "0"]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    # ffmpeg stops at the store's capacity instead of writing into a pipe that is no longer read
+    cmd += ["-frames:v", str(len(store)), "-f", "rawvideo", "-pix_fmt", store.pix_fmt,
+            "-s", f"{store.width}x{store.height}", "pipe:1"]
+    if logger:
+        logger.info(f"[VideoDecoder] Decoding into frame store {store.path}: {' '.join(cmd)}")
+    count = 0
+    with supervised(cmd, stdout=subprocess.PIPE) as proc:
+        try:
+            while count < len(store):
+                view = store.frame(count)
+                try:
+                    n = _read_frame(proc.stdout, view)
+                finally:
+                    view.release()
+                if n < store.frame_size:
+                    break
+                store.mark_written(count)
+                count += 1
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return count
@@ -1,29 +1,308 @@
+import contextvars
+import math
 import os
+import shutil
 import subprocess
-from utils.process_utils import require_binaries
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from media.renditions import container_codec
+from utils.process_utils import require_binaries, run_process, supervised
+from utils.timing import parse_fps
 
-def encode_video(frame_dir, output_path, fps=30, resolution=None, format="mp4", logger=None):
+# Keyframe interval of segmented encodes when the job sets no gop_size, in seconds of output
+DEFAULT_GOP_SECONDS = 2
+
+
+def _codec_args(format, preset=None):
+    """Output codec arguments for the given container format (preset: x264 speed preset)."""
+    if format.lower() == "gif":
+        return []
+    codec = container_codec(format.lower().lstrip("."))
+    args = ["-c:v", codec, "-pix_fmt", "yuv420p"]
+    if preset and codec == "libx264":
+        args += ["-preset", preset]
+    return args
+
+
+def write_timestamp_list(frame_dir, timestamps, fps, list_path, frame_format="png"):
+    """
+    Writes an ffconcat list giving every frame_%06d.<frame_format> in frame_dir
+    its own duration, so the encoder reproduces the exact (variable) presentation times.
+    """
+    frames = sorted(f for f in os.listdir(frame_dir) if f.startswith("frame_") and f.endswith("." + frame_format))
+    lines = ["ffconcat version 1.0"]
+    for i, name in enumerate(frames):
+        if i + 1 < len(timestamps):
+            duration = timestamps[i + 1] - timestamps[i]
+        else:
+            duration = 1.0 / float(parse_fps(fps))
+        lines.append(f"file '{name}'")
+        lines.append(f"duration {duration:.6f}")
+    if frames:
+        # The concat demuxer ignores the last duration unless the file is repeated
+        lines.append(f"file '{frames[-1]}'")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return list_path
+
+
+def _frame_input_args(frame_dir, fps, timestamps=None, frame_format="png"):
+    """ffmpeg input arguments reading frame_%06d.<frame_format> in frame_dir (VFR with timestamps)."""
+    if timestamps:
+        list_path = write_timestamp_list(
+            frame_dir, timestamps, fps, os.path.join(frame_dir, "timestamps.ffconcat"), frame_format
+        )
+        return ["-f", "concat", "-safe", "0", "-i", list_path, "-vsync", "vfr"]
+    return ["-framerate", str(fps), "-i", os.path.join(frame_dir, f"frame_%06d.{frame_format}")]
+
+
+def encode_video(frame_dir, output_path, fps=30, resolution=None, format="mp4", filters=None, timestamps=None,
+                 preset=None, frame_format="png", segments=None, gop_size=None, logger=None):
     """
     Encodes image frames in frame_dir into a video using ffmpeg.
+    With segments > 1 the sequence is encoded by that many ffmpeg processes in
+    parallel and joined without re-encoding (see encode_segmented).
     
     Args:
         frame_dir (str): Directory containing processed frames.
         output_path (str): Path for the output video file.
-        fps (int): Target framerate.
+        fps (int|str): Target framerate, a number or exact rate such as "60000/1001".
         resolution (str): Optional, e.g., "1920x1080".
         format (str): Output video format, default mp4.
+        filters (list): Optional ffmpeg video filters applied while encoding.
+        timestamps (list): Optional presentation time (seconds) of every frame,
+            for sequences that are not evenly spaced. Encoded as VFR.
+        preset (str): Optional x264 preset (e.g. "veryfast").
+        frame_format (str): Extension of the input frames (the intermediate format).
+        segments (int): Parallel segment encoders (pipeline "encode_segments"; 0/1: one process).
+        gop_size (int): Keyframe interval in frames for segmented encodes (default: 2 seconds).
         logger: Logger instance.
     """
     require_binaries(["ffmpeg"])
-    input_pattern = os.path.join(frame_dir, "frame_%06d.png")
-    cmd = ["ffmpeg", "-framerate", str(fps), "-i", input_pattern]
+    if segments and int(segments) > 1 and format.lower() != "gif":
+        if timestamps or filters:
+            # Variable frame times and encode-side filters (frame-rate conversion) span segment boundaries
+            if logger:
+                logger.info("[VideoEncoder] Segmented encoding needs evenly spaced frames and no "
+                            "encode filters; encoding in one process.")
+        elif encode_segmented(frame_dir, output_path, fps, int(segments), gop_size, resolution, format, preset,
+                              frame_format, logger):
+            return
+    cmd = ["ffmpeg"] + _frame_input_args(frame_dir, fps, timestamps, frame_format)
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
     if resolution:
         cmd += ["-s", resolution]
-    format = format.lower()
-    if format == "gif":
-        cmd += ["-y", output_path]
-    else:
-        cmd += ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-y", output_path]
+    cmd += _codec_args(format, preset) + ["-y", output_path]
+    if logger:
+        logger.info(f"[VideoEncoder] Running: {' '.join(cmd)}")
+    run_process(cmd, check=True, watch=[output_path])
+
+
+def segment_bounds(frame_count, segments, gop_size):
+    """
+    (start, count) of each segment: about frame_count / segments frames each,
+    rounded up to whole GOPs so every segment starts on a keyframe position.
+    """
+    size = math.ceil(math.ceil(frame_count / segments) / gop_size) * gop_size
+    return [(start, min(size, frame_count - start)) for start in range(0, frame_count, size)]
+
+
+def encode_segmented(frame_dir, output_path, fps, segments, gop_size=None, resolution=None, format="mp4",
+                     preset=None, frame_format="png", logger=None):
+    """
+    Encode frame_%06d.<frame_format> in frame_dir as GOP-aligned segments in
+    parallel ffmpeg processes and join them with the concat demuxer (-c copy).
+
+    Every segment uses the same encoder settings with a closed, fixed GOP
+    (-g/-keyint_min gop_size, no scene-cut keyframes), so the keyframes sit
+    where one process with those settings would put them and the joined
+    stream plays back seamlessly. Each process gets an equal share of the
+    CPU threads.
+
+    Returns False (nothing done) when there are too few frames for two
+    segments; True once output_path is written.
+    """
+    frames = sorted(f for f in os.listdir(frame_dir) if f.startswith("frame_") and f.endswith("." + frame_format))
+    gop_size = int(gop_size or max(1, round(float(parse_fps(fps)) * DEFAULT_GOP_SECONDS)))
+    bounds = segment_bounds(len(frames), segments, gop_size)
+    if len(bounds) < 2:
+        return False
+    first_number = int(os.path.splitext(frames[0])[0].split("_")[1])
+    threads = max(1, (os.cpu_count() or 1) // len(bounds))
+    ext = os.path.splitext(output_path)[1] or "." + format
+    work_dir = tempfile.mkdtemp(prefix="_segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    if logger:
+        logger.info(f"[VideoEncoder] Encoding {len(frames)} frames as {len(bounds)} segments "
+                    f"(GOP {gop_size}, {threads} threads each).")
+
+    def encode(k):
+        start, count = bounds[k]
+        cmd = ["ffmpeg", "-framerate", str(fps), "-start_number", str(first_number + start),
+               "-i", os.path.join(frame_dir, f"frame_%06d.{frame_format}"), "-frames:v", str(count)]
+        if resolution:
+            cmd += ["-s", resolution]
+        cmd += _codec_args(format, preset)
+        cmd += ["-g", str(gop_size), "-keyint_min", str(gop_size), "-sc_threshold", "0", "-flags", "+cgop",
+                "-threads", str(threads), "-an", "-y", os.path.join(work_dir, f"segment_{k:04d}{ext}")]
+        if logger:
+            logger.debug(f"[VideoEncoder] Segment {k}: {' '.join(cmd)}")
+        run_process(cmd, check=True, watch=[work_dir])
+
+    try:
+        # Each segment runs in a copy of the caller's context so the stage's process limits apply
+        with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, encode, k) for k in range(len(bounds))]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        list_path = os.path.join(work_dir, "segments.ffconcat")
+        with open(list_path, "w", encoding="utf-8") as f:
+            f.write("ffconcat version 1.0\n")
+            f.writelines(f"file 'segment_{k:04d}{ext}'\n" for k in range(len(bounds)))
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-y", output_path]
+        if logger:
+            logger.info(f"[VideoEncoder] Joining segments: {' '.join(cmd)}")
+        run_process(cmd, check=True, watch=[output_path])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return True
+
+
+def _rendition_codec_args(rendition, preset=None):
+    """Output codec arguments of one rendition (see media.renditions)."""
+    if rendition["container"] == "gif":
+        return []
+    args = ["-c:v", rendition["codec"], "-pix_fmt", "yuv420p"]
+    if preset and rendition["codec"] in ("libx264", "libx265"):
+        args += ["-preset", preset]
+    if rendition["bitrate"]:
+        args += ["-b:v", rendition["bitrate"]]
+    return args
+
+
+def _run_renditions(input_args, outputs, filters=None, preset=None, logger=None):
+    """
+    One ffmpeg process: the input goes through filters once, then split feeds
+    each (rendition, path) in outputs with its own scale and encoder.
+    """
+    chain = ",".join(filters) + "," if filters else ""
+    graph = [f"[0:v]{chain}split={len(outputs)}" + "".join(f"[s{k}]" for k in range(len(outputs)))]
+    cmd = ["ffmpeg"] + input_args
+    maps = []
+    for k, (rendition, path) in enumerate(outputs):
+        scale = f"scale={rendition['scale']}" if rendition["scale"] else "null"
+        graph.append(f"[s{k}]{scale}[v{k}]")
+        maps += ["-map", f"[v{k}]"] + _rendition_codec_args(rendition, preset) + ["-y", path]
+    cmd += ["-filter_complex", ";".join(graph)] + maps
     if logger:
         logger.info(f"[VideoEncoder] Running: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    run_process(cmd, check=True, watch=[path for _, path in outputs])
+
+
+def encode_renditions(frame_dir, outputs, fps=30, filters=None, timestamps=None, preset=None, frame_format="png",
+                      logger=None):
+    """
+    Encodes the frames in frame_dir into several renditions in one ffmpeg
+    process, so the frames are read and decoded once.
+
+    Args:
+        frame_dir (str): Directory containing processed frames.
+        outputs (list): (rendition, output path) pairs; renditions from
+            media.renditions.rendition_settings.
+        fps, filters, timestamps, preset, frame_format, logger: as for encode_video.
+    """
+    require_binaries(["ffmpeg"])
+    _run_renditions(_frame_input_args(frame_dir, fps, timestamps, frame_format), outputs, filters, preset, logger)
+
+
+def transcode_renditions(input_path, outputs, filters, preset=None, logger=None):
+    """transcode_video for several renditions: one decode, one filter pass, one output per rendition."""
+    require_binaries(["ffmpeg"])
+    _run_renditions(["-i", input_path], outputs, filters, preset, logger)
+
+
+def transcode_video(input_path, output_path, filters, format="mp4", preset=None, logger=None):
+    """
+    Decodes, filters and encodes a video in a single ffmpeg process.
+    Used when every requested stage is an ffmpeg filter, so no frames are written to disk.
+    """
+    require_binaries(["ffmpeg"])
+    cmd = ["ffmpeg", "-i", input_path, "-an"]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    cmd += _codec_args(format, preset) + ["-y", output_path]
+    if logger:
+        logger.info(f"[VideoEncoder] Running: {' '.join(cmd)}")
+    run_process(cmd, check=True, watch=[output_path])
+
+
+def encode_from_ring(ring, output_path, width, height, fps=30, pix_fmt="rgb24", format="mp4", preset=None,
+                     logger=None):
+    """
+    Encode raw frames taken from a core.ring_buffer.FrameRing until the
+    producer closes it. Each slot goes straight from shared memory to the
+    ffmpeg pipe and is released as soon as it has been written.
+    Returns the number of frames encoded.
+    """
+    require_binaries(["ffmpeg"])
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", pix_fmt, "-s", f"{width}x{height}", "-framerate", str(fps),
+        "-i", "pipe:0",
+    ]
+    cmd += _codec_args(format, preset) + ["-y", output_path]
+    if logger:
+        logger.info(f"[VideoEncoder] Streaming: {' '.join(cmd)}")
+    count = 0
+    with supervised(cmd, stdin=subprocess.PIPE) as proc:
+        try:
+            for frame in ring.frames():
+                try:
+                    proc.stdin.write(frame)
+                finally:
+                    frame.release()
+                count += 1
+        finally:
+            proc.stdin.close()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return count
+
+
+def encode_from_store(store, output_path, fps=30, indices=None, format="mp4", preset=None, logger=None):
+    """
+    Encode frames of a media.frame_store.FrameStore (all written frames in
+    order, or the given indices) by piping them from the mapped file.
+    Returns the number of frames encoded.
+    """
+    require_binaries(["ffmpeg"])
+    if indices is None:
+        indices = [i for i in range(len(store)) if store.is_written(i)]
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", store.pix_fmt, "-s", f"{store.width}x{store.height}",
+        "-framerate", str(fps), "-i", "pipe:0",
+    ]
+    cmd += _codec_args(format, preset) + ["-y", output_path]
+    if logger:
+        logger.info(f"[VideoEncoder] Encoding from frame store {store.path}: {' '.join(cmd)}")
+    with supervised(cmd, stdin=subprocess.PIPE) as proc:
+        try:
+            for index in indices:
+                view = store.frame(index)
+                try:
+                    proc.stdin.write(view)
+                finally:
+                    view.release()
+        finally:
+            proc.stdin.close()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return len(indices)
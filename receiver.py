@@ -2,10 +2,10 @@ import argparse
 import os
 import sys
 import json
-from utils import env_setup
+from utils import env_setup, signal_utils
 from utils.logger import get_logger
 from utils.logfile_utils import make_log_filename
-from utils.json_utils import validate_json_request
+from utils.json_utils import validate_json_request, load_json_from_file
 
 """
 Fusion2X Receiver
@@ -37,10 +37,86 @@ def get_run_log_path():
     return make_log_filename()
 
 
-# Set up logger ONCE, at module level, for whole script
-log_path = get_run_log_path()
-logger = get_logger(log_path, module_name="Receiver")
-env_setup.ensure_vc_runtime(logger)
+# Job-level pipeline options exposed as flags: name -> argparse kwargs
+PIPELINE_ARGS = {
+    "stage_order": {"type": str, "choices": ["auto", "upscale_first", "interpolate_first"],
+                    "help": "Order of the model stages for task 'both' (default: auto)"},
+    "fused_stage": {"action": "store_true", "default": None,
+                    "help": "Interpolate and upscale chunk by chunk when interpolating first"},
+    "chunk_size": {"type": int, "help": "Source frames per fused-stage chunk (default: 100)"},
+    "workers": {"type": int, "help": "Fused-stage chunks interpolated ahead of the upscaler (default: 1)"},
+    "scratch_dir": {"type": str, "help": "Directory for temporary frames (default: next to the input)"},
+    "frame_store": {"action": "store_true", "default": None,
+                    "help": "Keep the frames of a video job no stage processes in one raw frame file"},
+    "encoder_preset": {"type": str,
+                       "choices": ["ultrafast", "superfast", "veryfast", "faster", "fast",
+                                   "medium", "slow", "slower", "veryslow"],
+                       "help": "x264 preset for the output encode"},
+    "encode_segments": {"type": int,
+                        "help": "Encode the output as this many GOP-aligned segments in parallel (default: 1)"},
+    "gop_size": {"type": int, "help": "Keyframe interval in frames for segmented encoding (default: 2 seconds)"},
+    "intermediate_format": {"type": str, "choices": ["png", "webp", "jpg", "bmp", "ppm"],
+                            "help": "Image format of the frames between stages (default: png)"},
+    "intermediate_compression": {"type": int,
+                                 "help": "png (0-9) / webp (0-6) compression level of intermediate frames"},
+    "intermediate_quality": {"type": int, "help": "jpg quality (1-100) of intermediate frames"},
+    "cpu_workers": {"type": int,
+                    "help": "Python worker processes for CPU-bound stage work (default: half the cores)"},
+    "stage_timeout": {"type": float,
+                      "help": "Seconds each stage may run before its processes are stopped (default: no limit)"},
+    "idle_timeout": {"type": float,
+                     "help": "Seconds a child process may run without output or new frames (default: no limit)"},
+    "batch_window": {"type": float,
+                     "help": "Seconds a batch job waits to share an upscaling model run with other jobs (default: 0, off)"},
+    "coordinator": {"type": str,
+                    "help": "Listen on HOST:PORT and let --worker processes upscale the frames in batches"},
+    "batch_frames": {"type": int, "help": "Frames per batch handed to a cluster worker (default: 32)"},
+}
+
+
+def cli_value(text):
+    """Parse a CLI parameter value as JSON (numbers, booleans, lists), else keep it as a string."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _registry_params(registry):
+    """Map every parameter in a model registry to the models that support it (imports no runner)."""
+    params = {}
+    for model_name in registry:
+        for param in registry.supported_params(model_name):
+            params.setdefault(param, []).append(model_name)
+    return params
+
+
+def add_model_arguments(parser):
+    """
+    Add --upscaling_* and --interpolation_* flags generated from the model
+    registries: one flag per model parameter, plus the block-level keys.
+    """
+    from handlers.upscaling_handler import MODEL_REGISTRY as UPSCALING_MODELS
+    from handlers.interpolation_handler import MODEL_REGISTRY as INTERPOLATION_MODELS
+
+    for block, registry in (("upscaling", UPSCALING_MODELS), ("interpolation", INTERPOLATION_MODELS)):
+        group = parser.add_argument_group(f"{block} options")
+        group.add_argument(f"--{block}_model_name", type=str, choices=sorted(registry),
+                           help=f"{block.capitalize()} model")
+        group.add_argument(f"--{block}_fallback_model", type=str, choices=sorted(registry),
+                           help="Model used when the main model's executable is missing")
+        if block == "interpolation":
+            group.add_argument("--interpolation_target_fps", type=str,
+                               help='Exact output frame rate instead of times (e.g. 60 or "60000/1001")')
+        for param, models in sorted(_registry_params(registry).items()):
+            group.add_argument(f"--{block}_{param}", type=cli_value, metavar="VALUE",
+                               help=f"'{param}' param ({', '.join(models)})")
+
+
+def add_pipeline_arguments(parser):
+    group = parser.add_argument_group("pipeline options")
+    for name, kwargs in PIPELINE_ARGS.items():
+        group.add_argument(f"--{name}", **kwargs)
 
 
 def parse_cli_args():
@@ -75,7 +151,69 @@ def parse_cli_args():
         type=str,
         help='Output file format (e.g., mp4, png)'
     )
-    # (Add more argument options as needed for models/params...)
+    parser.add_argument(
+        '--watch',
+        type=str,
+        help='Watch this drop folder and process each file that lands in it (runs until interrupted)'
+    )
+    parser.add_argument(
+        '--max_jobs',
+        type=int,
+        default=2,
+        help='Files processed at the same time in directory/watch mode (default: 2)'
+    )
+    parser.add_argument(
+        '--poll_interval',
+        type=float,
+        default=2.0,
+        help='Watch mode: seconds between directory scans when inotify is unavailable'
+    )
+    parser.add_argument(
+        '--worker',
+        type=str,
+        metavar='HOST:PORT',
+        help='Run as a cluster worker for the coordinator at HOST:PORT (runs until interrupted)'
+    )
+    parser.add_argument(
+        '--job_stats',
+        type=float,
+        nargs='?',
+        const=0,
+        metavar='DAYS',
+        help='Print per-model throughput per day from the job database (optionally the last DAYS days) and exit'
+    )
+    parser.add_argument(
+        '--plan',
+        action='store_true',
+        help='Do not process: print the predicted stages, wall time, temp disk peak and output size'
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const=True,
+        metavar='PARTS',
+        help='Profile the job (cProfile, tracemalloc per stage, Chrome trace of child processes) '
+             'into files next to the log; optionally only PARTS, e.g. "cpu,processes"'
+    )
+    parser.add_argument(
+        '--metrics_port',
+        type=int,
+        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running '
+             '(default: FUSION2X_METRICS_PORT)'
+    )
+    parser.add_argument(
+        '--metrics_file',
+        type=str,
+        help='Write Prometheus metrics to this file when the run ends (default: FUSION2X_METRICS_FILE)'
+    )
+    parser.add_argument(
+        '--settle_time',
+        type=float,
+        default=2.0,
+        help='Watch mode: seconds a file must stay unchanged before it is processed'
+    )
+    add_model_arguments(parser)
+    add_pipeline_arguments(parser)
 
     args = parser.parse_args()
     return args
@@ -83,8 +221,14 @@ def parse_cli_args():
 
 def build_json_from_args(args):
     """
-    Build a standardized JSON request from CLI arguments.
-    Only the most basic options shown—extend as needed!
+    Build a standardized JSON request from CLI arguments. Only flags that
+    were given end up in it:
+    - task, input/output path and format at the top level;
+    - --upscaling_* / --interpolation_* (generated from the model registries,
+      see add_model_arguments) as an enabled model block: model_name,
+      fallback_model and target_fps on the block, every other flag in "params";
+    - --profile as misc.profile;
+    - the PIPELINE_ARGS flags as the "pipeline" block.
     """
     request = {
         "task": args.task,
@@ -92,26 +236,149 @@ def build_json_from_args(args):
         "output_format": args.output_format,
         "input_path": args.input_path,
         "output_path": args.output_path,
-        # Additional options can be populated here as needed.
     }
     # Remove None fields (if args not supplied)
     request = {k: v for k, v in request.items() if v is not None}
+
+    # Model blocks and pipeline options, only for flags that were given
+    for block in ("upscaling", "interpolation"):
+        prefix = f"{block}_"
+        given = {
+            k[len(prefix):]: v for k, v in vars(args).items()
+            if k.startswith(prefix) and v is not None
+        }
+        if not given:
+            continue
+        block_keys = ("model_name", "fallback_model", "target_fps")
+        block_request = {"enabled": True}
+        block_request.update({k: v for k, v in given.items() if k in block_keys})
+        params = {k: v for k, v in given.items() if k not in block_keys}
+        if params:
+            block_request["params"] = params
+        request[block] = block_request
+    if getattr(args, "profile", None):
+        request["misc"] = {"profile": args.profile}
+    pipeline = {k: getattr(args, k, None) for k in PIPELINE_ARGS}
+    pipeline = {k: v for k, v in pipeline.items() if v is not None}
+    if pipeline:
+        request["pipeline"] = pipeline
     return request
 
 
+def merge_requests(base, override):
+    """Recursively merge override into base (override wins). Returns a new dict."""
+    merged = dict(base)
+    for k, v in override.items():
+        if isinstance(v, dict) and isinstance(merged.get(k), dict):
+            merged[k] = merge_requests(merged[k], v)
+        else:
+            merged[k] = v
+    return merged
+
+
+def run_folder_mode(template, watch_dir, args, logger):
+    """
+    Process a directory (input_path is a directory) or watch a drop folder,
+    using the request as the template for each file. Prints one JSON line per
+    finished file and returns the batch summary.
+    """
+    from core.watch_folder import process_directory, watch_directory
+
+    output_dir = template.get("output_path")
+    if not output_dir:
+        return {"status": "error", "message": "Output directory not specified."}
+    max_jobs = args.max_jobs if args else 2
+
+    def on_result(manifest):
+        print(json.dumps(manifest), flush=True)
+
+    if watch_dir:
+        if not os.path.isdir(watch_dir):
+            return {"status": "error", "message": f"Watch directory does not exist: {watch_dir}"}
+        return watch_directory(
+            watch_dir, template, output_dir, logger, max_jobs=max_jobs,
+            poll_interval=args.poll_interval, settle_time=args.settle_time, on_result=on_result,
+        )
+    return process_directory(template["input_path"], template, output_dir, logger,
+                             max_jobs=max_jobs, on_result=on_result)
+
+
+def run_worker_mode(address, logger):
+    """Serve upscaling batches for cluster coordinators until interrupted."""
+    from core.distributed import run_worker
+
+    try:
+        run_worker(address, logger)
+    except signal_utils.JobCancelled:
+        logger.info("Worker stopped.")
+
+
+def print_job_stats(days):
+    """Print the job database's successful stage runs per day, stage and model as JSON lines."""
+    from utils.job_store import default_store
+
+    store = default_store()
+    if store is None:
+        print(json.dumps({"status": "error", "message": "Job database is disabled (FUSION2X_JOB_DB=off)."}))
+        return
+    for row in store.model_throughput(days or None):
+        print(json.dumps(row))
+
+
+def start_metrics(args, logger):
+    """
+    Serve metrics over HTTP if a port is configured. Returns the file the
+    metrics are written to at exit, or None. A port already in use (another
+    receiver started by the GUI serves it) is logged and the job runs on.
+    """
+    port = getattr(args, "metrics_port", None) or os.environ.get("FUSION2X_METRICS_PORT")
+    if port:
+        from utils.metrics import start_http_server
+        try:
+            server = start_http_server(port)
+            logger.info(f"Serving metrics on http://127.0.0.1:{server.server_address[1]}/metrics")
+        except OSError as e:
+            logger.warning(f"Metrics not served on port {port}: {e}")
+    return getattr(args, "metrics_file", None) or os.environ.get("FUSION2X_METRICS_FILE")
+
+
 def main():
+    # Logging and runtime checks happen here, not at import, so importing stays cheap
+    log_path = get_run_log_path()
+    logger = get_logger(log_path, module_name="Receiver")
+    env_setup.ensure_vc_runtime(logger)
+    # SIGINT/SIGTERM cancel the job: child processes are stopped and temp folders removed
+    signal_utils.install_signal_handlers()
+    metrics_file = None
     try:
         logger.info("Fusion2X receiver started.")
 
         if len(sys.argv) > 1:
             # CLI invocation with arguments
             args = parse_cli_args()
+            metrics_file = start_metrics(args, logger)
+            if args.worker:
+                run_worker_mode(args.worker, logger)
+                return
+            if args.job_stats is not None:
+                print_job_stats(args.job_stats)
+                return
             json_request = build_json_from_args(args)
+            if args.config:
+                # Config file supplies the job; CLI options override it
+                json_request = merge_requests(load_json_from_file(args.config), json_request)
             logger.info("Received job config from CLI args.")
         else:
+            args = None
+            metrics_file = start_metrics(args, logger)
             # Read job request as JSON from stdin
             input_data = ""
-            if not sys.stdin.isatty():
+            if not sys.stdin.isatty() and os.environ.get("FUSION2X_CONTROL_STDIN") == "1":
+                # The parent (gui.py) sends the JSON as one line and keeps stdin open to cancel the job
+                input_data = sys.stdin.readline()
+                signal_utils.watch_cancel_stream(sys.stdin)
+                logger.info("Received JSON from stdin; listening for cancel.")
+            elif not sys.stdin.isatty():
                 input_data = sys.stdin.read()
                 logger.info("Received JSON from stdin.")
             else:
@@ -126,11 +393,33 @@ def main():
                 print(json.dumps({"status": "error", "message": "Failed to parse input JSON.", "log_path": log_path}))
                 sys.exit(1)
 
-            logger.info(f"Received job config: {json.dumps(json_request, indent=2)}")
+            logger.debug(f"Received job config: {json.dumps(json_request)}")
 
         # Add log_path to the request, if not already present
         if "log_path" not in json_request:
             json_request["log_path"] = log_path
+        # One CPU worker pool serves every job of this process; size it before any starts
+        if json_request.get("pipeline", {}).get("cpu_workers"):
+            from core import executor
+            executor.configure(json_request["pipeline"]["cpu_workers"])
+
+        # Directory input or a drop folder: the request is the template for every file
+        watch_dir = args.watch if args else None
+        planning = bool(args and args.plan)
+        if planning and (watch_dir or os.path.isdir(json_request.get("input_path", ""))):
+            print(json.dumps({"status": "error", "message": "--plan takes a single input file.",
+                              "log_path": log_path}))
+            sys.exit(1)
+        if watch_dir or os.path.isdir(json_request.get("input_path", "")):
+            result = run_folder_mode(json_request, watch_dir, args, logger)
+            # Per-file manifests were already printed as they finished
+            result.pop("results", None)
+            result["log_path"] = log_path
+            logger.info(f"Batch result: {result['message']}")
+            print(json.dumps(result))
+            if result["status"] != "success":
+                sys.exit(1)
+            return
 
         # Validate request structure
         valid, reason = validate_json_request(json_request)
@@ -145,23 +434,43 @@ def main():
             logger.error(msg)
             print(json.dumps({"status": "error", "message": msg, "log_path": log_path}))
             sys.exit(1)
-        if not json_request.get("output_path"):
+        if not json_request.get("output_path") and not planning:
             msg = "Output directory not specified."
             logger.error(msg)
             print(json.dumps({"status": "error", "message": msg, "log_path": log_path}))
             sys.exit(1)
 
         # Import operator only when ready to process (avoid import-time side effects)
+        if planning:
+            # Dry run: predicted stages, time, temp disk and output size for a scheduler
+            from core.operator import plan_request
+            result = plan_request(json_request, logger=logger)
+            result["log_path"] = log_path
+            print(json.dumps(result))
+            if result["status"] != "success":
+                sys.exit(1)
+            return
+
         from core.operator import process_request
 
+        # The GUI asks for progress events on stderr
+        progress = None
+        if os.environ.get("FUSION2X_PROGRESS"):
+            from utils.progress import ProgressReporter, stderr_emitter
+            progress = ProgressReporter(stderr_emitter())
+
         # Pass log_path to operator via json_request
-        result = process_request(json_request)
+        result = process_request(json_request, progress=progress)
 
         # Always attach log_path to the result
         result["log_path"] = log_path
 
         logger.info(f"Job result: {result}")
         print(json.dumps(result))
+    except signal_utils.JobCancelled as e:
+        logger.warning(str(e))
+        print(json.dumps({"status": "cancelled", "message": str(e), "log_path": log_path}))
+        sys.exit(130)
     except Exception as e:
         logger.error(f"Exception occurred: {e}", exc_info=True)
         print(json.dumps({
@@ -170,6 +479,10 @@ def main():
             "log_path": log_path
         }))
         sys.exit(1)
+    finally:
+        if metrics_file:
+            from utils.metrics import write_text_file
+            write_text_file(metrics_file)
 
 if __name__ == "__main__":
     main()
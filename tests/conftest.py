@@ -0,0 +1,21 @@
+import pytest
+
+
+def dummy_logger():
+    """Logger stand-in that drops every message (tests may replace its methods)."""
+    class Dummy:
+        def info(self, *args, **kwargs):
+            pass
+        def error(self, *args, **kwargs):
+            pass
+        def warning(self, *args, **kwargs):
+            pass
+        def debug(self, *args, **kwargs):
+            pass
+    return Dummy()
+
+
+@pytest.fixture(autouse=True)
+def isolated_job_db(tmp_path, monkeypatch):
+    """Every test gets its own job database instead of logs/jobs.sqlite3."""
+    monkeypatch.setenv("FUSION2X_JOB_DB", str(tmp_path / "jobs.sqlite3"))
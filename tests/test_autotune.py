@@ -0,0 +1,64 @@
+import json
+
+from core import autotune
+from handlers import upscaling_handler
+from utils import perf_profile
+from tests.conftest import dummy_logger
+
+
+def test_build_grid_only_uses_supported_params():
+    grid = autotune.build_grid(["threads", "gpu_id", "scale"], threads=["1:2:2", "2:2:2"], gpu_ids=[0, 1],
+                               base_params={"scale": 2})
+    assert len(grid) == 4
+    assert {"scale": 2, "threads": "2:2:2", "gpu_id": 1} in grid
+    assert all("tile_size" not in p for p in grid)
+
+
+def test_onnxruntime_sweeps_integer_threads(monkeypatch):
+    monkeypatch.setattr(autotune.os, "cpu_count", lambda: 4)
+    grid = autotune.build_grid(["threads"], model_name="onnxruntime-cpu")
+    assert [p["threads"] for p in grid] == [1, 2, 4]
+    assert [p["threads"] for p in autotune.build_grid(["threads"], threads=["3"], model_name="onnxruntime-cpu")] == [3]
+    assert [p["threads"] for p in autotune.build_grid(["threads"], model_name="rife-ncnn-vulkan")] == \
+        autotune.DEFAULT_THREADS
+
+
+def test_autotune_writes_best_params_to_profile(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_PROFILE_DIR", str(tmp_path / "profiles"))
+    samples = tmp_path / "samples"
+    samples.mkdir()
+    for i in range(3):
+        (samples / f"frame_{i:06d}.png").write_text("x")
+
+    def fake_model(frame_dir, params, logger):
+        if params["tile_size"] == 0:
+            raise RuntimeError("out of memory")
+
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "tune-model", (fake_model, ["tile_size", "scale"]))
+    summary = autotune.autotune("upscaling", "tune-model", str(samples), tile_sizes=[0, 64],
+                                base_params={"scale": 2}, logger=dummy_logger(), isolate=False)
+
+    assert summary["status"] == "success"
+    assert summary["best"]["params"]["tile_size"] == 64
+    assert sum(1 for r in summary["results"] if not r["success"]) == 1
+    with open(summary["profile_path"]) as f:
+        profile = json.load(f)
+    assert profile["upscaling"]["tune-model"]["params"] == {"tile_size": 64}
+
+
+def test_profile_fills_only_missing_tunable_params(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_PROFILE_DIR", str(tmp_path))
+    perf_profile.save_profile({"upscaling": {"m": {"params": {"tile_size": 128, "threads": "2:2:2", "gpu_id": 1}}}})
+    params = perf_profile.apply_profile_defaults("upscaling", "m", {"gpu_id": 0}, ["tile_size", "gpu_id"])
+    assert params == {"gpu_id": 0, "tile_size": 128}
+
+
+def test_run_upscaling_uses_profile(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_PROFILE_DIR", str(tmp_path))
+    perf_profile.save_profile({"upscaling": {"prof-model": {"params": {"threads": "4:4:4"}}}})
+    seen = {}
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "prof-model",
+                        (lambda frame_dir, params, logger: seen.update(params), ["threads"]))
+    res = upscaling_handler.run_upscaling("frames", {"model_name": "prof-model", "params": {}}, dummy_logger())
+    assert res["success"] is True
+    assert seen == {"threads": "4:4:4"}
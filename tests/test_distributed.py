@@ -0,0 +1,189 @@
+import os
+import socket
+import threading
+import time
+
+from core import distributed
+from core.distributed import Coordinator, recv_message, send_message, run_worker
+from tests.conftest import dummy_logger
+
+
+def make_frames(frame_dir, count):
+    frame_dir.mkdir()
+    for i in range(1, count + 1):
+        (frame_dir / f"frame_{i:06d}.png").write_text(f"f{i}")
+
+
+def fake_upscaling(slow_threads=(), delay=0):
+    """Stand-in for run_upscaling: frame_N.png -> FRAME TEXT as frame_N.webp."""
+    def run(frame_dir, params, logger):
+        if threading.current_thread().name in slow_threads:
+            time.sleep(delay)
+        names = [f for f in os.listdir(frame_dir) if f.endswith(".png")]
+        for name in names:
+            path = os.path.join(frame_dir, name)
+            with open(path) as f:
+                text = f.read()
+            with open(path[:-4] + ".webp", "w") as f:
+                f.write(text.upper())
+            os.remove(path)
+        return {"success": True, "message": "ok",
+                "frames": {"expected": len(names), "verified": len(names), "reprocessed": 0, "failed": 0}}
+    return run
+
+
+def start_workers(address, names, stop):
+    threads = [
+        threading.Thread(target=run_worker, name=name, daemon=True,
+                         kwargs={"address": address, "logger": dummy_logger(), "stop_event": stop,
+                                 "reconnect_delay": 0.1})
+        for name in names
+    ]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def test_message_round_trip_with_files(tmp_path):
+    src = tmp_path / "frame_000001.png"
+    src.write_bytes(b"\x89PNG" + bytes(range(256)) * 10)
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    a, b = socket.socketpair()
+    with a, b:
+        send_message(a, {"type": "batch", "batch": 3}, [str(src)])
+        header = recv_message(b, str(dest))
+    assert header["batch"] == 3
+    assert header["files"] == [["frame_000001.png", src.stat().st_size]]
+    assert (dest / "frame_000001.png").read_bytes() == src.read_bytes()
+
+
+def test_workers_process_every_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "run_upscaling", fake_upscaling())
+    frames = tmp_path / "frames"
+    make_frames(frames, 10)
+    coordinator = Coordinator(str(frames), {"model_name": "x"}, dummy_logger(), address=("127.0.0.1", 0),
+                              batch_frames=3, token="", worker_wait=10)
+    coordinator.start()
+    stop = threading.Event()
+    start_workers(coordinator.address, ["w1", "w2", "w3"], stop)
+    try:
+        assert coordinator.wait() == []
+    finally:
+        stop.set()
+        coordinator.close()
+    assert sorted(os.listdir(frames)) == [f"frame_{i:06d}.webp" for i in range(1, 11)]
+    assert (frames / "frame_000007.webp").read_text() == "F7"
+    assert coordinator.frames["verified"] == 10
+    # The coordinator's receive directory is gone
+    assert os.listdir(tmp_path) == ["frames"]
+
+
+def test_batches_of_a_dead_worker_are_redispatched(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "run_upscaling", fake_upscaling())
+    frames = tmp_path / "frames"
+    make_frames(frames, 4)
+    coordinator = Coordinator(str(frames), {}, dummy_logger(), address=("127.0.0.1", 0),
+                              batch_frames=2, token="", worker_wait=10)
+    coordinator.start()
+    stop = threading.Event()
+    try:
+        # A worker that takes a batch and disappears
+        dead = socket.create_connection(coordinator.address)
+        scratch = tmp_path / "scratch"
+        scratch.mkdir()
+        send_message(dead, {"type": "hello", "worker": "dead", "nonce": "n"})
+        assert recv_message(dead)["type"] == "welcome"
+        send_message(dead, {"type": "auth", "proof": None})
+        send_message(dead, {"type": "ready"})
+        taken = recv_message(dead, str(scratch))
+        assert taken["type"] == "batch"
+        dead.close()
+        start_workers(coordinator.address, ["w1"], stop)
+        assert coordinator.wait() == []
+    finally:
+        stop.set()
+        coordinator.close()
+    assert len([f for f in os.listdir(frames) if f.endswith(".webp")]) == 4
+
+
+def test_idle_worker_steals_a_straggling_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "run_upscaling", fake_upscaling(slow_threads=("slow",), delay=30))
+    frames = tmp_path / "frames"
+    make_frames(frames, 2)
+    coordinator = Coordinator(str(frames), {}, dummy_logger(), address=("127.0.0.1", 0),
+                              batch_frames=1, token="", worker_wait=10)
+    coordinator.start()
+    stop = threading.Event()
+    start = time.monotonic()
+    try:
+        start_workers(coordinator.address, ["slow"], stop)
+        while not coordinator.assigned:
+            time.sleep(0.01)
+        start_workers(coordinator.address, ["fast"], stop)
+        assert coordinator.wait() == []
+    finally:
+        stop.set()
+        coordinator.close()
+    assert time.monotonic() - start < 10
+    assert sorted(os.listdir(frames)) == ["frame_000001.webp", "frame_000002.webp"]
+
+
+def test_wrong_token_is_rejected_and_frames_fall_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "run_upscaling", fake_upscaling())
+    frames = tmp_path / "frames"
+    make_frames(frames, 2)
+    coordinator = Coordinator(str(frames), {}, dummy_logger(), address=("127.0.0.1", 0),
+                              token="secret", worker_wait=0.5)
+    coordinator.start()
+    try:
+        assert run_worker(coordinator.address, dummy_logger(), token="wrong", once=True) == "error"
+        assert coordinator.wait() == ["frame_000001.png", "frame_000002.png"]
+    finally:
+        coordinator.close()
+
+
+def test_run_distributed_upscaling_without_workers_runs_locally(tmp_path, monkeypatch):
+    monkeypatch.setattr(distributed, "run_upscaling", fake_upscaling())
+    frames = tmp_path / "frames"
+    make_frames(frames, 3)
+    result = distributed.run_distributed_upscaling(str(frames), {}, dummy_logger(), "127.0.0.1:0", worker_wait=0.2)
+    assert result["success"]
+    assert result["frames"]["verified"] == 3
+    assert sorted(os.listdir(frames)) == [f"frame_{i:06d}.webp" for i in range(1, 4)]
+
+
+def test_workers_use_their_own_executables_and_need_a_proven_coordinator(tmp_path, monkeypatch):
+    blocks = []
+    upscale = fake_upscaling()
+
+    def recording_upscaling(frame_dir, block, logger):
+        blocks.append(block)
+        return upscale(frame_dir, block, logger)
+    monkeypatch.setattr(distributed, "run_upscaling", recording_upscaling)
+    frames = tmp_path / "frames"
+    make_frames(frames, 2)
+    block = {"model_name": "realesrgan-ncnn-vulkan",
+             "params": {"scale": 2, "realesrgan_exe_path": "/coordinator/only/realesrgan", "model_dir": "/c/m"}}
+    coordinator = Coordinator(str(frames), block, dummy_logger(), address=("127.0.0.1", 0), token="secret",
+                              worker_wait=5)
+    coordinator.start()
+    try:
+        assert run_worker(coordinator.address, dummy_logger(), token="secret", once=True) == "done"
+        assert coordinator.wait() == []
+    finally:
+        coordinator.close()
+    assert blocks == [{"model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 2}}]
+    # Paths in a batch are dropped by the worker too
+    assert distributed.portable_block(block)[1] == ["model_dir", "realesrgan_exe_path"]
+
+    # A coordinator without the token cannot hand work to a worker that has one
+    make_frames(tmp_path / "frames2", 1)
+    rogue = Coordinator(str(tmp_path / "frames2"), {}, dummy_logger(), address=("127.0.0.1", 0), token="",
+                        worker_wait=0.5)
+    rogue.start()
+    try:
+        assert run_worker(rogue.address, dummy_logger(), token="secret", once=True) == "error"
+    finally:
+        rogue.close()
+    assert len(blocks) == 1
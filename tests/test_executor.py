@@ -0,0 +1,70 @@
+from functools import partial
+
+import pytest
+
+from core import executor
+
+
+def _checksum(descriptor, chunk):
+    buffer = executor.SharedBuffer.attach(descriptor)
+    try:
+        return [sum(buffer.buf[i * 4:(i + 1) * 4]) for i in chunk]
+    finally:
+        buffer.close()
+
+
+def test_run_chunks_inline_for_small_inputs(monkeypatch):
+    monkeypatch.setattr(executor, "_get_pool", lambda: (_ for _ in ()).throw(AssertionError("pool started")))
+    assert executor.run_chunks(sum, range(10), chunk_size=3) == [3, 12, 21, 9]
+    assert executor.run_chunks(sum, []) == []
+
+
+def test_run_chunks_on_pool_with_shared_buffer():
+    executor.configure(2)
+    try:
+        with executor.SharedBuffer.from_bytes(bytes(range(64))) as buffer:
+            results = executor.run_chunks(
+                partial(_checksum, buffer.descriptor()), range(16), chunk_size=4, min_items=1
+            )
+        assert [x for part in results for x in part] == [
+            sum(range(i * 4, (i + 1) * 4)) for i in range(16)
+        ]
+    finally:
+        executor.shutdown()
+        executor.configure()
+
+
+def test_default_workers_from_environment(monkeypatch):
+    monkeypatch.setenv("FUSION2X_CPU_WORKERS", "3")
+    assert executor.default_workers() == 3
+    monkeypatch.delenv("FUSION2X_CPU_WORKERS")
+    assert executor.default_workers() >= 1
+    assert executor.max_workers() >= 1
+
+
+def test_pool_in_use_is_never_resized(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(executor, "_get_pool", lambda: (pool, threading.BoundedSemaphore(2)))
+    started, release = threading.Event(), threading.Event()
+
+    def work(chunk):
+        started.set()
+        release.wait(5)
+        return len(chunk)
+    results = []
+    job = threading.Thread(target=lambda: results.append(executor.run_chunks(work, range(4), 2, min_items=1)))
+    executor.configure(2)
+    job.start()
+    try:
+        assert started.wait(5)
+        with pytest.raises(RuntimeError):
+            executor.configure(3)
+    finally:
+        release.set()
+        job.join()
+        pool.shutdown()
+    assert results == [[2, 2]]
+    executor.configure()
@@ -0,0 +1,51 @@
+import pytest
+
+from media import frame_format, video_encoder
+
+
+def test_intermediate_settings_and_ffmpeg_args():
+    assert frame_format.intermediate_settings({})["format"] == "png"
+    png = frame_format.intermediate_settings({"intermediate_format": "png", "intermediate_compression": 1})
+    assert frame_format.ffmpeg_image_args(png) == ["-compression_level", "1"]
+    webp = frame_format.intermediate_settings({"intermediate_format": "webp"})
+    assert frame_format.ffmpeg_image_args(webp) == ["-c:v", "libwebp", "-lossless", "1"]
+    jpg = frame_format.intermediate_settings({"intermediate_format": "JPEG", "intermediate_quality": 100})
+    assert jpg["format"] == "jpg"
+    assert frame_format.ffmpeg_image_args(jpg) == ["-q:v", "2"]
+    assert frame_format.ffmpeg_image_args(frame_format.intermediate_settings({"intermediate_format": "bmp"})) == []
+    with pytest.raises(ValueError):
+        frame_format.intermediate_settings({"intermediate_format": "tiff"})
+
+
+def test_model_blocks_follow_intermediate_format():
+    bmp = frame_format.intermediate_settings({"intermediate_format": "bmp"})
+    ncnn = frame_format.with_intermediate_format(
+        {"model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 2}}, ["scale", "output_format"], bmp
+    )
+    # ncnn executables cannot write bmp
+    assert ncnn["params"] == {"scale": 2, "output_format": "png"}
+    onnx = frame_format.with_intermediate_format(
+        {"model_name": "onnxruntime-cpu", "params": {}}, ["output_format"], bmp
+    )
+    assert onnx["params"] == {"output_format": "bmp"}
+    pinned = {"model_name": "onnxruntime-cpu", "params": {"output_format": "jpg"}}
+    assert frame_format.with_intermediate_format(pinned, ["output_format"], bmp) == pinned
+    assert frame_format.with_intermediate_format(pinned, [], bmp) is pinned
+
+
+def test_encoder_reads_the_intermediate_format(tmp_path, monkeypatch):
+    (tmp_path / "frame_000001.bmp").write_bytes(b"BM")
+    assert frame_format.frame_extension(str(tmp_path)) == "bmp"
+    commands = []
+    monkeypatch.setattr(video_encoder, "require_binaries", lambda names: None)
+    monkeypatch.setattr(video_encoder, "run_process", lambda cmd, **k: commands.append(cmd))
+    video_encoder.encode_video(str(tmp_path), str(tmp_path / "out.mp4"), fps=24, frame_format="bmp")
+    assert str(tmp_path / "frame_%06d.bmp") in commands[0]
+
+
+
+def test_list_frames_lists_every_intermediate_format(tmp_path):
+    for name in ("frame_000002.PNG", "frame_000001.ppm", "frame_000003.bmp", "timestamps.ffconcat", "notes.txt"):
+        (tmp_path / name).write_text("x")
+    assert frame_format.list_frames(str(tmp_path)) == ["frame_000001.ppm", "frame_000002.PNG", "frame_000003.bmp"]
+    assert frame_format.list_frames(str(tmp_path / "missing")) == []
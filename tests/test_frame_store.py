@@ -0,0 +1,40 @@
+import pytest
+
+from media.frame_store import FrameStore, PAGE_SIZE
+
+
+def test_frame_store_random_access_and_resume(tmp_path):
+    path = str(tmp_path / "frames.f2x")
+    with FrameStore.create(path, width=4, height=2, capacity=10) as store:
+        assert store.frame_size == 24
+        assert store.stride == PAGE_SIZE
+        store.write(7, bytes(range(24)))
+        view = store.frame(2)
+        view[:] = b"\x01" * 24
+        view.release()
+        store.mark_written(2)
+        with pytest.raises(ValueError):
+            store.write(0, b"short")
+        with pytest.raises(IndexError):
+            store.frame(10)
+
+    with FrameStore.open(path) as store:
+        assert (store.width, store.height, store.pix_fmt, len(store)) == (4, 2, "rgb24", 10)
+        assert store.read(7) == bytes(range(24))
+        assert store.read(2) == b"\x01" * 24
+        assert store.written_count() == 2
+        assert store.missing(0, 5) == [0, 1, 3, 4]
+        assert store.is_written(7) and not store.is_written(8)
+
+
+def test_frame_store_shards_cover_every_frame(tmp_path):
+    with FrameStore.create(str(tmp_path / "s.f2x"), width=1, height=1, capacity=10, pix_fmt="gray") as store:
+        shards = [store.shard(k, 3) for k in range(3)]
+    assert [list(r) for r in shards] == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+
+def test_open_rejects_other_files(tmp_path):
+    other = tmp_path / "frame_000001.png"
+    other.write_bytes(b"\x89PNG" + b"\0" * 100)
+    with pytest.raises(ValueError):
+        FrameStore.open(str(other))
@@ -0,0 +1,107 @@
+import io
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from core.ring_buffer import FrameRing
+from media import video_decoder, video_encoder
+from media.frame_store import FrameStore
+
+WIDTH, HEIGHT = 4, 2
+FRAME_SIZE = WIDTH * HEIGHT * 3
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+class _Pipe(io.BytesIO):
+    """stdin of the fake ffmpeg: keeps what was written after close()."""
+
+    def close(self):
+        self.data = self.getvalue()
+        super().close()
+
+
+def fake_ffmpeg(monkeypatch, frames):
+    """Stand-in for the ffmpeg child of both modules: stdout yields frames, stdin is recorded."""
+    calls = []
+
+    @contextmanager
+    def supervised(cmd, **popen_kwargs):
+        proc = type("Proc", (), {})()
+        proc.stdout, proc.stdin = io.BytesIO(b"".join(frames)), _Pipe()
+        proc.wait = lambda: 0
+        calls.append((cmd, proc))
+        yield proc
+    for module in (video_decoder, video_encoder):
+        monkeypatch.setattr(module, "require_binaries", lambda names: None)
+        monkeypatch.setattr(module, "supervised", supervised)
+    return calls
+
+
+def make_clip(path, frames):
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                    "-i", "testsrc=size=32x16:rate=8", "-frames:v", str(frames),
+                    "-pix_fmt", "yuv420p", "-y", str(path)], check=True)
+
+
+def test_decode_to_store_and_encode_from_store_stream_raw_frames(tmp_path, monkeypatch):
+    frames = [bytes([i]) * FRAME_SIZE for i in range(5)]
+    calls = fake_ffmpeg(monkeypatch, frames)
+    with FrameStore.create(str(tmp_path / "frames.f2x"), WIDTH, HEIGHT, capacity=3) as store:
+        assert video_decoder.decode_to_store("clip.mp4", store) == 3
+        decode_cmd = calls[0][0]
+        # ffmpeg is told to stop at the store's capacity
+        assert decode_cmd[decode_cmd.index("-frames:v") + 1] == "3"
+        assert [store.read(i) for i in range(3)] == frames[:3]
+
+        assert video_encoder.encode_from_store(store, str(tmp_path / "out.mp4"), fps=24) == 3
+        encode_cmd, proc = calls[1]
+        assert encode_cmd[encode_cmd.index("-s") + 1] == f"{WIDTH}x{HEIGHT}"
+        assert proc.stdin.data == b"".join(frames[:3])
+
+
+def test_decode_to_ring_and_encode_from_ring_stream_raw_frames(tmp_path, monkeypatch):
+    frames = [bytes([i]) * FRAME_SIZE for i in range(6)]
+    calls = fake_ffmpeg(monkeypatch, frames)
+    ring = FrameRing(slots=2, slot_size=FRAME_SIZE)
+    try:
+        decoded = []
+        # Six frames through two slots: the decoder waits for the encoder
+        producer = threading.Thread(
+            target=lambda: decoded.append(video_decoder.decode_to_ring("clip.mp4", ring, WIDTH, HEIGHT)))
+        producer.start()
+        encoded = video_encoder.encode_from_ring(ring, str(tmp_path / "out.mp4"), WIDTH, HEIGHT, fps=24)
+        producer.join(timeout=10)
+        assert decoded == [6] and encoded == 6
+        [encode_proc] = [proc for cmd, proc in calls if "pipe:0" in cmd]
+        assert encode_proc.stdin.data == b"".join(frames)
+    finally:
+        ring.close()
+
+
+@needs_ffmpeg
+def test_short_clip_round_trips_through_the_store(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    make_clip(clip, 8)
+    with FrameStore.create(str(tmp_path / "frames.f2x"), 32, 16, capacity=5) as store:
+        assert video_decoder.decode_to_store(str(clip), store) == 5
+        assert store.missing() == []
+        assert video_encoder.encode_from_store(store, str(tmp_path / "out.mp4"), fps=8) == 5
+    assert video_decoder.probe_video(str(tmp_path / "out.mp4"))["frame_count"] == 5
+
+
+@needs_ffmpeg
+def test_short_clip_round_trips_through_the_ring(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    make_clip(clip, 8)
+    ring = FrameRing(slots=2, slot_size=32 * 16 * 3)
+    try:
+        producer = threading.Thread(target=video_decoder.decode_to_ring, args=(str(clip), ring, 32, 16))
+        producer.start()
+        assert video_encoder.encode_from_ring(ring, str(tmp_path / "out.mp4"), 32, 16, fps=8) == 8
+        producer.join(timeout=30)
+    finally:
+        ring.close()
+    assert video_decoder.probe_video(str(tmp_path / "out.mp4"))["frame_count"] == 8
@@ -0,0 +1,111 @@
+import os
+import struct
+import zlib
+from pathlib import Path
+
+from handlers import upscaling_handler, interpolation_handler
+from media import frame_verify
+from tests.conftest import dummy_logger
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png_bytes(width, height, complete=True):
+    """Header-only PNG: enough for the verifier, not a decodable image."""
+    data = frame_verify.PNG_SIGNATURE + _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+    return data + _chunk(b"IEND", b"") if complete else data
+
+
+def test_read_image_size_from_headers(tmp_path):
+    png = tmp_path / "a.png"
+    png.write_bytes(png_bytes(640, 360))
+    jpg = tmp_path / "b.jpg"
+    # SOI, APP0 (empty payload), SOF0 with height 90 / width 160, EOI
+    jpg.write_bytes(b"\xff\xd8\xff\xe0\x00\x02\xff\xc0\x00\x0b\x08\x00\x5a\x00\xa0\x03" + b"\x00" * 6 + b"\xff\xd9")
+    bmp = tmp_path / "c.bmp"
+    bmp.write_bytes(b"BM" + b"\x00" * 16 + struct.pack("<ii", 32, -16) + b"\x00" * 8)
+    text = tmp_path / "d.png"
+    text.write_text("not an image")
+
+    assert frame_verify.read_image_size(str(png)) == (640, 360)
+    assert frame_verify.read_image_size(str(jpg)) == (160, 90)
+    assert frame_verify.read_image_size(str(bmp)) == (32, 16)
+    assert frame_verify.read_image_size(str(text)) is None
+    assert frame_verify.read_image_size(str(tmp_path / "missing.png")) is None
+
+
+def test_truncated_png_is_incomplete(tmp_path):
+    (tmp_path / "ok.png").write_bytes(png_bytes(8, 8))
+    (tmp_path / "cut.png").write_bytes(png_bytes(8, 8, complete=False))
+    assert frame_verify.is_complete(str(tmp_path / "ok.png"))
+    assert not frame_verify.is_complete(str(tmp_path / "cut.png"))
+    assert frame_verify.invalid_frames(str(tmp_path), ["ok.png", "cut.png"], (8, 8)) == ["cut.png"]
+
+
+def test_verify_upscaled_checks_scale(tmp_path):
+    (tmp_path / "frame_000001.png").write_bytes(png_bytes(200, 100))
+    (tmp_path / "frame_000002.png").write_bytes(png_bytes(100, 50))
+    sources = {"frame_000001.png": (100, 50), "frame_000002.png": (100, 50), "frame_000003.png": (100, 50)}
+    assert frame_verify.verify_upscaled(str(tmp_path), sources, scale=2) == ["frame_000002.png", "frame_000003.png"]
+    assert frame_verify.verify_upscaled(str(tmp_path), sources) == ["frame_000002.png", "frame_000003.png"]
+
+
+def test_upscaling_reprocesses_frames_the_model_skipped(monkeypatch, tmp_path):
+    for i in range(1, 5):
+        (tmp_path / f"frame_{i:06d}.png").write_bytes(png_bytes(64, 36))
+    runs = []
+
+    def skipping_model(frame_dir, params, logger):
+        frames = sorted(f for f in os.listdir(frame_dir) if f.endswith(".png"))
+        runs.append(frames)
+        for name in frames:
+            # First run exits 0 but silently skips frame 3
+            if len(runs) == 1 and name == "frame_000003.png":
+                continue
+            (Path(frame_dir) / name).write_bytes(png_bytes(128, 72))
+
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "skip-model", (skipping_model, ["scale"]))
+    res = upscaling_handler.run_upscaling(str(tmp_path), {"model_name": "skip-model", "params": {"scale": 2}},
+                                          dummy_logger())
+    assert res["success"] is True
+    assert runs[1] == ["frame_000003.png"]
+    assert res["frames"] == {"expected": 4, "verified": 4, "reprocessed": 1, "failed": 0}
+    assert frame_verify.read_image_size(str(tmp_path / "frame_000003.png")) == (128, 72)
+
+
+def test_upscaling_fails_when_outputs_stay_invalid(monkeypatch, tmp_path):
+    for i in range(1, 3):
+        (tmp_path / f"frame_{i:06d}.png").write_bytes(png_bytes(64, 36))
+
+    def truncating_model(frame_dir, params, logger):
+        for name in os.listdir(frame_dir):
+            (Path(frame_dir) / name).write_bytes(png_bytes(128, 72, complete=name != "frame_000002.png"))
+
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "cut-model", (truncating_model, ["scale"]))
+    res = upscaling_handler.run_upscaling(str(tmp_path), {"model_name": "cut-model", "params": {"scale": 2}},
+                                          dummy_logger())
+    assert res["success"] is False
+    assert res["frames"]["failed"] == 1
+    assert res["frames"]["reprocessed"] == 0
+
+
+def test_interpolation_retries_when_outputs_are_unreadable(monkeypatch, tmp_path):
+    for i in range(1, 4):
+        (tmp_path / f"frame_{i:06d}.png").write_bytes(png_bytes(32, 32))
+    runs = []
+
+    def rife_like(frame_dir, params, logger):
+        runs.append(params)
+        for j in range(1, 7):
+            data = png_bytes(32, 32) if len(runs) > 1 or j != 4 else b"garbage"
+            (Path(frame_dir) / f"{j:08d}.png").write_bytes(data)
+
+    monkeypatch.setitem(interpolation_handler.MODEL_REGISTRY, "rife-like", (rife_like, ["times"]))
+    res = interpolation_handler.run_interpolation(str(tmp_path), {"model_name": "rife-like", "params": {"times": 2}},
+                                                  dummy_logger())
+    assert res["success"] is True
+    assert len(runs) == 2
+    assert res["frames"] == {"expected": 6, "verified": 6, "reprocessed": 6, "failed": 0}
+    assert sorted(os.listdir(tmp_path)) == [f"frame_{i:06d}.png" for i in range(1, 7)]
@@ -0,0 +1,70 @@
+import os
+
+from core import fused_stage
+from core.stage_planner import choose_stage_order, estimate_stage_costs
+from handlers import upscaling_handler, interpolation_handler
+from tests.conftest import dummy_logger
+
+
+def test_cost_model_prefers_interpolating_at_source_resolution():
+    up = {"model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 4}}
+    interp = {"model_name": "rife-ncnn-vulkan", "params": {"times": 2}}
+    costs = estimate_stage_costs(100, "1920x1080", up, interp)
+    assert costs["interpolate_first"] < costs["upscale_first"]
+    assert choose_stage_order({}, 100, "1920x1080", up, interp) == "interpolate_first"
+
+
+def test_stage_order_can_be_pinned_and_unknown_resolution_keeps_default():
+    up = {"model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 4}}
+    interp = {"model_name": "rife-ncnn-vulkan", "params": {"times": 2}}
+    assert choose_stage_order({"stage_order": "upscale_first"}, 100, "1920x1080", up, interp) == "upscale_first"
+    assert choose_stage_order({}, 100, "unknown", up, interp) == "upscale_first"
+
+
+def test_fused_stage_streams_chunks(tmp_path, monkeypatch):
+    frames_dir = tmp_path / "frames"
+    frames_dir.mkdir()
+    for i in range(1, 6):
+        (frames_dir / f"frame_{i:06d}.png").write_text(f"src{i}")
+
+    def fake_interp(frame_dir, params, logger):
+        # rife-style output: len(inputs) * 2 frames under new names
+        names = sorted(os.listdir(frame_dir))
+        idx = 1
+        for name in names:
+            content = open(os.path.join(frame_dir, name)).read()
+            for half in ("a", "b"):
+                with open(os.path.join(frame_dir, f"{idx:08d}.png"), "w") as f:
+                    f.write(content + half)
+                idx += 1
+
+    max_chunk = []
+
+    def fake_upscale(frame_dir, params, logger):
+        names = sorted(os.listdir(frame_dir))
+        max_chunk.append(len(names))
+        for name in names:
+            path = os.path.join(frame_dir, name)
+            content = open(path).read()
+            with open(path, "w") as f:
+                f.write(content + "-up")
+
+    monkeypatch.setitem(interpolation_handler.MODEL_REGISTRY, "fake-interp", (fake_interp, ["times"]))
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "fake-up", (fake_upscale, []))
+
+    res = fused_stage.run_fused_stage(
+        str(frames_dir),
+        {"model_name": "fake-interp", "params": {"times": 2}},
+        {"model_name": "fake-up", "params": {}},
+        dummy_logger(),
+        chunk_size=2,
+    )
+
+    assert res["success"] is True
+    out = sorted(os.listdir(frames_dir))
+    assert out == [f"frame_{i:06d}.png" for i in range(1, 11)]
+    contents = [(frames_dir / name).read_text() for name in out]
+    assert contents[:4] == ["src1a-up", "src1b-up", "src2a-up", "src2b-up"]
+    assert contents[-1] == "src5b-up"
+    assert max(max_chunk) == 4
+    assert not (tmp_path / "frames_fused").exists()
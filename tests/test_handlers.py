@@ -1,18 +1,8 @@
+import os
 import subprocess
+from pathlib import Path
 from handlers import upscaling_handler, interpolation_handler
-
-
-def dummy_logger():
-    class Dummy:
-        def info(self, *args, **kwargs):
-            pass
-        def error(self, *args, **kwargs):
-            pass
-        def warning(self, *args, **kwargs):
-            pass
-        def debug(self, *args, **kwargs):
-            pass
-    return Dummy()
+from tests.conftest import dummy_logger
 
 
 def test_upscaling_success(monkeypatch):
@@ -47,3 +37,146 @@ def test_interpolation_called_process_error(monkeypatch):
     res = interpolation_handler.run_interpolation("frames", {"model_name": "err-model", "params": {}}, dummy_logger())
     assert res["success"] is False
     assert res["message"] == "bad"
+
+
+def test_onnxruntime_backend_registered():
+    assert "onnxruntime-cpu" in upscaling_handler.MODEL_REGISTRY
+    assert "onnxruntime-cpu" in interpolation_handler.MODEL_REGISTRY
+
+
+def test_onnxruntime_session_reused(monkeypatch, tmp_path):
+    import sys
+    import types
+    from handlers.models import onnxruntime_cpu
+
+    created = []
+
+    class FakeSession:
+        def __init__(self, path, sess_options=None, providers=None):
+            created.append((path, sess_options.intra_op_num_threads, providers))
+
+    fake_ort = types.SimpleNamespace(
+        SessionOptions=lambda: types.SimpleNamespace(intra_op_num_threads=0, inter_op_num_threads=0),
+        InferenceSession=FakeSession,
+    )
+    monkeypatch.setitem(sys.modules, "onnxruntime", fake_ort)
+    monkeypatch.setitem(sys.modules, "numpy", types.ModuleType("numpy"))
+    monkeypatch.setitem(sys.modules, "PIL", types.SimpleNamespace(Image=object()))
+    monkeypatch.setattr(onnxruntime_cpu, "_SESSIONS", {})
+
+    model = tmp_path / "x4.onnx"
+    model.write_text("")
+    path = onnxruntime_cpu.resolve_model_path({"model_path": str(model)}, "upscaling")
+    first = onnxruntime_cpu.get_session(path, threads=8)
+    second = onnxruntime_cpu.get_session(path, threads=8)
+    assert first is second
+    assert created == [(path, 8, ["CPUExecutionProvider"])]
+
+
+def test_ffmpeg_filter_builders():
+    from handlers.models import ffmpeg_filters
+    assert ffmpeg_filters.build_ffmpeg_scale_filter({"scale": 2, "algorithm": "bicubic"}) == "scale=iw*2:ih*2:flags=bicubic"
+    assert ffmpeg_filters.build_ffmpeg_framerate_filter({"times": 2}, 30) == "framerate=fps=60"
+    flt = ffmpeg_filters.build_ffmpeg_minterpolate_filter({"times": 2}, 24)
+    assert flt.startswith("minterpolate=fps=48:mi_mode=mci")
+
+
+def test_build_upscaling_filter_only_for_filter_models():
+    flt = upscaling_handler.build_upscaling_filter(
+        {"model_name": "ffmpeg-scale", "params": {"scale": 4}}, 30, dummy_logger())
+    assert flt == "scale=iw*4:ih*4:flags=lanczos"
+    assert upscaling_handler.build_upscaling_filter(
+        {"model_name": "realesrgan-ncnn-vulkan", "params": {}}, 30, dummy_logger()) is None
+
+
+def test_upscaling_falls_back_when_executable_missing(monkeypatch):
+    calls = []
+    def missing_model(frame_dir, params, logger):
+        raise FileNotFoundError("exe not found")
+    def fallback_model(frame_dir, params, logger):
+        calls.append(params)
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "missing-model", (missing_model, ["scale", "gpu_id"]))
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "fallback-model", (fallback_model, ["scale"]))
+    res = upscaling_handler.run_upscaling(
+        "frames",
+        {"model_name": "missing-model", "fallback_model": "fallback-model", "params": {"scale": 2, "gpu_id": 0}},
+        dummy_logger(),
+    )
+    assert res["success"] is True
+    assert calls == [{"scale": 2}]
+
+
+def test_retry_backoff_sequence_for_memory_failures():
+    from handlers import retry_policy
+    retry = dict(retry_policy.DEFAULT_RETRY, cpu_fallback=True)
+    params = {"tile_size": 0, "threads": "4:4:4", "gpu_id": 0}
+    history = []
+    changes = []
+    while True:
+        step = retry_policy.backoff_params(params, ["tile_size", "threads", "gpu_id"], "memory", retry, history)
+        if step is None:
+            break
+        params, change = step
+        changes.append(change)
+    assert changes == ["tile_size=256", "tile_size=128", "tile_size=64", "tile_size=32",
+                       "threads=2:2:2", "threads=1:1:1", "gpu_id=-1 (CPU)"]
+
+
+def test_classify_failure():
+    from handlers import retry_policy
+    from utils.process_utils import ModelProcessError
+    assert retry_policy.classify_failure(ModelProcessError("x", 255, "", "vkAllocateMemory failed")) == "memory"
+    assert retry_policy.classify_failure(ModelProcessError("crash", 3221225477)) == "memory"
+    assert retry_policy.classify_failure(ModelProcessError("bad arg", 1, "", "unknown option")) == "other"
+
+
+def test_upscaling_retries_only_frames_without_output(monkeypatch, tmp_path):
+    from utils.process_utils import ModelProcessError
+    for i in range(1, 5):
+        (tmp_path / f"frame_{i:06d}.png").write_text("src")
+    runs = []
+
+    def flaky_model(frame_dir, params, logger):
+        frames = sorted(f for f in os.listdir(frame_dir) if f.endswith(".png"))
+        runs.append((frames, params.get("tile_size")))
+        if len(runs) == 1:
+            for name in frames[:2]:
+                (Path(frame_dir) / name).write_text("upscaled")
+            raise ModelProcessError("failed", 255, "", "vkAllocateMemory failed -2")
+        for name in frames:
+            (Path(frame_dir) / name).write_text("upscaled")
+
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "flaky-model", (flaky_model, ["tile_size"]))
+    res = upscaling_handler.run_upscaling(str(tmp_path), {"model_name": "flaky-model", "params": {"tile_size": 400}},
+                                          dummy_logger())
+    assert res["success"] is True
+    assert runs[1] == (["frame_000003.png", "frame_000004.png"], 200)
+    assert all((tmp_path / f"frame_{i:06d}.png").read_text() == "upscaled" for i in range(1, 5))
+    assert not (tmp_path / "_retry").exists()
+
+
+def test_upscaling_uses_fallback_for_frames_left_after_retries(monkeypatch, tmp_path):
+    from utils.process_utils import ModelProcessError
+    for i in range(1, 4):
+        (tmp_path / f"frame_{i:06d}.png").write_text("src")
+    fallback_frames = []
+
+    def broken_model(frame_dir, params, logger):
+        (Path(frame_dir) / "frame_000001.png").write_text("upscaled")
+        raise ModelProcessError("failed", 1, "", "invalid gpu device")
+
+    def fallback_model(frame_dir, params, logger):
+        for name in sorted(os.listdir(frame_dir)):
+            fallback_frames.append(name)
+            (Path(frame_dir) / name).write_text("fallback")
+
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "broken-model", (broken_model, ["scale"]))
+    monkeypatch.setitem(upscaling_handler.MODEL_REGISTRY, "fb-model", (fallback_model, ["scale"]))
+    res = upscaling_handler.run_upscaling(
+        str(tmp_path), {"model_name": "broken-model", "fallback_model": "fb-model", "params": {"scale": 2}},
+        dummy_logger(),
+    )
+    assert res["success"] is True
+    assert fallback_frames == ["frame_000002.png", "frame_000003.png"]
+    assert (tmp_path / "frame_000001.png").read_text() == "upscaled"
+    assert (tmp_path / "frame_000003.png").read_text() == "fallback"
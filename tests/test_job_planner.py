@@ -0,0 +1,102 @@
+import socket
+import struct
+
+import pytest
+
+import core.operator as operator
+from core.job_planner import plan_job, FRAME_BYTES_PER_PIXEL
+from utils.perf_profile import save_profile
+from tests.conftest import dummy_logger
+
+
+def video_request(**pipeline):
+    return {
+        "task": "both", "input_format": "mp4", "output_format": "mp4", "input_path": "clip.mp4",
+        "upscaling": {"enabled": True, "model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 2}},
+        "interpolation": {"enabled": True, "model_name": "rife-ncnn-vulkan", "params": {"times": 2}},
+        "pipeline": pipeline,
+    }
+
+
+def test_plan_follows_frames_through_the_stages(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_PROFILE_DIR", str(tmp_path / "profiles"))
+    source = {"resolution": "1000x500", "frame_count": 100, "fps_fraction": "24/1"}
+    plan = plan_job(video_request(), source, ["upscaling", "interpolation"])
+    assert [(s["stage"], s["frames"], s["resolution"]) for s in plan["stages"]] == [
+        ("decoding", 100, "1000x500"),
+        ("upscaling", 100, "2000x1000"),
+        ("interpolation", 200, "2000x1000"),
+        ("encoding", 200, "2000x1000"),
+    ]
+    assert plan["output"] == {"frames": 200, "resolution": "2000x1000", "fps": 48.0,
+                              "size_bytes": round(200 * 2e6 * 0.08 / 8)}
+    # Peak: 100 upscaled frames next to the 200 interpolated ones
+    png = FRAME_BYTES_PER_PIXEL["png"]
+    assert plan["temp_disk_peak_bytes"] == round(100 * 2e6 * png + 200 * 2e6 * png)
+    assert plan["estimated_from"] == ["estimate"]
+    assert plan["wall_seconds"] == round(sum(s["seconds"] for s in plan["stages"]), 1)
+
+
+def test_plan_uses_host_profile_throughput(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_PROFILE_DIR", str(tmp_path / "profiles"))
+    save_profile({"upscaling": {"realesrgan-ncnn-vulkan": {"fps": 2.0, "sample_megapixels": 1.0,
+                                                           "peak_rss_mb": 900.0}}},
+                 host=socket.gethostname())
+    request = video_request()
+    request["task"] = "upscaling"
+    source = {"resolution": "2000x1000", "frame_count": 50, "fps_fraction": "25/1"}
+    [_, upscaling, _] = plan_job(request, source, ["upscaling"])["stages"]
+    # 50 frames of 2 MP at 2 fps per MP
+    assert upscaling == {"stage": "upscaling", "frames": 50, "resolution": "4000x2000", "seconds": 50.0,
+                         "source": "profile", "model": "realesrgan-ncnn-vulkan", "peak_rss_mb": 900.0}
+
+
+def test_plan_request_probes_without_processing(tmp_path, monkeypatch):
+    video = tmp_path / "clip.mp4"
+    video.write_text("data")
+    monkeypatch.setattr(operator, "probe_video", lambda *a, **k: {
+        "resolution": "640x360", "fps": 24, "fps_fraction": "24/1", "frame_count": 240, "duration": 10.0})
+    monkeypatch.setattr(operator, "create_temp_folder", lambda **k: pytest.fail("planning created a temp folder"))
+    request = {
+        "task": "both", "input_format": "mp4", "output_format": "mp4", "input_path": str(video),
+        "upscaling": {"enabled": True, "model_name": "ffmpeg-scale", "params": {"scale": 2}},
+        "interpolation": {"enabled": True, "model_name": "ffmpeg-framerate", "params": {"times": 2}},
+    }
+    plan = operator.plan_request(request, logger=dummy_logger())
+    assert plan["status"] == "success"
+    assert [s["stage"] for s in plan["stages"]] == ["transcoding"]
+    assert plan["output"]["frames"] == 480 and plan["output"]["resolution"] == "1280x720"
+    assert plan["temp_disk_peak_bytes"] == plan["output"]["size_bytes"]
+
+    request["upscaling"]["model_name"] = "no-such-model"
+    assert operator.plan_request(request, logger=dummy_logger())["status"] == "error"
+
+
+def test_plan_request_for_an_image(tmp_path):
+    img = tmp_path / "photo.png"
+    img.write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 300, 200) + bytes(5))
+    request = {
+        "task": "upscaling", "input_format": "png", "output_format": "png", "input_path": str(img),
+        "upscaling": {"enabled": True, "model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 4}},
+    }
+    plan = operator.plan_request(request, logger=dummy_logger())
+    assert plan["status"] == "success"
+    assert plan["input"] == {"resolution": "300x200", "frame_count": 1}
+    assert [(s["stage"], s["resolution"]) for s in plan["stages"]] == [("upscaling", "1200x800")]
+    assert "fps" not in plan["output"]
+
+
+def test_plan_sizes_each_rendition(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_PROFILE_DIR", str(tmp_path / "profiles"))
+    request = video_request()
+    request["renditions"] = [{"name": "master"}, {"name": "proxy", "resolution": "480p", "bitrate": "1M"}]
+    source = {"resolution": "1920x1080", "frame_count": 240, "fps_fraction": "24/1"}
+    plan = plan_job(request, source, ["upscaling", "interpolation"])
+    master, proxy = plan["output"]["renditions"]
+    assert master == {"name": "master", "resolution": "3840x2160", "container": "mp4",
+                      "size_bytes": round(480 * 3840 * 2160 * 0.08 / 8)}
+    # 480 frames at 48 fps are 10 seconds at 1 Mbit/s
+    assert proxy == {"name": "proxy", "resolution": "854x480", "container": "mp4", "size_bytes": 1_250_000}
+    assert plan["output"]["size_bytes"] == master["size_bytes"] + proxy["size_bytes"]
+    single = plan_job(video_request(), source, ["upscaling", "interpolation"])
+    assert plan["stages"][-1]["seconds"] > single["stages"][-1]["seconds"]
@@ -0,0 +1,125 @@
+from pathlib import Path
+
+import core.operator as operator
+from utils import job_store
+from utils.job_store import JobStore, input_fingerprint, job_key, normalize_request
+from tests.conftest import dummy_logger
+
+
+def image_job(tmp_path, monkeypatch, calls):
+    img = tmp_path / "test.png"
+    img.write_text("data")
+
+    def fake_create_temp_folder(base_dir, base_name, timestamp):
+        temp_dir = tmp_path / f"temp{len(calls)}"
+        temp_dir.mkdir()
+        return str(temp_dir)
+    monkeypatch.setattr(operator, "create_temp_folder", fake_create_temp_folder)
+
+    def fake_process_image(frame_dir, output_path, logger=None):
+        calls.append(output_path)
+        Path(output_path).write_text("processed")
+    monkeypatch.setattr(operator, "process_image", fake_process_image)
+    monkeypatch.setattr(operator, "run_upscaling",
+                        lambda *a, **k: {"success": True, "frames": {"expected": 1, "verified": 1}})
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+    return {
+        "input_path": str(img),
+        "input_format": "png",
+        "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 2}},
+        "interpolation": {"enabled": False},
+        "output_format": "png",
+        "output_path": str(tmp_path / "out"),
+        "log_path": str(tmp_path / "log.txt"),
+    }
+
+
+def test_job_key_ignores_destination_and_runtime_options(tmp_path):
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"x" * 3000)
+    fingerprint = input_fingerprint(str(video))
+    base = {"task": "upscaling", "upscaling": {"model_name": "m", "params": {"scale": 2}},
+            "pipeline": {"encoder_preset": "fast"}}
+    moved = dict(base, output_path="/elsewhere", log_path="l.log", misc={"log_level": "DEBUG"},
+                 pipeline={"encoder_preset": "fast", "workers": 4, "stage_timeout": 60})
+    assert job_key(normalize_request(base), fingerprint) == job_key(normalize_request(moved), fingerprint)
+
+    other_params = dict(base, upscaling={"model_name": "m", "params": {"scale": 4}})
+    assert job_key(normalize_request(other_params), fingerprint) != job_key(normalize_request(base), fingerprint)
+    video.write_bytes(b"x" * 2999 + b"y")
+    assert input_fingerprint(str(video)) != fingerprint
+    # A same-size edit in the middle of a large file is a different input
+    data = bytearray(b"x" * (5 * 1024 * 1024))
+    video.write_bytes(data)
+    fingerprint = input_fingerprint(str(video))
+    data[len(data) // 2] = ord("y")
+    video.write_bytes(data)
+    assert input_fingerprint(str(video)) != fingerprint
+
+
+def test_identical_job_returns_the_stored_output(tmp_path, monkeypatch):
+    calls = []
+    request = image_job(tmp_path, monkeypatch, calls)
+    first = operator.process_request(request)
+    assert first["status"] == "success" and len(calls) == 1
+
+    again = operator.process_request(dict(request, log_path=str(tmp_path / "log2.txt")))
+    assert len(calls) == 1
+    assert again["status"] == "success"
+    assert again["output_path"] == first["output_path"]
+    assert again["frames"] == {"upscaling": {"expected": 1, "verified": 1}}
+
+    # Another output directory gets the same file linked in
+    elsewhere = operator.process_request(dict(request, output_path=str(tmp_path / "other")))
+    assert len(calls) == 1
+    assert Path(elsewhere["output_path"]).parent == tmp_path / "other"
+    assert Path(elsewhere["output_path"]).read_text() == "processed"
+
+    # Opting out, or an output that is gone, processes the input again
+    operator.process_request(dict(request, misc={"reuse_output": False}))
+    assert len(calls) == 2
+    for path in calls:
+        Path(path).unlink(missing_ok=True)
+    Path(elsewhere["output_path"]).unlink()
+    operator.process_request(request)
+    assert len(calls) == 3
+
+
+def test_stages_are_recorded_for_throughput(tmp_path, monkeypatch):
+    calls = []
+    request = image_job(tmp_path, monkeypatch, calls)
+    operator.process_request(request)
+    monkeypatch.setattr(operator, "run_upscaling", lambda *a, **k: {"success": False, "message": "boom"})
+    failed = operator.process_request(dict(request, upscaling=dict(request["upscaling"], params={"scale": 4})))
+    assert failed["status"] == "error"
+
+    store = job_store.default_store()
+    assert store.get_job(2)["status"] == "error"
+    assert [(s["stage"], s["model"], s["status"]) for s in store.get_job(2)["stages"]] == [
+        ("upscaling", "realesrgan-ncnn-vulkan", "error")
+    ]
+    [row] = store.model_throughput(days=1)
+    assert (row["stage"], row["model"], row["jobs"], row["frames"]) == ("upscaling", "realesrgan-ncnn-vulkan", 1, 1)
+
+
+def test_store_off_records_nothing(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_JOB_DB", "off")
+    calls = []
+    request = image_job(tmp_path, monkeypatch, calls)
+    operator.process_request(request)
+    operator.process_request(request)
+    assert len(calls) == 2
+    assert not (tmp_path / "jobs.sqlite3").exists()
+
+
+def test_unwritable_store_does_not_fail_the_job(tmp_path, monkeypatch):
+    calls = []
+    request = image_job(tmp_path, monkeypatch, calls)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    def broken(*args):
+        raise job_store.sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(store, "start_stage", broken)
+    monkeypatch.setattr(job_store, "default_store", lambda: store)
+    assert operator.process_request(request)["status"] == "success"
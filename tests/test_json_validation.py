@@ -14,3 +14,13 @@ def test_invalid_image_output_for_video_input():
     assert not valid
     assert "video input" in reason
 
+
+
+def test_renditions_are_validated():
+    req = {"task": "upscaling", "input_format": "mp4", "output_format": "mp4", "input_path": "x",
+           "upscaling": {}, "renditions": [{"resolution": "1080p"}, {"container": "flv"}]}
+    valid, reason = ju.validate_json_request(req)
+    assert not valid
+    assert "flv" in reason
+    req = dict(req, input_format="png", output_format="png", renditions=[{"resolution": "1080p"}])
+    assert ju.validate_json_request(req) == (False, "Renditions are only supported for video input.")
@@ -0,0 +1,88 @@
+import json
+import logging
+import os
+import threading
+
+from utils import logger as log_utils
+
+
+def _log_file(tmp_path, name):
+    # Loggers are keyed by file name, so keep names unique across tests
+    return str(tmp_path / f"{tmp_path.name}_{name}.log")
+
+
+def test_get_logger_writes_through_queue(tmp_path):
+    path = _log_file(tmp_path, "text")
+    logger = log_utils.get_logger(path, module_name="Test")
+    assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+    logger.info("hello %s", "world")
+    logger.debug("hidden")
+    assert log_utils.flush_logs()
+    lines = open(path, encoding="utf-8").read().splitlines()
+    assert lines[0].startswith("=== Fusion2X [Test] Log Started")
+    assert lines[1].endswith("[INFO] hello world")
+    assert len(lines) == 2
+    log_utils.close_logger(path)
+
+
+def test_json_lines_records_carry_structured_fields(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_LOG_FORMAT", "json")
+    path = _log_file(tmp_path, "json")
+    logger = log_utils.get_logger(path, job_id="job-42")
+    logger.info("chunk done", extra={"stage": "fused", "frame": 400, "duration": 1.5})
+    assert log_utils.flush_logs()
+    record = json.loads(open(path, encoding="utf-8").read().splitlines()[0])
+    assert record["message"] == "chunk done"
+    assert record["job_id"] == "job-42"
+    assert record["stage"] == "fused" and record["frame"] == 400 and record["duration"] == 1.5
+    assert record["module"] == "test_logger"
+    log_utils.close_logger(path)
+
+
+def test_per_module_levels_and_explicit_level(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_LOG_LEVELS", "test_logger=WARNING,other=DEBUG")
+    path = _log_file(tmp_path, "levels")
+    logger = log_utils.get_logger(path)
+    # another module may log at debug, so the logger itself must let debug through
+    assert logger.level == logging.DEBUG
+    logger.info("dropped for this module")
+    logger.warning("kept")
+    log_utils.get_logger(path, level="error")
+    logger.info("still dropped")
+    assert log_utils.flush_logs()
+    text = open(path, encoding="utf-8").read()
+    assert "dropped" not in text
+    assert "kept" in text
+    log_utils.close_logger(path)
+
+
+def test_rotation_and_close(tmp_path, monkeypatch):
+    monkeypatch.setenv("FUSION2X_LOG_MAX_BYTES", "200")
+    monkeypatch.setenv("FUSION2X_LOG_BACKUPS", "2")
+    path = _log_file(tmp_path, "rotate")
+    logger = log_utils.get_logger(path)
+    for i in range(20):
+        logger.info(f"line {i} " + "x" * 40)
+    log_utils.close_logger(path)
+    assert log_utils.flush_logs()
+    assert os.path.exists(path + ".1")
+    assert not os.path.exists(path + ".3")
+    assert logger.handlers == []
+
+
+def test_logging_from_many_threads(tmp_path):
+    path = _log_file(tmp_path, "threads")
+    logger = log_utils.get_logger(path)
+
+    def work(n):
+        for i in range(50):
+            logger.info(f"thread {n} line {i}")
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert log_utils.flush_logs()
+    lines = open(path, encoding="utf-8").read().splitlines()
+    assert len(lines) == 1 + 200
+    log_utils.close_logger(path)
@@ -0,0 +1,91 @@
+import urllib.request
+from pathlib import Path
+
+import core.operator as operator
+from utils import metrics
+from utils.metrics import Counter, Gauge, Histogram, Registry
+from tests.conftest import dummy_logger
+
+
+def test_text_format():
+    registry = Registry()
+    frames = registry.register(Counter("frames_total", "Frames.", ["model"]))
+    running = registry.register(Gauge("running", "Running."))
+    seconds = registry.register(Histogram("stage_seconds", "Stages.", ["stage"], buckets=(1, 10)))
+    frames.inc(3, model='a"b')
+    running.inc()
+    seconds.observe(0.5, stage="encoding")
+    seconds.observe(5, stage="encoding")
+    assert registry.render() == "\n".join([
+        "# HELP frames_total Frames.",
+        "# TYPE frames_total counter",
+        'frames_total{model="a\\"b"} 3',
+        "# HELP running Running.",
+        "# TYPE running gauge",
+        "running 1",
+        "# HELP stage_seconds Stages.",
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="encoding",le="1"} 1',
+        'stage_seconds_bucket{stage="encoding",le="10"} 2',
+        'stage_seconds_bucket{stage="encoding",le="+Inf"} 2',
+        'stage_seconds_sum{stage="encoding"} 5.5',
+        'stage_seconds_count{stage="encoding"} 2',
+    ]) + "\n"
+
+
+def test_operator_feeds_job_and_stage_metrics(tmp_path, monkeypatch):
+    img = tmp_path / "test.png"
+    img.write_text("data")
+    monkeypatch.setattr(operator, "create_temp_folder", lambda **k: str(tmp_path / "temp"))
+    (tmp_path / "temp").mkdir()
+    monkeypatch.setattr(operator, "process_image", lambda d, out, logger=None: Path(out).write_text("x"))
+    monkeypatch.setattr(operator, "run_upscaling", lambda *a, **k: {"success": True})
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+    finished = metrics.JOBS_FINISHED.value(status="success")
+    stages = metrics.STAGE_SECONDS.count(stage="upscaling")
+
+    operator.process_request({
+        "input_path": str(img), "input_format": "png", "output_format": "png", "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "x"}, "interpolation": {"enabled": False},
+        "output_path": str(tmp_path / "out"), "log_path": str(tmp_path / "log.txt"),
+    })
+    assert metrics.JOBS_FINISHED.value(status="success") == finished + 1
+    assert metrics.STAGE_SECONDS.count(stage="upscaling") == stages + 1
+    assert metrics.JOBS_RUNNING.value() == 0
+    assert metrics.TEMP_DISK.value() == 0
+
+
+def test_http_endpoint_and_file(tmp_path):
+    server = metrics.start_http_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode("utf-8")
+            assert response.headers["Content-Type"].startswith("text/plain")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert "# TYPE fusion2x_jobs_started_total counter" in body
+    assert "fusion2x_child_processes 0" in body
+
+    path = tmp_path / "metrics" / "fusion2x.prom"
+    metrics.write_text_file(str(path))
+    assert "fusion2x_jobs_running" in path.read_text()
+
+
+def test_metrics_port_in_use_does_not_stop_the_receiver(monkeypatch):
+    import receiver
+
+    warnings = []
+    logger = dummy_logger()
+    logger.warning = warnings.append
+    server = metrics.start_http_server(0)
+    try:
+        # A second receiver started by the GUI with the same FUSION2X_METRICS_PORT
+        monkeypatch.setenv("FUSION2X_METRICS_PORT", str(server.server_address[1]))
+        monkeypatch.delenv("FUSION2X_METRICS_FILE", raising=False)
+        assert receiver.start_metrics(None, logger) is None
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(warnings) == 1 and "not served" in warnings[0]
@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+
+import pytest
+
+from core import model_batcher
+from core.model_batcher import ModelBatcher, batched, model_batching
+from utils.process_utils import ModelProcessError
+from tests.conftest import dummy_logger
+
+
+def make_frames(frame_dir, texts):
+    os.makedirs(frame_dir)
+    for i, text in enumerate(texts, 1):
+        with open(os.path.join(frame_dir, f"frame_{i:06d}.png"), "w") as f:
+            f.write(text)
+
+
+def fake_model(calls, fail_after=None):
+    """In-place 'upscaler': replaces every frame with its text upper-cased."""
+    def run(frame_dir, params, logger):
+        calls.append(sorted(os.listdir(frame_dir)))
+        for n, name in enumerate(sorted(os.listdir(frame_dir))):
+            if fail_after is not None and n >= fail_after:
+                raise ModelProcessError("vkAllocateMemory failed", 255)
+            path = os.path.join(frame_dir, name)
+            with open(path) as f:
+                text = f.read()
+            os.remove(path)
+            with open(path, "w") as f:
+                f.write(text.upper())
+    return run
+
+
+def run_jobs(batcher, model, dirs, window=5):
+    errors = {}
+
+    def job(frame_dir):
+        try:
+            batcher.run(("m", "{}"), model, frame_dir, {}, dummy_logger(), window, expected=True)
+        except ModelProcessError as e:
+            errors[frame_dir] = e
+
+    # Every job is in the stage (e.g. still probing its frames) before the first one reaches the model
+    for _ in dirs:
+        batcher.expect(("m", "{}"))
+    threads = [threading.Thread(target=job, args=(d,)) for d in dirs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def read(frame_dir):
+    return {name: open(os.path.join(frame_dir, name)).read() for name in sorted(os.listdir(frame_dir))}
+
+
+def test_concurrent_jobs_share_one_model_run(tmp_path):
+    a, b = str(tmp_path / "a" / "frames"), str(tmp_path / "b" / "frames")
+    make_frames(a, ["a1", "a2"])
+    make_frames(b, ["b1"])
+    calls = []
+    start = time.monotonic()
+    assert run_jobs(ModelBatcher(), fake_model(calls), [a, b]) == {}
+    # The leader stops waiting as soon as every running job joined
+    assert time.monotonic() - start < 4
+    assert len(calls) == 1 and len(calls[0]) == 3
+    assert read(a) == {"frame_000001.png": "A1", "frame_000002.png": "A2"}
+    assert read(b) == {"frame_000001.png": "B1"}
+    # No staging directories left behind
+    assert sorted(os.listdir(tmp_path / "a")) == ["frames"]
+
+
+def test_failed_combined_run_returns_partial_output_and_error(tmp_path):
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+    make_frames(a, ["a1", "a2"])
+    make_frames(b, ["b1", "b2"])
+    errors = run_jobs(ModelBatcher(), fake_model([], fail_after=1), [a, b])
+    assert set(errors) == {a, b}
+    assert errors[a] is not errors[b]
+    assert errors[a].returncode == 255
+    # The one frame finished before the failure went back to its job; the rest are untouched
+    texts = sorted(list(read(a).values()) + list(read(b).values()))
+    assert texts in (["A1", "a2", "b1", "b2"], ["B1", "a1", "a2", "b2"])
+
+
+def test_batching_is_off_without_a_window(tmp_path):
+    def model(frame_dir, params, logger):
+        pass
+    assert batched("m", model) is model
+    with model_batching(0.5):
+        assert batched("m", model) is not model
+    assert model_batcher.BATCHER._expected == {}
+
+
+def test_single_job_runs_without_waiting(tmp_path):
+    a = str(tmp_path / "a")
+    make_frames(a, ["a1"])
+    calls = []
+    start = time.monotonic()
+    with model_batching(30):
+        batched("m", fake_model(calls))(frame_dir=a, params={}, logger=dummy_logger())
+    assert time.monotonic() - start < 5
+    assert calls == [["frame_000001.png"]]
+    with pytest.raises(ModelProcessError):
+        with model_batching(30):
+            batched("m", fake_model([], fail_after=0))(frame_dir=a, params={}, logger=dummy_logger())
+
+
+def test_only_jobs_headed_for_the_same_run_are_waited_for(tmp_path):
+    a, b = str(tmp_path / "a"), str(tmp_path / "b")
+    make_frames(a, ["a1"])
+    make_frames(b, ["b1"])
+    calls = []
+    in_stage, release = threading.Event(), threading.Event()
+
+    def other_job():
+        # Same model, other params: a different run, so it must not hold up job A
+        with model_batching(30), model_batcher.batch_stage("m", {"scale": 4}):
+            in_stage.set()
+            release.wait(10)
+    other = threading.Thread(target=other_job)
+    other.start()
+    try:
+        assert in_stage.wait(5)
+        start = time.monotonic()
+        with model_batching(30), model_batcher.batch_stage("m", {}):
+            run = batched("m", fake_model(calls))
+            run(frame_dir=a, params={}, logger=dummy_logger())
+            # A rerun of the same key waits for nobody either
+            run(frame_dir=b, params={}, logger=dummy_logger())
+        assert time.monotonic() - start < 5
+    finally:
+        release.set()
+        other.join()
+    assert len(calls) == 2
+    assert model_batcher.BATCHER._expected == {}
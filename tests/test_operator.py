@@ -3,19 +3,7 @@ from pathlib import Path
 import builtins
 
 import core.operator as operator
-
-
-def dummy_logger():
-    class Dummy:
-        def info(self, *args, **kwargs):
-            pass
-        def error(self, *args, **kwargs):
-            pass
-        def warning(self, *args, **kwargs):
-            pass
-        def debug(self, *args, **kwargs):
-            pass
-    return Dummy()
+from tests.conftest import dummy_logger
 
 
 def test_process_request_returns_existing_output(tmp_path, monkeypatch):
@@ -105,3 +93,244 @@ def test_process_request_respects_output_format(tmp_path, monkeypatch):
     assert Path(result["output_path"]).exists()
     assert Path(result["output_path"]).suffix == ".jpg"
     assert Path(result["output_path"]).parent == output_dir
+
+
+def test_process_request_fuses_filter_stages(tmp_path, monkeypatch):
+    video = tmp_path / "clip.mp4"
+    video.write_text("data")
+    output_dir = tmp_path / "out3"
+    temp_dir = tmp_path / "temp3"
+
+    def fake_create_temp_folder(*args, **kwargs):
+        temp_dir.mkdir(exist_ok=True)
+        return str(temp_dir)
+    monkeypatch.setattr(operator, "create_temp_folder", fake_create_temp_folder)
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+    monkeypatch.setattr(operator, "probe_video", lambda *a, **k: {"resolution": "640x360", "fps": 24, "fps_fraction": "24/1"})
+
+    def fail(*a, **k):
+        raise AssertionError("frames should not be extracted")
+    monkeypatch.setattr(operator, "extract_frames", fail)
+
+    transcoded = {}
+    def fake_transcode(input_path, output_path, filters, format="mp4", preset=None, logger=None):
+        transcoded["filters"] = filters
+        transcoded["preset"] = preset
+        Path(output_path).write_text("video")
+    monkeypatch.setattr(operator, "transcode_video", fake_transcode)
+
+    request = {
+        "input_path": str(video),
+        "input_format": "mp4",
+        "output_format": "mp4",
+        "task": "both",
+        "upscaling": {"enabled": True, "model_name": "ffmpeg-scale", "params": {"scale": 2}},
+        "interpolation": {"enabled": True, "model_name": "ffmpeg-framerate", "params": {"times": 2}},
+        "pipeline": {"encoder_preset": "veryfast"},
+        "output_path": str(output_dir),
+        "log_path": str(tmp_path / "log3.txt"),
+    }
+
+    result = operator.process_request(request)
+
+    assert result["status"] == "success"
+    assert transcoded["filters"] == ["scale=iw*2:ih*2:flags=lanczos", "framerate=fps=48"]
+    assert transcoded["preset"] == "veryfast"
+    assert Path(result["output_path"]).exists()
+
+
+def test_webm_input_is_processed_and_planned_as_video(tmp_path, monkeypatch):
+    video = tmp_path / "clip.webm"
+    video.write_text("data")
+    temp_dir = tmp_path / "temp_webm"
+
+    def fake_create_temp_folder(*args, **kwargs):
+        temp_dir.mkdir(exist_ok=True)
+        return str(temp_dir)
+    monkeypatch.setattr(operator, "create_temp_folder", fake_create_temp_folder)
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+    monkeypatch.setattr(operator, "probe_video", lambda *a, **k: {
+        "resolution": "640x360", "fps": 24, "fps_fraction": "24/1", "frame_count": 48})
+    monkeypatch.setattr(operator, "transcode_video",
+                        lambda input_path, output_path, *a, **k: Path(output_path).write_text("video"))
+    request = {
+        "input_path": str(video), "input_format": "webm", "output_format": "webm", "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "ffmpeg-scale", "params": {"scale": 2}},
+        "output_path": str(tmp_path / "out"), "log_path": str(tmp_path / "log_webm.txt"),
+    }
+    assert operator.process_request(request)["status"] == "success"
+    assert operator.plan_request(request, logger=dummy_logger())["status"] == "success"
+
+
+def test_failed_and_cancelled_jobs_remove_temp_folder(tmp_path, monkeypatch):
+    img = tmp_path / "test.png"
+    img.write_text("data")
+    temp_dir = tmp_path / "temp"
+
+    def fake_create_temp_folder(*args, **kwargs):
+        temp_dir.mkdir(exist_ok=True)
+        return str(temp_dir)
+    monkeypatch.setattr(operator, "create_temp_folder", fake_create_temp_folder)
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+
+    def cancelled(*a, **k):
+        raise operator.JobCancelled("Job cancelled (SIGTERM).")
+
+    request = {
+        "input_path": str(img),
+        "input_format": "png",
+        "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "x"},
+        "interpolation": {"enabled": False},
+        "output_format": "png",
+        "output_path": str(tmp_path / "out"),
+        "log_path": str(tmp_path / "log.txt"),
+    }
+    monkeypatch.setattr(operator, "run_upscaling", lambda *a, **k: {"success": False, "message": "boom"})
+    assert operator.process_request(request)["status"] == "error"
+    assert not temp_dir.exists()
+
+    monkeypatch.setattr(operator, "run_upscaling", cancelled)
+    result = operator.process_request(request)
+    assert result["status"] == "cancelled"
+    assert not temp_dir.exists()
+
+    request["misc"] = {"keep_temp": True}
+    operator.process_request(request)
+    assert temp_dir.exists()
+
+
+def test_stage_limit_reads_global_or_per_stage_values():
+    pipeline = {"stage_timeout": {"upscaling": 600}, "idle_timeout": 30}
+    assert operator.stage_limit(pipeline, "stage_timeout", "upscaling") == 600.0
+    assert operator.stage_limit(pipeline, "stage_timeout", "encoding") is None
+    assert operator.stage_limit(pipeline, "idle_timeout", "encoding") == 30.0
+
+
+def test_renditions_come_from_one_transcode_and_are_reused(tmp_path, monkeypatch):
+    video = tmp_path / "clip.mp4"
+    video.write_text("data")
+    output_dir = tmp_path / "out_renditions"
+
+    def fake_create_temp_folder(*args, **kwargs):
+        temp_dir = tmp_path / f"temp_{len(calls)}"
+        temp_dir.mkdir(exist_ok=True)
+        return str(temp_dir)
+    monkeypatch.setattr(operator, "create_temp_folder", fake_create_temp_folder)
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+    monkeypatch.setattr(operator, "probe_video", lambda *a, **k: {"resolution": "640x360", "fps": 24, "fps_fraction": "24/1"})
+
+    calls = []
+    def fake_transcode_renditions(input_path, outputs, filters, preset=None, logger=None):
+        calls.append([(r["name"], r["scale"]) for r, _ in outputs])
+        for rendition, path in outputs:
+            Path(path).write_text(rendition["name"])
+    monkeypatch.setattr(operator, "transcode_renditions", fake_transcode_renditions)
+
+    request = {
+        "input_path": str(video),
+        "input_format": "mp4",
+        "output_format": "mp4",
+        "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "ffmpeg-scale", "params": {"scale": 2}},
+        "renditions": [{"name": "master"}, {"name": "proxy", "resolution": "480p", "container": "webm"}],
+        "output_path": str(output_dir),
+        "log_path": str(tmp_path / "log_renditions.txt"),
+    }
+
+    result = operator.process_request(request)
+
+    assert result["status"] == "success"
+    assert calls == [[("master", None), ("proxy", "-2:480")]]
+    assert set(result["outputs"]) == {"master", "proxy"}
+    assert result["outputs"]["proxy"].endswith("_proxy.webm")
+    assert Path(result["outputs"]["proxy"]).read_text() == "proxy"
+    assert result["output_path"] == result["outputs"]["master"]
+
+    # The identical job hands out every rendition without transcoding again
+    again = operator.process_request(dict(request, log_path=str(tmp_path / "log_again.txt")))
+    assert len(calls) == 1
+    assert again["outputs"] == result["outputs"]
+    # ...unless one of them is gone
+    os.remove(result["outputs"]["proxy"])
+    operator.process_request(dict(request, log_path=str(tmp_path / "log_third.txt")))
+    assert len(calls) == 2
+
+
+def test_frame_store_reencodes_untouched_video_without_frame_files(tmp_path, monkeypatch):
+    video = tmp_path / "clip.mp4"
+    video.write_text("data")
+    temp_dir = tmp_path / "temp_store"
+
+    def fake_create_temp_folder(*args, **kwargs):
+        temp_dir.mkdir(exist_ok=True)
+        return str(temp_dir)
+    monkeypatch.setattr(operator, "create_temp_folder", fake_create_temp_folder)
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+    monkeypatch.setattr(operator, "probe_video", lambda *a, **k: {
+        "resolution": "4x2", "fps": 24, "fps_fraction": "24/1", "frame_count": 3})
+
+    def fail(*a, **k):
+        raise AssertionError("frames should not be extracted")
+    monkeypatch.setattr(operator, "extract_frames", fail)
+
+    def fake_decode(video_path, store, logger=None):
+        for i in range(3):
+            store.write(i, bytes([i]) * store.frame_size)
+        return 3
+    monkeypatch.setattr(operator, "decode_to_store", fake_decode)
+    encoded = {}
+
+    def fake_encode(store, output_path, fps=30, format="mp4", preset=None, logger=None):
+        encoded.update(path=store.path, frames=store.written_count(), fps=fps, preset=preset)
+        Path(output_path).write_text("video")
+        return encoded["frames"]
+    monkeypatch.setattr(operator, "encode_from_store", fake_encode)
+
+    request = {
+        "input_path": str(video), "input_format": "mp4", "output_format": "mp4", "task": "upscaling",
+        "upscaling": {"enabled": False}, "interpolation": {"enabled": False},
+        "pipeline": {"frame_store": True, "encoder_preset": "veryfast"},
+        "output_path": str(tmp_path / "out_store"), "log_path": str(tmp_path / "log_store.txt"),
+    }
+    result = operator.process_request(request)
+
+    assert result["status"] == "success"
+    assert encoded == {"path": str(temp_dir / "frames.f2x"), "frames": 3, "fps": "24/1", "preset": "veryfast"}
+    assert Path(result["output_path"]).exists()
+
+
+def test_video_job_probes_the_input_once(tmp_path, monkeypatch):
+    from media import video_decoder
+    video = tmp_path / "clip.mp4"
+    video.write_text("data")
+    temp_dir = tmp_path / "temp_probe"
+
+    def fake_create_temp_folder(*args, **kwargs):
+        temp_dir.mkdir(exist_ok=True)
+        return str(temp_dir)
+    monkeypatch.setattr(operator, "create_temp_folder", fake_create_temp_folder)
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+    probes = []
+
+    def fake_probe(*a, **k):
+        probes.append(a[0])
+        return {"resolution": "640x360", "fps": 24, "fps_fraction": "24/1", "duration": 0.125, "frame_count": 3}
+    monkeypatch.setattr(operator, "probe_video", fake_probe)
+    monkeypatch.setattr(video_decoder, "probe_video", fake_probe)
+    monkeypatch.setattr(video_decoder, "require_binaries", lambda names: None)
+
+    def fake_decode(cmd, **k):
+        for i in range(1, 4):
+            Path(cmd[-4].replace("%06d", f"{i:06d}")).write_text("frame")
+    monkeypatch.setattr(video_decoder, "run_process", fake_decode)
+    monkeypatch.setattr(operator, "run_upscaling", lambda *a, **k: {"success": True})
+    monkeypatch.setattr(operator, "encode_video", lambda frames_dir, output_path, **k: Path(output_path).write_text("v"))
+
+    request = {
+        "input_path": str(video), "input_format": "mp4", "output_format": "mp4", "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 2}},
+        "output_path": str(tmp_path / "out_probe"), "log_path": str(tmp_path / "log_probe.txt"),
+    }
+    assert operator.process_request(request)["status"] == "success"
+    assert probes == [str(video)]
@@ -1,9 +1,12 @@
+import os
+import sys
+import time
 import types
-import subprocess
 import pytest
 
 from utils import process_utils
 from utils import env_setup
+from utils import signal_utils
 
 class DummyLogger:
     def info(self, *a, **k):
@@ -12,10 +15,12 @@ class DummyLogger:
         pass
     def warning(self, *a, **k):
         pass
+    def debug(self, *a, **k):
+        pass
 
 def test_run_model_command_missing_runtime(monkeypatch):
     result = types.SimpleNamespace(returncode=3221225477, stdout='', stderr='')
-    monkeypatch.setattr(subprocess, 'run', lambda *a, **k: result)
+    monkeypatch.setattr(process_utils, 'run_process', lambda *a, **k: result)
     monkeypatch.setattr(env_setup, 'vc_runtime_installed', lambda: False)
     monkeypatch.setattr(env_setup, 'vulkan_available', lambda: True)
     with pytest.raises(RuntimeError) as exc:
@@ -24,7 +29,7 @@ def test_run_model_command_missing_runtime(monkeypatch):
 
 def test_run_model_command_gpu_issue(monkeypatch):
     result = types.SimpleNamespace(returncode=3221225477, stdout='', stderr='')
-    monkeypatch.setattr(subprocess, 'run', lambda *a, **k: result)
+    monkeypatch.setattr(process_utils, 'run_process', lambda *a, **k: result)
     monkeypatch.setattr(env_setup, 'vc_runtime_installed', lambda: True)
     monkeypatch.setattr(env_setup, 'vulkan_available', lambda: False)
     with pytest.raises(RuntimeError) as exc:
@@ -34,10 +39,82 @@ def test_run_model_command_gpu_issue(monkeypatch):
 
 def test_run_model_command_unknown_issue(monkeypatch):
     result = types.SimpleNamespace(returncode=3221225477, stdout='', stderr='')
-    monkeypatch.setattr(subprocess, 'run', lambda *a, **k: result)
+    monkeypatch.setattr(process_utils, 'run_process', lambda *a, **k: result)
     monkeypatch.setattr(env_setup, 'vc_runtime_installed', lambda: True)
     monkeypatch.setattr(env_setup, 'vulkan_available', lambda: True)
     with pytest.raises(RuntimeError) as exc:
         process_utils.run_model_command(['fake'], DummyLogger())
     assert 'graphics drivers' in str(exc.value)
-utils/env_setup.py
+
+
+def test_run_model_command_error_keeps_output(monkeypatch):
+    result = types.SimpleNamespace(returncode=255, stdout='', stderr='vkAllocateMemory failed -2')
+    monkeypatch.setattr(process_utils, 'run_process', lambda *a, **k: result)
+    with pytest.raises(process_utils.ModelProcessError) as exc:
+        process_utils.run_model_command(['fake'], DummyLogger())
+    assert exc.value.returncode == 255
+    assert 'vkAllocateMemory' in exc.value.stderr
+    assert isinstance(exc.value, RuntimeError)
+
+
+def python_cmd(code):
+    return [sys.executable, "-c", code]
+
+
+def test_run_process_captures_output():
+    result = process_utils.run_process(python_cmd("print('hi')"), capture_output=True, text=True)
+    assert result.returncode == 0
+    assert result.stdout.strip() == "hi"
+
+
+def test_timeout_stops_the_whole_process_group(tmp_path):
+    pid_file = tmp_path / "grandchild.pid"
+    # The child starts a grandchild that would outlive it, then hangs
+    code = (
+        "import subprocess, sys, time;"
+        "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)']);"
+        f"open({str(pid_file)!r}, 'w').write(str(p.pid));"
+        "time.sleep(60)"
+    )
+    start = time.monotonic()
+    with pytest.raises(process_utils.ProcessTimeout) as exc:
+        process_utils.run_process(python_cmd(code), timeout=1.5)
+    assert time.monotonic() - start < 10
+    assert "time limit" in str(exc.value)
+    if os.name != "nt":
+        grandchild = int(pid_file.read_text())
+        for _ in range(50):
+            try:
+                os.kill(grandchild, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.1)
+        else:
+            pytest.fail("grandchild still running")
+    assert not process_utils._children
+
+
+def test_idle_timeout_only_fires_without_activity(tmp_path):
+    with pytest.raises(process_utils.ProcessTimeout) as exc:
+        process_utils.run_process(python_cmd("import time; time.sleep(60)"), idle_timeout=0.5)
+    assert "no progress" in str(exc.value)
+
+    # Frames keep arriving in the watched directory: no timeout
+    code = (
+        "import time\n"
+        f"for i in range(8):\n    open({str(tmp_path)!r} + f'/frame_{{i}}.png', 'w').close(); time.sleep(0.2)"
+    )
+    result = process_utils.run_process(python_cmd(code), idle_timeout=0.6, watch=[str(tmp_path)])
+    assert result.returncode == 0
+
+
+def test_stage_limits_and_cancel():
+    with process_utils.process_limits(timeout=0.5):
+        with pytest.raises(process_utils.ProcessTimeout):
+            process_utils.run_process(python_cmd("import time; time.sleep(60)"))
+    signal_utils.request_cancel()
+    try:
+        with pytest.raises(signal_utils.JobCancelled):
+            process_utils.run_process(python_cmd("pass"))
+    finally:
+        signal_utils.reset_cancel()
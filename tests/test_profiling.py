@@ -0,0 +1,61 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+import core.operator as operator
+from utils import process_utils
+from utils.json_utils import validate_json_request
+from utils.profiling import profile_parts
+from tests.conftest import dummy_logger
+
+
+def test_profile_parts():
+    assert profile_parts(None) == ()
+    assert profile_parts(True) == ("cpu", "memory", "processes")
+    assert profile_parts("processes,cpu") == ("cpu", "processes")
+    with pytest.raises(ValueError):
+        profile_parts(["gpu"])
+    request = {"task": "upscaling", "input_format": "png", "output_format": "png", "input_path": "a.png",
+               "upscaling": {}, "misc": {"profile": ["gpu"]}}
+    assert validate_json_request(request)[0] is False
+
+
+def test_profiled_job_writes_files_next_to_log(tmp_path, monkeypatch):
+    img = tmp_path / "test.png"
+    img.write_text("data")
+    (tmp_path / "temp").mkdir()
+    monkeypatch.setattr(operator, "create_temp_folder", lambda **k: str(tmp_path / "temp"))
+    monkeypatch.setattr(operator, "process_image", lambda d, out, logger=None: Path(out).write_text("x"))
+    monkeypatch.setattr(operator, "get_logger", lambda *a, **k: dummy_logger())
+
+    def fake_upscaling(frame_dir, params, logger):
+        process_utils.run_process([sys.executable, "-c", "pass"])
+        return {"success": True}
+    monkeypatch.setattr(operator, "run_upscaling", fake_upscaling)
+
+    result = operator.process_request({
+        "input_path": str(img), "input_format": "png", "output_format": "png", "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "x"}, "interpolation": {"enabled": False},
+        "output_path": str(tmp_path / "out"), "log_path": str(tmp_path / "job.log"),
+        "misc": {"profile": True},
+    })
+    assert result["status"] == "success"
+    assert result["profile"] == {
+        "prof": str(tmp_path / "job.prof"),
+        "prof_summary": str(tmp_path / "job.prof.txt"),
+        "memory": str(tmp_path / "job.memory.txt"),
+        "trace": str(tmp_path / "job.trace.json"),
+    }
+    assert "cumulative" in (tmp_path / "job.prof.txt").read_text()
+    assert "upscaling end: current" in (tmp_path / "job.memory.txt").read_text()
+
+    events = json.loads((tmp_path / "job.trace.json").read_text())["traceEvents"]
+    spans = {(e["cat"], e["name"]) for e in events if e["ph"] == "X"}
+    assert ("stage", "upscaling") in spans
+    assert ("process", Path(sys.executable).name) in spans
+    child = next(e for e in events if e.get("cat") == "process")
+    stage = next(e for e in events if e.get("cat") == "stage")
+    assert child["args"]["returncode"] == 0
+    assert stage["ts"] <= child["ts"] and child["ts"] + child["dur"] <= stage["ts"] + stage["dur"]
@@ -0,0 +1,63 @@
+import io
+import os
+
+from core.operator import stage_progress_target
+from utils.progress import ProgressReporter, parse_progress_line, stderr_emitter
+
+
+def test_reporter_emits_stage_progress_and_eta():
+    events = []
+    reporter = ProgressReporter(events.append, min_interval=0)
+    reporter.start_stage("upscaling", total=10)
+    reporter._start -= 2  # pretend two seconds have passed
+    reporter.update(4)
+    reporter.update(4)  # unchanged count is not reported again
+    reporter.end_stage()
+
+    assert [e["event"] for e in events] == ["stage", "progress", "stage_done"]
+    progress = events[1]
+    assert progress["done"] == 4 and progress["total"] == 10
+    assert 1.9 < progress["fps"] < 2.1
+    assert 2.9 < progress["eta"] < 3.1
+    assert events[2]["done"] == 4
+
+
+def test_stage_monitor_counts_written_frames(tmp_path):
+    (tmp_path / "frame_000001.png").write_text("old")
+    events = []
+    reporter = ProgressReporter(events.append, min_interval=0)
+    with reporter.stage("interpolation", total=3, watch_dir=str(tmp_path), interval=0.01):
+        for i in range(2, 5):
+            (tmp_path / f"frame_{i:06d}.png").write_text("new")
+    assert events[-2]["event"] == "progress" and events[-2]["done"] == 3
+    assert events[-1] == {"event": "stage_done", "stage": "interpolation", "done": 3,
+                          "duration": events[-1]["duration"]}
+
+
+def test_disabled_reporter_does_not_monitor(tmp_path):
+    reporter = ProgressReporter()
+    with reporter.stage("upscaling", watch_dir=str(tmp_path), interval=0.01):
+        (tmp_path / "frame_000001.png").write_text("x")
+    assert not reporter.enabled
+
+
+def test_progress_lines_round_trip():
+    stream = io.StringIO()
+    stderr_emitter(stream)({"event": "stage", "stage": "encoding", "total": 5})
+    line = stream.getvalue()
+    assert parse_progress_line(line) == {"event": "stage", "stage": "encoding", "total": 5}
+    assert parse_progress_line("frame=  10 fps=0.0") is None
+    assert parse_progress_line("FUSION2X_PROGRESS {broken") is None
+
+
+def test_stage_progress_target(tmp_path):
+    frames = tmp_path / "frames"
+    frames.mkdir()
+    for i in range(1, 5):
+        (frames / f"frame_{i:06d}.png").write_text("x")
+    interpolation = {"params": {"times": 2}}
+    assert stage_progress_target("upscaling", str(frames), interpolation, "24") == (4, str(frames))
+    assert stage_progress_target("interpolation", str(frames), interpolation, "24") == (8, str(frames))
+    total, watch_dir = stage_progress_target("fused", str(frames), {"target_fps": "48"}, "24")
+    assert total == 8
+    assert watch_dir == os.path.join(str(frames) + "_fused", "output")
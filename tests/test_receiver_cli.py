@@ -1,4 +1,7 @@
+import os
+import subprocess
 import sys
+import time
 import types
 import json
 import pytest
@@ -52,7 +55,7 @@ def test_receiver_main_cli_success(monkeypatch, tmp_path, capsys):
     monkeypatch.setattr(sys, "argv", argv)
     # Skip validation of extra blocks
     monkeypatch.setattr(receiver, "validate_json_request", lambda req: (True, ""))
-    dummy_operator = types.SimpleNamespace(process_request=lambda req: {"status": "success", "output_path": "done"})
+    dummy_operator = types.SimpleNamespace(process_request=lambda req, **kwargs: {"status": "success", "output_path": "done"})
     monkeypatch.setitem(sys.modules, "core.operator", dummy_operator)
     # Run main
     receiver.main()
@@ -82,3 +85,103 @@ def test_receiver_main_cli_missing_argument(monkeypatch, tmp_path, capsys):
     data = json.loads(out)
     assert data["status"] == "error"
     assert "input_format" in data["message"]
+
+
+def test_receiver_main_directory_input_runs_batch(monkeypatch, tmp_path, capsys):
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    argv = ["receiver.py", "--task", "upscaling", "--input_path", str(in_dir),
+            "--output_path", str(tmp_path / "out"), "--output_format", "mp4", "--max_jobs", "3"]
+    monkeypatch.setattr(sys, "argv", argv)
+    seen = {}
+
+    def fake_process_directory(input_dir, template, output_dir, logger, max_jobs=2, on_result=None):
+        seen.update(input_dir=input_dir, template=template, max_jobs=max_jobs)
+        return {"status": "success", "message": "Processed 0 file(s)", "results": []}
+
+    dummy_batch = types.SimpleNamespace(process_directory=fake_process_directory, watch_directory=None)
+    monkeypatch.setitem(sys.modules, "core.watch_folder", dummy_batch)
+    receiver.main()
+    result = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert result["status"] == "success"
+    assert "results" not in result
+    assert seen["input_dir"] == str(in_dir)
+    assert seen["max_jobs"] == 3
+    assert seen["template"]["output_format"] == "mp4"
+
+
+def test_model_and_pipeline_flags_build_blocks(monkeypatch):
+    argv = ["receiver.py", "--task", "both", "--input_path", "in.mp4", "--input_format", "mp4",
+            "--output_format", "mp4",
+            "--upscaling_model_name", "realesrgan-ncnn-vulkan", "--upscaling_scale", "4",
+            "--upscaling_tile_size", "200", "--upscaling_threads", "1:2:2", "--upscaling_gpu_id", "0",
+            "--interpolation_model_name", "rife-ncnn-vulkan", "--interpolation_uhd_mode", "true",
+            "--interpolation_target_fps", "60000/1001",
+            "--chunk_size", "50", "--workers", "2", "--encoder_preset", "veryfast", "--fused_stage"]
+    monkeypatch.setattr(sys, "argv", argv)
+    req = receiver.build_json_from_args(receiver.parse_cli_args())
+    assert req["upscaling"] == {
+        "enabled": True,
+        "model_name": "realesrgan-ncnn-vulkan",
+        "params": {"scale": 4, "tile_size": 200, "threads": "1:2:2", "gpu_id": 0},
+    }
+    assert req["interpolation"] == {
+        "enabled": True,
+        "model_name": "rife-ncnn-vulkan",
+        "target_fps": "60000/1001",
+        "params": {"uhd_mode": True},
+    }
+    assert req["pipeline"] == {"fused_stage": True, "chunk_size": 50, "workers": 2, "encoder_preset": "veryfast"}
+
+
+def test_cli_flags_override_config_file(monkeypatch, tmp_path):
+    config = tmp_path / "job.json"
+    config.write_text(json.dumps({
+        "task": "upscaling",
+        "upscaling": {"enabled": True, "model_name": "realesrgan-ncnn-vulkan", "params": {"scale": 2, "model": "x"}},
+    }))
+    merged = receiver.merge_requests(
+        json.loads(config.read_text()), {"upscaling": {"enabled": True, "params": {"scale": 4}}}
+    )
+    assert merged["upscaling"]["params"] == {"scale": 4, "model": "x"}
+    assert merged["upscaling"]["model_name"] == "realesrgan-ncnn-vulkan"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="the fake model executable is a script with a shebang")
+def test_cancel_line_on_stdin_stops_the_job_and_its_children(tmp_path):
+    pid_file = tmp_path / "model.pid"
+    fake_exe = tmp_path / "realesrgan-ncnn-vulkan"
+    fake_exe.write_text(f"#!{sys.executable}\n"
+                        f"import os, time\nopen({str(pid_file)!r}, 'w').write(str(os.getpid()))\ntime.sleep(60)\n")
+    fake_exe.chmod(0o755)
+    image = tmp_path / "in.png"
+    image.write_bytes(b"png")
+    request = {
+        "task": "upscaling", "input_path": str(image), "input_format": "png", "output_format": "png",
+        "output_path": str(tmp_path / "out"),
+        "upscaling": {"enabled": True, "model_name": "realesrgan-ncnn-vulkan",
+                      "params": {"realesrgan_exe_path": str(fake_exe)}},
+    }
+    env = dict(os.environ, FUSION2X_CONTROL_STDIN="1", FUSION2X_LOG_PATH=str(tmp_path / "job.log"))
+    proc = subprocess.Popen([sys.executable, "receiver.py"], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        proc.stdin.write(json.dumps(request) + "\n")
+        proc.stdin.flush()
+        deadline = time.monotonic() + 30
+        while not pid_file.exists() or not pid_file.read_text():
+            assert time.monotonic() < deadline, "the model never started"
+            time.sleep(0.05)
+        model_pid = int(pid_file.read_text())
+
+        proc.stdin.write("cancel\n")
+        proc.stdin.flush()
+        stdout, _ = proc.communicate(timeout=30)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    assert json.loads(stdout.splitlines()[-1])["status"] == "cancelled"
+    with pytest.raises(ProcessLookupError):
+        os.kill(model_pid, 0)
+    # The job's temp folder next to the input is gone as well
+    assert not [p for p in tmp_path.iterdir() if p.is_dir()]
@@ -0,0 +1,55 @@
+import pytest
+
+from media import video_encoder
+from media.renditions import rendition_settings
+
+
+def test_renditions_share_one_ffmpeg_process(tmp_path, monkeypatch):
+    request = {"output_format": "mp4", "renditions": [
+        {"name": "master", "codec": "hevc", "bitrate": "40M", "container": "mkv"},
+        {"resolution": "1080p", "bitrate": "8M"},
+        {"name": "proxy", "resolution": "854x480", "container": "webm", "codec": "vp9"},
+    ]}
+    renditions = rendition_settings(request)
+    assert [(r["name"], r["scale"], r["codec"], r["container"]) for r in renditions] == [
+        ("master", None, "libx265", "mkv"), ("1080p", "-2:1080", "libx264", "mp4"),
+        ("proxy", "854:480", "libvpx-vp9", "webm")]
+    commands = []
+    monkeypatch.setattr(video_encoder, "require_binaries", lambda names: None)
+    monkeypatch.setattr(video_encoder, "run_process", lambda cmd, **k: commands.append(cmd))
+
+    outputs = [(r, str(tmp_path / f"{r['name']}.{r['container']}")) for r in renditions]
+    video_encoder.encode_renditions(str(tmp_path), outputs, fps=24, filters=["framerate=fps=48"],
+                                    preset="veryfast", frame_format="webp")
+    [cmd] = commands
+    assert cmd.count("-i") == 1 and cmd[cmd.index("-i") + 1].endswith("frame_%06d.webp")
+    assert cmd[cmd.index("-filter_complex") + 1] == (
+        "[0:v]framerate=fps=48,split=3[s0][s1][s2];[s0]null[v0];[s1]scale=-2:1080[v1];[s2]scale=854:480[v2]")
+    master = cmd[cmd.index("[v0]"):cmd.index(outputs[0][1]) + 1]
+    assert master == ["[v0]", "-c:v", "libx265", "-pix_fmt", "yuv420p", "-preset", "veryfast",
+                      "-b:v", "40M", "-y", outputs[0][1]]
+    proxy = cmd[cmd.index("[v2]"):]
+    assert "-preset" not in proxy and proxy[-1] == outputs[2][1]
+
+    for bad in ({"container": "flv"}, {"resolution": "big"}, {"bitrate": "fast"}, {"name": "../x"}):
+        with pytest.raises(ValueError):
+            rendition_settings({"output_format": "mp4", "renditions": [bad]})
+    with pytest.raises(ValueError, match="unique"):
+        rendition_settings({"output_format": "mp4", "renditions": [{"resolution": "480p"}, {"name": "480p"}]})
+
+
+def test_codecs_must_fit_the_container():
+    def codecs(*renditions):
+        return [r["codec"] for r in rendition_settings({"output_format": "mp4", "renditions": list(renditions)})]
+
+    # webm holds VP9/AV1 only: it defaults to VP9 instead of x264
+    assert codecs({"container": "webm"}, {"container": "mkv", "codec": "av1"}, {"container": "gif"}) == [
+        "libvpx-vp9", "libsvtav1", "libx264"]
+    # Encoder names the table does not know are left to ffmpeg
+    assert codecs({"container": "avi", "codec": "mpeg4"}) == ["mpeg4"]
+    for container, codec in (("webm", "h264"), ("webm", "hevc"), ("avi", "hevc"), ("mov", "vp9")):
+        with pytest.raises(ValueError, match="cannot be stored"):
+            codecs({"container": container, "codec": codec})
+    # The single-output encode picks the container's codec the same way
+    assert video_encoder._codec_args("webm", "veryfast") == ["-c:v", "libvpx-vp9", "-pix_fmt", "yuv420p"]
+    assert video_encoder._codec_args("mp4", "veryfast")[-2:] == ["-preset", "veryfast"]
@@ -0,0 +1,59 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from core.ring_buffer import FrameRing, RingClosed
+
+
+def _produce(ring, count):
+    for i in range(count):
+        index = ring.acquire_write(timeout=10)
+        ring.slot(index)[:4] = bytes([i % 256]) * 4
+        ring.commit_write(index, 4)
+    ring.close_writer()
+
+
+def test_ring_passes_frames_in_order_and_blocks_when_full():
+    ring = FrameRing(slots=2, slot_size=8)
+    try:
+        ring.commit_write(ring.acquire_write(), 1)
+        ring.commit_write(ring.acquire_write(), 1)
+        # Both slots are full: the producer must wait for the consumer
+        with pytest.raises(RingClosed):
+            ring.acquire_write(timeout=0.05)
+        index, nbytes = ring.acquire_read()
+        assert (index, nbytes) == (0, 1)
+        ring.release_read(index)
+        index, _ = ring.acquire_read()
+        ring.release_read(index)
+        assert ring.wait_drained(timeout=1)
+
+        producer = threading.Thread(target=_produce, args=(ring, 50))
+        producer.start()
+        received = []
+        for frame in ring.frames(timeout=10):
+            received.append(bytes(frame))
+            frame.release()
+        producer.join()
+        assert received == [bytes([i]) * 4 for i in range(50)]
+        assert ring.acquire_read(timeout=1) is None
+    finally:
+        ring.close()
+
+
+def test_ring_shared_with_a_child_process():
+    ctx = multiprocessing.get_context("spawn")
+    ring = FrameRing(slots=3, slot_size=4, ctx=ctx)
+    try:
+        producer = ctx.Process(target=_produce, args=(ring, 20))
+        producer.start()
+        received = []
+        for frame in ring.frames(timeout=30):
+            received.append(frame[0])
+            frame.release()
+        producer.join(timeout=30)
+        assert producer.exitcode == 0
+        assert received == list(range(20))
+    finally:
+        ring.close()
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generous budget for cumulative import time; a cold import is well under 0.1s
+IMPORT_BUDGET_US = 500_000
+
+
+def _importtime(module, cwd):
+    """Import module in a fresh interpreter; returns ({module: cumulative us}, stderr)."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    env.pop("FUSION2X_LOG_PATH", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    assert proc.returncode == 0, proc.stderr
+    times = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            try:
+                times[name.strip()] = int(cumulative)
+            except ValueError:
+                pass  # header line
+    return times, proc.stderr
+
+
+@pytest.mark.parametrize("module", ["receiver", "core.operator"])
+def test_import_has_no_side_effects_and_stays_lazy(module, tmp_path):
+    times, _ = _importtime(module, tmp_path)
+    # No log files (or anything else) written at import
+    assert os.listdir(tmp_path) == []
+    # Model backends load on first use, not at import
+    assert not [name for name in times if name.startswith("handlers.models.")]
+    assert "urllib.request" not in times
+    assert times[module] < IMPORT_BUDGET_US
+
+
+def test_registry_loads_model_module_on_lookup():
+    from handlers.registry import ModelRegistry, lazy
+
+    sys.modules.pop("colorsys", None)
+    registry = ModelRegistry({"fake": lazy("colorsys", "rgb_to_hsv", "ONE_THIRD")})
+    assert "fake" in registry
+    assert list(registry) == ["fake"]
+    assert "colorsys" not in sys.modules
+    runner, constant = registry["fake"]
+    assert runner.__name__ == "rgb_to_hsv"
+    assert constant == 1.0 / 3.0
+    registry["other"] = ("runner", [])
+    assert registry["other"] == ("runner", [])
+    del registry["other"]
+    assert "other" not in registry
+
+
+def test_model_flags_are_built_without_importing_the_runners(tmp_path):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    code = "\n".join([
+        "import argparse, sys, receiver",
+        "from handlers.upscaling_handler import MODEL_REGISTRY as up",
+        "from handlers.interpolation_handler import MODEL_REGISTRY as interp",
+        "receiver.add_model_arguments(argparse.ArgumentParser())",
+        "print(sorted(m for m in sys.modules if m.startswith('handlers.models.')))",
+        "static = [{name: r.supported_params(name) for name in r} for r in (up, interp)]",
+        # The params read from the source are the lists the runners are registered with
+        "print(static == [{name: list(r[name][1]) for name in r} for r in (up, interp)])",
+    ])
+    proc = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.split("\n")[:2] == ["[]", "True"]
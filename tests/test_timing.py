@@ -0,0 +1,111 @@
+import os
+from fractions import Fraction
+
+from handlers import interpolation_handler
+from utils.timing import parse_fps, format_rate, plan_interpolation
+from tests.conftest import dummy_logger
+
+
+def make_frames(frame_dir, count):
+    frame_dir.mkdir()
+    for i in range(1, count + 1):
+        (frame_dir / f"frame_{i:06d}.png").write_text(str(i))
+
+
+def test_parse_fps_snaps_ntsc_rates():
+    assert parse_fps(23.976) == Fraction(24000, 1001)
+    assert parse_fps("30000/1001") == Fraction(30000, 1001)
+    assert parse_fps(60) == Fraction(60)
+    assert format_rate(Fraction(60000, 1001)) == "60000/1001"
+    assert format_rate(Fraction(60)) == "60"
+
+
+def test_plan_23976_to_60_only_needs_few_timesteps():
+    plan = plan_interpolation(400, "24000/1001", 60)
+    assert plan["ratio"] == Fraction(1001, 400)
+    assert len(plan["frames"]) == 1001
+    assert plan["frames"][0] == (0, 0)
+    assert plan["frames"][1] == (0, Fraction(400, 1001))
+    # Only the final hold repeats a frame; nothing is generated twice
+    assert plan["frames"][-2:] == [(399, 0), (399, 0)]
+    assert len(set(plan["frames"])) == len(plan["frames"]) - 1
+
+
+def test_plan_integer_multiple_holds_last_frame():
+    plan = plan_interpolation(3, 30, 60)
+    assert plan["frames"] == [
+        (0, 0), (0, Fraction(1, 2)), (1, 0), (1, Fraction(1, 2)), (2, 0), (2, 0)
+    ]
+    assert plan["timesteps"] == [Fraction(1, 2)]
+
+
+def test_run_interpolation_reports_output_fps(tmp_path, monkeypatch):
+    frame_dir = tmp_path / "frames"
+    make_frames(frame_dir, 2)
+    monkeypatch.setitem(interpolation_handler.MODEL_REGISTRY, "noop", (lambda **k: None, ["times"]))
+    res = interpolation_handler.run_interpolation(
+        str(frame_dir), {"model_name": "noop", "params": {"times": 2}}, dummy_logger(), source_fps="24000/1001"
+    )
+    assert res["output_fps"] == "48000/1001"
+
+
+def test_target_fps_passes_timesteps_to_capable_models(tmp_path, monkeypatch):
+    frame_dir = tmp_path / "frames"
+    make_frames(frame_dir, 4)
+    seen = {}
+
+    def fake_model(frame_dir, params, logger):
+        seen.update(params)
+
+    monkeypatch.setitem(interpolation_handler.MODEL_REGISTRY, "ts-model", (fake_model, ["timesteps", "times"]))
+    res = interpolation_handler.run_interpolation(
+        str(frame_dir), {"model_name": "ts-model", "target_fps": 60, "params": {"times": 4}},
+        dummy_logger(), source_fps=24,
+    )
+    assert res["success"] is True
+    assert res["output_fps"] == "60"
+    assert "times" not in seen
+    assert len(seen["timesteps"]) == 10
+    assert seen["timesteps"][1] == [0, 0.4]
+
+
+def test_target_fps_selects_frames_for_multiplier_only_models(tmp_path, monkeypatch):
+    frame_dir = tmp_path / "frames"
+    make_frames(frame_dir, 2)
+
+    def fake_model(frame_dir, params, logger):
+        # rife-style: len(inputs) * times frames under new names
+        for i in range(2 * params["times"]):
+            with open(os.path.join(frame_dir, f"{i + 1:08d}.png"), "w") as f:
+                f.write(f"out{i}")
+
+    monkeypatch.setitem(interpolation_handler.MODEL_REGISTRY, "x-model", (fake_model, ["times"]))
+    res = interpolation_handler.run_interpolation(
+        str(frame_dir), {"model_name": "x-model", "target_fps": 50, "params": {}},
+        dummy_logger(), source_fps=20,
+    )
+    assert res["success"] is True
+    assert res["output_fps"] == "50"
+    # x3 was generated; 5 frames are kept at their exact times
+    assert sorted(os.listdir(frame_dir)) == [f"frame_{i:06d}.png" for i in range(1, 6)]
+    assert (frame_dir / "frame_000002.png").read_text() == "out1"
+    assert res["timestamps"] == [0.0, 1 / 60, 2 / 60, 4 / 60, 5 / 60]
+
+
+def test_explicit_num_frame_sets_output_fps(tmp_path, monkeypatch):
+    frame_dir = tmp_path / "frames"
+    make_frames(frame_dir, 4)
+
+    def fake_model(frame_dir, params, logger):
+        for i in range(params["num_frame"]):
+            with open(os.path.join(frame_dir, f"{i + 1:08d}.png"), "w") as f:
+                f.write(f"out{i}")
+
+    monkeypatch.setitem(interpolation_handler.MODEL_REGISTRY, "nf-model", (fake_model, ["num_frame", "times"]))
+    res = interpolation_handler.run_interpolation(
+        str(frame_dir), {"model_name": "nf-model", "params": {"num_frame": 10, "times": 2}},
+        dummy_logger(), source_fps="24000/1001",
+    )
+    # 10 frames from 4 inputs is 2.5x the source rate, whatever times says
+    assert res["output_fps"] == "60000/1001"
+    assert res["frames"]["verified"] == 10
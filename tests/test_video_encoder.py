@@ -0,0 +1,37 @@
+from media import video_encoder
+
+
+def test_segmented_encode_splits_on_gop_boundaries_and_concats(tmp_path, monkeypatch):
+    frames = tmp_path / "frames"
+    frames.mkdir()
+    for i in range(1, 11):
+        (frames / f"frame_{i:06d}.png").write_text("x")
+    commands = []
+    lists = []
+
+    def fake_run(cmd, **k):
+        commands.append(cmd)
+        if "concat" in cmd:
+            lists.append(open(cmd[cmd.index("-i") + 1]).read())
+    monkeypatch.setattr(video_encoder, "require_binaries", lambda names: None)
+    monkeypatch.setattr(video_encoder, "run_process", fake_run)
+
+    assert video_encoder.segment_bounds(10, 3, 2) == [(0, 4), (4, 4), (8, 2)]
+    video_encoder.encode_video(str(frames), str(tmp_path / "out.mp4"), fps=24, segments=3, gop_size=2)
+    segments, join = commands[:3], commands[3]
+    assert sorted((c[c.index("-start_number") + 1], c[c.index("-frames:v") + 1]) for c in segments) == [
+        ("1", "4"), ("5", "4"), ("9", "2")]
+    for cmd in segments:
+        assert cmd[cmd.index("-g") + 1] == cmd[cmd.index("-keyint_min") + 1] == "2"
+        assert cmd[cmd.index("-sc_threshold") + 1] == "0"
+    assert join[join.index("-c") + 1] == "copy" and join[-1] == str(tmp_path / "out.mp4")
+    assert lists == ["ffconcat version 1.0\nfile 'segment_0000.mp4'\nfile 'segment_0001.mp4'\n"
+                     "file 'segment_0002.mp4'\n"]
+    # The segment directory is removed
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["frames"]
+
+    # Variable frame times cannot be split: one process
+    commands.clear()
+    video_encoder.encode_video(str(frames), str(tmp_path / "out.mp4"), fps=24, segments=3, gop_size=2,
+                               timestamps=[i / 24 for i in range(10)])
+    assert len(commands) == 1
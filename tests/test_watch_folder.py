@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from core import watch_folder
+from utils.dir_watcher import DirectoryWatcher
+from tests.conftest import dummy_logger
+
+
+TEMPLATE = {
+    "task": "upscaling",
+    "output_format": "mp4",
+    "upscaling": {"enabled": True, "model_name": "ffmpeg-scale", "params": {"scale": 2}},
+}
+
+
+def fake_process_request(calls):
+    def process(request):
+        calls.append(request)
+        return {"status": "success", "message": "ok", "log_path": request["log_path"],
+                "output_path": os.path.join(request["output_path"], "out_" + os.path.basename(request["input_path"]))}
+    return process
+
+
+def test_build_job_request_picks_formats(tmp_path):
+    video = watch_folder.build_job_request(TEMPLATE, str(tmp_path / "clip.MOV"), "out")
+    assert video["input_format"] == "mov"
+    assert video["output_format"] == "mp4"
+    image = watch_folder.build_job_request(TEMPLATE, str(tmp_path / "still.jpg"), "out")
+    # mp4 does not suit an image, so the image keeps its own format
+    assert image["output_format"] == "jpg"
+    assert image["upscaling"] == TEMPLATE["upscaling"] and image["upscaling"] is not TEMPLATE["upscaling"]
+    assert watch_folder.build_job_request(TEMPLATE, str(tmp_path / "notes.txt"), "out") is None
+
+
+def test_process_directory_writes_manifests_and_resumes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    monkeypatch.setattr(watch_folder, "process_request", fake_process_request(calls))
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    for name in ("a.mp4", "b.png", "c.txt"):
+        (in_dir / name).write_text("x")
+    out_dir = tmp_path / "out"
+
+    summary = watch_folder.process_directory(str(in_dir), TEMPLATE, str(out_dir), dummy_logger(), max_jobs=2)
+    assert summary["status"] == "success"
+    assert len(summary["results"]) == 2
+    assert sorted(os.path.basename(r["input_path"]) for r in calls) == ["a.mp4", "b.png"]
+    manifest = json.loads((out_dir / "a.mp4.result.json").read_text())
+    assert manifest["status"] == "success"
+    assert manifest["input_path"] == str(in_dir / "a.mp4")
+
+    # A second run skips files that already succeeded
+    summary = watch_folder.process_directory(str(in_dir), TEMPLATE, str(out_dir), dummy_logger())
+    assert summary["results"] == []
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_directory_watcher_reports_settled_files_once(tmp_path, use_inotify):
+    watcher = DirectoryWatcher(str(tmp_path), poll_interval=0.05, settle_time=0.2, use_inotify=use_inotify)
+    try:
+        (tmp_path / "clip.mp4").write_text("part")
+        seen = []
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not seen:
+            seen += watcher.wait_for_files(timeout=0.05)
+        assert seen == [str(tmp_path / "clip.mp4")]
+        for _ in range(10):
+            assert watcher.wait_for_files(timeout=0.05) == []
+    finally:
+        watcher.close()
+
+
+def test_directory_watcher_waits_for_writes_to_finish(tmp_path):
+    watcher = DirectoryWatcher(str(tmp_path), poll_interval=0.05, settle_time=0.5, use_inotify=False)
+    try:
+        path = tmp_path / "big.mp4"
+        path.write_text("a")
+        start = time.monotonic()
+        seen = []
+        while time.monotonic() - start < 0.4:
+            with open(path, "a") as f:
+                f.write("a")
+            seen += watcher.wait_for_files(timeout=0.05)
+        assert seen == []
+    finally:
+        watcher.close()
+
+
+def test_watch_directory_processes_and_archives(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    monkeypatch.setattr(watch_folder, "process_request", fake_process_request(calls))
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    out_dir = tmp_path / "out"
+    stop = threading.Event()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(watch_folder.watch_directory(
+        str(drop), TEMPLATE, str(out_dir), dummy_logger(), poll_interval=0.05, settle_time=0.1, stop_event=stop)))
+    thread.start()
+    try:
+        (drop / "clip.mkv").write_text("x")
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not (drop / "processed" / "clip.mkv").exists():
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join(timeout=5)
+    assert (drop / "processed" / "clip.mkv").exists()
+    assert (out_dir / "clip.mkv.result.json").exists()
+    assert results[0]["status"] == "success"
+    assert calls[0]["input_format"] == "mkv"
+
+
+def test_a_job_that_raises_is_recorded_and_archived(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    (in_dir / "a.mp4").write_text("x")
+    out_dir = tmp_path / "out"
+
+    def broken(*a, **k):
+        raise OSError("disk full")
+    monkeypatch.setattr(watch_folder, "run_file_job", broken)
+
+    summary = watch_folder.process_directory(str(in_dir), TEMPLATE, str(out_dir), dummy_logger())
+    assert summary["status"] == "error"
+    assert [r["message"] for r in summary["results"]] == ["OSError: disk full"]
+    assert json.loads((out_dir / "a.mp4.result.json").read_text())["status"] == "error"
+
+    # In watch mode the file also leaves the drop folder
+    stop = threading.Event()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(watch_folder.watch_directory(
+        str(in_dir), TEMPLATE, str(out_dir), dummy_logger(), poll_interval=0.05, settle_time=0.1, stop_event=stop)))
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not (in_dir / "failed" / "a.mp4").exists():
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join(timeout=5)
+    assert (in_dir / "failed" / "a.mp4").exists()
+    assert results[0]["status"] == "error"
+
+
+def test_watch_reprocesses_a_new_file_under_an_old_name(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+    monkeypatch.setattr(watch_folder, "process_request", fake_process_request(calls))
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    out_dir = tmp_path / "out"
+    stop = threading.Event()
+    thread = threading.Thread(target=watch_folder.watch_directory, args=(
+        str(drop), TEMPLATE, str(out_dir), dummy_logger()),
+        kwargs={"poll_interval": 0.05, "settle_time": 0.1, "stop_event": stop})
+    thread.start()
+
+    def wait_for(condition):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not condition():
+            time.sleep(0.05)
+        assert condition()
+    try:
+        (drop / "clip.mp4").write_text("first export")
+        wait_for(lambda: len(calls) == 1 and (drop / "processed" / "clip.mp4").exists())
+        first = drop / "processed" / "first.mp4"
+        os.replace(drop / "processed" / "clip.mp4", first)
+        # A re-export under the same name is new work
+        (drop / "clip.mp4").write_text("second, longer export")
+        wait_for(lambda: len(calls) == 2 and (drop / "processed" / "clip.mp4").exists())
+        # The very same file dropped again is skipped, and still leaves the drop folder
+        os.replace(drop / "processed" / "clip.mp4", drop / "clip.mp4")
+        wait_for(lambda: (drop / "processed" / "clip.mp4").exists())
+        assert len(calls) == 2
+    finally:
+        stop.set()
+        thread.join(timeout=5)
+
+
+def test_watch_rejects_an_output_directory_inside_the_drop_folder(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    for output_dir in (drop, drop / "processed", drop / "out" / "videos"):
+        result = watch_folder.watch_directory(str(drop), TEMPLATE, str(output_dir), dummy_logger(),
+                                              stop_event=threading.Event())
+        assert result["status"] == "error" and "inside it" in result["message"]
+    assert not (drop / "out").exists()
+    # A sibling whose name merely starts with the drop folder's is fine
+    assert watch_folder.output_dir_problem(str(drop), str(tmp_path / "drop_out")) is None
@@ -0,0 +1,155 @@
+"""
+Drop-folder watcher.
+
+Reports files that appear in a directory once they have finished being
+written: a file is ready when its size and mtime have not changed for
+settle_time seconds. On Linux new files are noticed immediately through
+inotify (via ctypes); elsewhere, or if inotify is unavailable, the directory is
+polled every poll_interval seconds.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal inotify wrapper; raises OSError if unsupported."""
+
+    def __init__(self, path):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def read(self, timeout):
+        """Wait up to timeout seconds; returns the file names with events."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """
+    Watches one directory (not recursive) for new files.
+
+    Usage:
+        watcher = DirectoryWatcher("drop/")
+        while running:
+            for path in watcher.wait_for_files(timeout=1.0):
+                ...
+        watcher.close()
+    """
+
+    def __init__(self, path, poll_interval=2.0, settle_time=2.0, use_inotify=True, logger=None):
+        self.path = os.path.abspath(path)
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.logger = logger
+        self._pending = {}   # name -> (size, mtime_ns, unchanged_since)
+        self._reported = set()
+        self._last_scan = 0.0
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify(self.path)
+            except (OSError, AttributeError) as e:
+                if logger:
+                    logger.info(f"[Watcher] inotify unavailable ({e}); polling every {poll_interval}s.")
+        if logger and self._inotify:
+            logger.info(f"[Watcher] Watching {self.path} with inotify.")
+
+    def _scan(self):
+        for entry in os.scandir(self.path):
+            if entry.is_file() and not entry.name.startswith("."):
+                self._track(entry.name)
+        self._last_scan = time.monotonic()
+
+    def _track(self, name):
+        if name not in self._reported and name not in self._pending:
+            self._pending[name] = (None, None, time.monotonic())
+
+    def _settled(self):
+        """Move files whose size and mtime held still for settle_time to the ready list."""
+        now = time.monotonic()
+        ready = []
+        for name, (size, mtime, since) in list(self._pending.items()):
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except FileNotFoundError:
+                del self._pending[name]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime):
+                self._pending[name] = (st.st_size, st.st_mtime_ns, now)
+            elif now - since >= self.settle_time:
+                del self._pending[name]
+                self._reported.add(name)
+                ready.append(os.path.join(self.path, name))
+        return sorted(ready)
+
+    def wait_for_files(self, timeout=1.0):
+        """
+        Block for up to timeout seconds and return paths of files that are
+        newly complete. Each file is reported once.
+        """
+        if self._inotify:
+            for name in self._inotify.read(timeout):
+                self._track(name)
+            # Rescan occasionally in case events were dropped (queue overflow)
+            if time.monotonic() - self._last_scan >= max(self.poll_interval, 30.0):
+                self._scan()
+        else:
+            if time.monotonic() - self._last_scan >= self.poll_interval:
+                self._scan()
+            elif not self._pending:
+                time.sleep(timeout)
+        ready = self._settled()
+        if not ready and self._pending:
+            time.sleep(min(timeout, self.settle_time / 4 or timeout))
+        return ready
+
+    def scan_existing(self):
+        """Start tracking files already in the directory."""
+        self._scan()
+
+    def forget(self, path):
+        """Allow a file name to be reported again (e.g. after it was moved away)."""
+        self._reported.discard(os.path.basename(path))
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
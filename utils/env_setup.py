@@ -3,7 +3,6 @@ import os
 import platform
 import subprocess
 import tempfile
-import urllib.request
 
 
 def vc_runtime_installed():
@@ -35,6 +34,8 @@ def install_vc_runtime():
     if platform.system().lower() != "windows":
         return False
 
+    import urllib.request
+
     url = "https://aka.ms/vs/17/release/vc_redist.x64.exe"
     tmp_dir = tempfile.gettempdir()
     installer = os.path.join(tmp_dir, "vc_redist.x64.exe")
@@ -35,3 +35,59 @@ def safe_rename(src_path, new_name):
     dst_path = os.path.join(dir_path, new_name)
     os.rename(src_path, dst_path)
     return dst_path
+
+def link_or_copy(src_path, dst_path):
+    """
+    Hard-link src_path to dst_path, copying instead when linking is not possible
+    (different filesystem, unsupported FS). Returns dst_path.
+    """
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copy2(src_path, dst_path)
+    return dst_path
+
+def snapshot_dir(dir_path):
+    """
+    Record the identity of every file in dir_path.
+    Returns {name: (inode, mtime_ns, size)}; empty if the directory does not exist.
+    """
+    if not os.path.isdir(dir_path):
+        return {}
+    snapshot = {}
+    for entry in os.scandir(dir_path):
+        if entry.is_file():
+            st = entry.stat()
+            snapshot[entry.name] = (st.st_ino, st.st_mtime_ns, st.st_size)
+    return snapshot
+
+def changed_files(dir_path, snapshot):
+    """
+    Returns the sorted names of files in dir_path that are new or were
+    rewritten since snapshot was taken.
+    """
+    current = snapshot_dir(dir_path)
+    return sorted(name for name, ident in current.items() if snapshot.get(name) != ident)
+
+def renumber_frames(frame_dir, names, start=1):
+    """
+    Renames names (in the given order) to frame_%06d.<ext> and deletes every
+    other file in frame_dir. Returns the new names.
+    """
+    keep = set(names)
+    for name in os.listdir(frame_dir):
+        path = os.path.join(frame_dir, name)
+        if name not in keep and os.path.isfile(path):
+            os.remove(path)
+    # Two passes so a target name never collides with a file not yet renamed
+    staged = []
+    for i, name in enumerate(names):
+        tmp_name = f".renumber_{i:06d}_{name}"
+        os.rename(os.path.join(frame_dir, name), os.path.join(frame_dir, tmp_name))
+        staged.append((tmp_name, os.path.splitext(name)[1]))
+    new_names = []
+    for i, (tmp_name, ext) in enumerate(staged, start=start):
+        new_name = f"frame_{i:06d}{ext}"
+        os.rename(os.path.join(frame_dir, tmp_name), os.path.join(frame_dir, new_name))
+        new_names.append(new_name)
+    return new_names
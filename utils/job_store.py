@@ -0,0 +1,355 @@
+"""
+Persistent job database (SQLite).
+
+Every job the operator runs is recorded with its normalized request, a
+fingerprint of the input file, the status of each stage (model, frames,
+duration), the result and the output path. The job key is a hash of the
+normalized request and the input fingerprint. When a job with the same key
+already succeeded and its output still exists, the operator returns that
+output instead of processing the input again.
+
+The database is logs/jobs.sqlite3 by default. FUSION2X_JOB_DB sets another
+path, and FUSION2X_JOB_DB=off disables it.
+
+    jobs(id, job_key, status, request, input_path, input_fingerprint,
+         output_path, output_size, outputs, log_path, message, frames, created, finished)
+    stages(job_id, stage, model, status, frames, started, finished, duration)
+
+The operator opens a JobRecord per job and makes it current (a contextvar,
+like the stage time limits) so job stages record themselves. A database that
+cannot be written never fails the job; it is logged and the job runs on.
+
+model_throughput() answers "frames per second per model per day" without
+parsing logs.
+"""
+import contextvars
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+DEFAULT_PATH = os.path.join("logs", "jobs.sqlite3")
+# Read size while hashing the input for its fingerprint
+FINGERPRINT_CHUNK = 1024 * 1024
+# Request keys that do not change the output (where it goes, logging, scheduling)
+VOLATILE_KEYS = ("input_path", "output_path", "log_path", "misc")
+RUNTIME_PIPELINE_KEYS = (
+    "workers", "cpu_workers", "scratch_dir", "frame_store", "stage_timeout", "idle_timeout",
+    "batch_window", "coordinator", "batch_frames",
+)
+# Request blocks whose model a stage runs
+STAGE_BLOCKS = {"upscaling": ("upscaling",), "interpolation": ("interpolation",),
+                "fused": ("interpolation", "upscaling")}
+
+_current = contextvars.ContextVar("job_record", default=None)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    job_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    input_path TEXT,
+    input_fingerprint TEXT,
+    output_path TEXT,
+    output_size INTEGER,
+    outputs TEXT,
+    log_path TEXT,
+    message TEXT,
+    frames TEXT,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_key ON jobs (job_key, status);
+CREATE TABLE IF NOT EXISTS stages (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    stage TEXT NOT NULL,
+    model TEXT,
+    status TEXT NOT NULL,
+    frames INTEGER,
+    started REAL NOT NULL,
+    finished REAL,
+    duration REAL,
+    PRIMARY KEY (job_id, stage)
+);
+CREATE INDEX IF NOT EXISTS stages_by_time ON stages (finished);
+"""
+
+
+def input_fingerprint(path):
+    """
+    sha256 of the whole file. Any edit changes it, so a stored output is only
+    reused for the same bytes (hashing runs at disk speed, far below a job's time).
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(FINGERPRINT_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_request(json_request):
+    """The request without the keys that do not affect the output, as canonical JSON."""
+    request = {k: v for k, v in json_request.items() if k not in VOLATILE_KEYS}
+    pipeline = request.get("pipeline")
+    if isinstance(pipeline, dict):
+        request["pipeline"] = {k: v for k, v in pipeline.items() if k not in RUNTIME_PIPELINE_KEYS}
+    return json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def job_key(normalized_request, fingerprint):
+    return hashlib.sha256(f"{normalized_request}\n{fingerprint}".encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """
+    SQLite job records. Safe to share between threads (one connection per
+    call) and processes (SQLite locking, WAL journal).
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Databases created before multi-rendition jobs
+            if "outputs" not in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN outputs TEXT")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _execute(self, sql, args=()):
+        with closing(self._connect()) as conn, conn:
+            cursor = conn.execute(sql, args)
+            return cursor.lastrowid
+
+    def start_job(self, key, normalized_request, input_path, fingerprint, log_path=None):
+        """Record a new running job; returns its id."""
+        return self._execute(
+            "INSERT INTO jobs (job_key, status, request, input_path, input_fingerprint, log_path, created) "
+            "VALUES (?, 'running', ?, ?, ?, ?, ?)",
+            (key, normalized_request, input_path, fingerprint, log_path, time.time()),
+        )
+
+    def finish_job(self, job_id, result):
+        """Store the operator result (status, message, output_path, outputs, frames)."""
+        status = result.get("status", "error")
+        output_path = result.get("output_path")
+        output_size = os.path.getsize(output_path) if output_path and os.path.isfile(output_path) else None
+        outputs = {name: [path, os.path.getsize(path) if os.path.isfile(path) else None]
+                   for name, path in (result.get("outputs") or {}).items()}
+        now = time.time()
+        self._execute(
+            "UPDATE jobs SET status = ?, output_path = ?, output_size = ?, outputs = ?, message = ?, frames = ?, "
+            "finished = ? WHERE id = ?",
+            (status, output_path, output_size, json.dumps(outputs) if outputs else None,
+             str(result.get("message", ""))[:2000],
+             json.dumps(result["frames"]) if result.get("frames") else None, now, job_id),
+        )
+        # Stages still open belong to a job that stopped in the middle
+        self._execute(
+            "UPDATE stages SET status = ?, finished = ?, duration = ? - started WHERE job_id = ? AND status = 'running'",
+            (status, now, now, job_id),
+        )
+
+    def start_stage(self, job_id, stage, model=None, frames=None):
+        self._execute(
+            "INSERT OR REPLACE INTO stages (job_id, stage, model, status, frames, started) "
+            "VALUES (?, ?, ?, 'running', ?, ?)",
+            (job_id, stage, model, frames, time.time()),
+        )
+
+    def finish_stage(self, job_id, stage, status, frames=None):
+        now = time.time()
+        self._execute(
+            "UPDATE stages SET status = ?, frames = COALESCE(?, frames), finished = ?, duration = ? - started "
+            "WHERE job_id = ? AND stage = ?",
+            (status, frames, now, now, job_id, stage),
+        )
+
+    def find_completed(self, key):
+        """Latest successful job with this key whose output files are all still there unchanged, as a dict; else None."""
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE job_key = ? AND status = 'success' ORDER BY finished DESC", (key,)
+            ).fetchall()
+        for row in rows:
+            files = [(row["output_path"], row["output_size"])]
+            files += [tuple(f) for f in json.loads(row["outputs"]).values()] if row["outputs"] else []
+            if all(path and os.path.isfile(path) and os.path.getsize(path) == size for path, size in files):
+                return dict(row)
+        return None
+
+    def get_job(self, job_id):
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            stages = conn.execute("SELECT * FROM stages WHERE job_id = ? ORDER BY started", (job_id,)).fetchall()
+        return dict(job, stages=[dict(s) for s in stages])
+
+    def model_throughput(self, days=None):
+        """
+        Successful stage runs per (day, stage, model): jobs, frames, seconds and
+        frames per second; the last `days` days only if given.
+        """
+        since = time.time() - days * 86400 if days else 0
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT date(finished, 'unixepoch') AS day, stage, model, COUNT(*) AS jobs, "
+                "SUM(frames) AS frames, ROUND(SUM(duration), 3) AS seconds, "
+                "ROUND(SUM(frames) / NULLIF(SUM(duration), 0), 2) AS fps "
+                "FROM stages WHERE status = 'success' AND finished >= ? "
+                "GROUP BY day, stage, model ORDER BY day, stage, model",
+                (since,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+
+class JobRecord:
+    """
+    One job's entry in a JobStore. open() looks the job up; start() inserts
+    it (a job answered from a previous one is not recorded again).
+    """
+
+    def __init__(self, store, json_request, input_path):
+        self.store = store
+        self.request = json_request
+        self.input_path = input_path
+        self.normalized = normalize_request(json_request)
+        self.fingerprint = input_fingerprint(input_path)
+        self.key = job_key(self.normalized, self.fingerprint)
+        self.job_id = None
+        self.logger = None
+
+    @classmethod
+    def open(cls, json_request, store=None):
+        """A record for the request, or None when the store is off or the input cannot be read."""
+        try:
+            store = store or default_store()
+            if store is None:
+                return None
+            return cls(store, json_request, os.path.abspath(json_request["input_path"]))
+        except (OSError, KeyError, sqlite3.Error):
+            return None
+
+    def previous(self):
+        """The latest successful identical job whose output is still there, or None."""
+        return self._write(self.store.find_completed, self.key)
+
+    def start(self, log_path, logger):
+        self.logger = logger
+        self.job_id = self._write(
+            self.store.start_job, self.key, self.normalized, self.input_path, self.fingerprint, log_path
+        )
+
+    def finish(self, result):
+        if self.job_id is not None:
+            self._write(self.store.finish_job, self.job_id, result)
+
+    def stage_model(self, stage):
+        names = [self.request.get(block, {}).get("model_name") for block in STAGE_BLOCKS.get(stage, ())]
+        return "+".join(n for n in names if n) or None
+
+    def start_stage(self, stage, frames=None):
+        if self.job_id is not None:
+            self._write(self.store.start_stage, self.job_id, stage, self.stage_model(stage), frames)
+
+    def finish_stage(self, stage, status, frames=None):
+        if self.job_id is not None:
+            self._write(self.store.finish_stage, self.job_id, stage, status, frames)
+
+    def _write(self, func, *args):
+        try:
+            return func(*args)
+        except sqlite3.Error as e:
+            if self.logger:
+                self.logger.warning(f"Job database {self.store.path} not updated: {e}")
+            return None
+
+
+@contextmanager
+def recording(record):
+    """Make record (or None) the current job's record inside the block."""
+    token = _current.set(record)
+    try:
+        yield record
+    finally:
+        _current.reset(token)
+
+
+def current_job():
+    return _current.get()
+
+
+@contextmanager
+def recorded_stage(stage, frames=None):
+    """Record a stage of the current job: success, or the status of the exception that ended it."""
+    record = current_job()
+    if record is None:
+        yield
+        return
+    record.start_stage(stage, frames)
+    try:
+        yield
+    except Exception:
+        record.finish_stage(stage, "error")
+        raise
+    except BaseException:
+        record.finish_stage(stage, "cancelled")
+        raise
+    record.finish_stage(stage, "success")
+
+
+def mark_stage(stage, status):
+    """Correct a finished stage's status (a stage that reported failure instead of raising)."""
+    record = current_job()
+    if record is not None:
+        record.finish_stage(stage, status)
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def default_store():
+    """The process-wide JobStore (FUSION2X_JOB_DB or DEFAULT_PATH), or None when disabled."""
+    global _default_store
+    path = os.environ.get("FUSION2X_JOB_DB", DEFAULT_PATH)
+    if not path or path.lower() == "off":
+        return None
+    with _default_lock:
+        if _default_store is None or _default_store.path != path:
+            _default_store = JobStore(path)
+        return _default_store
+
+
+def stored_outputs(row):
+    """{rendition name: path} of a stored job ({} for a single-output job)."""
+    return {name: path for name, (path, _) in json.loads(row["outputs"]).items()} if row.get("outputs") else {}
+
+
+def reused_result(row, output_path, log_path, outputs=None):
+    """Operator result for a job answered from a stored one."""
+    result = {
+        "status": "success",
+        "log_path": log_path,
+        "message": f"Identical job already processed (job {row['id']}); returning its output.",
+        "output_path": output_path,
+        "reused_job": row["id"],
+    }
+    if outputs:
+        result["outputs"] = outputs
+    if row.get("frames"):
+        result["frames"] = copy.deepcopy(json.loads(row["frames"]))
+    return result
@@ -1,5 +1,11 @@
 import json
 
+from media.renditions import rendition_settings
+from utils.profiling import profile_parts
+
+VIDEO_FORMATS = {"mp4", "avi", "mov", "mkv", "webm", "gif"}
+IMAGE_FORMATS = {"png", "jpg", "jpeg", "webp"}
+
 
 def load_json_from_file(json_file):
     """
@@ -19,16 +25,14 @@ def validate_json_request(request):
         if field not in request:
             return False, f"Missing required field '{field}'"
 
-    video_formats = {"mp4", "avi", "mov", "mkv", "webm", "gif"}
-    image_formats = {"png", "jpg", "jpeg", "webp"}
     input_fmt = request.get("input_format", "").lower()
     output_fmt = request.get("output_format", "").lower()
 
-    if input_fmt in video_formats and output_fmt not in video_formats:
+    if input_fmt in VIDEO_FORMATS and output_fmt not in VIDEO_FORMATS:
         return False, (
             f"Output format '{output_fmt}' is not valid for video input"
         )
-    if input_fmt in image_formats and output_fmt not in image_formats:
+    if input_fmt in IMAGE_FORMATS and output_fmt not in IMAGE_FORMATS:
         return False, (
             f"Output format '{output_fmt}' is not valid for image input"
         )
@@ -46,5 +50,12 @@ def validate_json_request(request):
         return False, (
             "Task is 'both' but required blocks are missing."
         )
+    if request.get("renditions") and input_fmt not in VIDEO_FORMATS:
+        return False, "Renditions are only supported for video input."
+    try:
+        rendition_settings(request)
+        profile_parts(request.get("misc", {}).get("profile"))
+    except ValueError as e:
+        return False, str(e)
     # All checks passed
     return True, ""
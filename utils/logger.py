@@ -1,26 +1,184 @@
+"""
+Fusion2X logging.
+
+Loggers returned by get_logger never write to disk on the calling thread: each
+record is put on a queue and a single background QueueListener thread writes
+it to the logger's size-rotated log file. Pipeline threads therefore never
+block on file I/O.
+
+Records can carry structured fields through ``extra``:
+    logger.info("Chunk done", extra={"stage": "fused", "frame": 400, "duration": 2.31})
+The job id given to get_logger is attached to every record. With
+FUSION2X_LOG_FORMAT=json log files are written as JSON lines containing these
+fields; the default is the plain text format.
+
+Environment:
+    FUSION2X_LOG_LEVEL      default level (INFO)
+    FUSION2X_LOG_LEVELS     per-module levels, e.g. "process_utils=DEBUG,video_encoder=WARNING"
+                            (module = source file name without .py)
+    FUSION2X_LOG_FORMAT     "text" (default) or "json"
+    FUSION2X_LOG_MAX_BYTES  rotate a log file at this size (default 10 MB)
+    FUSION2X_LOG_BACKUPS    rotated files to keep (default 5)
+"""
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
 from datetime import datetime
 
+STRUCTURED_FIELDS = ("job_id", "stage", "frame", "duration")
+TEXT_FORMAT = '[%(asctime)s] [%(levelname)s] %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_queue = queue.SimpleQueue()
+_routes = {}            # logger name -> file handler (used on the listener thread)
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, with any structured fields present."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, default=str)
+
+
+def parse_module_levels(spec):
+    """Parse "module=LEVEL,module=LEVEL" into {module: levelno}. Bad entries are ignored."""
+    levels = {}
+    for item in (spec or "").split(","):
+        module, _, level = item.partition("=")
+        levelno = logging.getLevelName(level.strip().upper())
+        if module.strip() and isinstance(levelno, int):
+            levels[module.strip()] = levelno
+    return levels
+
+
+class ModuleLevelFilter(logging.Filter):
+    """Drops records below the level set for their source module (default level otherwise)."""
+
+    def __init__(self, default_level, module_levels):
+        super().__init__()
+        self.default_level = default_level
+        self.module_levels = module_levels
+
+    def filter(self, record):
+        return record.levelno >= self.module_levels.get(record.module, self.default_level)
+
+
+class _JobFilter(logging.Filter):
+    def __init__(self, job_id):
+        super().__init__()
+        self.job_id = job_id
+
+    def filter(self, record):
+        if getattr(record, "job_id", None) is None:
+            record.job_id = self.job_id
+        return True
+
+
+class _RoutingHandler(logging.Handler):
+    """Runs on the listener thread: hands each record to its logger's file handler."""
+
+    def handle(self, record):
+        flush_event = getattr(record, "_flush_event", None)
+        if flush_event is not None:
+            for handler in list(_routes.values()):
+                handler.flush()
+            flush_event.set()
+            return True
+        closing = getattr(record, "_close_route", None)
+        if closing is not None:
+            # Records queued before the close are already written; a re-opened route stays
+            if _routes.get(record.name) is closing:
+                del _routes[record.name]
+            closing.close()
+            return True
+        handler = _routes.get(record.name)
+        if handler:
+            handler.handle(record)
+        return True
+
 
-def get_logger(log_file, module_name=None):
+def _ensure_listener():
+    global _listener
+    if _listener is None:
+        _listener = logging.handlers.QueueListener(_queue, _RoutingHandler())
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for name, handler in _routes.items():
+            handler.close()
+            logger = logging.getLogger(name)
+            for qh in list(logger.handlers):
+                logger.removeHandler(qh)
+        _routes.clear()
+
+
+def _file_handler(log_file):
+    handler = logging.handlers.RotatingFileHandler(
+        log_file,
+        mode="a",
+        maxBytes=int(os.environ.get("FUSION2X_LOG_MAX_BYTES", 10 * 1024 * 1024)),
+        backupCount=int(os.environ.get("FUSION2X_LOG_BACKUPS", 5)),
+        encoding="utf-8",
+    )
+    if os.environ.get("FUSION2X_LOG_FORMAT", "text").lower() == "json":
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT))
+    return handler
+
+
+def get_logger(log_file, module_name=None, job_id=None, level=None):
     """
     Returns a logger configured to write to the specified log_file.
     Adds a header with a timestamp at the top of the file if first use.
+
+    Args:
+        log_file (str): Log file path.
+        module_name (str): Shown in the header line.
+        job_id (str): Attached to every record (defaults to the log file name).
+        level (str|int): Default level; overrides FUSION2X_LOG_LEVEL.
     """
     logger_name = f"fusion2x_{os.path.basename(log_file)}"
     logger = logging.getLogger(logger_name)
-    if not logger.handlers:
-        logger.setLevel(logging.INFO)
-        fh = logging.FileHandler(log_file, mode="a", encoding="utf-8")
-        formatter = logging.Formatter(
-            '[%(asctime)s] [%(levelname)s] %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        fh.setFormatter(formatter)
-        logger.addHandler(fh)
-        # Write header only if file is empty
-        if os.stat(log_file).st_size == 0:
+    with _lock:
+        if logger.handlers:
+            if level is not None:
+                set_log_level(logger, level)
+            return logger
+        module_levels = parse_module_levels(os.environ.get("FUSION2X_LOG_LEVELS"))
+        level_filter = ModuleLevelFilter(logging.INFO, module_levels)
+        logger.propagate = False
+
+        log_dir = os.path.dirname(log_file)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        # Write header only if file is empty (JSON-lines files hold records only)
+        json_format = os.environ.get("FUSION2X_LOG_FORMAT", "text").lower() == "json"
+        if not json_format and (not os.path.exists(log_file) or os.stat(log_file).st_size == 0):
             start_line = (
                 "=== Fusion2X"
                 f"{' [' + module_name + ']' if module_name else ''}"
@@ -29,4 +187,47 @@ def get_logger(log_file, module_name=None):
             )
             with open(log_file, "a", encoding="utf-8") as f:
                 f.write(start_line)
+
+        _routes[logger_name] = _file_handler(log_file)
+        qh = logging.handlers.QueueHandler(_queue)
+        qh.addFilter(level_filter)
+        qh.addFilter(_JobFilter(job_id or os.path.splitext(os.path.basename(log_file))[0]))
+        logger.addHandler(qh)
+        set_log_level(logger, level or os.environ.get("FUSION2X_LOG_LEVEL", "INFO"))
+        _ensure_listener()
     return logger
+
+
+def set_log_level(logger, level):
+    """Change the default level of a logger from get_logger; per-module levels still apply."""
+    levelno = logging.getLevelName(str(level).upper()) if not isinstance(level, int) else level
+    if not isinstance(levelno, int):
+        return
+    for handler in logger.handlers:
+        for flt in handler.filters:
+            if isinstance(flt, ModuleLevelFilter):
+                flt.default_level = levelno
+                # The logger lets through the most verbose level any module asks for; the filter does the rest
+                logger.setLevel(min([levelno] + list(flt.module_levels.values())))
+
+
+def close_logger(log_file):
+    """
+    Detach the logger for log_file and close its file once queued records are
+    written. Long-running processes (watch mode) call this when a job ends.
+    """
+    logger_name = f"fusion2x_{os.path.basename(log_file)}"
+    logger = logging.getLogger(logger_name)
+    with _lock:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        route = _routes.get(logger_name)
+        if route is not None:
+            _queue.put(logging.makeLogRecord({"name": logger_name, "_close_route": route}))
+
+
+def flush_logs(timeout=5.0):
+    """Block until every record queued so far has been written (used by tests and before exit)."""
+    done = threading.Event()
+    _queue.put(logging.makeLogRecord({"name": "", "_flush_event": done}))
+    return done.wait(timeout) if _listener is not None else True
@@ -0,0 +1,275 @@
+"""
+Process-wide metrics in the Prometheus text format.
+
+The operator, the model handlers, the watch folder and the process
+supervisor update the metrics below; they are cheap (a lock and a dict
+update) and always on. receiver.py exposes them:
+
+    --metrics_port 9464     serve http://127.0.0.1:9464/metrics while it runs
+    --metrics_file out.prom write them when the run ends (one-shot jobs;
+                            e.g. for node_exporter's textfile collector)
+
+Counters and histograms carry labels; gauges backed by a function (child
+processes, temp disk usage) are computed when the metrics are collected.
+"""
+import bisect
+import os
+import threading
+
+# Stage and job durations, seconds (a short image job to a long 4K video)
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def samples(self):
+        """[(suffix, label text, value)] for the text format."""
+        with self._lock:
+            return [("", _label_text(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{suffix}{labels} {_number(value)}" for suffix, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        if not self.labels:
+            self._values[()] = 0
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), function=None):
+        super().__init__(name, help, labels)
+        self.function = function
+        if not self.labels:
+            self._values[()] = 0
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        if self.function:
+            return self.function()
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        if self.function:
+            return [("", "", self.function())]
+        return super().samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels):
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], 0.0))
+            return sum(counts)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                samples.append(("_bucket", _label_text(self.labels, key, [le]), cumulative))
+            samples.append(("_sum", _label_text(self.labels, key), round(total, 6)))
+            samples.append(("_count", _label_text(self.labels, key), cumulative))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Temp folders of running jobs, measured when the metrics are collected
+_temp_dirs = set()
+_temp_lock = threading.Lock()
+
+
+def track_temp_dir(path):
+    with _temp_lock:
+        _temp_dirs.add(path)
+
+
+def untrack_temp_dir(path):
+    with _temp_lock:
+        _temp_dirs.discard(path)
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _temp_disk_bytes():
+    with _temp_lock:
+        dirs = list(_temp_dirs)
+    return sum(_dir_size(d) for d in dirs)
+
+
+def _child_processes():
+    from utils import process_utils
+    with process_utils._children_lock:
+        return len(process_utils._children)
+
+
+JOBS_STARTED = REGISTRY.register(Counter("fusion2x_jobs_started_total", "Jobs started."))
+JOBS_FINISHED = REGISTRY.register(Counter(
+    "fusion2x_jobs_finished_total", "Jobs finished, by status (success, error, cancelled, reused).", ["status"]))
+JOBS_RUNNING = REGISTRY.register(Gauge("fusion2x_jobs_running", "Jobs being processed."))
+JOB_SECONDS = REGISTRY.register(Histogram("fusion2x_job_duration_seconds", "Wall time of finished jobs."))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "fusion2x_queue_depth", "Batch and watch-folder files waiting for a free job slot."))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "fusion2x_stage_duration_seconds", "Wall time of job stages (decoding, upscaling, ..., encoding).", ["stage"]))
+MODEL_SECONDS = REGISTRY.register(Histogram(
+    "fusion2x_model_duration_seconds", "Model run time including retries and output checks.", ["stage", "model"]))
+FRAMES = REGISTRY.register(Counter(
+    "fusion2x_frames_processed_total", "Frames written by model runs, by stage and model.", ["stage", "model"]))
+CHILD_PROCESSES = REGISTRY.register(Gauge(
+    "fusion2x_child_processes", "Child processes (ffmpeg, models) running.", function=_child_processes))
+CHILD_PROCESSES_STARTED = REGISTRY.register(Counter(
+    "fusion2x_child_processes_started_total", "Child processes started."))
+TEMP_DISK = REGISTRY.register(Gauge(
+    "fusion2x_temp_disk_bytes", "Disk used by the temp folders of running jobs.", function=_temp_disk_bytes))
+
+
+def record_model_run(stage, model, frames, seconds=None):
+    """Count a successful model run's output frames (and its duration) for stage and model."""
+    if frames:
+        FRAMES.inc(frames, stage=stage, model=model)
+    if seconds is not None:
+        MODEL_SECONDS.observe(seconds, stage=stage, model=model)
+
+
+def write_text_file(path, registry=REGISTRY):
+    """Write the metrics to path atomically (readers never see half a file)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+def start_http_server(port, host="127.0.0.1", registry=REGISTRY):
+    """
+    Serve the metrics at http://host:port/metrics from a daemon thread.
+    Returns the server (server.server_address has the bound port; shutdown() stops it).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, int(port)), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
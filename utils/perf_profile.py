@@ -0,0 +1,92 @@
+"""
+Per-host performance profiles.
+
+A profile stores the tuned model parameters (tile_size, threads, gpu_id) and
+the measured throughput for each model on one machine. It is written by the
+autotune command and read by run_upscaling/run_interpolation to fill in
+parameters a job does not set, and by core.job_planner to predict run times
+("fps" is input frames per second at the sample frames' size).
+
+Layout of profiles/<hostname>.json:
+    {
+        "host": "node-01",
+        "updated": "2026-01-01 12:00:00",
+        "upscaling": {
+            "realesrgan-ncnn-vulkan": {
+                "params": {"tile_size": 200, "threads": "1:2:2", "gpu_id": 0},
+                "fps": 3.4,
+                "peak_rss_mb": 812.0,
+                "sample_frames": 20,
+                "sample_megapixels": 2.0736
+            }
+        },
+        "interpolation": {...}
+    }
+"""
+import json
+import os
+import socket
+from datetime import datetime
+
+
+# Parameters a profile may supply when the job leaves them out
+TUNABLE_PARAMS = ("tile_size", "threads", "gpu_id")
+
+
+def profile_dir():
+    """Directory holding host profiles (FUSION2X_PROFILE_DIR or <repo>/profiles)."""
+    env_dir = os.environ.get("FUSION2X_PROFILE_DIR")
+    if env_dir:
+        return env_dir
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "profiles"))
+
+
+def profile_path(host=None):
+    """Path of the profile for host (default: this machine)."""
+    host = host or socket.gethostname()
+    return os.path.join(profile_dir(), f"{host}.json")
+
+
+def load_profile(host=None):
+    """Load the host profile. Returns {} if there is none or it is unreadable."""
+    path = profile_path(host)
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_profile(profile, host=None):
+    """Write the host profile atomically. Returns the path."""
+    path = profile_path(host)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    profile["host"] = host or socket.gethostname()
+    profile["updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_model_profile(stage, model_name, host=None):
+    """Profile entry for one model ({} if not tuned). stage is "upscaling" or "interpolation"."""
+    return load_profile(host).get(stage, {}).get(model_name, {})
+
+
+def apply_profile_defaults(stage, model_name, params, supported_params, logger=None):
+    """
+    Returns a copy of params with tuned values filled in for tunable
+    parameters the job did not set. Explicit job values always win.
+    """
+    tuned = get_model_profile(stage, model_name).get("params", {})
+    filled = {
+        k: v for k, v in tuned.items()
+        if k in TUNABLE_PARAMS and k in supported_params and k not in params
+    }
+    if filled and logger:
+        logger.info(f"Using tuned parameters from host profile for {model_name}: {filled}")
+    return dict(params, **filled)
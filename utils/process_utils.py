@@ -1,6 +1,71 @@
+"""
+Child-process helpers: binary checks, the supervised runner every ffmpeg and
+model command goes through, and model error reporting.
+
+Supervised children run in their own process group (a new session on POSIX),
+so stopping one also stops anything it spawned, and a Ctrl+C in the terminal
+reaches only Fusion2X, which then stops its children itself. run_process()
+polls the child and stops it when:
+
+    - the job is cancelled (utils.signal_utils, SIGINT/SIGTERM),
+    - the wall-clock limit passes (its own timeout or the stage's),
+    - nothing changes for idle_timeout seconds: no output from the child and
+      no change to the watched files/directories (e.g. the stage's frame dir).
+
+Stage limits are set by the operator with process_limits(); they apply to
+every child started in that context (threads started with a copy of the
+context included, see core.fused_stage). Children still running at exit are
+stopped by an atexit hook.
+"""
+import atexit
+import contextvars
+import os
+import signal
 import subprocess
 import shutil
-from utils import env_setup
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import env_setup, metrics, profiling
+from utils.signal_utils import JobCancelled, cancel_requested, check_cancelled
+
+# Lines of model output kept in the error log; the full output is logged at debug level
+OUTPUT_TAIL_LINES = 20
+# Seconds between terminating a process group and killing it
+TERMINATE_GRACE = 5.0
+# Seconds between checks of a running child (cancel, deadline)
+POLL_INTERVAL = 0.2
+# Longest interval between activity checks for the no-progress timeout
+IDLE_CHECK_INTERVAL = 2.0
+
+_children = set()
+_children_lock = threading.Lock()
+# (deadline, stage timeout, idle timeout, watched paths) for children started in this context
+_limits = contextvars.ContextVar("process_limits", default=(None, None, None, ()))
+
+
+class ModelProcessError(RuntimeError):
+    """A model command exited non-zero. Keeps the exit code and output for retry decisions."""
+
+    def __init__(self, message, returncode=None, stdout="", stderr=""):
+        super().__init__(message)
+        self.returncode = returncode
+        self.stdout = stdout or ""
+        self.stderr = stderr or ""
+
+
+class ProcessTimeout(subprocess.TimeoutExpired):
+    """A supervised child ran past its time limit or made no progress for too long."""
+
+    def __init__(self, cmd, timeout, reason, output=None, stderr=None):
+        super().__init__(cmd, timeout, output, stderr)
+        self.reason = reason
+
+    def __str__(self):
+        name = os.path.basename(str(self.cmd[0] if isinstance(self.cmd, (list, tuple)) else self.cmd))
+        return f"'{name}' {self.reason} ({self.timeout:g}s); it was stopped."
 
 
 def require_binaries(names):
@@ -12,18 +77,187 @@ def require_binaries(names):
             )
 
 
+@contextmanager
+def process_limits(timeout=None, idle_timeout=None, watch=None):
+    """
+    Limits for every child started inside the block: all of them must finish
+    within timeout seconds of entering it, and each is stopped after
+    idle_timeout seconds without activity (watch: extra paths whose changes
+    count as activity). Nested blocks keep the earlier deadline.
+    """
+    deadline, outer_timeout, outer_idle, outer_watch = _limits.get()
+    if timeout:
+        own = time.monotonic() + float(timeout)
+        if deadline is None or own < deadline:
+            deadline, outer_timeout = own, float(timeout)
+    token = _limits.set((
+        deadline, outer_timeout, float(idle_timeout) if idle_timeout else outer_idle,
+        tuple(outer_watch) + tuple(p for p in (watch or ()) if p),
+    ))
+    try:
+        yield
+    finally:
+        _limits.reset(token)
+
+
+def _signal_group(proc, kill=False):
+    try:
+        if os.name == "nt":
+            proc.kill() if kill else proc.terminate()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL if kill else signal.SIGTERM)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def start_process(cmd, **popen_kwargs):
+    """subprocess.Popen in a new process group, tracked until stop_process()."""
+    check_cancelled()
+    if os.name == "nt":
+        popen_kwargs.setdefault("creationflags", subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        popen_kwargs.setdefault("start_new_session", True)
+    proc = subprocess.Popen(cmd, **popen_kwargs)
+    with _children_lock:
+        _children.add(proc)
+    metrics.CHILD_PROCESSES_STARTED.inc()
+    profiling.process_started(proc, cmd)
+    return proc
+
+
+def stop_process(proc, grace=TERMINATE_GRACE):
+    """Terminate proc's process group, kill it if still running after grace seconds, and reap it."""
+    if proc.poll() is None:
+        _signal_group(proc)
+        try:
+            proc.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            _signal_group(proc, kill=True)
+            proc.wait()
+    with _children_lock:
+        _children.discard(proc)
+    profiling.process_finished(proc)
+
+
+def stop_all(grace=TERMINATE_GRACE):
+    """Stop every supervised child still running (registered with atexit)."""
+    with _children_lock:
+        procs = list(_children)
+    for proc in procs:
+        stop_process(proc, grace)
+
+
+atexit.register(stop_all)
+
+
+@contextmanager
+def supervised(cmd, **popen_kwargs):
+    """
+    start_process() as a context manager for streaming use (pipes); the
+    child's group is stopped if the block exits while it is still running.
+    """
+    proc = start_process(cmd, **popen_kwargs)
+    try:
+        yield proc
+    finally:
+        stop_process(proc)
+
+
+def _activity(paths):
+    """Cheap change signature of files (size) and directories (entry count, mtime)."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append(None)
+            continue
+        if os.path.isdir(path):
+            signature.append((len(os.listdir(path)), st.st_mtime_ns))
+        else:
+            signature.append((st.st_size, st.st_mtime_ns))
+    return signature
+
+
+def run_process(cmd, timeout=None, idle_timeout=None, watch=None, capture_output=False, text=False, check=False,
+                poll=POLL_INTERVAL):
+    """
+    Run cmd to completion under supervision, like subprocess.run. The limits
+    of the enclosing process_limits() block apply as well; the earlier
+    deadline and the explicit idle_timeout win.
+
+    Returns:
+        subprocess.CompletedProcess (stdout/stderr set with capture_output).
+    Raises:
+        ProcessTimeout: time limit or no-progress limit hit (child stopped).
+        JobCancelled: the job was cancelled (child stopped).
+        subprocess.CalledProcessError: non-zero exit with check=True.
+    """
+    deadline, stage_timeout, stage_idle, stage_watch = _limits.get()
+    start = time.monotonic()
+    limit = stage_timeout
+    if timeout and (deadline is None or start + timeout < deadline):
+        deadline, limit = start + timeout, timeout
+    idle_timeout = idle_timeout or stage_idle
+    outputs = [tempfile.TemporaryFile() for _ in range(2)] if capture_output else [None, None]
+    proc = start_process(cmd, stdout=outputs[0], stderr=outputs[1])
+    paths = list(stage_watch) + list(watch or ())
+    try:
+        signature = _activity(paths) + [_output_size(outputs)] if idle_timeout else None
+        last_activity = next_check = start
+        while True:
+            try:
+                returncode = proc.wait(timeout=poll)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            now = time.monotonic()
+            if cancel_requested():
+                raise JobCancelled("Job cancelled.")
+            if deadline is not None and now > deadline:
+                raise ProcessTimeout(cmd, limit, "exceeded its time limit")
+            if idle_timeout and now >= next_check:
+                current = _activity(paths) + [_output_size(outputs)]
+                if current != signature:
+                    signature, last_activity = current, now
+                elif now - last_activity > idle_timeout:
+                    raise ProcessTimeout(cmd, idle_timeout, "made no progress")
+                next_check = now + min(IDLE_CHECK_INTERVAL, idle_timeout / 4)
+        stdout, stderr = (_read_output(o, text) for o in outputs)
+    finally:
+        stop_process(proc)
+        for o in outputs:
+            if o is not None:
+                o.close()
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+
+def _output_size(outputs):
+    return tuple(os.fstat(o.fileno()).st_size for o in outputs if o is not None)
+
+
+def _read_output(f, text):
+    if f is None:
+        return None
+    f.seek(0)
+    data = f.read()
+    return data.decode("utf-8", "replace") if text else data
+
+
 def run_model_command(cmd, logger):
     """Run an external model command with logging and rich error messages."""
     logger.info("[subprocess] Running: %s" % " ".join(str(x) for x in cmd))
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = run_process(cmd, capture_output=True, text=True)
     if result.returncode == 0:
         return
 
     logger.error(f"Model process failed with code {result.returncode}")
-    if result.stdout:
-        logger.error(result.stdout)
-    if result.stderr:
-        logger.error(result.stderr)
+    for name, output in (("stdout", result.stdout), ("stderr", result.stderr)):
+        if output:
+            logger.debug(f"[subprocess] {name}:\n{output}")
+            logger.error("\n".join(output.rstrip().splitlines()[-OUTPUT_TAIL_LINES:]))
 
     # Provide a helpful message for common crash code 3221225477 (0xC0000005)
     if result.returncode in (3221225477, -1073741819):
@@ -53,4 +287,4 @@ def run_model_command(cmd, logger):
     else:
         hint = f"Model process returned exit code {result.returncode}."
     logger.error(hint)
-    raise RuntimeError(hint)
\ No newline at end of file
+    raise ModelProcessError(hint, result.returncode, result.stdout, result.stderr)
\ No newline at end of file
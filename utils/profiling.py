@@ -0,0 +1,224 @@
+"""
+Job profiling: where does a slow job spend its time?
+
+With "misc": {"profile": true} in the job JSON (receiver.py --profile) the
+operator profiles the job and writes next to its log file:
+
+    <log>.prof         cProfile stats of the operator thread (pstats, snakeviz)
+    <log>.prof.txt     the top functions by cumulative time
+    <log>.memory.txt   tracemalloc: memory and peak per stage, top allocations
+    <log>.trace.json   Chrome trace (chrome://tracing, ui.perfetto.dev): one
+                       span per stage and per child process (ffmpeg, models)
+
+"profile" may also list the parts to run: ["cpu", "memory", "processes"].
+
+Child processes are traced in utils.process_utils.start_process/stop_process,
+so every ffmpeg and model command is covered. cProfile only sees the operator
+thread; fused-stage worker threads show up through their child processes.
+"""
+import contextvars
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PARTS = ("cpu", "memory", "processes")
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 10
+
+_current = contextvars.ContextVar("job_profiler", default=None)
+# Child process -> (profiler, cmd, start); start_process and stop_process may run in different contexts
+_running = {}
+_running_lock = threading.Lock()
+# tracemalloc is process-wide: it runs while any profiled job needs it
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+
+
+def profile_parts(option):
+    """The profiling parts a job's "profile" option asks for (True: all)."""
+    if not option:
+        return ()
+    if option is True or option == "all":
+        return PARTS
+    if isinstance(option, str):
+        option = [p.strip() for p in option.split(",")]
+    unknown = set(option) - set(PARTS)
+    if unknown:
+        raise ValueError(f"Unknown profile part(s): {', '.join(sorted(unknown))}. Use {', '.join(PARTS)}.")
+    return tuple(p for p in PARTS if p in option)
+
+
+class JobProfiler:
+    def __init__(self, base_path, parts=PARTS, logger=None):
+        self.base_path = base_path
+        self.parts = parts
+        self.logger = logger
+        self.files = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._events = []
+        self._stage_starts = {}
+        self._memory = []
+        self._cprofile = None
+        self._tracing_memory = False
+
+    def _us(self, t):
+        return round((t - self._origin) * 1e6)
+
+    def start(self):
+        if "cpu" in self.parts:
+            import cProfile
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self._cprofile = profile
+            except ValueError as e:
+                # Another profiler (e.g. a concurrent profiled job on Python 3.12+) owns the hook
+                self._warn(f"CPU profiling unavailable: {e}")
+        if "memory" in self.parts:
+            global _tracemalloc_users
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                _tracemalloc_users += 1
+            self._tracing_memory = True
+
+    def stop(self):
+        if self._cprofile:
+            self._cprofile.disable()
+            self._write("prof", ".prof", self._write_cpu)
+        if self._tracing_memory:
+            self._write("memory", ".memory.txt", self._write_memory)
+            global _tracemalloc_users
+            with _tracemalloc_lock:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+        if "processes" in self.parts:
+            self._write("trace", ".trace.json", self._write_trace)
+
+    # Stage boundaries (operator job_stage)
+    def stage_started(self, stage):
+        self._stage_starts[stage] = time.perf_counter()
+        self._record_memory(stage, "start")
+
+    def stage_finished(self, stage, status):
+        start = self._stage_starts.pop(stage, None)
+        if start is not None:
+            self._span(stage, "stage", start, time.perf_counter(), tid=0, args={"status": status})
+        self._record_memory(stage, "end")
+
+    # Child processes (process_utils)
+    def process_finished(self, proc, cmd, start):
+        args = {"cmd": " ".join(str(c) for c in cmd), "returncode": proc.returncode,
+                "thread": threading.current_thread().name}
+        self._span(os.path.basename(str(cmd[0])), "process", start, time.perf_counter(), tid=proc.pid, args=args)
+
+    def _span(self, name, category, start, end, tid, args):
+        with self._lock:
+            self._events.append({"name": name, "cat": category, "ph": "X", "ts": self._us(start),
+                                 "dur": self._us(end) - self._us(start), "pid": os.getpid(), "tid": tid,
+                                 "args": args})
+
+    def _record_memory(self, stage, point):
+        if not self._tracing_memory or not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        top = []
+        if point == "end":
+            top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALLOCATIONS]
+            tracemalloc.reset_peak()
+        with self._lock:
+            self._memory.append((stage, point, current, peak, top))
+
+    def _write(self, key, suffix, writer):
+        path = self.base_path + suffix
+        try:
+            writer(path)
+            self.files[key] = path
+        except OSError as e:
+            self._warn(f"Could not write {path}: {e}")
+
+    def _write_cpu(self, path):
+        import pstats
+        self._cprofile.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(self._cprofile, stream=summary).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+        self.files["prof_summary"] = path + ".txt"
+
+    def _write_memory(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stage, point, current, peak, top in self._memory:
+                f.write(f"{stage} {point}: current {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB\n")
+                for stat in top:
+                    f.write(f"    {stat}\n")
+
+    def _write_trace(self, path):
+        names = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": 0, "args": {"name": "stages"}}]
+        for event in self._events:
+            if event["cat"] == "process":
+                names.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": event["tid"],
+                              "args": {"name": f"{event['name']} ({event['tid']})"}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": names + self._events, "displayTimeUnit": "ms"}, f)
+
+    def _warn(self, message):
+        if self.logger:
+            self.logger.warning(f"[profile] {message}")
+
+
+@contextmanager
+def job_profiling(option, log_path, logger=None):
+    """
+    Profile the block if option (the job's misc.profile) asks for it; yields
+    the JobProfiler (its .files after the block) or None.
+    """
+    parts = profile_parts(option)
+    if not parts:
+        yield None
+        return
+    profiler = JobProfiler(os.path.splitext(log_path)[0], parts, logger)
+    token = _current.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        _current.reset(token)
+        profiler.stop()
+
+
+@contextmanager
+def profiled_stage(stage):
+    """Mark a stage of the current job in its trace and memory report."""
+    profiler = _current.get()
+    if profiler is None:
+        yield
+        return
+    profiler.stage_started(stage)
+    status = "error"
+    try:
+        yield
+        status = "success"
+    finally:
+        profiler.stage_finished(stage, status)
+
+
+def process_started(proc, cmd):
+    profiler = _current.get()
+    if profiler is not None and "processes" in profiler.parts:
+        with _running_lock:
+            _running[proc] = (profiler, cmd, time.perf_counter())
+
+
+def process_finished(proc):
+    with _running_lock:
+        entry = _running.pop(proc, None)
+    if entry is not None:
+        profiler, cmd, start = entry
+        profiler.process_finished(proc, cmd, start)
@@ -0,0 +1,130 @@
+"""
+Job progress events.
+
+The operator reports each phase (decoding, upscaling, interpolation, fused,
+encoding) to a ProgressReporter, which turns frame counts into events with
+throughput and ETA:
+
+    {"event": "stage", "stage": "upscaling", "total": 1440}
+    {"event": "progress", "stage": "upscaling", "done": 300, "total": 1440, "fps": 12.5, "eta": 91.2}
+    {"event": "stage_done", "stage": "upscaling", "done": 1440, "duration": 115.3}
+
+Model executables do not report progress, so during a stage a background
+thread counts the frames written to the stage's output directory.
+
+receiver.py prints the events to stderr as "FUSION2X_PROGRESS <json>" lines
+when FUSION2X_PROGRESS=1 is set (the GUI does this); parse_progress_line()
+reads them back.
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.file_utils import snapshot_dir, changed_files
+
+PROGRESS_PREFIX = "FUSION2X_PROGRESS "
+MONITOR_INTERVAL = 1.0
+
+
+class ProgressReporter:
+    """
+    Args:
+        emit (callable): Receives every event dict; None disables reporting
+            (no events, no directory monitoring).
+        min_interval (float): Minimum seconds between "progress" events.
+    """
+
+    def __init__(self, emit=None, min_interval=0.5):
+        self.enabled = emit is not None
+        self.emit = emit or (lambda event: None)
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._stage = None
+        self._total = None
+        self._done = 0
+        self._start = 0.0
+        self._last_emit = 0.0
+
+    def start_stage(self, stage, total=None):
+        with self._lock:
+            self._stage, self._total, self._done = stage, total, 0
+            self._start = self._last_emit = time.monotonic()
+        self.emit({"event": "stage", "stage": stage, "total": total})
+
+    def update(self, done, force=False):
+        """Report frames finished in the current stage (throttled to min_interval)."""
+        with self._lock:
+            now = time.monotonic()
+            if done == self._done and not force:
+                return
+            self._done = done
+            if not force and now - self._last_emit < self.min_interval:
+                return
+            self._last_emit = now
+            elapsed = now - self._start
+            fps = done / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if self._total and fps > 0:
+                eta = round(max(0, self._total - done) / fps, 1)
+            event = {"event": "progress", "stage": self._stage, "done": done, "total": self._total,
+                     "fps": round(fps, 2), "eta": eta}
+        self.emit(event)
+
+    def end_stage(self):
+        with self._lock:
+            event = {"event": "stage_done", "stage": self._stage, "done": self._done,
+                     "duration": round(time.monotonic() - self._start, 3)}
+        self.emit(event)
+
+    @contextmanager
+    def stage(self, stage, total=None, watch_dir=None, interval=MONITOR_INTERVAL):
+        """
+        Report a stage from start to end. With watch_dir, frames written there
+        since the stage started are counted every interval seconds.
+        """
+        self.start_stage(stage, total)
+        stop = threading.Event()
+        monitor = None
+        if watch_dir and self.enabled:
+            before = snapshot_dir(watch_dir)
+
+            def poll():
+                while not stop.wait(interval):
+                    self.update(len(changed_files(watch_dir, before)))
+
+            monitor = threading.Thread(target=poll, name=f"progress-{stage}", daemon=True)
+            monitor.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            if monitor is not None:
+                monitor.join()
+                self.update(len(changed_files(watch_dir, before)), force=True)
+            self.end_stage()
+
+
+def stderr_emitter(stream=None):
+    """emit callable writing events as PROGRESS_PREFIX + JSON lines (default: sys.stderr)."""
+    lock = threading.Lock()
+
+    def emit(event):
+        out = stream or sys.stderr
+        with lock:
+            out.write(PROGRESS_PREFIX + json.dumps(event) + "\n")
+            out.flush()
+    return emit
+
+
+def parse_progress_line(line):
+    """The event dict of a progress line, or None for any other output."""
+    line = line.strip()
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(PROGRESS_PREFIX):])
+    except ValueError:
+        return None
+
@@ -1,3 +1,16 @@
+import signal
+import threading
+
+_cancel = threading.Event()
+
+
+class JobCancelled(BaseException):
+    """
+    The job was cancelled (SIGINT/SIGTERM). Like KeyboardInterrupt it is not an
+    Exception, so model fallbacks and retries do not swallow it.
+    """
+
+
 def build_result_signal(
     status, output_path=None, log_path=None, message="", extra=None
 ):
@@ -13,3 +26,65 @@ def build_result_signal(
     if extra:
         signal.update(extra)
     return signal
+
+
+def request_cancel():
+    """Cancel the running job(s): supervised children are stopped at their next poll."""
+    _cancel.set()
+
+
+def cancel_requested():
+    return _cancel.is_set()
+
+
+def reset_cancel():
+    _cancel.clear()
+
+
+def watch_cancel_stream(stream):
+    """
+    Cancel the job when a "cancel" line arrives on stream, or when stream is
+    closed (the parent is gone). Lets a parent cancel on every platform: on
+    Windows a console child gets no SIGTERM and a kill skips all cleanup.
+    Reads in a daemon thread; returns it.
+    """
+    def read():
+        try:
+            for line in stream:
+                if line.strip() == "cancel":
+                    break
+        except (OSError, ValueError):
+            pass
+        request_cancel()
+
+    thread = threading.Thread(target=read, name="cancel-stream", daemon=True)
+    thread.start()
+    return thread
+
+
+def check_cancelled():
+    """Raise JobCancelled if a cancel was requested (call between units of work)."""
+    if _cancel.is_set():
+        raise JobCancelled("Job cancelled.")
+
+
+def install_signal_handlers(signals=None):
+    """
+    Turn SIGINT/SIGTERM (and SIGBREAK on Windows) into a job cancel: the first
+    signal sets the cancel flag, which stops every supervised child, and raises
+    JobCancelled in the main thread; later signals only keep the flag set while
+    cleanup runs. Must be called from the main thread. Returns the previous
+    handlers.
+    """
+    if signals is None:
+        signals = [signal.SIGINT, signal.SIGTERM]
+        if hasattr(signal, "SIGBREAK"):
+            signals.append(signal.SIGBREAK)
+
+    def handler(signum, frame):
+        first = not _cancel.is_set()
+        _cancel.set()
+        if first:
+            raise JobCancelled(f"Job cancelled ({signal.Signals(signum).name}).")
+
+    return {sig: signal.signal(sig, handler) for sig in signals}
@@ -0,0 +1,91 @@
+"""
+Frame-rate arithmetic and interpolation timing plans.
+
+Rates are kept as exact Fractions (23.976 is 24000/1001) so plans do not drift
+over long sequences.
+"""
+import math
+from fractions import Fraction
+
+# Common broadcast rates that are usually written as rounded decimals
+NTSC_RATES = {
+    Fraction(24000, 1001),
+    Fraction(30000, 1001),
+    Fraction(48000, 1001),
+    Fraction(60000, 1001),
+    Fraction(120000, 1001),
+}
+
+
+def parse_fps(value):
+    """
+    Parse a frame rate given as a number, "num/den" or decimal string into a Fraction.
+    Rounded NTSC rates (23.976, 29.97, 59.94, ...) snap to their exact value.
+    """
+    if isinstance(value, Fraction):
+        return value
+    if isinstance(value, str) and "/" in value:
+        num, den = value.split("/", 1)
+        fps = Fraction(int(num), int(den))
+    else:
+        fps = Fraction(str(value))
+    if fps <= 0:
+        raise ValueError(f"Invalid frame rate: {value}")
+    for rate in NTSC_RATES:
+        if abs(fps - rate) < Fraction(1, 100):
+            return rate
+    return fps.limit_denominator(1001000)
+
+
+def format_rate(fps):
+    """Format a Fraction rate for ffmpeg ("60" or "60000/1001")."""
+    fps = Fraction(fps)
+    if fps.denominator == 1:
+        return str(fps.numerator)
+    return f"{fps.numerator}/{fps.denominator}"
+
+
+def plan_interpolation(frame_count, source_fps, target_fps):
+    """
+    Compute which frames are needed to retime frame_count source frames from
+    source_fps to target_fps.
+
+    Output frame j shows source position p = j * source_fps / target_fps, i.e.
+    frame floor(p) blended towards the next one at timestep p - floor(p).
+    Positions past the last source frame hold the last frame, so the output
+    covers the same duration as the input.
+
+    Returns:
+        dict: output_fps (Fraction), ratio (output frames per source frame),
+              frames (list of (source_index, Fraction timestep)),
+              timesteps (sorted distinct non-zero timesteps that must be generated).
+    """
+    source_fps = parse_fps(source_fps)
+    target_fps = parse_fps(target_fps)
+    ratio = target_fps / source_fps
+    count = math.ceil(frame_count * ratio)
+    frames = []
+    for j in range(count):
+        p = j / ratio
+        i = math.floor(p)
+        t = p - i
+        if i >= frame_count - 1:
+            i, t = frame_count - 1, Fraction(0)
+        frames.append((i, t))
+    return {
+        "output_fps": target_fps,
+        "ratio": ratio,
+        "frames": frames,
+        "timesteps": sorted({t for _, t in frames if t}),
+    }
+
+
+def output_frame_ratio(interpolation_params, source_fps=None):
+    """
+    Output frames per source frame for an interpolation block: target_fps / source_fps
+    when a target rate is set, else the "times" multiplier.
+    """
+    target_fps = interpolation_params.get("target_fps")
+    if target_fps and source_fps:
+        return parse_fps(target_fps) / parse_fps(source_fps)
+    return Fraction(str(interpolation_params.get("params", {}).get("times", 2)))